@@ -1,17 +1,30 @@
 import os
+import time
 import logging
+import threading
 from datetime import datetime
 import psycopg2
 import psycopg2.extras
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator
 
 from vector_store import VectorStore
 from rag_system import RAGSystem
 from llm_providers import llm_manager
 from database import Database
+from history_manager import get_history_manager
 
 logging.basicConfig(level=logging.INFO)
 
+# Cache de agentes do processo: agent_id -> (expira_em, Agent).
+# Outros processos só enxergam edições após o TTL (AGENT_CACHE_TTL, em segundos).
+_agent_cache: Dict[str, tuple] = {}
+_agent_cache_lock = threading.Lock()
+
+
+def _agent_cache_ttl() -> float:
+    return float(os.getenv("AGENT_CACHE_TTL", "60"))
+
+
 class Agent:
     def __init__(self, data: Dict[str, Any]):
         self.id = str(data.get('id'))
@@ -21,10 +34,20 @@ class Agent:
         self.model = data.get('model', 'gpt-4o-mini')
         self.temperature = float(data.get('temperature', 0.7))
         self.created_at = data.get('created_at', datetime.now())
-        
-        self.rag_system = RAGSystem(agent_id=self.id)
+
+        self._rag_system: Optional[RAGSystem] = None
+        self._rag_lock = threading.Lock()
         self.llm_provider_name = llm_manager.active_provider
 
+    @property
+    def rag_system(self) -> RAGSystem:
+        """RAGSystem do agente, criado no primeiro uso (listagens não pagam a montagem)"""
+        if self._rag_system is None:
+            with self._rag_lock:
+                if self._rag_system is None:
+                    self._rag_system = RAGSystem(agent_id=self.id)
+        return self._rag_system
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -41,7 +64,11 @@ class Agent:
 
     def add_document_from_text(self, content: str, source: str):
         """Adiciona um documento ao sistema RAG a partir de um conteúdo de texto."""
-        self.rag_system.add_document_from_text(content, source)
+        return self.rag_system.add_document_from_text(content, source)
+
+    def sync_document(self, file_path: str):
+        """Reingere um arquivo já conhecido vetorizando apenas o que mudou."""
+        return self.rag_system.sync_document(file_path)
 
     def get_response(self, user_message: str, history: List[Dict[str, str]]) -> str:
         return self.rag_system.get_response(
@@ -52,6 +79,39 @@ class Agent:
             self.model
         )
         
+    def stream_chat(self, user_message: str, history: List[Dict[str, str]], conversation_id: str) -> Iterator[Dict[str, Any]]:
+        """
+        Resposta em streaming para a conversa: gera eventos ``token`` conforme o
+        modelo responde e, ao final, persiste o texto completo com
+        ``save_llm_response`` e emite o evento ``done``. Se o cliente desconectar
+        no meio, o texto parcial recebido é persistido.
+        """
+        model_to_use = self.model if self.model and self.model.strip() else "gpt-4o-mini"
+        stats: Dict[str, Any] = {}
+        parts: List[str] = []
+        saved = False
+        try:
+            for token in self.rag_system.stream_response(user_message, history, self.system_prompt,
+                                                         self.temperature, model_to_use, stats=stats):
+                parts.append(token)
+                yield {'type': 'token', 'content': token}
+
+            response_id = self.save_llm_response(conversation_id, self.llm_provider_name, model_to_use, "".join(parts), 0)
+            saved = True
+            yield {
+                'type': 'done',
+                'id': response_id,
+                'conversation_id': conversation_id,
+                'time_to_first_token': stats.get('time_to_first_token'),
+                'total_time': stats.get('total_time')
+            }
+        except Exception as e:
+            logging.error(f"Erro no streaming da resposta do agente {self.id}: {e}", exc_info=True)
+            yield {'type': 'error', 'error': "Desculpe, ocorreu um erro ao processar sua solicitação."}
+        finally:
+            if not saved and parts:
+                self.save_llm_response(conversation_id, self.llm_provider_name, model_to_use, "".join(parts), 0)
+
     def get_multi_llm_response(self, user_message: str, history: List[Dict[str, str]], providers: List[str]):
         context = self.rag_system.get_relevant_context(user_message)
         return self.rag_system.get_multi_response(user_message, context, history, self.system_prompt, self.temperature, providers)
@@ -78,33 +138,78 @@ class Agent:
         finally:
             if conn: Database.release_connection(conn)
 
+    @staticmethod
+    def _cache_put(agent: 'Agent', replace: bool = True):
+        ttl = _agent_cache_ttl()
+        if ttl <= 0:
+            return
+        with _agent_cache_lock:
+            entry = _agent_cache.get(agent.id)
+            if replace or entry is None or entry[0] <= time.monotonic():
+                _agent_cache[agent.id] = (time.monotonic() + ttl, agent)
+
+    @staticmethod
+    def invalidate_cache(agent_id: Optional[str] = None):
+        """Remove um agente (ou todos) do cache do processo"""
+        with _agent_cache_lock:
+            if agent_id is None:
+                _agent_cache.clear()
+            else:
+                _agent_cache.pop(str(agent_id), None)
+
     @classmethod
     def get_by_id(cls, agent_id: str) -> Optional['Agent']:
+        with _agent_cache_lock:
+            entry = _agent_cache.get(str(agent_id))
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
         row = cls._execute_query("SELECT * FROM agentes WHERE id = %s", (agent_id,), fetch='one')
-        return cls(row) if row else None
+        if not row:
+            return None
+        agent = cls(row)
+        cls._cache_put(agent)
+        return agent
 
     @classmethod
     def get_all(cls) -> List['Agent']:
         rows = cls._execute_query("SELECT * FROM agentes ORDER BY created_at DESC", fetch='all')
-        return [cls(row) for row in rows] if rows else []
+        agents = [cls(row) for row in rows] if rows else []
+        # Não substitui entradas válidas, que podem já ter o RAGSystem montado
+        for agent in agents:
+            cls._cache_put(agent, replace=False)
+        return agents
 
     @classmethod
     def create(cls, data: Dict[str, Any]) -> Optional['Agent']:
         query = "INSERT INTO agentes (name, description, system_prompt, model, temperature) VALUES (%s, %s, %s, %s, %s) RETURNING *;"
         params = (data['name'], data.get('description'), data.get('system_prompt'), data.get('model'), data.get('temperature'))
         new_agent_data = cls._execute_query(query, params, fetch='one')
-        return cls(new_agent_data) if new_agent_data else None
+        if not new_agent_data:
+            return None
+        agent = cls(new_agent_data)
+        cls._cache_put(agent)
+        return agent
 
     @classmethod
     def update(cls, agent_id: str, data: Dict[str, Any]) -> Optional['Agent']:
         query = "UPDATE agentes SET name = %s, description = %s, system_prompt = %s, model = %s, temperature = %s WHERE id = %s RETURNING *;"
         params = (data['name'], data.get('description'), data.get('system_prompt'), data.get('model'), data.get('temperature'), agent_id)
         updated_agent_data = cls._execute_query(query, params, fetch='one')
-        return cls(updated_agent_data) if updated_agent_data else None
+        with _agent_cache_lock:
+            previous = _agent_cache.pop(str(agent_id), None)
+        if not updated_agent_data:
+            return None
+        agent = cls(updated_agent_data)
+        # O RAGSystem depende só do agent_id: o já montado é reaproveitado
+        if previous:
+            agent._rag_system = previous[1]._rag_system
+        cls._cache_put(agent)
+        return agent
 
     @classmethod
     def delete(cls, agent_id: str) -> bool:
         cls._execute_query("DELETE FROM agentes WHERE id = %s", (agent_id,))
+        cls.invalidate_cache(agent_id)
         return True
 
     def save_conversation(self, user_message: str) -> Optional[str]:
@@ -123,30 +228,24 @@ class Agent:
         Agent._execute_query("UPDATE llm_responses SET feedback = %s WHERE id = %s", (feedback, response_id))
         return True
 
-    def get_full_history(self) -> List[Dict[str, Any]]:
-        query = """
-            SELECT c.id as conv_id, c.user_message, c.created_at,
-                   json_agg(json_build_object(
-                       'id', r.id, 'provider', r.provider, 'model_used', r.model_used,
-                       'response_text', r.response_text, 'feedback', r.feedback
-                   ) ORDER BY r.created_at) FILTER (WHERE r.id IS NOT NULL) as responses
-            FROM conversations c
-            LEFT JOIN llm_responses r ON c.id = r.conversation_id
-            WHERE c.agent_id = %s
-            GROUP BY c.id ORDER BY c.created_at ASC;
+    def get_history_page(self, limit: int = 50, before: Optional[str] = None) -> Dict[str, Any]:
+        """Página do histórico (keyset), da mais recente para trás a partir do cursor ``before``"""
+        return get_history_manager().get_page(self.id, limit=limit, before=before)
+
+    def get_chat_history(self, client_history: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, str]]:
         """
-        rows = self._execute_query(query, (self.id,), fetch='all')
-        if not rows: return []
-        
-        history = []
-        for row in rows:
-            history.append({"id": str(row['conv_id']), "role": "user", "content": row['user_message']})
-            if row['responses']:
-                history.append({"id": str(row['conv_id']), "role": "assistant", "responses": [{
-                        'id': str(resp['id']), 'provider': resp['provider'], 'content': resp['response_text'], 'feedback': resp['feedback']
-                    } for resp in row['responses']]
-                })
-        return history
+        Histórico para o prompt do próximo turno: resumo + janela recente do
+        banco (padrão) ou, com CHAT_HISTORY_SOURCE=client, o histórico enviado
+        pelo cliente com a mesma janela e o mesmo teto de tokens.
+        """
+        manager = get_history_manager()
+        if os.getenv("CHAT_HISTORY_SOURCE", "server").lower() == "client":
+            return manager.window_client_history(client_history or [], self.model)
+        try:
+            return manager.build_history(self.id, self.model)
+        except Exception as e:
+            logging.error(f"Falha ao montar o histórico do agente {self.id}: {e}")
+            return manager.window_client_history(client_history or [], self.model)
 
     def get_stats(self) -> Dict[str, Any]:
         doc_query = "SELECT COUNT(*) FROM documents WHERE agent_id = %s;"
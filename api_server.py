@@ -7,10 +7,12 @@ Servidor FastAPI com endpoints para todas as funcionalidades
 
 import os
 import sys
+import json
 from fastapi import FastAPI, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-from typing import Dict, Any
+from typing import Dict, Any, List
 from datetime import datetime
 
 # Imports do sistema
@@ -29,6 +31,10 @@ class LLMQueryRequest(BaseModel):
     query: str = Field(..., description="Query para o LLM")
     provider: str = Field("openai", description="Provedor LLM")
 
+class ChatRequest(BaseModel):
+    message: str = Field(..., description="Mensagem do usuario")
+    history: List[Dict[str, str]] = Field(default_factory=list, description="Historico da conversa")
+
 # Configuracao do FastAPI
 app = FastAPI(
     title="RAG Python API",
@@ -129,6 +135,28 @@ async def list_providers():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/v1/agents/{agent_id}/chat/stream")
+def chat_stream(agent_id: str, request: ChatRequest, user = Depends(get_current_user)):
+    """Chat com o agente em streaming (Server-Sent Events)"""
+    from agent_system import Agent
+
+    agent = Agent.get_by_id(agent_id)
+    if not agent:
+        raise HTTPException(status_code=404, detail="Agente nao encontrado")
+    if not request.message:
+        raise HTTPException(status_code=400, detail="Mensagem nao pode ser vazia")
+
+    conversation_id = agent.save_conversation(request.message)
+    if not conversation_id:
+        raise HTTPException(status_code=500, detail="Falha ao salvar conversa")
+
+    def events():
+        for event in agent.stream_chat(request.message, request.history, conversation_id):
+            yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # Endpoints para Extensão Chrome
 @app.get("/api/v1/extension/health")
 async def extension_health():
@@ -22,8 +22,11 @@ import random
 # Importações do sistema
 from llm_providers import LLMProviderManager
 from privacy_system import privacy_manager
-from vector_store import VectorStore
+from vector_store import VectorStore, bulk_insert_chunks, sync_document_chunks
 from database import Database
+from embedding_engine import get_embedding_engine
+from memory_search import InMemorySearchEngine
+from context_assembler import get_context_assembler
 
 # Importar o novo gerenciador de modelos
 try:
@@ -244,27 +247,27 @@ class RAGSystemUnified:
     def __init__(self):
         self.llm_manager = LLMProviderManager()
         self.agent_manager = AgentManager()
-        self.documents = []
+        self.search_engine = InMemorySearchEngine()
         self.knowledge_base = {}
         self.settings = {
             'model_name': 'gpt-3.5-turbo',
             'temperature': 0.7,
-            'max_tokens': 1000
+            'max_tokens': 1000,
+            'ingest_batch_size': int(os.getenv('INGEST_BATCH_SIZE', '500'))
         }
         self.connection_pool = self._create_connection_pool()
         self._create_tables()
     
+    @property
+    def documents(self):
+        """Documentos enviados nesta sessão (com conteúdo completo), mantidos no índice em memória"""
+        return self.search_engine.list_documents()
+    
     def _create_connection_pool(self):
-        """Cria pool de conexões com PostgreSQL"""
+        """Usa o pool de conexões compartilhado do processo (database.Database)"""
         try:
-            return psycopg2.pool.SimpleConnectionPool(
-                1, 20,
-                host=os.getenv('POSTGRES_HOST', 'localhost'),
-                database=os.getenv('POSTGRES_DB', 'rag_system'),
-                user=os.getenv('POSTGRES_USER', 'postgres'),
-                password=os.getenv('POSTGRES_PASSWORD', 'postgres'),
-                port=os.getenv('POSTGRES_PORT', '5432')
-            )
+            Database.initialize_pool()
+            return Database._connection_pool
         except Exception as e:
             logger.error(f"Erro ao criar pool de conexões: {e}")
             return None
@@ -329,33 +332,6 @@ class RAGSystemUnified:
             # Recuperar documentos do agente
             context_docs = self.get_agent_documents(agent_id) if agent_id else []
             
-            # Preparar contexto dos documentos
-            context = ""
-            if context_docs:
-                context = "\n\nContexto dos documentos:\n"
-                for doc in context_docs[:3]:  # Limitar a 3 documentos mais relevantes
-                    context += f"- {doc.get('name', 'Documento')}: {doc.get('content', '')[:500]}...\n"
-            
-            # Preparar mensagens
-            messages = []
-            
-            if agent:
-                system_prompt = agent['system_prompt']
-                if context:
-                    system_prompt += f"\n\nUse os seguintes documentos como referência quando relevante:{context}"
-                
-                messages.append({
-                    "role": "system", 
-                    "content": system_prompt
-                })
-            elif context:
-                messages.append({
-                    "role": "system",
-                    "content": f"Você é um assistente inteligente. Use os seguintes documentos como referência quando relevante:{context}"
-                })
-            
-            messages.append({"role": "user", "content": question})
-            
             # Determinar configurações
             if agent:
                 # Usar modelo específico se fornecido, senão usar do agente
@@ -366,6 +342,21 @@ class RAGSystemUnified:
                 final_model = model if model and model != "default" else self.settings['model_name']
                 temperature = float(self.settings['temperature'])
             
+            # Contexto: chunks mais similares dos documentos em memória do agente (ou os
+            # documentos listados), montados no orçamento de tokens do modelo
+            chunks = self.search_engine.search(question, k=5, where={'agent_id': agent_id}) if agent_id else []
+            if not chunks:
+                chunks = [{'text': doc['content'], 'source': doc.get('name')}
+                          for doc in context_docs[:3] if doc.get('content')]
+            
+            if agent:
+                system_prompt = agent['system_prompt']
+            else:
+                system_prompt = "Você é um assistente inteligente." if chunks else ""
+            
+            prompt = get_context_assembler(final_model).assemble(question, chunks, system_prompt=system_prompt)
+            messages = prompt['messages']
+            
             # Gerar resposta usando LLM especificado
             if llm:
                 result = self.llm_manager.generate_response(
@@ -432,7 +423,7 @@ class RAGSystemUnified:
         try:
             if not agent_id:
                 # Retornar documentos da base geral
-                return [doc for doc in self.documents if not doc.get('agent_id')]
+                return self.search_engine.list_documents(agent_id=None)
             
             # Buscar documentos no banco de dados PostgreSQL (usando schema correto)
             query = """
@@ -462,15 +453,12 @@ class RAGSystemUnified:
                 return documents
             else:
                 # Fallback para documentos em memória
-                return [doc for doc in self.documents if doc.get('agent_id') == agent_id]
+                return self.search_engine.list_documents(agent_id=agent_id)
                 
         except Exception as e:
             logger.error(f"Erro ao recuperar documentos do agente {agent_id}: {e}")
             # Fallback para documentos em memória
-            if agent_id:
-                return [doc for doc in self.documents if doc.get('agent_id') == agent_id]
-            else:
-                return [doc for doc in self.documents if not doc.get('agent_id')]
+            return self.search_engine.list_documents(agent_id=agent_id)
     
     def multi_llm_compare(self, question: str, providers: List[str] = None) -> Dict:
         """Compara respostas de múltiplos LLMs"""
@@ -508,6 +496,7 @@ class RAGSystemUnified:
                     'user': result[2],
                     'timestamp': result[3],
                     'connection_pool': bool(self.connection_pool),
+                    'pool_stats': Database.get_pool_stats(),
                     'error': None
                 }
             else:
@@ -701,54 +690,80 @@ class RAGSystemUnified:
             # Gerar hash do conteúdo
             content_hash = hashlib.sha256(file_content.encode()).hexdigest()
             
-            # Verificar se documento já existe
-            check_query = "SELECT id FROM documents WHERE content_hash = %s"
-            existing = self.agent_manager._execute_query(check_query, (content_hash,), fetch='one')
+            # Conteúdo idêntico já presente para o agente: nada a fazer
+            check_query = "SELECT id FROM documents WHERE agent_id = %s AND content_hash = %s"
+            existing = self.agent_manager._execute_query(check_query, (agent_id, content_hash), fetch='one')
             
             if existing:
+                self._index_upload_in_memory(file_content, file_name, agent_id)
                 return {
-                    'success': False,
-                    'error': 'Documento já existe na base de dados'
+                    'success': True,
+                    'unchanged': True,
+                    'document_id': str(existing['id']),
+                    'chunks_created': 0,
+                    'agent_id': agent_id
                 }
             
-            # Inserir documento
-            doc_id = str(uuid.uuid4())
             source_type = file_name.split('.')[-1].lower() if '.' in file_name else 'txt'
             
-            insert_doc_query = """
-                INSERT INTO documents (id, agent_id, file_name, source_type, content_hash, created_at)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """
-            
-            self.agent_manager._execute_query(insert_doc_query, (
-                doc_id, agent_id, file_name, source_type, content_hash, datetime.now()
-            ))
-            
             # Chunking do documento
             chunks = self._create_chunks(file_content)
             
-            # Gerar embeddings e inserir chunks
-            embeddings_created = 0
-            for chunk_text in chunks:
-                try:
-                    # Gerar embedding (simulado - em produção usar OpenAI/etc)
-                    embedding = self._generate_embedding(chunk_text)
+            conn = Database.get_connection()
+            try:
+                with conn.cursor() as cur:
+                    # Mesmo arquivo reenviado com alterações: atualização incremental
+                    cur.execute(
+                        "SELECT id FROM documents WHERE agent_id = %s AND file_name = %s ORDER BY created_at LIMIT 1 FOR UPDATE",
+                        (agent_id, file_name)
+                    )
+                    previous = cur.fetchone()
                     
-                    if embedding:
-                        chunk_id = str(uuid.uuid4())
-                        insert_chunk_query = """
-                            INSERT INTO document_chunks (id, document_id, agent_id, chunk_text, embedding, created_at)
+                    if previous:
+                        doc_id = str(previous[0])
+                        diff = sync_document_chunks(
+                            cur, doc_id, agent_id, chunks, self._generate_embeddings,
+                            batch_size=self.settings.get('ingest_batch_size')
+                        )
+                        cur.execute("UPDATE documents SET content_hash = %s WHERE id = %s", (content_hash, doc_id))
+                        embeddings_created = diff['added']
+                    else:
+                        doc_id = str(uuid.uuid4())
+                        
+                        # Gerar embeddings de todos os chunks em lotes concorrentes
+                        embeddings = self._generate_embeddings(chunks)
+                        
+                        # Inserir documento e chunks em uma única transação (COPY em massa)
+                        cur.execute("""
+                            INSERT INTO documents (id, agent_id, file_name, source_type, content_hash, created_at)
                             VALUES (%s, %s, %s, %s, %s, %s)
-                        """
+                        """, (doc_id, agent_id, file_name, source_type, content_hash, datetime.now()))
                         
-                        self.agent_manager._execute_query(insert_chunk_query, (
-                            chunk_id, doc_id, agent_id, chunk_text, embedding, datetime.now()
-                        ))
-                        embeddings_created += 1
-                
-                except Exception as e:
-                    logger.warning(f"Erro ao processar chunk: {e}")
-                    continue
+                        embeddings_created = bulk_insert_chunks(
+                            cur, doc_id, agent_id, chunks, embeddings,
+                            batch_size=self.settings.get('ingest_batch_size')
+                        )
+                        diff = None
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                Database.release_connection(conn)
+            
+            self._index_upload_in_memory(file_content, file_name, agent_id)
+            
+            if diff:
+                return {
+                    'success': True,
+                    'updated': True,
+                    'document_id': doc_id,
+                    'chunks_created': embeddings_created,
+                    'chunks_kept': diff['kept'],
+                    'chunks_removed': diff['removed'],
+                    'total_chunks': len(chunks),
+                    'agent_id': agent_id
+                }
             
             return {
                 'success': True,
@@ -765,6 +780,24 @@ class RAGSystemUnified:
                 'error': str(e)
             }
     
+    def _index_upload_in_memory(self, file_content: str, file_name: str, agent_id: str):
+        """Substitui no índice em memória a versão anterior do arquivo enviado para o agente"""
+        try:
+            for doc in self.search_engine.list_documents(agent_id=agent_id, source=file_name):
+                self.search_engine.remove_document(doc['id'])
+            agent = self.agent_manager.get_agent_by_id(agent_id)
+            self.search_engine.add_document(
+                file_content, file_name,
+                name=file_name,
+                type=file_name.split('.')[-1].lower() if '.' in file_name else 'txt',
+                size=len(file_content.encode()),
+                uploaded_at=datetime.now().strftime('%d/%m/%Y %H:%M'),
+                agent_id=agent_id,
+                agent_name=agent['name'] if agent else None
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Documento '{file_name}' não indexado em memória: {e}")
+    
     def _create_chunks(self, text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
         """Divide texto em chunks com sobreposição"""
         chunks = []
@@ -789,16 +822,20 @@ class RAGSystemUnified:
         
         return [chunk for chunk in chunks if chunk.strip()]
     
-    def _generate_embedding(self, text: str) -> List[float]:
-        """Gera embedding para o texto (simulado)"""
+    def _generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Gera embeddings para os textos usando o motor em lotes compartilhado.
+        Erros do provedor são propagados para que o upload desfaça a transação.
+        """
         try:
-            import random
-            # Em produção, usar OpenAI embeddings ou similar
-            # Por enquanto, retornar embedding simulado
-            return [random.random() for _ in range(1536)]  # Dimensão do text-embedding-3-small
+            return get_embedding_engine().embed_texts(texts)
         except Exception as e:
-            logger.error(f"Erro ao gerar embedding: {e}")
-            return None
+            logger.error(f"Erro ao gerar embeddings: {e}")
+            raise
+    
+    def _generate_embedding(self, text: str) -> List[float]:
+        """Gera embedding para um único texto"""
+        return self._generate_embeddings([text])[0]
     
     def save_conversation_to_db(self, agent_id: str, user_message: str, assistant_response: str, 
                                provider: str, model_used: str, response_time: float = 0) -> bool:
@@ -1116,6 +1153,8 @@ def dashboard_interface(rag_system):
                         - **Banco:** {db_status['database']}
                         - **Usuário:** {db_status['user']}
                         - **Pool:** {'✅ Ativo' if db_status['connection_pool'] else '❌ Inativo'}
+                        - **Conexões em uso:** {db_status['pool_stats'].get('in_use', 0)}/{db_status['pool_stats'].get('maxconn', 0)}
+                        - **Espera média:** {db_status['pool_stats'].get('avg_wait_ms', 0)} ms
                         """)
                     
                     with col2:
@@ -2263,7 +2302,13 @@ def documents_interface(rag_system):
                         chunks_created = result.get('chunks_created', 0)
                         total_chunks += chunks_created
                         
-                        st.success(f"✅ **{file_name}**: {chunks_created} chunks criados")
+                        if result.get('unchanged'):
+                            st.info(f"⏭️ **{file_name}**: sem alterações")
+                        elif result.get('updated'):
+                            st.success(f"🔁 **{file_name}**: {chunks_created} chunks novos, "
+                                       f"{result['chunks_kept']} mantidos, {result['chunks_removed']} removidos")
+                        else:
+                            st.success(f"✅ **{file_name}**: {chunks_created} chunks criados")
                     else:
                         st.error(f"❌ **{file_name}**: {result.get('error', 'Erro desconhecido')}")
                 
@@ -2324,7 +2369,7 @@ def documents_interface(rag_system):
                         
                         with col2:
                             if st.button(f"🗑️ Remover", key=f"remove_{i}"):
-                                rag_system.documents.pop(i)
+                                rag_system.search_engine.remove_document(doc['id'])
                                 st.success("🗑️ Documento removido!")
                                 st.rerun()
             else:
@@ -2338,15 +2383,21 @@ def documents_interface(rag_system):
         search_query = st.text_input("🔍 Termo de Busca:", placeholder="Digite para buscar...")
         
         if search_query:
-            results = []
-            for doc in rag_system.documents:
-                if search_query.lower() in doc.get('content', '').lower():
-                    results.append(doc)
+            # Busca vetorial no índice em memória, em vez de varrer o conteúdo de cada documento
+            try:
+                results = rag_system.search_engine.search(search_query, k=10)
+            except Exception as e:
+                logger.error(f"Erro na busca em documentos: {e}")
+                st.error(f"❌ Erro na busca: {e}")
+                results = []
             
             if results:
-                st.write(f"📊 Encontrados {len(results)} resultado(s):")
-                for doc in results:
-                    st.write(f"📄 **{doc['name']}**")
+                st.write(f"📊 Encontrados {len(results)} trecho(s) relevante(s):")
+                for result in results:
+                    metadata = result['metadata']
+                    st.write(f"📄 **{metadata.get('name') or metadata.get('source')}** "
+                             f"(similaridade {result['score']:.2f})")
+                    st.caption(result['content'][:300])
             else:
                 st.info("🔍 Nenhum resultado encontrado.")
 
@@ -12,10 +12,10 @@ from typing import List, Dict, Any
 import json
 import pandas as pd
 import plotly.express as px
-from datetime import datetime
 
 # Imports dos sistemas
 from llm_providers import LLMProviderManager
+from memory_search import InMemorySearchEngine
 from agent_system import MultiAgentSystem, create_agent
 from privacy_system import privacy_manager
 
@@ -86,7 +86,7 @@ class RAGSystemLocal:
     
     def __init__(self):
         self.llm_manager = LLMProviderManager()
-        self.documents = []
+        self.search_engine = InMemorySearchEngine()
         self.knowledge_base = {}
         self.settings = {
             'model_name': 'gpt-3.5-turbo',
@@ -117,12 +117,7 @@ class RAGSystemLocal:
                 for file_path in file_paths:
                     content = self._load_file_content(file_path)
                     if content:
-                        self.documents.append({
-                            'source': file_path,
-                            'content': content,
-                            'type': 'file',
-                            'timestamp': datetime.now().isoformat()
-                        })
+                        self.search_engine.add_document(content, file_path, type='file')
             
             if directory_path:
                 directory = Path(directory_path)
@@ -130,22 +125,12 @@ class RAGSystemLocal:
                     for file_path in directory.rglob("*.txt"):
                         content = self._load_file_content(str(file_path))
                         if content:
-                            self.documents.append({
-                                'source': str(file_path),
-                                'content': content,
-                                'type': 'directory',
-                                'timestamp': datetime.now().isoformat()
-                            })
+                            self.search_engine.add_document(content, str(file_path), type='directory')
             
             if urls:
                 for url in urls:
                     # Simulação de carregamento de URL
-                    self.documents.append({
-                        'source': url,
-                        'content': f"Conteúdo simulado de {url}",
-                        'type': 'url',
-                        'timestamp': datetime.now().isoformat()
-                    })
+                    self.search_engine.add_document(f"Conteúdo simulado de {url}", url, type='url')
             
             return success
             
@@ -166,7 +151,8 @@ class RAGSystemLocal:
         """Processa uma pergunta usando RAG"""
         try:
             # Buscar contexto relevante
-            context = self._get_relevant_context(question)
+            relevant_chunks = self.search_engine.search(question, k=4)
+            context = "\n\n".join(chunk['content'] for chunk in relevant_chunks)
             
             # Preparar mensagens para o LLM
             messages = []
@@ -192,7 +178,7 @@ Responda de forma clara e precisa, baseando-se no contexto fornecido."""
                 
                 result = {
                     'answer': response,
-                    'sources': self._get_sources() if include_sources else [],
+                    'sources': self._get_sources(relevant_chunks) if include_sources else [],
                     'success': True
                 }
             else:
@@ -212,48 +198,20 @@ Responda de forma clara e precisa, baseando-se no contexto fornecido."""
                 'success': False
             }
     
-    def _get_relevant_context(self, question):
-        """Busca contexto relevante nos documentos"""
-        if not self.documents:
-            return ""
-        
-        # Busca simples por palavras-chave
-        relevant_docs = []
-        question_words = question.lower().split()
-        
-        for doc in self.documents[-5:]:  # Últimos 5 documentos
-            content_lower = doc['content'].lower()
-            if any(word in content_lower for word in question_words):
-                relevant_docs.append(doc['content'][:500])  # Primeiros 500 chars
-        
-        return "\n\n".join(relevant_docs)
+    @property
+    def documents(self):
+        """Documentos carregados (com conteúdo completo)"""
+        return self.search_engine.list_documents()
     
-    def _get_sources(self):
-        """Retorna fontes dos documentos"""
-        return [{'source': doc['source'], 'content': doc['content'][:100]} 
-                for doc in self.documents[-3:]]
+    def _get_sources(self, chunks):
+        """Retorna fontes dos chunks usados como contexto"""
+        return [{'source': chunk['metadata']['source'], 'content': chunk['content'][:100]}
+                for chunk in chunks]
     
     def search_similar_documents(self, query, k=4):
-        """Busca documentos similares"""
+        """Busca os chunks mais similares à consulta no índice em memória"""
         try:
-            results = []
-            query_lower = query.lower()
-            
-            for doc in self.documents:
-                if query_lower in doc['content'].lower():
-                    results.append({
-                        'content': doc['content'][:300],
-                        'metadata': {
-                            'source': doc['source'],
-                            'type': doc['type'],
-                            'timestamp': doc['timestamp']
-                        }
-                    })
-                
-                if len(results) >= k:
-                    break
-            
-            return results
+            return self.search_engine.search(query, k=k)
             
         except Exception as e:
             logger.error(f"Erro na busca: {e}")
@@ -262,7 +220,8 @@ Responda de forma clara e precisa, baseando-se no contexto fornecido."""
     def get_system_info(self):
         """Retorna informações do sistema"""
         return {
-            'document_count': len(self.documents),
+            'document_count': len(self.search_engine),
+            'search_index': self.search_engine.stats(),
             'model_name': self.settings['model_name'],
             'temperature': self.settings['temperature'],
             'max_tokens': self.settings['max_tokens'],
@@ -274,7 +233,7 @@ Responda de forma clara e precisa, baseando-se no contexto fornecido."""
     def reset_system(self):
         """Reseta o sistema"""
         try:
-            self.documents = []
+            self.search_engine.clear()
             self.knowledge_base = {}
             return True
         except Exception as e:
@@ -0,0 +1,252 @@
+"""
+Ingestão paralela de múltiplos arquivos
+Um pool de processos faz o parsing/splitting (CPU, segura o GIL) enquanto um
+pool de threads vetoriza e grava (rede). Cada arquivo tem seu resultado
+registrado em um manifesto retomável, para que uma importação interrompida
+continue de onde parou.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Callable
+
+from ingestion_pipeline import ChunkBatch
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class IngestionManifest:
+    """
+    Manifesto de importação em JSON Lines (uma linha por arquivo concluído).
+
+    Um arquivo é considerado já importado quando caminho, tamanho e data de
+    modificação coincidem com uma entrada de sucesso (ou de arquivo vazio, que
+    também é um estado final); arquivos alterados ou que falharam são
+    reprocessados na próxima execução.
+    """
+
+    TERMINAL_STATUSES = ('success', 'empty')
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Última linha truncada por uma queda do processo
+                    continue
+                self.entries[entry['file']] = entry
+
+    @staticmethod
+    def fingerprint(file_path: str) -> Dict[str, Any]:
+        stat = os.stat(file_path)
+        return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    def is_done(self, file_path: str) -> bool:
+        entry = self.entries.get(str(file_path))
+        if not entry or entry.get('status') not in self.TERMINAL_STATUSES:
+            return False
+        try:
+            current = self.fingerprint(file_path)
+        except OSError:
+            return False
+        return entry.get('size') == current['size'] and entry.get('mtime') == current['mtime']
+
+    def record(self, result: Dict[str, Any]):
+        """Acrescenta o resultado de um arquivo ao manifesto"""
+        entry = dict(result)
+        try:
+            entry.update(self.fingerprint(entry['file']))
+        except OSError:
+            pass
+        with self._lock:
+            self.entries[entry['file']] = entry
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+                f.flush()
+
+
+# --- Parsing em processos filhos ---------------------------------------------
+
+_worker_loader = None
+
+
+def parse_file(file_path: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> Dict[str, Any]:
+    """
+    Lê e divide um arquivo em chunks (executado no pool de processos).
+    Retorna apenas textos para minimizar o custo de serialização entre processos.
+    """
+    global _worker_loader
+    if _worker_loader is None or (_worker_loader.chunk_size, _worker_loader.chunk_overlap) != (chunk_size, chunk_overlap):
+        from document_loader import DocumentLoader
+        _worker_loader = DocumentLoader(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+    texts = [chunk.page_content for chunk in _worker_loader.iter_chunks(file_path)
+             if chunk.page_content and chunk.page_content.strip()]
+    return {'file': file_path, 'file_type': Path(file_path).suffix.lower(), 'texts': texts}
+
+
+class ParallelIngestor:
+    """
+    Ingestão de lotes de arquivos para um agente: parsing em processos,
+    vetorização e gravação em threads, com relatório por arquivo.
+    """
+
+    def __init__(self,
+                 agent_id: str,
+                 embed_fn: Optional[Callable[[List[str]], List[List[float]]]] = None,
+                 writer_factory: Optional[Callable[[], Any]] = None,
+                 parse_fn: Callable[..., Dict[str, Any]] = parse_file,
+                 parse_workers: Optional[int] = None,
+                 embed_workers: int = 4,
+                 chunk_size: int = 1000,
+                 chunk_overlap: int = 200):
+        if not agent_id:
+            raise ValueError("ParallelIngestor requer um agent_id.")
+        self.agent_id = agent_id
+        self.parse_fn = parse_fn
+        self.parse_workers = parse_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.embed_workers = embed_workers
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+        if embed_fn is None:
+            from vector_store import PGVectorStore
+            embed_fn = PGVectorStore(agent_id=agent_id).embedding_function
+        self.embed_fn = embed_fn
+
+        if writer_factory is None:
+            from ingestion_pipeline import PGChunkWriter
+            writer_factory = lambda: PGChunkWriter(agent_id)
+        self.writer_factory = writer_factory
+
+    def _embed_and_write(self, parsed: Dict[str, Any], started: float) -> Dict[str, Any]:
+        """Vetoriza e grava um arquivo já dividido (uma transação por documento)"""
+        texts = parsed['texts']
+        if not texts:
+            return {'file': parsed['file'], 'status': 'empty', 'chunks': 0,
+                    'seconds': round(time.time() - started, 3)}
+
+        batch = ChunkBatch(source=parsed['file'], file_type=parsed['file_type'], texts=texts)
+        batch.embeddings = self.embed_fn(texts)
+
+        writer = self.writer_factory()
+        try:
+            written = writer.write(batch)
+            writer.finish_document()
+        except Exception:
+            writer.abort()
+            raise
+        return {'file': parsed['file'], 'status': 'success', 'chunks': written,
+                'seconds': round(time.time() - started, 3)}
+
+    def ingest_files(self, file_paths: Iterable[str], manifest_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Ingere os arquivos em paralelo.
+
+        Args:
+            file_paths: Caminhos dos arquivos
+            manifest_path: Manifesto para retomar importações interrompidas
+
+        Returns:
+            Relatório com o resultado de cada arquivo
+        """
+        manifest = IngestionManifest(manifest_path) if manifest_path else None
+        results: List[Dict[str, Any]] = []
+        skipped = 0
+        wall_start = time.time()
+
+        def finish(result: Dict[str, Any]):
+            results.append(result)
+            if manifest:
+                manifest.record(result)
+            if result['status'] == 'failed':
+                logger.warning(f"⚠️ Ingestão: {result['file']} falhou: {result.get('error')}")
+            else:
+                logger.info(f"✅ Ingestão: {result['file']} ({result['chunks']} chunks, {result['seconds']}s)")
+
+        # Limitar os arquivos em voo mantém a memória estável em importações grandes
+        max_in_flight = self.parse_workers * 2
+
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as parse_pool, \
+                ThreadPoolExecutor(max_workers=self.embed_workers, thread_name_prefix="ingest") as io_pool:
+            parsing: Dict[Any, tuple] = {}
+            writing: Dict[Any, tuple] = {}
+
+            def collect(done):
+                for future in done:
+                    if future in parsing:
+                        file_path, started = parsing.pop(future)
+                        try:
+                            parsed = future.result()
+                        except Exception as e:
+                            finish({'file': file_path, 'status': 'failed', 'chunks': 0, 'error': str(e),
+                                    'seconds': round(time.time() - started, 3)})
+                            continue
+                        writing[io_pool.submit(self._embed_and_write, parsed, started)] = (file_path, started)
+                    else:
+                        file_path, started = writing.pop(future)
+                        try:
+                            finish(future.result())
+                        except Exception as e:
+                            finish({'file': file_path, 'status': 'failed', 'chunks': 0, 'error': str(e),
+                                    'seconds': round(time.time() - started, 3)})
+
+            for file_path in file_paths:
+                file_path = str(file_path)
+                if manifest and manifest.is_done(file_path):
+                    skipped += 1
+                    continue
+                while len(parsing) + len(writing) >= max_in_flight:
+                    done, _ = wait(list(parsing) + list(writing), return_when=FIRST_COMPLETED)
+                    collect(done)
+                future = parse_pool.submit(self.parse_fn, file_path, self.chunk_size, self.chunk_overlap)
+                parsing[future] = (file_path, time.time())
+
+            while parsing or writing:
+                done, _ = wait(list(parsing) + list(writing), return_when=FIRST_COMPLETED)
+                collect(done)
+
+        succeeded = [r for r in results if r['status'] != 'failed']
+        report = {
+            'success': len(succeeded) == len(results),
+            'agent_id': self.agent_id,
+            'files_processed': len(results),
+            'files_succeeded': len(succeeded),
+            'files_failed': len(results) - len(succeeded),
+            'files_skipped': skipped,
+            'chunks_written': sum(r['chunks'] for r in succeeded),
+            'wall_seconds': round(time.time() - wall_start, 3),
+            'files': results
+        }
+        logger.info(f"📦 Ingestão paralela: {report['files_succeeded']}/{report['files_processed']} arquivos, "
+                    f"{report['chunks_written']} chunks, {skipped} já importados, {report['wall_seconds']}s")
+        return report
+
+    def ingest_directory(self, directory_path: str, manifest_path: Optional[str] = None) -> Dict[str, Any]:
+        """Ingere em paralelo todos os arquivos suportados de um diretório"""
+        from document_loader import SUPPORTED_EXTENSIONS
+
+        directory = Path(directory_path)
+        if not directory.exists():
+            raise FileNotFoundError(f"Diretório não encontrado: {directory_path}")
+
+        paths = (p for p in directory.rglob('*') if p.is_file() and p.suffix.lower() in SUPPORTED_EXTENSIONS)
+        return self.ingest_files(paths, manifest_path=manifest_path)
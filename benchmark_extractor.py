@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark do extrator de conteúdo HTML: BeautifulSoup (original) x lxml (passada única)
+
+Uso:
+    python benchmark_extractor.py [arquivos ou globs ...] [--repeat N] [--synthetic N]
+
+Aceita capturas salvas por save_page_as_json (campo raw_html) e resultados
+rag_processed_*.json (que guardam só os chunks: o HTML é remontado a partir
+deles). Uma página jurídica sintética com contêineres aninhados entra por
+padrão, já que as capturas salvas costumam ser pequenas.
+"""
+
+import sys
+import glob
+import json
+import time
+import html
+import argparse
+import statistics
+from typing import List, Tuple
+
+from html_extractor import extract_content_bs4, extract_content_lxml
+
+DEFAULT_PATTERNS = ["rag_processed_https___www.example.com_*.json"]
+NESTED_KEYS = ("semantic_content", "jurisprudence_content")
+
+
+def html_from_saved(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if "raw_html" in data:
+        return data["raw_html"]
+    if "raw_html" in data.get("data", {}):
+        return data["data"]["raw_html"]
+
+    # rag_processed: remonta uma página com o título e os chunks como parágrafos
+    title = html.escape(data.get("source_title") or "")
+    paragraphs = "".join(f"<p>{html.escape(line)}</p>"
+                         for chunk in data.get("chunks", []) for line in chunk["text"].splitlines() if line.strip())
+    return (f"<html><head><title>{title}</title></head><body><header><nav><ul><li>Início</li>"
+            f"<li>Sobre</li></ul></nav></header><main><article><h1>{title}</h1>{paragraphs}"
+            f"</article></main><footer><p>Rodapé da página de exemplo.</p></footer></body></html>")
+
+
+def synthetic_jurisprudence_page(decisions: int) -> str:
+    """Listagem de acórdãos com main > section > article e .acordao > .ementa/.voto aninhados"""
+    items = []
+    for i in range(decisions):
+        items.append(
+            f"<article class='acordao'><h2>Acórdão {i} - REsp {1000 + i}/SP</h2>"
+            f"<div class='ementa'><p>EMENTA: Direito civil. Responsabilidade civil. Dano moral "
+            f"configurado no caso {i}. Recurso especial conhecido e provido.</p></div>"
+            f"<div class='voto'><p>O relator votou pelo provimento do recurso, nos termos da "
+            f"fundamentação, com base na jurisprudência consolidada.</p>"
+            f"<ul><li>Precedente A{i}</li><li>Precedente B{i}</li></ul></div>"
+            f"<div class='relatorio'><p>Trata-se de recurso interposto contra acórdão do "
+            f"tribunal de origem no processo {i}.</p></div></article>")
+    return ("<html><head><title>Jurisprudência</title><script>var analytics = 1;</script>"
+            "<style>.x{color:red}</style></head><body><header><nav><ul>"
+            + "".join(f"<li><a href='/p{i}'>Página {i}</a></li>" for i in range(30))
+            + "</ul></nav></header><main class='content'><section class='main-content'>"
+            + "".join(items) + "</section></main><footer><p>Tribunal de exemplo - todos os "
+            "direitos reservados.</p></footer></body></html>")
+
+
+def median_ms(fn, html_content: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(html_content)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def compare(html_content: str) -> Tuple[List[str], List[str]]:
+    """Chaves iguais e chaves que diferem (só as de contêineres aninhados podem diferir)"""
+    old, new = extract_content_bs4(html_content), extract_content_lxml(html_content)
+    differ = [key for key in old if old[key] != new[key]]
+    return [key for key in old if key not in differ], differ
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", help="capturas JSON salvas (aceita globs)")
+    parser.add_argument("--repeat", type=int, default=20, help="execuções por página (mediana)")
+    parser.add_argument("--synthetic", type=int, default=200, help="acórdãos na página sintética (0 desliga)")
+    args = parser.parse_args(argv)
+
+    pages = []
+    for pattern in args.paths or DEFAULT_PATTERNS:
+        for path in sorted(glob.glob(pattern)):
+            pages.append((path, html_from_saved(path)))
+    if args.synthetic:
+        pages.append((f"sintética ({args.synthetic} acórdãos)", synthetic_jurisprudence_page(args.synthetic)))
+    if not pages:
+        print("Nenhuma página encontrada.")
+        return 1
+
+    print(f"{'página':<60} {'KB':>8} {'bs4 ms':>9} {'lxml ms':>9} {'ganho':>7}  saída")
+    total_old = total_new = 0.0
+    ok = True
+    for name, html_content in pages:
+        old_ms = median_ms(extract_content_bs4, html_content, args.repeat)
+        new_ms = median_ms(extract_content_lxml, html_content, args.repeat)
+        total_old += old_ms
+        total_new += new_ms
+        _, differ = compare(html_content)
+        unexpected = [key for key in differ if key not in NESTED_KEYS]
+        ok = ok and not unexpected
+        if not differ:
+            verdict = "idêntica"
+        elif unexpected:
+            verdict = f"DIFERE em {', '.join(unexpected)}"
+        else:
+            verdict = f"idêntica exceto aninhados ({', '.join(differ)})"
+        print(f"{name[-60:]:<60} {len(html_content) / 1024:>8.1f} {old_ms:>9.2f} {new_ms:>9.2f} "
+              f"{old_ms / new_ms:>6.1f}x  {verdict}")
+
+    print(f"\nTotal: bs4 {total_old:.1f} ms | lxml {total_new:.1f} ms | ganho {total_old / total_new:.1f}x")
+    return 0 if ok else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
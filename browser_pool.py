@@ -0,0 +1,388 @@
+"""
+Pool persistente de navegadores headless para o scraper
+
+- Um Chromium de vida longa roda em um loop de eventos dedicado (thread
+  própria), como o ``_AsyncRunner`` de llm_providers: capturas chamadas de
+  qualquer thread ou loop não pagam a inicialização do navegador
+- Contextos são reaproveitados e reciclados após ``max_pages_per_context``
+  páginas ou ``max_context_age`` segundos
+- O navegador é reiniciado após ``max_pages_per_browser`` páginas (memória
+  limitada em processos que ficam semanas no ar) e fechado quando ocioso
+- Queda do navegador ou da página é detectada: o contexto é descartado, o
+  navegador é relançado e a captura é repetida uma vez
+- Número de páginas abertas simultaneamente limitado por semáforo
+"""
+
+import os
+import time
+import atexit
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from lazy_imports import lazy_import
+
+playwright_api = lazy_import("playwright.async_api", "playwright")
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36')
+
+LAUNCH_ARGS = [
+    '--no-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-blink-features=AutomationControlled',
+    '--disable-web-security',
+    '--disable-features=VizDisplayCompositor',
+    '--disable-automation',
+    '--disable-extensions',
+    '--no-first-run',
+    '--disable-default-apps',
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-renderer-backgrounding',
+    '--disable-field-trial-config',
+    '--disable-back-forward-cache',
+    '--disable-ipc-flooding-protection',
+    '--enable-javascript',  # Garantir que JS está habilitado
+    f'--user-agent={USER_AGENT}'
+]
+
+CONTEXT_OPTIONS = {
+    'viewport': {'width': 1920, 'height': 1080},
+    'user_agent': USER_AGENT,
+    'locale': 'pt-BR',
+    'timezone_id': 'America/Sao_Paulo',
+    'permissions': ['geolocation'],
+    'java_script_enabled': True,
+    'extra_http_headers': {
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+        'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'DNT': '1',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+        'Sec-Fetch-Dest': 'document',
+        'Sec-Fetch-Mode': 'navigate',
+        'Sec-Fetch-Site': 'none',
+        'Sec-Fetch-User': '?1',
+        'Cache-Control': 'max-age=0'
+    }
+}
+
+# Mascara propriedades que indicam automação (aplicado a todas as páginas do contexto)
+STEALTH_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined,
+    });
+
+    Object.defineProperty(navigator, 'plugins', {
+        get: () => [1, 2, 3, 4, 5],
+    });
+
+    Object.defineProperty(navigator, 'languages', {
+        get: () => ['pt-BR', 'pt', 'en'],
+    });
+
+    window.chrome = {
+        runtime: {},
+    };
+
+    Object.defineProperty(navigator, 'permissions', {
+        get: () => ({
+            query: () => Promise.resolve({ state: 'granted' }),
+        }),
+    });
+"""
+
+_CRASH_MARKERS = ("target closed", "browser has been closed", "page crashed", "target page, context or browser has been closed")
+
+
+class _ContextSlot:
+    """Contexto do navegador com contagem de páginas servidas e em uso"""
+
+    def __init__(self, context: Any, browser: Any):
+        self.context = context
+        self.browser = browser
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.pages_served = 0
+        self.active = 0
+        self.retired = False
+
+
+class BrowserPool:
+    """Navegador headless compartilhado com contextos reciclados"""
+
+    def __init__(self,
+                 max_concurrent_pages: int = 4,
+                 max_pages_per_context: int = 50,
+                 max_context_age: float = 900.0,
+                 max_pages_per_browser: int = 500,
+                 idle_timeout: float = 300.0,
+                 launcher: Optional[Callable[[], Awaitable[Any]]] = None):
+        self.max_concurrent_pages = max_concurrent_pages
+        self.max_pages_per_context = max_pages_per_context
+        self.max_context_age = max_context_age
+        self.max_pages_per_browser = max_pages_per_browser
+        self.idle_timeout = idle_timeout
+        self._launcher = launcher or self._launch_chromium
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._browser_lock: Optional[asyncio.Lock] = None
+        self._reaper_task: Optional[asyncio.Task] = None
+        self._playwright = None
+        self._browser = None
+        self._browser_pages = 0
+        self._slots: List[_ContextSlot] = []
+        self._last_activity = time.monotonic()
+
+        self.stats_counters: Dict[str, int] = {
+            'launches': 0, 'crashes': 0, 'restarts': 0, 'contexts_created': 0,
+            'contexts_recycled': 0, 'pages': 0, 'retries': 0, 'idle_shutdowns': 0
+        }
+
+    # --- Loop dedicado ------------------------------------------------------
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._loop_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="browser-pool", daemon=True).start()
+                    asyncio.run_coroutine_threadsafe(self._setup(), loop).result()
+                    self._loop = loop
+        return self._loop
+
+    async def _setup(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrent_pages)
+        self._browser_lock = asyncio.Lock()
+        # O loop guarda só referências fracas às tarefas: sem esta, o coletor pode descartá-la
+        self._reaper_task = asyncio.get_running_loop().create_task(self._reaper())
+
+    # --- Navegador ----------------------------------------------------------
+
+    async def _launch_chromium(self):
+        if self._playwright is None:
+            self._playwright = await playwright_api.async_playwright().start()
+        return await self._playwright.chromium.launch(headless=True, args=LAUNCH_ARGS)
+
+    def _on_disconnected(self, browser):
+        if browser is self._browser:
+            self.stats_counters['crashes'] += 1
+            logger.warning("💥 BrowserPool: navegador desconectado; será relançado na próxima captura")
+            self._browser = None
+        for slot in self._slots:
+            if slot.browser is browser:
+                slot.retired = True
+        self._slots = [slot for slot in self._slots if slot.browser is not browser]
+
+    async def _get_browser(self):
+        async with self._browser_lock:
+            if self._browser is not None and self._browser_pages >= self.max_pages_per_browser:
+                # Reinício preventivo: o navegador atual fecha quando suas páginas terminarem
+                logger.info(f"♻️ BrowserPool: reiniciando o navegador após {self._browser_pages} páginas")
+                self.stats_counters['restarts'] += 1
+                old = self._browser
+                self._browser = None
+                for slot in self._slots:
+                    if slot.browser is old:
+                        slot.retired = True
+                await self._close_retired(old)
+            if self._browser is None or not self._browser.is_connected():
+                started = time.perf_counter()
+                browser = await self._launcher()
+                browser.on("disconnected", lambda *_: self._on_disconnected(browser))
+                self._browser = browser
+                self._browser_pages = 0
+                self.stats_counters['launches'] += 1
+                logger.info(f"🚀 BrowserPool: navegador iniciado em {time.perf_counter() - started:.2f}s")
+            return self._browser
+
+    async def _close_retired(self, browser=None):
+        """Fecha contextos aposentados sem páginas em uso e navegadores sem contextos"""
+        for slot in list(self._slots):
+            if slot.retired and slot.active == 0:
+                self._slots.remove(slot)
+                self.stats_counters['contexts_recycled'] += 1
+                try:
+                    await slot.context.close()
+                except Exception:
+                    pass
+        if browser is not None and browser is not self._browser and \
+                not any(slot.browser is browser for slot in self._slots):
+            try:
+                await browser.close()
+            except Exception:
+                pass
+
+    async def _acquire_slot(self) -> _ContextSlot:
+        browser = await self._get_browser()
+        now = time.monotonic()
+        for slot in self._slots:
+            if slot.browser is browser and not slot.retired:
+                if slot.pages_served >= self.max_pages_per_context or now - slot.created > self.max_context_age:
+                    slot.retired = True
+                    continue
+                return slot
+
+        context = await browser.new_context(**CONTEXT_OPTIONS)
+        await context.add_init_script(STEALTH_SCRIPT)
+        slot = _ContextSlot(context, browser)
+        self._slots.append(slot)
+        self.stats_counters['contexts_created'] += 1
+        return slot
+
+    # --- Páginas ------------------------------------------------------------
+
+    @asynccontextmanager
+    async def _lease(self):
+        async with self._semaphore:
+            slot = await self._acquire_slot()
+            slot.active += 1
+            slot.pages_served += 1
+            self._browser_pages += 1
+            self.stats_counters['pages'] += 1
+            page = None
+            try:
+                page = await slot.context.new_page()
+                page.on("crash", lambda *_: setattr(slot, 'retired', True))
+                yield page
+            finally:
+                slot.active -= 1
+                slot.last_used = self._last_activity = time.monotonic()
+                if page is not None:
+                    try:
+                        await page.close()
+                    except Exception:
+                        slot.retired = True
+                await self._close_retired(slot.browser)
+
+    async def _run(self, fn: Callable[[Any], Awaitable[Any]], retries: int = 1) -> Any:
+        for attempt in range(retries + 1):
+            try:
+                async with self._lease() as page:
+                    return await fn(page)
+            except Exception as e:
+                crashed = any(marker in str(e).lower() for marker in _CRASH_MARKERS)
+                if not crashed or attempt >= retries:
+                    raise
+                self.stats_counters['retries'] += 1
+                logger.warning(f"💥 BrowserPool: página ou navegador caiu ({e}); repetindo a captura")
+                if self._browser is not None and not self._browser.is_connected():
+                    self._on_disconnected(self._browser)
+
+    async def run(self, fn: Callable[[Any], Awaitable[Any]]) -> Any:
+        """
+        Executa ``fn(page)`` com uma página do pool e devolve o resultado.
+        Pode ser aguardada de qualquer loop de eventos; a página é sempre
+        manipulada no loop do pool.
+        """
+        loop = self._ensure_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            return await self._run(fn)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._run(fn), loop))
+
+    def run_sync(self, fn: Callable[[Any], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """Versão bloqueante de ``run`` para código síncrono (Flask, Streamlit)"""
+        return asyncio.run_coroutine_threadsafe(self._run(fn), self._ensure_loop()).result(timeout)
+
+    # --- Manutenção ---------------------------------------------------------
+
+    async def _reaper(self, interval: float = 30.0):
+        """Recicla contextos velhos e fecha o navegador ocioso"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reap()
+            except Exception as e:
+                logger.warning(f"⚠️ BrowserPool: falha na manutenção do pool: {e}")
+
+    async def reap(self):
+        now = time.monotonic()
+        for slot in self._slots:
+            if slot.active == 0 and now - slot.created > self.max_context_age:
+                slot.retired = True
+        await self._close_retired()
+        if self._browser is not None and not any(slot.active for slot in self._slots) \
+                and now - self._last_activity > self.idle_timeout:
+            logger.info("💤 BrowserPool: navegador ocioso fechado")
+            self.stats_counters['idle_shutdowns'] += 1
+            await self._shutdown_browser()
+
+    async def _shutdown_browser(self):
+        for slot in self._slots:
+            slot.retired = True
+        await self._close_retired()
+        browser, self._browser = self._browser, None
+        if browser is not None:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+
+    async def _shutdown(self):
+        if self._reaper_task is not None:
+            self._reaper_task.cancel()
+            self._reaper_task = None
+        await self._shutdown_browser()
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
+
+    def close(self):
+        """Fecha o navegador e o Playwright (chamado no encerramento do processo)"""
+        if self._loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout=10)
+        except Exception as e:
+            logger.debug(f"BrowserPool: erro ao encerrar: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats_counters,
+            'browser_running': self._browser is not None,
+            'browser_pages': self._browser_pages,
+            'contexts': len(self._slots),
+            'active_pages': sum(slot.active for slot in self._slots),
+            'max_concurrent_pages': self.max_concurrent_pages
+        }
+
+
+_browser_pool: Optional[BrowserPool] = None
+_browser_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """
+    Pool compartilhado, configurado por SCRAPER_MAX_PAGES,
+    SCRAPER_PAGES_PER_CONTEXT, SCRAPER_CONTEXT_MAX_AGE,
+    SCRAPER_PAGES_PER_BROWSER e SCRAPER_BROWSER_IDLE_TIMEOUT
+    """
+    global _browser_pool
+    if _browser_pool is None:
+        with _browser_pool_lock:
+            if _browser_pool is None:
+                _browser_pool = BrowserPool(
+                    max_concurrent_pages=int(os.getenv("SCRAPER_MAX_PAGES", "4")),
+                    max_pages_per_context=int(os.getenv("SCRAPER_PAGES_PER_CONTEXT", "50")),
+                    max_context_age=float(os.getenv("SCRAPER_CONTEXT_MAX_AGE", "900")),
+                    max_pages_per_browser=int(os.getenv("SCRAPER_PAGES_PER_BROWSER", "500")),
+                    idle_timeout=float(os.getenv("SCRAPER_BROWSER_IDLE_TIMEOUT", "300"))
+                )
+                atexit.register(_browser_pool.close)
+    return _browser_pool
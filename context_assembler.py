@@ -0,0 +1,258 @@
+"""
+Montagem do prompt RAG com orçamento de tokens
+
+- Orçamento derivado de ``ModelInfo.context_length`` (llm_models_config),
+  descontando a resposta esperada
+- Chunks vizinhos do mesmo documento (sobreposição do splitter) são unidos e
+  quase-duplicatas são descartadas antes da contagem de tokens
+- O contexto recuperado tem prioridade: o histórico é truncado primeiro
+  (mensagens mais antigas saem antes, com teto opcional de tokens), depois os
+  chunks menos relevantes
+- Contagem de tokens com tiktoken quando instalado; senão, ~4 caracteres por token
+"""
+
+import os
+import re
+import logging
+from typing import Any, Dict, List, Optional
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTEXT_LENGTH = 8192
+# Tokens extras por mensagem no formato de chat (papel, separadores)
+MESSAGE_OVERHEAD_TOKENS = 4
+CONTEXT_HEADER = "Use o seguinte contexto para responder à pergunta do usuário:"
+
+_encoders: Dict[str, Any] = {}
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Conta tokens do texto para o modelo (estimativa se o tiktoken não estiver instalado)"""
+    if not text:
+        return 0
+    if tiktoken is None:
+        return len(text) // 4 + 1
+    key = model or "default"
+    if key not in _encoders:
+        try:
+            _encoders[key] = tiktoken.encoding_for_model(model)
+        except Exception:
+            _encoders[key] = tiktoken.get_encoding("cl100k_base")
+    return len(_encoders[key].encode(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """Corta o texto para caber em ``max_tokens``, preferindo fronteira de palavra"""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    if tiktoken is None:
+        cut = text[:max(0, (max_tokens - 1) * 4)]
+    else:
+        encoder = _encoders.get(model or "default") or tiktoken.get_encoding("cl100k_base")
+        cut = encoder.decode(encoder.encode(text)[:max_tokens])
+    last_space = cut.rfind(" ")
+    return cut[:last_space] if last_space > len(cut) // 2 else cut
+
+
+def context_length_for(model: Optional[str]) -> int:
+    """Janela de contexto do modelo segundo o catálogo de llm_models_config"""
+    try:
+        from llm_models_config import models_manager
+        info = models_manager.get_model_info(model) if model else None
+        if info and info.context_length:
+            return info.context_length
+    except Exception as e:
+        logger.debug(f"ContextAssembler: catálogo de modelos indisponível: {e}")
+    return DEFAULT_CONTEXT_LENGTH
+
+
+def _overlap(a: str, b: str, min_overlap: int, max_overlap: int) -> int:
+    """Tamanho do maior sufixo de ``a`` que é prefixo de ``b`` (0 se menor que ``min_overlap``)"""
+    probe = b[:min_overlap]
+    if len(probe) < min_overlap:
+        return 0
+    window_start = max(0, len(a) - max_overlap)
+    pos = a.find(probe, window_start)
+    while pos != -1:
+        if b.startswith(a[pos:]):
+            return len(a) - pos
+        pos = a.find(probe, pos + 1)
+    return 0
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def pack_chunks(chunks: List[Dict[str, Any]], min_overlap: int = 40, max_overlap: int = 600,
+                duplicate_threshold: float = 0.85) -> Dict[str, Any]:
+    """
+    Une chunks adjacentes (sufixo de um = prefixo do outro, como nas
+    sobreposições do splitter) e descarta quase-duplicatas, preservando a
+    ordem de relevância. Cada chunk é ``{'text': ..., 'source': ...}``.
+    """
+    items = [dict(chunk, rank=i) for i, chunk in enumerate(chunks) if chunk.get('text', '').strip()]
+    merged = 0
+
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(items)):
+            for j in range(len(items)):
+                if i == j:
+                    continue
+                a, b = items[i], items[j]
+                if a.get('source') and b.get('source') and a['source'] != b['source']:
+                    continue
+                size = _overlap(a['text'], b['text'], min_overlap, max_overlap)
+                if size:
+                    a['text'] = a['text'] + b['text'][size:]
+                    a['rank'] = min(a['rank'], b['rank'])
+                    items.pop(j)
+                    merged += 1
+                    changed = True
+                    break
+            if changed:
+                break
+
+    items.sort(key=lambda item: item['rank'])
+    kept, kept_shingles, duplicates = [], [], 0
+    for item in items:
+        shingles = _shingles(item['text'])
+        is_duplicate = any(
+            shingles and other and len(shingles & other) / min(len(shingles), len(other)) >= duplicate_threshold
+            for other in kept_shingles
+        )
+        if is_duplicate:
+            duplicates += 1
+            continue
+        kept.append(item)
+        kept_shingles.append(shingles)
+
+    return {'chunks': kept, 'merged': merged, 'duplicates': duplicates}
+
+
+class ContextAssembler:
+    """Monta as mensagens do chat dentro do orçamento de tokens do modelo"""
+
+    def __init__(self, model: Optional[str] = None, response_tokens: int = 1000,
+                 max_context_tokens: Optional[int] = None, context_length: Optional[int] = None,
+                 max_history_tokens: Optional[int] = None):
+        self.model = model
+        self.response_tokens = response_tokens
+        self.max_context_tokens = max_context_tokens
+        self.max_history_tokens = max_history_tokens
+        self.context_length = context_length or context_length_for(model)
+
+    @property
+    def prompt_budget(self) -> int:
+        return max(0, self.context_length - self.response_tokens)
+
+    def _tokens(self, text: str) -> int:
+        return count_tokens(text, self.model)
+
+    def assemble(self, user_message: str, chunks: List[Any], history: Optional[List[Dict[str, str]]] = None,
+                 system_prompt: str = "") -> Dict[str, Any]:
+        """
+        Retorna ``messages`` prontas para o LLM, o ``context`` e o ``history``
+        efetivamente usados, e ``stats`` com os tokens economizados.
+        ``chunks`` aceita Documents, dicts com 'text'/'content' ou strings.
+        """
+        history = list(history or [])
+        normalized = []
+        for chunk in chunks:
+            if hasattr(chunk, 'page_content'):
+                normalized.append({'text': chunk.page_content, 'source': chunk.metadata.get('source')})
+            elif isinstance(chunk, dict):
+                normalized.append({'text': chunk.get('text', chunk.get('content', '')),
+                                   'source': chunk.get('source', chunk.get('metadata', {}).get('source'))})
+            else:
+                normalized.append({'text': str(chunk), 'source': None})
+
+        raw_context_tokens = sum(self._tokens(c['text']) for c in normalized)
+        raw_history_tokens = sum(self._tokens(m['content']) + MESSAGE_OVERHEAD_TOKENS for m in history)
+
+        packed = pack_chunks(normalized)
+
+        fixed = (self._tokens(system_prompt) + self._tokens(user_message) + self._tokens(CONTEXT_HEADER)
+                 + 3 * MESSAGE_OVERHEAD_TOKENS)
+        available = max(0, self.prompt_budget - fixed)
+        context_limit = min(available, self.max_context_tokens) if self.max_context_tokens else available
+
+        # Contexto por ordem de relevância; o primeiro chunk é cortado se sozinho não couber
+        selected, context_used, dropped = [], 0, 0
+        for item in packed['chunks']:
+            tokens = self._tokens(item['text']) + 2
+            if context_used + tokens <= context_limit:
+                selected.append(item['text'])
+                context_used += tokens
+            elif not selected and context_limit > 16:
+                selected.append(truncate_to_tokens(item['text'], context_limit - 2, self.model))
+                context_used = context_limit
+            else:
+                dropped += 1
+        context = "\n\n".join(selected)
+
+        # Histórico: do mais recente para o mais antigo, no que sobrou do orçamento
+        history_limit = available - context_used
+        if self.max_history_tokens is not None:
+            history_limit = min(history_limit, self.max_history_tokens)
+        kept_history, history_used = [], 0
+        for message in reversed(history):
+            tokens = self._tokens(message['content']) + MESSAGE_OVERHEAD_TOKENS
+            if history_used + tokens > history_limit:
+                break
+            kept_history.insert(0, message)
+            history_used += tokens
+
+        messages = []
+        system_content = system_prompt
+        if context:
+            context_message = f"{CONTEXT_HEADER}\n\n---\n{context}\n---"
+            system_content = f"{system_prompt}\n\n{context_message}" if system_prompt else context_message
+        if system_content:
+            messages.append({"role": "system", "content": system_content})
+        messages.extend(kept_history)
+        messages.append({"role": "user", "content": user_message})
+
+        stats = {
+            'model': self.model,
+            'prompt_budget': self.prompt_budget,
+            'prompt_tokens': fixed + context_used + history_used,
+            'context_tokens': context_used,
+            'context_tokens_saved': max(0, raw_context_tokens - context_used),
+            'history_tokens': history_used,
+            'history_messages_dropped': len(history) - len(kept_history),
+            'history_tokens_saved': max(0, raw_history_tokens - history_used),
+            'chunks_in': len(normalized),
+            'chunks_merged': packed['merged'],
+            'chunks_duplicated': packed['duplicates'],
+            'chunks_over_budget': dropped,
+            'chunks_used': len(selected)
+        }
+        logger.info(f"🧩 ContextAssembler: {stats['prompt_tokens']}/{self.prompt_budget} tokens "
+                    f"({len(selected)} blocos de contexto, {packed['merged']} unidos, "
+                    f"{packed['duplicates']} duplicados, {stats['history_messages_dropped']} mensagens do histórico cortadas)")
+        return {'messages': messages, 'context': context, 'history': kept_history, 'stats': stats}
+
+
+def get_context_assembler(model: Optional[str] = None, response_tokens: Optional[int] = None) -> ContextAssembler:
+    """Assembler configurado por RAG_CONTEXT_MAX_TOKENS, RAG_HISTORY_MAX_TOKENS e RAG_RESPONSE_TOKENS"""
+    max_context = os.getenv("RAG_CONTEXT_MAX_TOKENS", "4000")
+    max_history = os.getenv("RAG_HISTORY_MAX_TOKENS", "1500")
+    return ContextAssembler(
+        model=model,
+        response_tokens=response_tokens or int(os.getenv("RAG_RESPONSE_TOKENS", "1000")),
+        max_context_tokens=int(max_context) if max_context else None,
+        max_history_tokens=int(max_history) if max_history else None
+    )
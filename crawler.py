@@ -0,0 +1,564 @@
+"""
+Crawler em lote com fronteira de URLs e cortesia por domínio
+Captura sementes e/ou sitemaps com scrape_url_to_json + process_json_to_clean_text,
+segue os links internos até max_depth e entrega cada página direto ao pipeline
+de ingestão do agente. Vários domínios são capturados em paralelo, mas cada
+domínio respeita seu próprio intervalo mínimo, limite de páginas simultâneas e
+o Crawl-delay do robots.txt. O progresso fica em um SQLite: uma captura
+interrompida continua de onde parou sem recapturar o que já foi ingerido.
+"""
+
+import os
+import re
+import gzip
+import time
+import uuid
+import asyncio
+import sqlite3
+import logging
+import threading
+import xml.etree.ElementTree as ET
+from collections import deque
+from html.parser import HTMLParser
+from typing import List, Dict, Any, Optional, Iterable, Callable, Awaitable, Set, Tuple
+from urllib import robotparser
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CRAWLER_USER_AGENT = "RAGPythonCrawler/1.0"
+
+# Parâmetros de rastreamento que não mudam o conteúdo da página
+_TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|msclkid|mc_cid|mc_eid|_ga|ref_src)$", re.IGNORECASE)
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+# Recursos que não são páginas HTML (o navegador não extrai texto deles)
+_SKIP_EXTENSIONS = re.compile(
+    r"\.(jpe?g|png|gif|svg|webp|ico|bmp|css|js|json|xml|zip|rar|7z|gz|tar|mp[34]|avi|mov|webm|"
+    r"woff2?|ttf|eot|pdf|docx?|xlsx?|pptx?|exe|dmg)$", re.IGNORECASE)
+
+
+def normalize_url(url: str, base: Optional[str] = None) -> Optional[str]:
+    """
+    Forma canônica de uma URL para deduplicação: resolve relativa à base, só
+    http(s), esquema/host minúsculos, sem porta padrão, sem fragmento, sem
+    parâmetros de rastreamento e com a query ordenada. Retorna None se inválida.
+    """
+    url = (url or "").strip()
+    if base:
+        url = urljoin(base, url)
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS or not parts.hostname:
+        return None
+
+    host = parts.hostname.lower().rstrip(".")
+    if port and port != _DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                             if not _TRACKING_PARAMS.match(k)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def url_domain(url: str) -> str:
+    """Host da URL sem "www.", usado para o escopo e a cortesia por domínio"""
+    host = urlsplit(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class _LinkParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.base: Optional[str] = None
+        self.hrefs: List[str] = []
+        self.nofollow = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "a" and attrs.get("href"):
+            if "nofollow" not in (attrs.get("rel") or "").lower():
+                self.hrefs.append(attrs["href"])
+        elif tag == "base" and attrs.get("href") and self.base is None:
+            self.base = attrs["href"]
+        elif tag == "meta" and (attrs.get("name") or "").lower() == "robots":
+            self.nofollow = "nofollow" in (attrs.get("content") or "").lower()
+
+
+def extract_links(html: str, page_url: str) -> List[str]:
+    """Links normalizados e únicos de uma página (respeita <base>, rel=nofollow e meta robots)"""
+    parser = _LinkParser()
+    try:
+        parser.feed(html or "")
+        parser.close()
+    except Exception as e:
+        logger.warning(f"⚠️ HTML malformado ao extrair links de {page_url}: {e}")
+    if parser.nofollow:
+        return []
+
+    base = urljoin(page_url, parser.base) if parser.base else page_url
+    links, seen = [], set()
+    for href in parser.hrefs:
+        if href.startswith(("mailto:", "tel:", "javascript:", "#")):
+            continue
+        link = normalize_url(href, base)
+        if link and link not in seen:
+            seen.add(link)
+            links.append(link)
+    return links
+
+
+def parse_sitemap(content: bytes) -> Tuple[List[str], List[str]]:
+    """Lê um sitemap (ou índice de sitemaps, opcionalmente .gz): retorna (páginas, sitemaps filhos)"""
+    if content[:2] == b"\x1f\x8b":
+        content = gzip.decompress(content)
+    root = ET.fromstring(content)
+    # Ignora o namespace: {http://www.sitemaps.org/...}loc -> loc
+    locs = [el.text.strip() for el in root.iter() if el.tag.rsplit("}", 1)[-1] == "loc" and el.text]
+    if root.tag.rsplit("}", 1)[-1] == "sitemapindex":
+        return [], locs
+    return locs, []
+
+
+def _http_get(url: str, timeout: float = 30) -> bytes:
+    import requests
+    response = requests.get(url, timeout=timeout, headers={"User-Agent": CRAWLER_USER_AGENT})
+    response.raise_for_status()
+    return response.content
+
+
+class CrawlState:
+    """
+    Progresso persistente da captura (SQLite): uma linha por URL normalizada com
+    status pending → done | failed | skipped. URLs que estavam em andamento
+    numa queda voltam para a fila na retomada.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_urls (
+                url TEXT PRIMARY KEY,
+                depth INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                title TEXT,
+                content_length INTEGER,
+                error TEXT,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_crawl_urls_status ON crawl_urls(status)")
+        self._conn.commit()
+
+    def add(self, url: str, depth: int) -> bool:
+        """Registra a URL na fronteira; False se ela já era conhecida"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO crawl_urls (url, depth, updated_at) VALUES (?, ?, ?)",
+                (url, depth, time.time()))
+            self._conn.commit()
+            return cursor.rowcount == 1
+
+    def mark(self, url: str, status: str, title: Optional[str] = None,
+             content_length: Optional[int] = None, error: Optional[str] = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE crawl_urls SET status = ?, title = ?, content_length = ?, error = ?, "
+                "attempts = attempts + ?, updated_at = ? WHERE url = ?",
+                (status, title, content_length, error, int(status in ("done", "failed")), time.time(), url))
+            self._conn.commit()
+
+    def known_urls(self) -> Set[str]:
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT url FROM crawl_urls")}
+
+    def pending(self, max_attempts: int = 2) -> List[Tuple[str, int]]:
+        """URLs a (re)capturar: pendentes e falhas com tentativas restantes"""
+        with self._lock:
+            return list(self._conn.execute(
+                "SELECT url, depth FROM crawl_urls WHERE status = 'pending' "
+                "OR (status = 'failed' AND attempts < ?) ORDER BY depth, updated_at", (max_attempts,)))
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM crawl_urls GROUP BY status"))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class Frontier:
+    """
+    Fronteira assíncrona com uma fila por domínio. get() entrega a próxima URL
+    de um domínio que já cumpriu seu intervalo e está abaixo do limite de
+    páginas simultâneas, então um domínio lento não bloqueia os demais.
+    """
+
+    def __init__(self, min_delay: float = 1.0, per_domain_concurrency: int = 2):
+        self.min_delay = min_delay
+        self.per_domain_concurrency = per_domain_concurrency
+        self._queues: Dict[str, deque] = {}
+        self._active: Dict[str, int] = {}
+        self._next_ready: Dict[str, float] = {}
+        self._delays: Dict[str, float] = {}
+        self._changed = asyncio.Event()
+        self._closed = False
+
+    def put(self, url: str, depth: int):
+        domain = url_domain(url)
+        self._queues.setdefault(domain, deque()).append((url, depth))
+        self._active.setdefault(domain, 0)
+        self._changed.set()
+
+    def set_delay(self, domain: str, delay: float):
+        """Intervalo específico do domínio (ex.: Crawl-delay do robots.txt)"""
+        self._delays[domain] = max(self.min_delay, delay)
+
+    def queued(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _idle(self) -> bool:
+        return not any(self._queues.values()) and not any(self._active.values())
+
+    async def get(self) -> Optional[Tuple[str, int]]:
+        """Próxima (url, profundidade) pronta; None quando a captura terminou"""
+        while True:
+            if self._closed or self._idle():
+                return None
+            now = time.monotonic()
+            wait: Optional[float] = None
+            for domain, queue in self._queues.items():
+                if not queue or self._active[domain] >= self.per_domain_concurrency:
+                    continue
+                ready = self._next_ready.get(domain, 0.0)
+                if ready <= now:
+                    self._active[domain] += 1
+                    self._next_ready[domain] = now + self._delays.get(domain, self.min_delay)
+                    return queue.popleft()
+                wait = ready - now if wait is None else min(wait, ready - now)
+
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def done(self, url: str):
+        self._active[url_domain(url)] -= 1
+        self._changed.set()
+
+    def close(self):
+        self._closed = True
+        self._changed.set()
+
+
+async def fetch_page(url: str) -> Dict[str, Any]:
+    """Captura padrão: navegador do pool + texto limpo + links da página"""
+    from scraper import scrape_url_to_json, process_json_to_clean_text
+
+    captured = await scrape_url_to_json(url)
+    if not captured.get("success"):
+        return captured
+
+    def process():
+        result = process_json_to_clean_text(captured)
+        page_data = captured["data"]
+        result["links"] = extract_links(page_data["raw_html"], page_data["capture_info"]["final_url"])
+        return result
+
+    return await asyncio.to_thread(process)
+
+
+def agent_ingestor(agent_id: str) -> Callable[[Dict[str, Any]], Any]:
+    """Entrega a página ao pipeline de ingestão do agente (chunks novos/alterados apenas)"""
+    from agent_system import Agent
+
+    agent = Agent.get_by_id(agent_id)
+    if not agent:
+        raise ValueError(f"Agente '{agent_id}' não encontrado")
+
+    def ingest(page: Dict[str, Any]):
+        # Mesmo formato de fonte da captura individual (/api/v1/capture_page)
+        return agent.add_document_from_text(page["content"], f"{page['title']} ({page['url']})")
+    return ingest
+
+
+class Crawler:
+    """
+    Captura em lote com fronteira deduplicada, cortesia por domínio e
+    progresso retomável.
+
+    Args:
+        ingest: recebe cada página capturada (dict de process_json_to_clean_text);
+            roda em thread, limitado a ingest_concurrency chamadas simultâneas
+        fetch: corrotina url -> dict de página (padrão: fetch_page)
+        state_path: arquivo SQLite do progresso (":memory:" não retoma)
+        max_concurrency: páginas capturadas ao mesmo tempo no total
+        per_domain_concurrency / min_delay: limite e intervalo por domínio
+        max_pages: limite de páginas capturadas nesta execução
+        max_depth: profundidade de links a seguir a partir das sementes (0 = só sementes)
+        same_domain: só segue links dos domínios das sementes/sitemaps
+        include / exclude: regex aplicadas à URL normalizada dos links
+        respect_robots: consulta robots.txt (Disallow e Crawl-delay)
+    """
+
+    def __init__(self,
+                 ingest: Optional[Callable[[Dict[str, Any]], Any]] = None,
+                 fetch: Optional[Callable[[str], Awaitable[Dict[str, Any]]]] = None,
+                 state_path: str = ":memory:",
+                 max_concurrency: int = 8,
+                 per_domain_concurrency: int = 2,
+                 min_delay: float = 1.0,
+                 max_pages: Optional[int] = None,
+                 max_depth: int = 2,
+                 same_domain: bool = True,
+                 include: Optional[Iterable[str]] = None,
+                 exclude: Optional[Iterable[str]] = None,
+                 respect_robots: bool = True,
+                 ingest_concurrency: int = 2,
+                 max_attempts: int = 2,
+                 robots_fetcher: Callable[[str], bytes] = _http_get,
+                 sitemap_fetcher: Callable[[str], bytes] = _http_get):
+        self.ingest = ingest
+        self.fetch = fetch or fetch_page
+        self.state = CrawlState(state_path)
+        self.max_concurrency = max_concurrency
+        self.per_domain_concurrency = per_domain_concurrency
+        self.min_delay = min_delay
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.same_domain = same_domain
+        self.include = [re.compile(p) for p in include or []]
+        self.exclude = [re.compile(p) for p in exclude or []]
+        self.respect_robots = respect_robots
+        self.ingest_concurrency = ingest_concurrency
+        self.max_attempts = max_attempts
+        self.robots_fetcher = robots_fetcher
+        self.sitemap_fetcher = sitemap_fetcher
+
+        self._domains: Set[str] = set()
+        self._robots: Dict[str, "asyncio.Future"] = {}
+        self._seen: Set[str] = set()
+        self._stop = False
+        self._reserved = 0
+        self.stats = {'fetched': 0, 'ingested': 0, 'failed': 0, 'skipped': 0, 'discovered': 0}
+
+    def _in_scope(self, url: str) -> bool:
+        if _SKIP_EXTENSIONS.search(urlsplit(url).path):
+            return False
+        if self.same_domain and url_domain(url) not in self._domains:
+            return False
+        if self.include and not any(p.search(url) for p in self.include):
+            return False
+        return not any(p.search(url) for p in self.exclude)
+
+    def _enqueue(self, frontier: Frontier, url: str, depth: int) -> bool:
+        if url in self._seen:
+            return False
+        self._seen.add(url)
+        if not self.state.add(url, depth):
+            return False
+        frontier.put(url, depth)
+        self.stats['discovered'] += 1
+        return True
+
+    async def _load_robots(self, origin: str, domain: str, frontier: Frontier) -> robotparser.RobotFileParser:
+        parser = robotparser.RobotFileParser()
+        try:
+            content = await asyncio.to_thread(self.robots_fetcher, f"{origin}/robots.txt")
+            parser.parse(content.decode("utf-8", errors="ignore").splitlines())
+        except Exception:
+            # Sem robots.txt acessível: tudo liberado
+            parser.parse([])
+        delay = parser.crawl_delay(CRAWLER_USER_AGENT)
+        if delay:
+            frontier.set_delay(domain, float(delay))
+        return parser
+
+    async def _robots_for(self, url: str, frontier: Frontier) -> robotparser.RobotFileParser:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        if origin not in self._robots:
+            # Uma única busca por origem, compartilhada pelas tarefas do mesmo domínio
+            self._robots[origin] = asyncio.ensure_future(self._load_robots(origin, url_domain(url), frontier))
+        return await self._robots[origin]
+
+    async def expand_sitemaps(self, sitemap_urls: Iterable[str], max_sitemaps: int = 200) -> List[str]:
+        """URLs de página listadas nos sitemaps (segue índices de sitemaps)"""
+        pending, visited, pages = deque(sitemap_urls), set(), []
+        while pending and len(visited) < max_sitemaps:
+            sitemap_url = pending.popleft()
+            if sitemap_url in visited:
+                continue
+            visited.add(sitemap_url)
+            try:
+                content = await asyncio.to_thread(self.sitemap_fetcher, sitemap_url)
+                urls, children = parse_sitemap(content)
+            except Exception as e:
+                logger.warning(f"⚠️ Sitemap ignorado {sitemap_url}: {e}")
+                continue
+            pages.extend(urls)
+            pending.extend(children)
+        logger.info(f"🗺️ {len(pages)} URLs em {len(visited)} sitemap(s)")
+        return pages
+
+    async def _ingest(self, page: Dict[str, Any], ingest_slots: asyncio.Semaphore):
+        async with ingest_slots:
+            await asyncio.to_thread(self.ingest, page)
+
+    async def _process(self, frontier: Frontier, url: str, depth: int, ingest_slots: asyncio.Semaphore):
+        robots = await self._robots_for(url, frontier) if self.respect_robots else None
+        if robots is not None and not robots.can_fetch(CRAWLER_USER_AGENT, url):
+            self.state.mark(url, "skipped", error="robots.txt")
+            self.stats['skipped'] += 1
+            self._reserved -= 1
+            return
+
+        page = await self.fetch(url)
+        self.stats['fetched'] += 1
+        if not page.get("success"):
+            raise RuntimeError(page.get("error", "captura falhou"))
+
+        if depth < self.max_depth:
+            for link in page.get("links", []):
+                if self._in_scope(link):
+                    self._enqueue(frontier, link, depth + 1)
+
+        if self.ingest:
+            await self._ingest(page, ingest_slots)
+            self.stats['ingested'] += 1
+        self.state.mark(url, "done", title=page.get("title"), content_length=page.get("content_length"))
+
+    async def _worker(self, frontier: Frontier, ingest_slots: asyncio.Semaphore):
+        while not self._stop:
+            item = await frontier.get()
+            if item is None:
+                return
+            url, depth = item
+            try:
+                # Reserva a vaga ao tirar a URL da fila: capturas em andamento também contam
+                if self.max_pages is not None and self._reserved >= self.max_pages:
+                    # Limite atingido: a URL continua pendente para a próxima execução
+                    self._stop = True
+                    frontier.close()
+                    return
+                self._reserved += 1
+                await self._process(frontier, url, depth, ingest_slots)
+            except Exception as e:
+                logger.warning(f"⚠️ Falha ao capturar {url}: {e}")
+                self.state.mark(url, "failed", error=str(e)[:500])
+                self.stats['failed'] += 1
+            finally:
+                frontier.done(url)
+
+    async def crawl(self, seeds: Iterable[str] = (), sitemaps: Iterable[str] = ()) -> Dict[str, Any]:
+        """Captura sementes e sitemaps (retomando o progresso salvo) e retorna o resumo"""
+        started = time.perf_counter()
+        frontier = Frontier(self.min_delay, self.per_domain_concurrency)
+        ingest_slots = asyncio.Semaphore(self.ingest_concurrency)
+        self._stop = False
+        self._reserved = 0
+        self._robots = {}
+
+        seeds = [u for u in (normalize_url(s) for s in seeds) if u]
+        sitemaps = [u for u in (normalize_url(s) for s in sitemaps) if u]
+        self._domains.update(url_domain(u) for u in seeds + sitemaps)
+
+        # Retomada: pendentes/falhas salvos voltam para a fila; o resto só conta como visto
+        resumed = self.state.pending(self.max_attempts)
+        self._seen = self.state.known_urls()
+        for url, depth in resumed:
+            self._domains.add(url_domain(url))
+            frontier.put(url, depth)
+        if resumed:
+            logger.info(f"🔁 Retomando captura com {len(resumed)} URL(s) pendente(s)")
+
+        for url in seeds:
+            self._enqueue(frontier, url, 0)
+        if sitemaps:
+            for url in await self.expand_sitemaps(sitemaps):
+                url = normalize_url(url)
+                if url and self._in_scope(url):
+                    self._enqueue(frontier, url, 0)
+
+        workers = [asyncio.create_task(self._worker(frontier, ingest_slots))
+                   for _ in range(self.max_concurrency)]
+        await asyncio.gather(*workers)
+
+        elapsed = time.perf_counter() - started
+        summary = dict(self.stats, status=self.state.counts(), domains=len(self._domains),
+                       queued=frontier.queued(), elapsed_seconds=round(elapsed, 2),
+                       complete=not self._stop)
+        logger.info(f"🕸️ Captura concluída em {elapsed:.1f}s: {self.stats['fetched']} página(s), "
+                    f"{self.stats['ingested']} ingerida(s), {self.stats['failed']} falha(s)")
+        return summary
+
+    def crawl_sync(self, seeds: Iterable[str] = (), sitemaps: Iterable[str] = ()) -> Dict[str, Any]:
+        return asyncio.run(self.crawl(seeds, sitemaps))
+
+    def close(self):
+        self.state.close()
+
+
+# Capturas em segundo plano iniciadas pela API
+_crawls: Dict[str, Dict[str, Any]] = {}
+_crawls_lock = threading.Lock()
+
+
+def start_crawl(agent_id: str, seeds: Iterable[str] = (), sitemaps: Iterable[str] = (),
+                crawl_id: Optional[str] = None, **options) -> Dict[str, Any]:
+    """
+    Inicia (ou retoma, com o mesmo crawl_id) uma captura em lote para o agente
+    numa thread em segundo plano. O progresso fica em CRAWL_STATE_DIR/<crawl_id>.db.
+    """
+    crawl_id = crawl_id or uuid.uuid4().hex[:12]
+    if not re.fullmatch(r"[\w-]+", crawl_id):
+        raise ValueError("crawl_id inválido")
+    state_dir = os.getenv("CRAWL_STATE_DIR", "crawls")
+    os.makedirs(state_dir, exist_ok=True)
+
+    options.setdefault("max_concurrency", int(os.getenv("CRAWL_MAX_CONCURRENCY", "8")))
+    options.setdefault("per_domain_concurrency", int(os.getenv("CRAWL_PER_DOMAIN_CONCURRENCY", "2")))
+    options.setdefault("min_delay", float(os.getenv("CRAWL_MIN_DELAY", "1.0")))
+    crawler = Crawler(ingest=agent_ingestor(agent_id),
+                      state_path=os.path.join(state_dir, f"{crawl_id}.db"), **options)
+
+    with _crawls_lock:
+        current = _crawls.get(crawl_id)
+        if current and current['status'] == 'running':
+            crawler.close()
+            raise ValueError(f"Captura '{crawl_id}' já está em andamento")
+        info = {'crawl_id': crawl_id, 'agent_id': agent_id, 'status': 'running',
+                'stats': crawler.stats, 'result': None, 'error': None}
+        _crawls[crawl_id] = info
+
+    def run():
+        try:
+            info['result'] = crawler.crawl_sync(list(seeds), list(sitemaps))
+            info['status'] = 'completed'
+        except Exception as e:
+            logger.error(f"❌ Captura {crawl_id} falhou: {e}", exc_info=True)
+            info['status'], info['error'] = 'failed', str(e)
+        finally:
+            crawler.close()
+
+    threading.Thread(target=run, name=f"crawl-{crawl_id}", daemon=True).start()
+    return get_crawl_status(crawl_id)
+
+
+def get_crawl_status(crawl_id: str) -> Optional[Dict[str, Any]]:
+    with _crawls_lock:
+        info = _crawls.get(crawl_id)
+        if info is None:
+            return None
+        return {k: (dict(v) if isinstance(v, dict) else v) for k, v in info.items()}
@@ -1,6 +1,12 @@
 import os
+import time
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
 import psycopg2
 from psycopg2 import pool
+from psycopg2 import extensions
 from dotenv import load_dotenv
 import logging
 
@@ -9,38 +15,228 @@ load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
 
+
+def _register_vector_type(conn):
+    """Registra o tipo ``vector`` do pgvector uma única vez por conexão física."""
+    try:
+        from pgvector.psycopg2 import register_vector
+        register_vector(conn)
+        conn.commit()
+    except Exception as e:
+        # Sem a extensão instalada a conexão continua útil para as demais tabelas
+        conn.rollback()
+        logging.warning(f"Tipo vector não registrado na conexão: {e}")
+
+
+class ConnectionPool:
+    """
+    Pool de conexões thread-safe com limite de espera.
+
+    - ``getconn`` bloqueia até ``timeout`` segundos quando todas as ``maxconn``
+      conexões estão em uso (em vez de falhar imediatamente).
+    - Conexões ociosas há mais de ``validate_after`` segundos são testadas com
+      ``SELECT 1`` antes de serem entregues; conexões quebradas são substituídas.
+    - ``configure`` roda uma vez por conexão física (ex: registro do pgvector).
+    - ``stats`` expõe tempo de espera e saturação do pool.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, timeout: float = 30.0, validate_after: float = 30.0,
+                 configure: Optional[Callable[[Any], None]] = None,
+                 connect: Optional[Callable[[], Any]] = None, **connect_kwargs):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Limites inválidos para o pool de conexões")
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.validate_after = validate_after
+        self._configure = configure
+        self._connect_fn = connect or (lambda: psycopg2.connect(**connect_kwargs))
+
+        self._cond = threading.Condition()
+        self._idle: deque = deque()
+        self._in_use: Dict[int, Any] = {}
+        self._size = 0
+        self.closed = False
+
+        self._checkouts = 0
+        self._waited_checkouts = 0
+        self._timeouts = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._peak_in_use = 0
+        self._replaced = 0
+
+        for _ in range(minconn):
+            self._idle.append((self._new_connection(), time.monotonic()))
+            self._size += 1
+
+    def _new_connection(self):
+        conn = self._connect_fn()
+        if self._configure:
+            self._configure(conn)
+        return conn
+
+    @staticmethod
+    def _is_alive(conn) -> bool:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def getconn(self, timeout: Optional[float] = None):
+        """Retira uma conexão do pool, esperando até ``timeout`` segundos"""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.perf_counter()
+        deadline = start + timeout
+        waited = False
+        conn, last_used = None, None
+
+        with self._cond:
+            while True:
+                if self.closed:
+                    raise pool.PoolError("Pool de conexões fechado")
+                if self._idle:
+                    # LIFO: reaproveita a conexão usada mais recentemente
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.maxconn:
+                    self._size += 1
+                    break
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise pool.PoolError(f"Nenhuma conexão disponível após {timeout}s ({self.maxconn} em uso)")
+                waited = True
+                self._cond.wait(remaining)
+
+        try:
+            if conn is None:
+                conn = self._new_connection()
+            elif conn.closed or (time.monotonic() - last_used > self.validate_after and not self._is_alive(conn)):
+                logging.warning("Conexão inválida descartada do pool; abrindo uma nova")
+                self._close_quietly(conn)
+                self._replaced += 1
+                conn = self._new_connection()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        wait = time.perf_counter() - start
+        with self._cond:
+            self._in_use[id(conn)] = conn
+            self._checkouts += 1
+            self._waited_checkouts += int(waited)
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+            self._peak_in_use = max(self._peak_in_use, len(self._in_use))
+        return conn
+
+    def putconn(self, conn, close: bool = False):
+        """Devolve a conexão ao pool, descartando-a se estiver quebrada"""
+        with self._cond:
+            if self._in_use.pop(id(conn), None) is None:
+                logging.warning("Tentativa de devolver ao pool uma conexão que não foi retirada dele")
+                return
+
+        discard = close or self.closed or conn.closed
+        if not discard and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            # Transação esquecida aberta (ou conexão em erro): desfaz antes de reaproveitar
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+
+        if discard:
+            self._close_quietly(conn)
+        with self._cond:
+            if discard:
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            self.closed = True
+            while self._idle:
+                self._close_quietly(self._idle.pop()[0])
+            for conn in self._in_use.values():
+                self._close_quietly(conn)
+            self._in_use.clear()
+            self._size = 0
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas de espera e saturação do pool"""
+        with self._cond:
+            return {
+                'minconn': self.minconn,
+                'maxconn': self.maxconn,
+                'size': self._size,
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+                'peak_in_use': self._peak_in_use,
+                'saturation': round(len(self._in_use) / self.maxconn, 3),
+                'checkouts': self._checkouts,
+                'waited_checkouts': self._waited_checkouts,
+                'timeouts': self._timeouts,
+                'avg_wait_ms': round(self._total_wait / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                'max_wait_ms': round(self._max_wait * 1000, 3),
+                'replaced_connections': self._replaced
+            }
+
+
 class Database:
     """Gerencia o pool de conexões com o banco de dados PostgreSQL."""
     _connection_pool = None
+    _init_lock = threading.Lock()
 
     @classmethod
     def initialize_pool(cls):
         """Inicializa o pool de conexões com o banco de dados."""
         if cls._connection_pool is None:
-            try:
-                cls._connection_pool = psycopg2.pool.SimpleConnectionPool(
-                    minconn=1,
-                    maxconn=10,
-                    user=os.getenv("DB_USER"),
-                    password=os.getenv("DB_PASSWORD"),
-                    host=os.getenv("DB_HOST"),
-                    port=os.getenv("DB_PORT"),
-                    database=os.getenv("DB_NAME")
-                )
-                logging.info("Pool de conexões com o PostgreSQL inicializado com sucesso.")
-            except psycopg2.OperationalError as e:
-                logging.error(f"Erro ao conectar ao PostgreSQL: {e}")
-                raise
+            with cls._init_lock:
+                if cls._connection_pool is not None:
+                    return
+                try:
+                    cls._connection_pool = ConnectionPool(
+                        minconn=int(os.getenv("DB_POOL_MIN", "1")),
+                        maxconn=int(os.getenv("DB_POOL_MAX", "10")),
+                        timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+                        validate_after=float(os.getenv("DB_POOL_VALIDATE_AFTER", "30")),
+                        configure=_register_vector_type,
+                        user=os.getenv("DB_USER", os.getenv("POSTGRES_USER")),
+                        password=os.getenv("DB_PASSWORD", os.getenv("POSTGRES_PASSWORD")),
+                        host=os.getenv("DB_HOST", os.getenv("POSTGRES_HOST")),
+                        port=os.getenv("DB_PORT", os.getenv("POSTGRES_PORT")),
+                        database=os.getenv("DB_NAME", os.getenv("POSTGRES_DB"))
+                    )
+                    logging.info("Pool de conexões com o PostgreSQL inicializado com sucesso.")
+                except psycopg2.OperationalError as e:
+                    logging.error(f"Erro ao conectar ao PostgreSQL: {e}")
+                    raise
 
     @classmethod
-    def get_connection(cls):
-        """Obtém uma conexão do pool."""
+    def get_connection(cls, timeout: Optional[float] = None):
+        """Obtém uma conexão do pool (esperando até ``timeout`` segundos se estiver saturado)."""
         if cls._connection_pool is None:
             # Tenta inicializar se ainda não foi feito
             cls.initialize_pool()
-        
+
         if cls._connection_pool:
-            return cls._connection_pool.getconn()
+            return cls._connection_pool.getconn(timeout)
         else:
             raise Exception("Pool de conexões não está disponível e não pôde ser inicializado.")
 
@@ -51,13 +247,19 @@ class Database:
         if cls._connection_pool and conn:
             cls._connection_pool.putconn(conn)
 
+    @classmethod
+    def get_pool_stats(cls) -> Dict[str, Any]:
+        """Métricas de espera e saturação do pool (vazio se ainda não inicializado)."""
+        return cls._connection_pool.stats() if cls._connection_pool else {}
+
     @classmethod
     def close_all_connections(cls):
         """Fecha todas as conexões no pool."""
         if cls._connection_pool:
             cls._connection_pool.closeall()
+            cls._connection_pool = None
             logging.info("Todas as conexões com o PostgreSQL foram fechadas.")
 
 # O bloco de teste `if __name__ == '__main__'` foi removido para evitar
 # a execução automática de código e potenciais erros de importação circular
-# ou falhas de conexão durante o processo de importação por outros módulos. 
\ No newline at end of file
+# ou falhas de conexão durante o processo de importação por outros módulos.
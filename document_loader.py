@@ -5,21 +5,22 @@ Suporta PDF, DOCX, TXT e páginas web
 
 import os
 import requests
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 from pathlib import Path
 import logging
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import (
-    PyPDFLoader,
-    Docx2txtLoader,
-    TextLoader,
-    WebBaseLoader
-)
+
+from lazy_imports import lazy_import
+
+# Carregadores do langchain_community só são importados no primeiro arquivo lido
+loaders = lazy_import("langchain_community.document_loaders", "langchain-community")
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SUPPORTED_EXTENSIONS = {'.pdf', '.docx', '.doc', '.txt'}
+
 class DocumentLoader:
     """Classe para carregar e processar diferentes tipos de documentos"""
     
@@ -48,15 +49,7 @@ class DocumentLoader:
             raise FileNotFoundError(f"Arquivo não encontrado: {file_path}")
         
         try:
-            if file_path.suffix.lower() == '.pdf':
-                loader = PyPDFLoader(str(file_path))
-            elif file_path.suffix.lower() in ['.docx', '.doc']:
-                loader = Docx2txtLoader(str(file_path))
-            elif file_path.suffix.lower() == '.txt':
-                loader = TextLoader(str(file_path), encoding='utf-8')
-            else:
-                raise ValueError(f"Tipo de arquivo não suportado: {file_path.suffix}")
-            
+            loader = self._get_loader(file_path)
             documents = loader.load()
             logger.info(f"Carregados {len(documents)} documentos de {file_path}")
             
@@ -71,6 +64,70 @@ class DocumentLoader:
             logger.error(f"Erro ao carregar {file_path}: {str(e)}")
             raise
     
+    def _get_loader(self, file_path: Path):
+        """Retorna o loader LangChain adequado à extensão do arquivo"""
+        if file_path.suffix.lower() == '.pdf':
+            return loaders.PyPDFLoader(str(file_path))
+        elif file_path.suffix.lower() in ['.docx', '.doc']:
+            return loaders.Docx2txtLoader(str(file_path))
+        elif file_path.suffix.lower() == '.txt':
+            return loaders.TextLoader(str(file_path), encoding='utf-8')
+        raise ValueError(f"Tipo de arquivo não suportado: {file_path.suffix}")
+    
+    def iter_pages(self, file_path: str) -> Iterator[Any]:
+        """
+        Itera sobre as páginas de um documento sem carregá-lo inteiro na memória
+        
+        Args:
+            file_path: Caminho para o arquivo
+            
+        Yields:
+            Documentos LangChain (uma página por vez no caso de PDFs)
+        """
+        file_path = Path(file_path)
+        
+        if not file_path.exists():
+            raise FileNotFoundError(f"Arquivo não encontrado: {file_path}")
+        
+        loader = self._get_loader(file_path)
+        pages = loader.lazy_load() if hasattr(loader, 'lazy_load') else iter(loader.load())
+        for page in pages:
+            page.metadata['source'] = str(file_path)
+            page.metadata['file_type'] = file_path.suffix.lower()
+            yield page
+    
+    def iter_chunks(self, file_path: str) -> Iterator[Any]:
+        """
+        Itera sobre os chunks de um documento, dividindo uma página por vez
+        
+        Args:
+            file_path: Caminho para o arquivo
+            
+        Yields:
+            Chunks do documento
+        """
+        for page in self.iter_pages(file_path):
+            for chunk in self.text_splitter.split_documents([page]):
+                yield chunk
+    
+    def iter_supported_files(self, directory_path: str) -> Iterator[Path]:
+        """
+        Itera sobre os arquivos suportados de um diretório (recursivamente)
+        
+        Args:
+            directory_path: Caminho para o diretório
+            
+        Yields:
+            Caminhos dos arquivos suportados
+        """
+        directory = Path(directory_path)
+        if not directory.exists():
+            raise FileNotFoundError(f"Diretório não encontrado: {directory_path}")
+        
+        for file_path in directory.rglob('*'):
+            if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_EXTENSIONS:
+                yield file_path
+    
     def load_web_page(self, url: str) -> List[Dict[str, Any]]:
         """
         Carrega conteúdo de uma página web
@@ -82,7 +139,7 @@ class DocumentLoader:
             Lista de chunks do conteúdo
         """
         try:
-            loader = WebBaseLoader(url)
+            loader = loaders.WebBaseLoader(url)
             documents = loader.load()
             
             # Adicionar metadados
@@ -125,22 +182,16 @@ class DocumentLoader:
         Returns:
             Lista de todos os chunks dos documentos
         """
-        directory = Path(directory_path)
-        if not directory.exists():
-            raise FileNotFoundError(f"Diretório não encontrado: {directory_path}")
-        
         all_chunks = []
-        supported_extensions = {'.pdf', '.docx', '.doc', '.txt'}
         
-        for file_path in directory.rglob('*'):
-            if file_path.is_file() and file_path.suffix.lower() in supported_extensions:
-                try:
-                    chunks = self.load_document(str(file_path))
-                    all_chunks.extend(chunks)
-                    logger.info(f"Processado: {file_path}")
-                except Exception as e:
-                    logger.warning(f"Erro ao processar {file_path}: {str(e)}")
-                    continue
+        for file_path in self.iter_supported_files(directory_path):
+            try:
+                chunks = self.load_document(str(file_path))
+                all_chunks.extend(chunks)
+                logger.info(f"Processado: {file_path}")
+            except Exception as e:
+                logger.warning(f"Erro ao processar {file_path}: {str(e)}")
+                continue
         
         logger.info(f"Total de chunks carregados: {len(all_chunks)}")
         return all_chunks
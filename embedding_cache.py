@@ -0,0 +1,304 @@
+"""
+Cache de embeddings endereçado por conteúdo
+Chave: (modelo, hash do texto normalizado do chunk). Um LRU em memória,
+limitado em bytes e com os vetores empacotados em float32, fica na frente de
+um arquivo SQLite local com despejo por tamanho.
+"""
+
+import os
+import re
+import array
+import sqlite3
+import hashlib
+import logging
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Callable
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Fora do diretório de trabalho: o cache não depende de onde o processo foi iniciado
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "embedding_cache.db")
+
+
+def normalize_text(text: str) -> str:
+    """Normaliza o chunk (Unicode NFC, espaços colapsados) antes do hash"""
+    text = unicodedata.normalize("NFC", text or "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def content_key(model: str, text: str) -> str:
+    """Chave do cache: sha256 de modelo + texto normalizado"""
+    payload = f"{model}\x00{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _pack(vector: List[float]) -> bytes:
+    return array.array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    values = array.array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class EmbeddingCache:
+    """Cache em dois níveis (LRU em memória + SQLite em disco) com contadores de acerto"""
+
+    def __init__(self,
+                 db_path: str = DEFAULT_DB_PATH,
+                 max_memory_bytes: int = 64 * 1024 * 1024,
+                 max_disk_bytes: int = 512 * 1024 * 1024):
+        self.db_path = db_path
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+
+        # Vetores guardados como o blob float32 do disco (4 bytes por dimensão)
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disk_bytes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._init_db()
+
+    def _init_db(self):
+        """Inicializa o nível em disco; sem disco o cache continua só em memória"""
+        try:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_access ON embeddings(last_access)")
+            self._conn.commit()
+            row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()
+            self._disk_bytes = row[0]
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"⚠️ EmbeddingCache: nível em disco indisponível ({e}); usando apenas memória")
+            self._conn = None
+
+    # --- Nível em memória ---------------------------------------------------
+
+    def _memory_get(self, key: str) -> Optional[List[float]]:
+        blob = self._memory.get(key)
+        if blob is None:
+            return None
+        self._memory.move_to_end(key)
+        return _unpack(blob)
+
+    def _memory_put(self, key: str, blob: bytes):
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        if len(blob) > self.max_memory_bytes:
+            return
+        self._memory[key] = blob
+        self._memory_bytes += len(blob)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    # --- Nível em disco -----------------------------------------------------
+
+    def _disk_get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        if not self._conn or not keys:
+            return {}
+        found = {}
+        # SQLite limita o número de parâmetros por instrução
+        for start in range(0, len(keys), 500):
+            part = keys[start:start + 500]
+            placeholders = ",".join("?" * len(part))
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = blob
+        if found:
+            now = time.time()
+            self._conn.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?",
+                                   [(now, key) for key in found])
+            self._conn.commit()
+        return found
+
+    def _disk_put_many(self, items: List[tuple]):
+        if not self._conn or not items:
+            return
+        now = time.time()
+        added = 0
+        for key, model, blob in items:
+            # rowcount 0: a chave já estava gravada (INSERT OR IGNORE) e não ocupa bytes novos
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO embeddings (key, model, vector, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, model, blob, len(blob), now)
+            )
+            if cursor.rowcount > 0:
+                added += len(blob)
+        self._conn.commit()
+        self._disk_bytes += added
+        if self._disk_bytes > self.max_disk_bytes:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        """Remove as entradas menos acessadas até ficar abaixo de 90% do limite"""
+        target = int(self.max_disk_bytes * 0.9)
+        removed = 0
+        while self._disk_bytes > target:
+            rows = self._conn.execute(
+                "SELECT key, size FROM embeddings ORDER BY last_access ASC LIMIT 1000"
+            ).fetchall()
+            if not rows:
+                break
+            victims = []
+            for key, size in rows:
+                victims.append((key,))
+                self._disk_bytes -= size
+                if self._disk_bytes <= target:
+                    break
+            self._conn.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+            removed += len(victims)
+        self._conn.commit()
+        logger.info(f"🧹 EmbeddingCache: {removed} embeddings removidos do disco (limite de {self.max_disk_bytes} bytes)")
+
+    # --- API pública --------------------------------------------------------
+
+    def get_many(self, texts: List[str], model: str) -> List[Optional[List[float]]]:
+        """Busca os vetores dos textos; posições sem vetor em cache ficam como None"""
+        keys = [content_key(model, text) for text in texts]
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        pending: Dict[str, List[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory_get(key)
+                if vector is not None:
+                    results[i] = vector
+                    self.memory_hits += 1
+                else:
+                    pending.setdefault(key, []).append(i)
+
+            try:
+                found = self._disk_get_many(list(pending))
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ EmbeddingCache: erro ao ler do disco: {e}")
+                found = {}
+
+            for key, positions in pending.items():
+                blob = found.get(key)
+                vector = None
+                if blob is not None:
+                    self._memory_put(key, blob)
+                    vector = _unpack(blob)
+                    self.disk_hits += len(positions)
+                else:
+                    self.misses += len(positions)
+                for i in positions:
+                    results[i] = vector
+
+        return results
+
+    def put_many(self, texts: List[str], vectors: List[List[float]], model: str):
+        """Armazena os vetores nos dois níveis"""
+        items = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                if vector is None:
+                    continue
+                key = content_key(model, text)
+                blob = _pack(vector)
+                self._memory_put(key, blob)
+                items.append((key, model, blob))
+            try:
+                self._disk_put_many(items)
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ EmbeddingCache: erro ao gravar no disco: {e}")
+
+    def get_or_compute(self, texts: List[str], model: str,
+                       compute: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """
+        Retorna os embeddings dos textos, chamando ``compute`` apenas para os
+        textos (únicos) que não estão em cache.
+        """
+        results = self.get_many(texts, model)
+
+        missing: Dict[str, List[int]] = {}
+        for i, vector in enumerate(results):
+            if vector is None:
+                missing.setdefault(content_key(model, texts[i]), []).append(i)
+
+        if missing:
+            to_embed = [texts[positions[0]] for positions in missing.values()]
+            vectors = compute(to_embed)
+            self.put_many(to_embed, vectors, model)
+            for positions, vector in zip(missing.values(), vectors):
+                for i in positions:
+                    results[i] = vector
+
+            logger.info(f"🗃️ EmbeddingCache: {len(texts) - sum(len(p) for p in missing.values())}/{len(texts)} "
+                        f"embeddings vieram do cache; {len(to_embed)} gerados")
+
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de acerto/erro e ocupação do cache"""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "hits": hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / total * 100, 2) if total else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "max_memory_bytes": self.max_memory_bytes,
+                "disk_bytes": self._disk_bytes,
+                "max_disk_bytes": self.max_disk_bytes
+            }
+
+    def clear(self):
+        """Esvazia os dois níveis"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self._conn:
+                self._conn.execute("DELETE FROM embeddings")
+                self._conn.commit()
+            self._disk_bytes = 0
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Retorna o cache de embeddings compartilhado pelo processo"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache(
+                    db_path=os.getenv("EMBEDDING_CACHE_PATH", DEFAULT_DB_PATH),
+                    max_memory_bytes=int(os.getenv("EMBEDDING_CACHE_MEMORY_MB", "64")) * 1024 * 1024,
+                    max_disk_bytes=int(os.getenv("EMBEDDING_CACHE_MAX_MB", "512")) * 1024 * 1024
+                )
+    return _cache
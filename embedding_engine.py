@@ -0,0 +1,288 @@
+"""
+Motor de embeddings em lote e concorrente
+Agrupa textos em lotes limitados por tokens, mantém alguns lotes em voo
+sobre um cliente compartilhado e reexecuta com backoff os lotes que falharam
+por erro transitório (limite de taxa, tempo esgotado, erro 5xx).
+"""
+
+import os
+import time
+import random
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Callable
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_MODEL = "text-embedding-3-small"
+DEFAULT_EMBEDDING_DIMENSIONS = 1536
+
+# Limites da API de embeddings da OpenAI (com folga)
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_REQUEST = 250000
+MAX_TOKENS_PER_INPUT = 8191
+# Folga para a estimativa de ~4 caracteres por token, que subestima textos
+# em português e com muitos números
+DEFAULT_MAX_INPUT_TOKENS = int(MAX_TOKENS_PER_INPUT * 0.75)
+
+# Erros do SDK da OpenAI que valem nova tentativa (comparados pelo nome para
+# não exigir o pacote openai)
+_RETRYABLE_ERROR_NAMES = {"RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError"}
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa barata de tokens (~4 caracteres por token) sem depender do tiktoken."""
+    return max(1, len(text) // 4)
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Limite de taxa (429), tempo esgotado, falha de conexão e erros 5xx; o resto falha na hora"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if any(cls.__name__ in _RETRYABLE_ERROR_NAMES for cls in type(error).__mro__):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return isinstance(status, int) and (status in (408, 429) or status >= 500)
+
+
+class EmbeddingBackend(ABC):
+    """Serviço de embeddings substituível (OpenAI, stub local, etc.)"""
+
+    @abstractmethod
+    def embed_batch(self, texts: List[str], model: str) -> List[List[float]]:
+        """Gera embeddings para um lote de textos, preservando a ordem"""
+        pass
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """Backend OpenAI com um único cliente reaproveitado entre chamadas e threads"""
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from openai import OpenAI
+                    self._client = OpenAI(
+                        api_key=self.api_key or os.getenv("OPENAI_API_KEY"),
+                        base_url=self.base_url
+                    )
+        return self._client
+
+    def embed_batch(self, texts: List[str], model: str) -> List[List[float]]:
+        response = self.client.embeddings.create(model=model, input=texts)
+        # A API devolve os itens com 'index'; ordenar garante a correspondência
+        data = sorted(response.data, key=lambda item: item.index)
+        return [item.embedding for item in data]
+
+
+class LocalStubEmbeddingBackend(EmbeddingBackend):
+    """
+    Backend local determinístico para testes e benchmarks offline.
+    Gera vetores pseudoaleatórios a partir do hash do texto e pode simular
+    a latência de rede por requisição.
+    """
+
+    def __init__(self, dimensions: int = DEFAULT_EMBEDDING_DIMENSIONS, latency: float = 0.0):
+        self.dimensions = dimensions
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def embed_batch(self, texts: List[str], model: str) -> List[List[float]]:
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._vector_for(model, text) for text in texts]
+
+    def _vector_for(self, model: str, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(f"{model}:{text}".encode("utf-8")).digest()[:8], "big")
+        rng = random.Random(seed)
+        return [rng.uniform(-1.0, 1.0) for _ in range(self.dimensions)]
+
+
+class EmbeddingEngine:
+    """
+    Motor de embeddings reutilizável.
+
+    Os textos são empacotados em lotes limitados por quantidade de itens e por
+    tokens estimados; até ``max_concurrency`` lotes ficam em voo ao mesmo tempo
+    e cada lote com falha transitória é reexecutado com backoff exponencial;
+    textos acima do limite de tokens por entrada são truncados antes dos lotes.
+    """
+
+    def __init__(self,
+                 backend: Optional[EmbeddingBackend] = None,
+                 model: str = DEFAULT_EMBEDDING_MODEL,
+                 max_batch_size: int = 256,
+                 max_batch_tokens: int = 100000,
+                 max_concurrency: int = 4,
+                 max_retries: int = 5,
+                 backoff_base: float = 0.5,
+                 backoff_max: float = 20.0,
+                 max_input_tokens: int = DEFAULT_MAX_INPUT_TOKENS,
+                 token_counter: Callable[[str], int] = estimate_tokens):
+        self.backend = backend or OpenAIEmbeddingBackend()
+        self.model = model
+        self.max_batch_size = min(max_batch_size, MAX_INPUTS_PER_REQUEST)
+        self.max_batch_tokens = min(max_batch_tokens, MAX_TOKENS_PER_REQUEST)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_input_tokens = min(max_input_tokens, MAX_TOKENS_PER_INPUT)
+        self.token_counter = token_counter
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                            thread_name_prefix="embedding")
+
+    def fit_input(self, text: str) -> str:
+        """Trunca o texto ao limite de tokens por entrada da API (o excedente seria rejeitado)"""
+        tokens = self.token_counter(text)
+        if tokens <= self.max_input_tokens:
+            return text
+        cut = len(text) * self.max_input_tokens // tokens
+        while cut > 0 and self.token_counter(text[:cut]) > self.max_input_tokens:
+            cut = cut * 9 // 10
+        logger.warning(f"⚠️ EmbeddingEngine: texto com ~{tokens} tokens truncado para "
+                       f"{self.max_input_tokens} tokens")
+        return text[:cut]
+
+    def make_batches(self, texts: List[str]) -> List[List[int]]:
+        """Agrupa os índices dos textos em lotes respeitando os limites configurados"""
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_tokens = 0
+
+        for index, text in enumerate(texts):
+            tokens = self.token_counter(text)
+            if current and (len(current) >= self.max_batch_size or
+                            current_tokens + tokens > self.max_batch_tokens):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(index)
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    def _embed_with_retry(self, texts: List[str], model: str) -> List[List[float]]:
+        attempt = 0
+        while True:
+            try:
+                vectors = self.backend.embed_batch(texts, model)
+                if len(vectors) != len(texts):
+                    raise ValueError(f"Backend retornou {len(vectors)} embeddings para {len(texts)} textos")
+                return vectors
+            except Exception as e:
+                if not is_retryable_error(e):
+                    logger.error(f"❌ EmbeddingEngine: lote de {len(texts)} textos falhou sem nova tentativa: {e}")
+                    raise
+                attempt += 1
+                if attempt > self.max_retries:
+                    logger.error(f"❌ EmbeddingEngine: lote de {len(texts)} textos falhou após {self.max_retries} tentativas: {e}")
+                    raise
+                delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+                delay *= random.uniform(0.5, 1.0)
+                logger.warning(f"⚠️ EmbeddingEngine: falha no lote ({e}); nova tentativa {attempt}/{self.max_retries} em {delay:.2f}s")
+                time.sleep(delay)
+
+    def embed_texts(self, texts: List[str], model: Optional[str] = None) -> List[List[float]]:
+        """Gera embeddings para todos os textos, na mesma ordem da entrada"""
+        if not texts:
+            return []
+
+        model = model or self.model
+        texts = [self.fit_input(text) for text in texts]
+        batches = self.make_batches(texts)
+        logger.info(f"🧠 EmbeddingEngine: {len(texts)} textos em {len(batches)} lotes (concorrência: {self.max_concurrency})")
+
+        futures = [
+            self._executor.submit(self._embed_with_retry, [texts[i] for i in batch], model)
+            for batch in batches
+        ]
+
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        for batch, future in zip(batches, futures):
+            for index, vector in zip(batch, future.result()):
+                results[index] = vector
+        return results
+
+    def embed_query(self, text: str, model: Optional[str] = None) -> List[float]:
+        """Gera o embedding de um único texto (consulta)"""
+        return self._embed_with_retry([self.fit_input(text)], model or self.model)[0]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+_engine: Optional[EmbeddingEngine] = None
+_engine_lock = threading.Lock()
+
+
+def _default_backend() -> EmbeddingBackend:
+    if os.getenv("EMBEDDING_BACKEND", "openai").lower() == "stub":
+        logger.info("🧪 EmbeddingEngine: usando backend local (stub)")
+        return LocalStubEmbeddingBackend()
+    return OpenAIEmbeddingBackend()
+
+
+def get_embedding_engine() -> EmbeddingEngine:
+    """Retorna o motor de embeddings compartilhado pelo processo"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = EmbeddingEngine(
+                    backend=_default_backend(),
+                    max_concurrency=int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4")),
+                    max_batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "256")),
+                )
+    return _engine
+
+
+def set_embedding_engine(engine: Optional[EmbeddingEngine]):
+    """Substitui o motor compartilhado (ex: por um backend stub em testes)"""
+    global _engine
+    with _engine_lock:
+        if _engine is not None and _engine is not engine:
+            _engine.shutdown()
+        _engine = engine
+
+
+if __name__ == "__main__":
+    # Benchmark offline: laço serial (uma requisição por chunk) vs. motor em lotes
+    latency = 0.05
+    chunks = [f"Trecho {i} " + "lorem ipsum dolor sit amet " * 35 for i in range(300)]
+
+    print("🧠 Benchmark do EmbeddingEngine (backend stub, latência simulada de 50ms)")
+    print("=" * 60)
+
+    stub = LocalStubEmbeddingBackend(latency=latency)
+    start = time.time()
+    for chunk in chunks:
+        stub.embed_batch([chunk], DEFAULT_EMBEDDING_MODEL)
+    serial_time = time.time() - start
+    print(f"Serial:  {len(chunks)} requisições em {serial_time:.2f}s")
+
+    stub = LocalStubEmbeddingBackend(latency=latency)
+    engine = EmbeddingEngine(backend=stub, max_batch_size=64, max_concurrency=4)
+    start = time.time()
+    engine.embed_texts(chunks)
+    batched_time = time.time() - start
+    print(f"Lotes:   {stub.calls} requisições em {batched_time:.2f}s")
+    print(f"Ganho:   {serial_time / batched_time:.1f}x")
+    engine.shutdown()
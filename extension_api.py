@@ -49,8 +49,9 @@ def save_content():
             f.write("="*20 + " CONTENT " + "="*20 + "\n\n")
             f.write(content)
 
-        # Adiciona o arquivo de texto como um documento para o agente
-        agent.add_document(str(file_path))
+        # Adiciona o arquivo como documento do agente; recapturar a mesma página
+        # vetoriza apenas os trechos que mudaram
+        agent.sync_document(str(file_path))
         
         logging.info(f"Conteúdo da URL '{url}' salvo com sucesso para o agente '{agent.name}' (ID: {agent_id})")
         return jsonify({"success": True, "message": f"Conteúdo salvo no agente '{agent.name}'."}), 201
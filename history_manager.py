@@ -0,0 +1,351 @@
+"""
+Histórico de conversas dos agentes com custo limitado por turno
+
+- Paginação por keyset em ``(created_at, id)``: cada página custa o mesmo,
+  independente de quantas conversas o agente já teve
+- Janela deslizante: só os últimos N turnos entram no prompt literalmente
+- Turnos que saem da janela são condensados em um resumo por agente
+  (tabela ``conversation_summaries``), atualizado de forma incremental a partir
+  do cursor do último turno resumido, em lotes e fora do caminho da resposta
+- Teto de tokens para o histórico (resumo + janela) dentro do prompt
+"""
+
+import os
+import base64
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from context_assembler import count_tokens, truncate_to_tokens, MESSAGE_OVERHEAD_TOKENS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SUMMARY_HEADER = "Resumo da conversa anterior com o usuário:"
+SUMMARY_PROMPT = (
+    "Atualize o resumo de uma conversa entre um usuário e um assistente. "
+    "Mantenha fatos, decisões, preferências do usuário e pendências; descarte cumprimentos. "
+    "Responda apenas com o novo resumo, em no máximo {max_words} palavras."
+)
+
+# Conversas do agente, mais recentes primeiro, com a resposta preferida de cada turno
+_TURNS_SQL = """
+    SELECT c.id, c.user_message, c.created_at, r.response_text
+    FROM conversations c
+    LEFT JOIN LATERAL (
+        SELECT response_text FROM llm_responses
+        WHERE conversation_id = c.id
+        ORDER BY feedback DESC, created_at DESC
+        LIMIT 1
+    ) r ON TRUE
+    WHERE c.agent_id = %s {where}
+    ORDER BY c.created_at DESC, c.id DESC
+    LIMIT %s
+"""
+
+
+def _execute(query: str, params: tuple = (), fetch: Optional[str] = None):
+    """Executa a consulta em uma conexão do pool (DictCursor)"""
+    import psycopg2.extras
+    from database import Database
+
+    conn = Database.get_connection()
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+            cur.execute(query, params)
+            result = cur.fetchone() if fetch == 'one' else cur.fetchall() if fetch == 'all' else None
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        Database.release_connection(conn)
+
+
+def _is_undefined_table(error: Exception) -> bool:
+    """psycopg2.errors.UndefinedTable (SQLSTATE 42P01)"""
+    return getattr(error, 'pgcode', None) == '42P01'
+
+
+def encode_cursor(created_at: Any, conversation_id: Any) -> str:
+    """Cursor opaco de paginação a partir da chave ``(created_at, id)``"""
+    stamp = created_at.isoformat() if isinstance(created_at, datetime) else str(created_at)
+    return base64.urlsafe_b64encode(f"{stamp}|{conversation_id}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        stamp, conversation_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+        return stamp, conversation_id
+    except Exception:
+        raise ValueError("Cursor de histórico inválido")
+
+
+def turns_to_messages(turns: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """Converte turnos (em ordem cronológica) em mensagens de chat"""
+    messages = []
+    for turn in turns:
+        messages.append({"role": "user", "content": turn['user_message']})
+        if turn.get('response_text'):
+            messages.append({"role": "assistant", "content": turn['response_text']})
+    return messages
+
+
+def extractive_summary(previous: str, turns: List[Dict[str, Any]], max_tokens: int) -> str:
+    """Resumo sem LLM: acrescenta os turnos ao resumo e mantém as linhas mais recentes"""
+    lines = previous.split("\n") if previous else []
+    lines += [f"{'Usuário' if m['role'] == 'user' else 'Assistente'}: {m['content']}" for m in turns_to_messages(turns)]
+    # O que foi dito por último costuma importar mais: as linhas antigas saem primeiro
+    while len(lines) > 1 and count_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return truncate_to_tokens("\n".join(lines), max_tokens)
+
+
+def llm_summarizer(model: Optional[str] = None) -> Callable[[str, List[Dict[str, Any]], int], str]:
+    """Resumidor via llm_manager, com fallback extrativo se o provedor falhar"""
+    model = model or os.getenv("HISTORY_SUMMARY_MODEL", "gpt-4o-mini")
+
+    def summarize(previous: str, turns: List[Dict[str, Any]], max_tokens: int) -> str:
+        from llm_providers import llm_manager
+
+        transcript = "\n".join(f"{'Usuário' if m['role'] == 'user' else 'Assistente'}: {m['content']}"
+                               for m in turns_to_messages(turns))
+        messages = [
+            {"role": "system", "content": SUMMARY_PROMPT.format(max_words=max(50, int(max_tokens * 0.7)))},
+            {"role": "user", "content": f"Resumo atual:\n{previous or '(vazio)'}\n\nNovos turnos:\n{transcript}"}
+        ]
+        try:
+            result = llm_manager.generate_response(messages, model=model, temperature=0.2, max_tokens=max_tokens)
+            if result.get('success') and result.get('response'):
+                return truncate_to_tokens(result['response'].strip(), max_tokens)
+            logger.warning(f"⚠️ HistoryManager: resumo via LLM falhou ({result.get('error')}); usando resumo extrativo")
+        except Exception as e:
+            logger.warning(f"⚠️ HistoryManager: resumo via LLM falhou ({e}); usando resumo extrativo")
+        return extractive_summary(previous, turns, max_tokens)
+
+    return summarize
+
+
+class HistoryManager:
+    """Janela de histórico + resumo incremental por agente"""
+
+    def __init__(self,
+                 window_turns: int = 6,
+                 max_history_tokens: int = 1500,
+                 summary_max_tokens: int = 400,
+                 summary_batch: int = 4,
+                 max_turns_per_summary: int = 20,
+                 summarizer: Optional[Callable[[str, List[Dict[str, Any]], int], str]] = None,
+                 execute: Optional[Callable] = None,
+                 background: bool = True):
+        self.window_turns = window_turns
+        self.max_history_tokens = max_history_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.summary_batch = summary_batch
+        self.max_turns_per_summary = max_turns_per_summary
+        self.summarizer = summarizer or llm_summarizer()
+        self._execute = execute or _execute
+        self.background = background
+
+        self._inflight: set = set()
+        self._inflight_lock = threading.Lock()
+        self._summary_table_available = True
+
+    # --- Paginação ----------------------------------------------------------
+
+    def get_page(self, agent_id: str, limit: int = 50, before: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Página de histórico anterior a ``before`` (mais recente se None), em
+        ordem cronológica, no formato usado pela interface (mensagens 'user' e
+        'assistant' com todas as respostas). ``next_cursor`` é None na última página.
+        """
+        limit = max(1, min(int(limit), 200))
+        where, params = "", [agent_id]
+        if before:
+            stamp, conversation_id = decode_cursor(before)
+            where = "AND (c.created_at, c.id) < (%s::timestamptz, %s::uuid)"
+            params += [stamp, conversation_id]
+        query = f"""
+            SELECT c.id, c.user_message, c.created_at,
+                   (SELECT json_agg(json_build_object(
+                        'id', r.id, 'provider', r.provider, 'model_used', r.model_used,
+                        'response_text', r.response_text, 'feedback', r.feedback
+                    ) ORDER BY r.created_at)
+                    FROM llm_responses r WHERE r.conversation_id = c.id) AS responses
+            FROM conversations c
+            WHERE c.agent_id = %s {where}
+            ORDER BY c.created_at DESC, c.id DESC
+            LIMIT %s
+        """
+        # Um registro a mais indica se existe página anterior
+        rows = self._execute(query, tuple(params + [limit + 1]), fetch='all') or []
+        has_more = len(rows) > limit
+        rows = list(rows[:limit])
+
+        items = []
+        for row in reversed(rows):
+            items.append({"id": str(row['id']), "role": "user", "content": row['user_message']})
+            if row['responses']:
+                items.append({"id": str(row['id']), "role": "assistant", "responses": [{
+                    'id': str(resp['id']), 'provider': resp['provider'],
+                    'content': resp['response_text'], 'feedback': resp['feedback']
+                } for resp in row['responses']]})
+        next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id']) if has_more else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    # --- Janela + resumo ----------------------------------------------------
+
+    def _recent_turns(self, agent_id: str, limit: int, before: Optional[Tuple[Any, Any]] = None,
+                      after: Optional[Tuple[Any, Any]] = None) -> List[Dict[str, Any]]:
+        """Turnos mais recentes (até ``limit``) no intervalo, em ordem cronológica"""
+        where, params = "", [agent_id]
+        if after and after[0] is not None:
+            where += " AND (c.created_at, c.id) > (%s, %s)"
+            params += list(after)
+        if before:
+            where += " AND (c.created_at, c.id) < (%s, %s)"
+            params += list(before)
+        rows = self._execute(_TURNS_SQL.format(where=where), tuple(params + [limit]), fetch='all') or []
+        return [dict(row) for row in reversed(rows)]
+
+    def _load_summary(self, agent_id: str) -> Optional[Dict[str, Any]]:
+        if not self._summary_table_available:
+            return None
+        try:
+            row = self._execute(
+                "SELECT summary, covered_until, covered_id, turns_covered FROM conversation_summaries WHERE agent_id = %s",
+                (agent_id,), fetch='one')
+            return dict(row) if row else None
+        except Exception as e:
+            if _is_undefined_table(e):
+                self._summary_table_available = False
+                logger.warning(f"⚠️ HistoryManager: tabela conversation_summaries inexistente ({e}); "
+                               f"usando apenas a janela de histórico")
+            else:
+                # Falha transitória (pool, rede): só esta montagem fica sem resumo
+                logger.warning(f"⚠️ HistoryManager: resumo do agente {agent_id} indisponível ({e})")
+            return None
+
+    def update_summary(self, agent_id: str, window_start: Tuple[Any, Any],
+                       summary: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Incorpora ao resumo os turnos entre o último resumido e o início da
+        janela. Só roda com pelo menos ``summary_batch`` turnos pendentes; um
+        atraso maior que ``max_turns_per_summary`` descarta os turnos mais antigos.
+        """
+        summary = summary if summary is not None else (self._load_summary(agent_id) or {})
+        after = (summary.get('covered_until'), summary.get('covered_id'))
+        pending = self._recent_turns(agent_id, self.max_turns_per_summary, before=window_start, after=after)
+        if len(pending) < self.summary_batch:
+            return False
+
+        text = self.summarizer(summary.get('summary') or "", pending, self.summary_max_tokens)
+        last = pending[-1]
+        self._execute("""
+            INSERT INTO conversation_summaries (agent_id, summary, covered_until, covered_id, turns_covered, updated_at)
+            VALUES (%s, %s, %s, %s, %s, NOW())
+            ON CONFLICT (agent_id) DO UPDATE SET
+                summary = EXCLUDED.summary, covered_until = EXCLUDED.covered_until,
+                covered_id = EXCLUDED.covered_id,
+                turns_covered = conversation_summaries.turns_covered + %s, updated_at = NOW()
+            WHERE conversation_summaries.covered_until IS NULL
+               OR (conversation_summaries.covered_until, conversation_summaries.covered_id) < (EXCLUDED.covered_until, EXCLUDED.covered_id)
+        """, (agent_id, text, last['created_at'], last['id'], len(pending), len(pending)))
+        logger.info(f"📝 HistoryManager: resumo do agente {agent_id} atualizado com {len(pending)} turnos")
+        return True
+
+    def _schedule_summary(self, agent_id: str, window_start: Tuple[Any, Any], summary: Optional[Dict[str, Any]]):
+        with self._inflight_lock:
+            if agent_id in self._inflight:
+                return
+            self._inflight.add(agent_id)
+
+        def run():
+            try:
+                self.update_summary(agent_id, window_start, summary)
+            except Exception as e:
+                logger.warning(f"⚠️ HistoryManager: falha ao atualizar o resumo do agente {agent_id}: {e}")
+            finally:
+                with self._inflight_lock:
+                    self._inflight.discard(agent_id)
+
+        if self.background:
+            threading.Thread(target=run, name=f"history-summary-{agent_id}", daemon=True).start()
+        else:
+            run()
+
+    def cap_messages(self, messages: List[Dict[str, str]], summary: str = "",
+                     model: Optional[str] = None) -> List[Dict[str, str]]:
+        """
+        Aplica o teto de tokens: o resumo (cortado em ``summary_max_tokens``)
+        entra primeiro e as mensagens mais recentes ocupam o restante.
+        """
+        result: List[Dict[str, str]] = []
+        used = 0
+        if summary:
+            summary_text = f"{SUMMARY_HEADER}\n{truncate_to_tokens(summary, self.summary_max_tokens, model)}"
+            used = count_tokens(summary_text, model) + MESSAGE_OVERHEAD_TOKENS
+            if used <= self.max_history_tokens:
+                result.append({"role": "system", "content": summary_text})
+            else:
+                used = 0
+
+        kept: List[Dict[str, str]] = []
+        for message in reversed(messages):
+            tokens = count_tokens(message.get('content', ''), model) + MESSAGE_OVERHEAD_TOKENS
+            if used + tokens > self.max_history_tokens:
+                break
+            kept.insert(0, {"role": message['role'], "content": message.get('content', '')})
+            used += tokens
+        # Uma resposta cuja pergunta foi cortada não entra sozinha
+        while kept and kept[0]['role'] == 'assistant':
+            kept.pop(0)
+        return result + kept
+
+    def window_client_history(self, history: List[Dict[str, str]], model: Optional[str] = None) -> List[Dict[str, str]]:
+        """Janela + teto de tokens para um histórico enviado pelo cliente"""
+        valid = [m for m in history or []
+                 if isinstance(m, dict) and m.get('role') in ('user', 'assistant') and isinstance(m.get('content'), str)]
+        return self.cap_messages(valid[-2 * self.window_turns:], model=model)
+
+    def build_history(self, agent_id: str, model: Optional[str] = None) -> List[Dict[str, str]]:
+        """
+        Histórico do prompt para o próximo turno: resumo em cache + últimos
+        ``window_turns`` turnos, dentro de ``max_history_tokens``. Custa duas
+        consultas indexadas, independente do tamanho do histórico do agente.
+        """
+        # Os turnos logo antes da janela dizem, sem outra consulta, se já há um lote a resumir
+        turns = self._recent_turns(agent_id, self.window_turns + self.summary_batch)
+        older, window = turns[:-self.window_turns], turns[-self.window_turns:]
+        summary = self._load_summary(agent_id) if turns else None
+
+        if len(older) >= self.summary_batch and self._summary_table_available:
+            covered = (summary or {}).get('covered_until')
+            if covered is None or (covered, str(summary['covered_id'])) < (older[0]['created_at'], str(older[0]['id'])):
+                self._schedule_summary(agent_id, (window[0]['created_at'], window[0]['id']), summary)
+
+        return self.cap_messages(turns_to_messages(window), (summary or {}).get('summary', ''), model)
+
+
+_history_manager: Optional[HistoryManager] = None
+_history_manager_lock = threading.Lock()
+
+
+def get_history_manager() -> HistoryManager:
+    """
+    Gerenciador compartilhado, configurado por HISTORY_WINDOW_TURNS,
+    RAG_HISTORY_MAX_TOKENS, HISTORY_SUMMARY_MAX_TOKENS e HISTORY_SUMMARY_BATCH
+    """
+    global _history_manager
+    if _history_manager is None:
+        with _history_manager_lock:
+            if _history_manager is None:
+                _history_manager = HistoryManager(
+                    window_turns=int(os.getenv("HISTORY_WINDOW_TURNS", "6")),
+                    max_history_tokens=int(os.getenv("RAG_HISTORY_MAX_TOKENS", "1500")),
+                    summary_max_tokens=int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS", "400")),
+                    summary_batch=int(os.getenv("HISTORY_SUMMARY_BATCH", "4"))
+                )
+    return _history_manager
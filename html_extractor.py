@@ -0,0 +1,347 @@
+"""
+Extração do conteúdo principal de páginas HTML
+``extract_content`` produz as extrações usadas por process_content_extractions
+(título, headings, parágrafos, listas, conteúdo semântico, conteúdo jurídico e
+texto completo). Com lxml instalado, o HTML é analisado uma vez e todas as
+categorias são coletadas em um único percurso da árvore; contêineres
+semânticos ou jurídicos aninhados (main > article > section) contam uma vez só.
+Sem lxml, cai no extrator original com BeautifulSoup.
+
+Os dois extratores não montam a mesma árvore para HTML malformado: o lxml
+segue o navegador (libxml2) e o html.parser aninha o que não foi fechado.
+As diferenças estão descritas em extract_content_lxml e fixadas nos testes.
+"""
+
+import re
+import logging
+import importlib.util
+from typing import Dict, List, Optional
+
+from lazy_imports import lazy_import
+
+# BeautifulSoup só é carregado na primeira extração
+bs4 = lazy_import("bs4", "beautifulsoup4")
+lxml_html = lazy_import("lxml.html", "lxml")
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Elementos que nunca contêm conteúdo útil (descartados com toda a subárvore)
+UNWANTED_TAGS = frozenset([
+    'script', 'style', 'noscript', 'iframe', 'embed', 'object', 'svg',
+    'meta', 'link', 'title', 'base', 'area', 'map'
+])
+# O BeautifulSoup também ignora o texto de <template> em get_text
+_SKIPPED_TAGS = UNWANTED_TAGS | {'template'}
+HEADING_TAGS = frozenset(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+SEMANTIC_SELECTORS = [
+    'main', 'article', 'section',
+    '[role="main"]', '.content', '.main-content',
+    '.article-content', '.post-content', '.entry-content'
+]
+JURISPRUDENCE_SELECTORS = [
+    '.jurisprudencia-content', '.decisao-content', '.ementa',
+    '.acordao', '.sentenca', '.voto', '.relatorio', '.fundamentacao',
+    '.tribunal', '.processo', '.julgamento', '.decisao'
+]
+
+_BODY_TAG = re.compile(r'<body[\s>/]', re.IGNORECASE)
+
+
+def lxml_available() -> bool:
+    return importlib.util.find_spec("lxml") is not None
+
+
+def _empty_extractions() -> dict:
+    return {
+        'title': "",
+        'meta_description': "",
+        'headings': [],
+        'paragraphs': [],
+        'lists': [],
+        'semantic_content': "",
+        'full_body_text': "",
+        'jurisprudence_content': ""  # Específico para sites jurídicos
+    }
+
+
+def extract_content_bs4(html_content: str) -> dict:
+    """
+    Extrator original (BeautifulSoup + html.parser, uma busca por categoria).
+    Usado quando o lxml não está instalado e como referência no benchmark.
+    """
+    soup = bs4.BeautifulSoup(html_content, 'html.parser')
+    
+    # Remover elementos que nunca contêm conteúdo útil
+    for selector in UNWANTED_TAGS:
+        for element in soup.select(selector):
+            element.decompose()
+    
+    # Remover comentários HTML
+    for comment in soup.find_all(string=lambda text: isinstance(text, bs4.Comment)):
+        comment.extract()
+    
+    # Extrair diferentes tipos de conteúdo
+    content_extractions = _empty_extractions()
+    content_extractions['title'] = soup.title.get_text(strip=True) if soup.title else ""
+    
+    # Meta description
+    meta_desc = soup.find('meta', attrs={'name': 'description'})
+    if meta_desc:
+        content_extractions['meta_description'] = meta_desc.get('content', '')
+    
+    # Extrair headings (h1-h6)
+    for heading in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
+        text = heading.get_text(strip=True)
+        if text and len(text) > 2:
+            content_extractions['headings'].append({
+                'level': heading.name,
+                'text': text
+            })
+    
+    # Extrair parágrafos
+    for p in soup.find_all('p'):
+        text = p.get_text(strip=True)
+        if text and len(text) > 10:
+            content_extractions['paragraphs'].append(text)
+    
+    # Extrair listas
+    for ul in soup.find_all(['ul', 'ol']):
+        items = []
+        for li in ul.find_all('li'):
+            text = li.get_text(strip=True)
+            if text and len(text) > 3:
+                items.append(text)
+        if items:
+            content_extractions['lists'].append(items)
+    
+    # Extrair conteúdo semântico (main, article, section)
+    semantic_texts = []
+    for selector in SEMANTIC_SELECTORS:
+        elements = soup.select(selector)
+        for element in elements:
+            text = element.get_text(separator='\n', strip=True)
+            if text and len(text) > 50:
+                semantic_texts.append(text)
+    
+    content_extractions['semantic_content'] = '\n\n'.join(semantic_texts)
+    
+    # Extrair conteúdo jurídico específico
+    jurisprudence_texts = []
+    for selector in JURISPRUDENCE_SELECTORS:
+        elements = soup.select(selector)
+        for element in elements:
+            text = element.get_text(separator='\n', strip=True)
+            if text and len(text) > 20:
+                jurisprudence_texts.append(text)
+    
+    content_extractions['jurisprudence_content'] = '\n\n'.join(jurisprudence_texts)
+    
+    # Extrair texto completo do body como fallback
+    if soup.body:
+        content_extractions['full_body_text'] = soup.body.get_text(separator='\n', strip=True)
+    
+    return content_extractions
+
+
+def _selector_matcher(selectors: List[str]):
+    """
+    Compila seletores simples (tag, .classe, [role="x"]) em uma função que
+    devolve o índice do primeiro seletor que casa com o elemento, ou None.
+    """
+    tags, classes, roles = {}, {}, {}
+    for index, selector in enumerate(selectors):
+        if selector.startswith('.'):
+            classes.setdefault(selector[1:], index)
+        elif selector.startswith('[role='):
+            roles.setdefault(selector[6:-1].strip('"\''), index)
+        else:
+            tags.setdefault(selector, index)
+
+    def match(tag: str, element) -> Optional[int]:
+        found = tags.get(tag)
+        if classes:
+            for name in (element.get('class') or '').split():
+                index = classes.get(name)
+                if index is not None and (found is None or index < found):
+                    found = index
+        if roles:
+            index = roles.get(element.get('role'))
+            if index is not None and (found is None or index < found):
+                found = index
+        return found
+    return match
+
+
+_match_semantic = _selector_matcher(SEMANTIC_SELECTORS)
+_match_jurisprudence = _selector_matcher(JURISPRUDENCE_SELECTORS)
+
+
+class _Collector:
+    """Textos de um elemento aberto (e onde guardar o resultado ao fechar)"""
+    __slots__ = ('kind', 'pieces', 'slot', 'group', 'items')
+
+    def __init__(self, kind: str, slot: int = 0, group: int = 0):
+        self.kind = kind
+        self.pieces: List[str] = []
+        self.slot = slot
+        self.group = group
+        self.items: List = []
+
+
+def extract_content_lxml(html_content: str) -> dict:
+    """
+    Extrator de passada única: analisa com lxml e percorre a árvore uma vez,
+    distribuindo cada nó de texto para todos os coletores abertos (heading,
+    parágrafo, item de lista, contêiner semântico/jurídico e body).
+
+    Em HTML bem formado produz o mesmo dicionário de extract_content_bs4,
+    exceto que cada texto entra uma vez só em ``semantic_content`` e
+    ``jurisprudence_content``: um contêiner dentro de outro da mesma
+    categoria, ou que casa com dois seletores (``<main class="content">``),
+    não é repetido. Em HTML malformado vale a árvore do lxml, que fecha os
+    elementos como o navegador:
+
+    - ``<p>`` fecha antes de um bloco (``<p>a <div>b</div> c</p>``): o
+      parágrafo é só "a"; "b" e "c" continuam no texto do body
+    - ``<p>`` e ``<li>`` sem fechamento terminam no próximo irmão, em vez de
+      aninhar os seguintes e repetir o texto deles
+
+    Como os limites de tamanho de _pick_main_content passam a medir o texto
+    sem repetições, uma página pode cair na categoria seguinte (semântico ->
+    parágrafos -> body) onde o BeautifulSoup contava o mesmo trecho duas vezes.
+    """
+    extractions = _empty_extractions()
+    if not html_content or not html_content.strip():
+        return extractions
+    try:
+        root = lxml_html.document_fromstring(html_content)
+    except ValueError:
+        # Strings com declaração de encoding (<?xml ... encoding=...?>) só entram como bytes
+        root = lxml_html.document_fromstring(html_content.encode('utf-8'),
+                                             parser=lxml_html.HTMLParser(encoding='utf-8'))
+    except Exception as e:
+        logger.warning(f"⚠️ HTML não pôde ser analisado pelo lxml: {e}")
+        return extractions
+
+    # html.parser só tem body se o documento declarar <body>; o lxml sempre cria um
+    has_body = bool(_BODY_TAG.search(html_content))
+
+    headings: List[Optional[dict]] = []
+    paragraphs: List[Optional[str]] = []
+    lists: List[Optional[List[str]]] = []
+    semantic: List[List[Optional[str]]] = [[] for _ in SEMANTIC_SELECTORS]
+    jurisprudence: List[List[Optional[str]]] = [[] for _ in JURISPRUDENCE_SELECTORS]
+    body_pieces: Optional[List[str]] = None
+
+    active: List[_Collector] = []        # coletores que recebem o texto atual
+    open_lists: List[_Collector] = []    # ul/ol abertos (recebem os li descendentes)
+    in_semantic = in_jurisprudence = 0
+
+    def emit(text: Optional[str]):
+        if text:
+            text = text.strip()
+            if text:
+                for collector in active:
+                    collector.pieces.append(text)
+
+    # Pilha explícita: (elemento, fechando, coletores abertos por ele)
+    stack = [(root, False, None)]
+    while stack:
+        element, closing, opened = stack.pop()
+        if closing:
+            for collector in opened:
+                active.remove(collector)
+                kind = collector.kind
+                if kind == 'heading':
+                    text = ''.join(collector.pieces)
+                    if len(text) > 2:
+                        headings[collector.slot] = {'level': element.tag, 'text': text}
+                elif kind == 'p':
+                    text = ''.join(collector.pieces)
+                    if len(text) > 10:
+                        paragraphs[collector.slot] = text
+                elif kind == 'li':
+                    text = ''.join(collector.pieces)
+                    if len(text) > 3:
+                        for owner, slot in collector.items:
+                            owner.items[slot] = text
+                elif kind == 'list':
+                    open_lists.remove(collector)
+                    items = [item for item in collector.items if item is not None]
+                    if items:
+                        lists[collector.slot] = items
+                elif kind == 'semantic':
+                    in_semantic -= 1
+                    text = '\n'.join(collector.pieces)
+                    if len(text) > 50:
+                        semantic[collector.group][collector.slot] = text
+                elif kind == 'jurisprudence':
+                    in_jurisprudence -= 1
+                    text = '\n'.join(collector.pieces)
+                    if len(text) > 20:
+                        jurisprudence[collector.group][collector.slot] = text
+                elif kind == 'body':
+                    body_pieces = collector.pieces
+            emit(element.tail)
+            continue
+
+        tag = element.tag
+        if not isinstance(tag, str) or tag in _SKIPPED_TAGS:
+            # Comentários e elementos descartados: só o texto que vem depois deles conta
+            emit(element.tail)
+            continue
+
+        opened = []
+        if tag in HEADING_TAGS:
+            opened.append(_Collector('heading', len(headings)))
+            headings.append(None)
+        elif tag == 'p':
+            opened.append(_Collector('p', len(paragraphs)))
+            paragraphs.append(None)
+        elif tag == 'li' and open_lists:
+            item = _Collector('li')
+            for owner in open_lists:
+                item.items.append((owner, len(owner.items)))
+                owner.items.append(None)
+            opened.append(item)
+        elif tag in ('ul', 'ol'):
+            collector = _Collector('list', len(lists))
+            lists.append(None)
+            open_lists.append(collector)
+            opened.append(collector)
+        elif tag == 'body' and body_pieces is None and has_body:
+            opened.append(_Collector('body'))
+
+        if not in_semantic:
+            group = _match_semantic(tag, element)
+            if group is not None:
+                in_semantic += 1
+                opened.append(_Collector('semantic', len(semantic[group]), group))
+                semantic[group].append(None)
+        if not in_jurisprudence:
+            group = _match_jurisprudence(tag, element)
+            if group is not None:
+                in_jurisprudence += 1
+                opened.append(_Collector('jurisprudence', len(jurisprudence[group]), group))
+                jurisprudence[group].append(None)
+
+        active.extend(opened)
+        emit(element.text)
+        stack.append((element, True, opened))
+        stack.extend((child, False, None) for child in reversed(element))
+
+    extractions['headings'] = [h for h in headings if h is not None]
+    extractions['paragraphs'] = [p for p in paragraphs if p is not None]
+    extractions['lists'] = [items for items in lists if items is not None]
+    extractions['semantic_content'] = '\n\n'.join(t for group in semantic for t in group if t is not None)
+    extractions['jurisprudence_content'] = '\n\n'.join(t for group in jurisprudence for t in group if t is not None)
+    extractions['full_body_text'] = '\n'.join(body_pieces or [])
+    return extractions
+
+
+def extract_content(html_content: str) -> dict:
+    """Extrações do HTML: passada única com lxml quando disponível, senão BeautifulSoup"""
+    if lxml_available():
+        return extract_content_lxml(html_content)
+    return extract_content_bs4(html_content)
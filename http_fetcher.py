@@ -0,0 +1,310 @@
+"""
+Camada HTTP do scraper (antes do navegador)
+
+A maioria das páginas estáticas (ementas, acórdãos, notícias) vem completa em
+um GET simples. O scraper tenta primeiro um cliente aiohttp persistente
+(keep-alive, compressão, pool de conexões por host) e só escala para o
+Chromium do BrowserPool quando a resposta indica que a página precisa de
+JavaScript: desafio anti-bot, casca de SPA ou conteúdo ralo. A camada
+escolhida é lembrada por domínio para não repetir o GET inútil em sites que
+sempre exigem o navegador.
+"""
+
+import os
+import re
+import time
+import atexit
+import asyncio
+import logging
+import threading
+import importlib.util
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+from lazy_imports import lazy_import
+from browser_pool import USER_AGENT
+
+aiohttp = lazy_import("aiohttp", "aiohttp")
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TIER_HTTP = "http"
+TIER_BROWSER = "browser"
+
+
+def _accept_encoding() -> str:
+    # aiohttp descomprime gzip/deflate sozinho; br só com Brotli instalado
+    if importlib.util.find_spec("brotli") or importlib.util.find_spec("brotlicffi"):
+        return "gzip, deflate, br"
+    return "gzip, deflate"
+
+
+HTTP_HEADERS = {
+    'User-Agent': USER_AGENT,
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
+    'Accept-Encoding': _accept_encoding(),
+}
+
+# Marcadores de desafio anti-bot no HTML cru: a página real só aparece após JS
+CHALLENGE_MARKERS = (
+    'cf-browser-verification', 'challenge-platform', '__cf_chl', 'cf_chl_opt', 'cf-challenge',
+    'ddos-guard', '_incapsula_resource', 'px-captcha', 'captcha-delivery'
+)
+# Os mesmos indicadores de detect_cloudflare_protection, mas procurados só no
+# texto visível: no HTML cru "cloudflare" aparece em qualquer site que use o CDN
+CLOUDFLARE_TEXT_INDICATORS = (
+    'verifying you are human', 'just a moment', 'checking your browser',
+    'ddos protection', 'ray id', 'cloudflare'
+)
+JS_REQUIRED_PHRASES = (
+    'enable javascript', 'javascript is disabled', 'requires javascript',
+    'habilite o javascript', 'ative o javascript', 'javascript desabilitado'
+)
+# Contêiner vazio de SPA (React, Vue, Next, Nuxt, Angular)
+_SPA_SHELL = re.compile(
+    r'<(div|app-root)[^>]*\bid=["\']?(root|app|__next|__nuxt|main-app)["\']?[^>]*>\s*</\1>', re.IGNORECASE)
+_META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+_TITLE = re.compile(r'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+
+
+def url_domain(url: str) -> str:
+    host = urlsplit(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def html_title(html: str) -> str:
+    """Título do <title> do HTML cru"""
+    import html as html_lib
+    match = _TITLE.search(html or "")
+    return re.sub(r"\s+", " ", html_lib.unescape(match.group(1))).strip() if match else ""
+
+
+def needs_browser(response: Dict[str, Any], text: str, has_main_content: bool,
+                  min_text_chars: Optional[int] = None) -> Optional[str]:
+    """
+    Decide se uma resposta HTTP precisa ser recapturada no navegador.
+    Retorna o motivo da escalada ou None se o HTML já basta.
+
+    Args:
+        response: resultado de HTTPFetcher.fetch
+        text: texto visível extraído (full_body_text)
+        has_main_content: se process_content_extractions achou conteúdo principal
+    """
+    if min_text_chars is None:
+        min_text_chars = int(os.getenv("SCRAPER_MIN_HTTP_TEXT", "500"))
+    status = response['status']
+    if status >= 400:
+        return f"HTTP {status}"
+    if 'html' not in response['content_type']:
+        return f"conteúdo {response['content_type'] or 'desconhecido'}"
+
+    html_lower = response['html'][:200_000].lower()
+    text_lower = (text or "").lower()
+    if any(marker in html_lower for marker in CHALLENGE_MARKERS):
+        return "desafio anti-bot"
+    short = len(text_lower.strip()) < min_text_chars
+    if short and any(indicator in text_lower for indicator in CLOUDFLARE_TEXT_INDICATORS):
+        return "proteção Cloudflare"
+    if short and any(phrase in text_lower for phrase in JS_REQUIRED_PHRASES):
+        return "página exige JavaScript"
+    if short and _SPA_SHELL.search(response['html']):
+        return "casca de SPA"
+    if not has_main_content:
+        return "conteúdo ralo"
+    return None
+
+
+class DomainTierCache:
+    """
+    Camada (http ou browser) que funcionou por domínio. Domínios que exigem o
+    navegador voltam a ser testados via HTTP depois de ``ttl`` segundos.
+    """
+
+    def __init__(self, ttl: float = 6 * 3600):
+        self.ttl = ttl
+        self._tiers: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self.counters = {'http': 0, 'escalated': 0, 'browser_direct': 0}
+
+    def get(self, domain: str) -> Optional[str]:
+        with self._lock:
+            entry = self._tiers.get(domain)
+            if entry is None:
+                return None
+            tier, remembered_at = entry
+            if tier == TIER_BROWSER and time.monotonic() - remembered_at > self.ttl:
+                del self._tiers[domain]
+                return None
+            return tier
+
+    def remember(self, domain: str, tier: str):
+        with self._lock:
+            previous = self._tiers.get(domain)
+            self._tiers[domain] = (tier, time.monotonic())
+        if previous is None or previous[0] != tier:
+            logger.info(f"🧭 Camada de captura para {domain}: {tier}")
+
+    def count(self, event: str):
+        with self._lock:
+            self.counters[event] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            tiers = {domain: tier for domain, (tier, _) in self._tiers.items()}
+            return {
+                **self.counters,
+                'domains_http': sum(1 for t in tiers.values() if t == TIER_HTTP),
+                'domains_browser': sum(1 for t in tiers.values() if t == TIER_BROWSER),
+                'domains': tiers
+            }
+
+
+class HTTPFetcher:
+    """Cliente aiohttp persistente em loop próprio (a sessão vive entre capturas)"""
+
+    def __init__(self,
+                 timeout: float = 20.0,
+                 max_connections: int = 100,
+                 max_connections_per_host: int = 8,
+                 max_bytes: int = 10 * 1024 * 1024):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.max_bytes = max_bytes
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        self._session = None
+        self.stats_counters: Dict[str, Any] = {'requests': 0, 'errors': 0, 'bytes': 0, 'seconds': 0.0}
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._loop_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="http-fetcher", daemon=True).start()
+                    asyncio.run_coroutine_threadsafe(self._setup(), loop).result()
+                    self._loop = loop
+        return self._loop
+
+    async def _setup(self):
+        connector = aiohttp.TCPConnector(limit=self.max_connections,
+                                         limit_per_host=self.max_connections_per_host,
+                                         ttl_dns_cache=300, keepalive_timeout=30)
+        self._session = aiohttp.ClientSession(connector=connector, headers=HTTP_HEADERS,
+                                              timeout=aiohttp.ClientTimeout(total=self.timeout),
+                                              auto_decompress=True)
+
+    @staticmethod
+    def _decode(body: bytes, charset: Optional[str]) -> str:
+        if not charset:
+            match = _META_CHARSET.search(body[:4096])
+            charset = match.group(1).decode('ascii') if match else 'utf-8'
+        try:
+            return body.decode(charset, errors='replace')
+        except LookupError:
+            return body.decode('utf-8', errors='replace')
+
+    async def _fetch(self, url: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        self.stats_counters['requests'] += 1
+        try:
+            async with self._session.get(url, allow_redirects=True) as response:
+                chunks, size, truncated = [], 0, False
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size >= self.max_bytes:
+                        truncated = True
+                        break
+                body = b''.join(chunks)[:self.max_bytes]
+                result = {
+                    'status': response.status,
+                    'final_url': str(response.url),
+                    'content_type': response.headers.get('Content-Type', '').lower(),
+                    'html': self._decode(body, response.charset),
+                    'bytes': len(body),
+                    'truncated': truncated
+                }
+        except Exception:
+            self.stats_counters['errors'] += 1
+            raise
+        finally:
+            self.stats_counters['seconds'] += time.perf_counter() - started
+        self.stats_counters['bytes'] += result['bytes']
+        return result
+
+    async def fetch(self, url: str) -> Dict[str, Any]:
+        """GET de ``url`` na sessão persistente; pode ser aguardado de qualquer loop"""
+        loop = self._ensure_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            return await self._fetch(url)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._fetch(url), loop))
+
+    async def _close_session(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def close(self):
+        if self._loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close_session(), self._loop).result(timeout=10)
+        except Exception as e:
+            logger.debug(f"HTTPFetcher: erro ao encerrar: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.stats_counters['requests']
+        return {
+            **self.stats_counters,
+            'seconds': round(self.stats_counters['seconds'], 3),
+            'avg_ms': round(self.stats_counters['seconds'] / requests * 1000, 1) if requests else 0.0
+        }
+
+
+_http_fetcher: Optional[HTTPFetcher] = None
+_tier_cache: Optional[DomainTierCache] = None
+_fetch_lock = threading.Lock()
+
+
+def http_first_enabled() -> bool:
+    return os.getenv("SCRAPER_HTTP_FIRST", "true").lower() not in ("0", "false", "no")
+
+
+def get_http_fetcher() -> HTTPFetcher:
+    """Cliente compartilhado, configurado por SCRAPER_HTTP_TIMEOUT e SCRAPER_HTTP_MAX_CONNECTIONS"""
+    global _http_fetcher
+    if _http_fetcher is None:
+        with _fetch_lock:
+            if _http_fetcher is None:
+                _http_fetcher = HTTPFetcher(
+                    timeout=float(os.getenv("SCRAPER_HTTP_TIMEOUT", "20")),
+                    max_connections=int(os.getenv("SCRAPER_HTTP_MAX_CONNECTIONS", "100"))
+                )
+                atexit.register(_http_fetcher.close)
+    return _http_fetcher
+
+
+def get_tier_cache() -> DomainTierCache:
+    """Camadas lembradas por domínio (SCRAPER_TIER_TTL segundos para re-testar HTTP)"""
+    global _tier_cache
+    if _tier_cache is None:
+        with _fetch_lock:
+            if _tier_cache is None:
+                _tier_cache = DomainTierCache(ttl=float(os.getenv("SCRAPER_TIER_TTL", str(6 * 3600))))
+    return _tier_cache
+
+
+def fetch_tier_stats() -> Dict[str, Any]:
+    return {
+        'http_first': http_first_enabled(),
+        'tiers': get_tier_cache().stats(),
+        'http': _http_fetcher.stats() if _http_fetcher is not None else None
+    }
@@ -0,0 +1,402 @@
+"""
+Pipeline de ingestão em streaming com memória limitada
+Carregador de páginas → splitter → embedder → gravador no banco, com filas
+limitadas entre os estágios para que eles rodem sobrepostos (a página N+1 é
+lida enquanto os chunks da página N são vetorizados) sem acumular o
+documento inteiro na memória.
+"""
+
+import time
+import queue
+import logging
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Callable
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Marcador de fim de fluxo entre estágios
+_END = object()
+
+
+@dataclass
+class StageStats:
+    """Métricas de vazão de um estágio do pipeline"""
+    name: str
+    items: int = 0
+    busy_seconds: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'items': self.items,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'items_per_second': round(self.items / self.busy_seconds, 2) if self.busy_seconds else 0.0
+        }
+
+
+@dataclass
+class ChunkBatch:
+    """Lote de chunks de uma mesma fonte que trafega entre os estágios"""
+    source: str
+    file_type: str
+    texts: List[str]
+    embeddings: Optional[List[List[float]]] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+class PGChunkWriter:
+    """
+    Gravador do pipeline no PostgreSQL, com a mesma semântica de
+    ``PGVectorStore.upsert_document``: o documento é identificado por
+    (agente, fonte); reingerir a mesma fonte mantém os chunks inalterados,
+    insere só os novos e remove os que sumiram, e o ``content_hash`` é
+    gravado ao final. Uma transação por documento. Os chunks mantidos ainda
+    passam pelo estágio de vetorização, mas saem do cache de embeddings.
+    """
+
+    def __init__(self, agent_id: str, batch_size: Optional[int] = None):
+        self.agent_id = agent_id
+        self.batch_size = batch_size
+        self._conn = None
+        self._cur = None
+        self._source = None
+        self._document_id = None
+        self._existing: Dict[str, List[Any]] = {}
+        self._hasher = None
+        self._diff: Dict[str, int] = {}
+        self.documents: Dict[str, str] = {}
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+    def write(self, batch: ChunkBatch) -> int:
+        from vector_store import bulk_insert_chunks, chunk_hash
+
+        if batch.source != self._source:
+            self.finish_document()
+            self._begin_document(batch)
+
+        new_texts, new_embeddings = [], []
+        for text, embedding in zip(batch.texts, batch.embeddings or []):
+            if not text or not text.strip():
+                continue
+            self._hasher.update(("\x00" if self._diff['chunks'] else "").encode('utf-8') + text.encode('utf-8'))
+            self._diff['chunks'] += 1
+            ids = self._existing.get(chunk_hash(text))
+            if ids:
+                ids.pop()
+                self._diff['kept'] += 1
+            else:
+                new_texts.append(text)
+                new_embeddings.append(embedding)
+        if new_texts:
+            self._diff['added'] += bulk_insert_chunks(self._cur, self._document_id, self.agent_id,
+                                                      new_texts, new_embeddings, batch_size=self.batch_size)
+        return len(batch.texts)
+
+    def _begin_document(self, batch: ChunkBatch):
+        import hashlib
+        from database import Database
+
+        self._conn = Database.get_connection()
+        self._cur = self._conn.cursor()
+        self._cur.execute(
+            "SELECT id FROM documents WHERE agent_id = %s AND file_name = %s ORDER BY created_at LIMIT 1 FOR UPDATE",
+            (self.agent_id, batch.source)
+        )
+        row = self._cur.fetchone()
+        self._existing = {}
+        if row:
+            self._document_id = row[0]
+            self._cur.execute("SELECT id, md5(chunk_text) FROM document_chunks WHERE document_id = %s",
+                              (str(self._document_id),))
+            for chunk_id, digest in self._cur.fetchall():
+                self._existing.setdefault(digest, []).append(chunk_id)
+        else:
+            self._cur.execute(
+                "INSERT INTO documents (agent_id, file_name, source_type) VALUES (%s, %s, %s) RETURNING id",
+                (self.agent_id, batch.source, batch.file_type.lstrip('.') or 'file')
+            )
+            self._document_id = self._cur.fetchone()[0]
+        self._source = batch.source
+        self._hasher = hashlib.sha256()
+        self._diff = {'chunks': 0, 'kept': 0, 'added': 0, 'removed': 0, 'created': not row}
+
+    def finish_document(self):
+        """Remove os chunks que sumiram, grava o content_hash e confirma a transação"""
+        if self._conn is None:
+            return
+        try:
+            status = self._complete_document()
+            self._conn.commit()
+        except Exception:
+            self._conn.rollback()
+            self._release()
+            raise
+        self._invalidate_agent_indexes()
+        diff = self._diff
+        self.results[self._source] = {'document_id': self.documents[self._source], 'status': status,
+                                      'kept': diff['kept'], 'added': diff['added'], 'removed': diff['removed']}
+        logger.info(f"🔁 Pipeline: '{self._source}' {status} (+{diff['added']} / -{diff['removed']} / ={diff['kept']})")
+        self._release()
+
+    def _complete_document(self) -> str:
+        stale = [str(chunk_id) for ids in self._existing.values() for chunk_id in ids]
+        content_hash = self._hasher.hexdigest()
+
+        # Mesmo conteúdo já gravado sob outra fonte do agente (unicidade por agent_id + content_hash)
+        self._cur.execute(
+            "SELECT id FROM documents WHERE agent_id = %s AND content_hash = %s AND id <> %s LIMIT 1",
+            (self.agent_id, content_hash, self._document_id)
+        )
+        duplicate = self._cur.fetchone()
+        if duplicate:
+            self._cur.execute("DELETE FROM documents WHERE id = %s", (self._document_id,))
+            self._diff['removed'] = self._diff['kept'] + len(stale)
+            self._diff['kept'] = self._diff['added'] = 0
+            self.documents[self._source] = str(duplicate[0])
+            return 'unchanged'
+
+        if stale:
+            self._cur.execute("DELETE FROM document_chunks WHERE id = ANY(%s::uuid[])", (stale,))
+        self._diff['removed'] = len(stale)
+        self._cur.execute("UPDATE documents SET content_hash = %s WHERE id = %s", (content_hash, self._document_id))
+        self.documents[self._source] = str(self._document_id)
+        if self._diff['created']:
+            return 'created'
+        return 'updated' if self._diff['added'] or stale else 'unchanged'
+
+    def _invalidate_agent_indexes(self):
+        from local_ann_index import get_local_ann_index
+        from vector_index_manager import get_vector_index_manager
+
+        get_vector_index_manager().invalidate(self.agent_id)
+        local_index = get_local_ann_index()
+        if local_index:
+            local_index.invalidate(self.agent_id)
+
+    def _release(self):
+        from database import Database
+        try:
+            self._cur.close()
+        finally:
+            Database.release_connection(self._conn)
+            self._conn, self._cur, self._source = None, None, None
+
+    def abort(self):
+        """Desfaz a transação do documento corrente"""
+        if self._conn is None:
+            return
+        try:
+            self._conn.rollback()
+        finally:
+            self._release()
+
+
+class IngestionPipeline:
+    """
+    Pipeline de ingestão em streaming para um agente.
+
+    Cada estágio roda em sua própria thread e se comunica com o seguinte por
+    uma ``queue.Queue`` limitada; quando um estágio mais lento enche a fila, os
+    anteriores bloqueiam, mantendo o pico de memória constante.
+    """
+
+    def __init__(self,
+                 agent_id: str,
+                 document_loader=None,
+                 embed_fn: Optional[Callable[[List[str]], List[List[float]]]] = None,
+                 writer=None,
+                 queue_size: int = 4,
+                 embed_batch_size: int = 64):
+        if not agent_id:
+            raise ValueError("IngestionPipeline requer um agent_id.")
+        self.agent_id = agent_id
+        self.queue_size = queue_size
+        self.embed_batch_size = embed_batch_size
+
+        if document_loader is None:
+            from document_loader import DocumentLoader
+            document_loader = DocumentLoader()
+        self.document_loader = document_loader
+
+        if embed_fn is None:
+            from vector_store import PGVectorStore
+            embed_fn = PGVectorStore(agent_id=agent_id).embedding_function
+        self.embed_fn = embed_fn
+
+        self.writer = writer or PGChunkWriter(agent_id)
+
+    # --- Fontes de páginas --------------------------------------------------
+
+    def _iter_file_pages(self, paths: Iterable[Path], failures: List[Dict[str, str]],
+                         strict: bool = False) -> Iterator[Any]:
+        for path in paths:
+            try:
+                for page in self.document_loader.iter_pages(str(path)):
+                    yield page
+            except Exception as e:
+                if strict:
+                    raise
+                logger.warning(f"⚠️ Pipeline: erro ao ler {path}: {e}")
+                failures.append({'file': str(path), 'error': str(e)})
+
+    # --- Estágios -----------------------------------------------------------
+
+    def _run_stage(self, name: str, source: Iterator[Any], out_queue: "queue.Queue",
+                   stop: threading.Event, errors: List[BaseException],
+                   stats: Optional[StageStats] = None):
+        """
+        Consome ``source`` e publica na fila de saída. Com ``stats``, mede o
+        tempo gasto produzindo cada item (usado pelo estágio de leitura, que
+        não espera por fila de entrada).
+        """
+        try:
+            iterator = iter(source)
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    if stats is not None:
+                        stats.busy_seconds += time.perf_counter() - start
+                if stats is not None:
+                    stats.items += 1
+                self._put(out_queue, item, stop)
+        except BaseException as e:
+            logger.error(f"❌ Pipeline: falha no estágio '{name}': {e}", exc_info=True)
+            errors.append(e)
+            stop.set()
+        finally:
+            self._put(out_queue, _END, stop, force=True)
+
+    @staticmethod
+    def _put(out_queue: "queue.Queue", item: Any, stop: threading.Event, force: bool = False):
+        while True:
+            try:
+                out_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if stop.is_set() and not force:
+                    return
+                if stop.is_set():
+                    # Abrir espaço para o marcador de fim mesmo com o consumidor parado
+                    try:
+                        out_queue.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    @staticmethod
+    def _drain(in_queue: "queue.Queue") -> Iterator[Any]:
+        while True:
+            item = in_queue.get()
+            if item is _END:
+                return
+            yield item
+
+    def _split(self, pages: Iterator[Any], stats: StageStats) -> Iterator[ChunkBatch]:
+        """Divide as páginas e agrupa os chunks em lotes de uma mesma fonte"""
+        batch: Optional[ChunkBatch] = None
+        for page in pages:
+            source = page.metadata.get('source', 'desconhecido')
+            start = time.perf_counter()
+            chunks = self.document_loader.text_splitter.split_documents([page])
+            stats.busy_seconds += time.perf_counter() - start
+            stats.items += len(chunks)
+            for chunk in chunks:
+                text = chunk.page_content
+                if not text or not text.strip():
+                    continue
+                if batch is not None and (batch.source != source or len(batch.texts) >= self.embed_batch_size):
+                    yield batch
+                    batch = None
+                if batch is None:
+                    batch = ChunkBatch(source=source, file_type=page.metadata.get('file_type', ''), texts=[])
+                batch.texts.append(text)
+        if batch is not None:
+            yield batch
+
+    def _embed(self, batches: Iterator[ChunkBatch], stats: StageStats) -> Iterator[ChunkBatch]:
+        for batch in batches:
+            start = time.perf_counter()
+            batch.embeddings = self.embed_fn(batch.texts)
+            stats.busy_seconds += time.perf_counter() - start
+            stats.items += len(batch.texts)
+            yield batch
+
+    # --- Execução -----------------------------------------------------------
+
+    def run(self, pages: Iterable[Any], failures: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+        """Executa o pipeline sobre um iterável de páginas e retorna o relatório"""
+        failures = failures if failures is not None else []
+        stats = {name: StageStats(name) for name in ('load', 'split', 'embed', 'write')}
+        stop = threading.Event()
+        errors: List[BaseException] = []
+
+        pages_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        split_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        embed_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+
+        threads = [
+            threading.Thread(target=self._run_stage, name="ingest-load", daemon=True,
+                             args=('load', pages, pages_queue, stop, errors, stats['load'])),
+            threading.Thread(target=self._run_stage, name="ingest-split", daemon=True,
+                             args=('split', self._split(self._drain(pages_queue), stats['split']),
+                                   split_queue, stop, errors)),
+            threading.Thread(target=self._run_stage, name="ingest-embed", daemon=True,
+                             args=('embed', self._embed(self._drain(split_queue), stats['embed']),
+                                   embed_queue, stop, errors)),
+        ]
+
+        wall_start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        chunks_written = 0
+        try:
+            for batch in self._drain(embed_queue):
+                if stop.is_set():
+                    break
+                start = time.perf_counter()
+                chunks_written += self.writer.write(batch)
+                stats['write'].busy_seconds += time.perf_counter() - start
+                stats['write'].items += len(batch.texts)
+            if errors:
+                raise errors[0]
+            self.writer.finish_document()
+        except BaseException:
+            stop.set()
+            self.writer.abort()
+            raise
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join(timeout=5)
+
+        wall_seconds = time.perf_counter() - wall_start
+        report = {
+            'success': not failures,
+            'agent_id': self.agent_id,
+            'chunks_written': chunks_written,
+            'documents': dict(getattr(self.writer, 'documents', {})),
+            'sync': dict(getattr(self.writer, 'results', {})),
+            'failed_files': failures,
+            'wall_seconds': round(wall_seconds, 3),
+            'stages': {name: stat.to_dict() for name, stat in stats.items()}
+        }
+        logger.info(f"🚚 Pipeline: {chunks_written} chunks gravados em {wall_seconds:.2f}s | "
+                    + " | ".join(f"{name}: {s['items_per_second']}/s" for name, s in report['stages'].items()))
+        return report
+
+    def ingest_file(self, file_path: str) -> Dict[str, Any]:
+        """Ingere um arquivo em streaming"""
+        failures: List[Dict[str, str]] = []
+        return self.run(self._iter_file_pages([Path(file_path)], failures, strict=True), failures)
+
+    def ingest_directory(self, directory_path: str) -> Dict[str, Any]:
+        """Ingere todos os arquivos suportados de um diretório em streaming"""
+        failures: List[Dict[str, str]] = []
+        paths = self.document_loader.iter_supported_files(directory_path)
+        return self.run(self._iter_file_pages(paths, failures), failures)
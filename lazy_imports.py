@@ -0,0 +1,64 @@
+"""
+Importação preguiçosa de SDKs pesados
+
+``lazy_import("google.generativeai")`` devolve um proxy que só importa o
+módulo no primeiro acesso a um atributo. Assim, importar os módulos do sistema
+(e subir web_agent_manager, api_server ou os apps Streamlit) não carrega
+chromadb, LangChain, Playwright ou SDKs de provedores que ainda não foram usados.
+Se o pacote não estiver instalado, o ImportError aparece no primeiro uso, com
+a dica de instalação.
+"""
+
+import importlib
+import threading
+from typing import Any, Optional
+
+# Módulos que não devem ser carregados só por importar os pontos de entrada
+# (verificado por test_import_time.py)
+HEAVY_MODULES = (
+    "chromadb",
+    "langchain_community",
+    "langchain_openai",
+    "google.generativeai",
+    "playwright",
+    "psutil",
+)
+
+
+class LazyModule:
+    """Proxy de módulo importado no primeiro acesso a um atributo"""
+
+    def __init__(self, name: str, install_hint: Optional[str] = None):
+        self.__dict__.update(_name=name, _install_hint=install_hint, _module=None, _lock=threading.Lock())
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            with self._lock:
+                if self._module is None:
+                    try:
+                        self.__dict__['_module'] = importlib.import_module(self._name)
+                    except ImportError as e:
+                        hint = f" (instale com: pip install {self._install_hint})" if self._install_hint else ""
+                        raise ImportError(f"Módulo '{self._name}' indisponível{hint}: {e}") from e
+                module = self._module
+        return module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr: str, value: Any):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self) -> str:
+        state = "carregado" if self._module is not None else "não carregado"
+        return f"<LazyModule '{self._name}' ({state})>"
+
+
+def lazy_import(name: str, install_hint: Optional[str] = None) -> LazyModule:
+    """Proxy preguiçoso para o módulo ``name``"""
+    return LazyModule(name, install_hint)
@@ -4,17 +4,55 @@ Suporta OpenRouter, OpenAI e Google Gemini
 """
 
 import os
+import time
+import asyncio
 import logging
-from typing import Dict, Any, Optional, List
+import threading
+import weakref
+from typing import Dict, Any, Optional, List, AsyncIterator, Iterator, Tuple
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
+from functools import cached_property
 
-from openai import OpenAI
-import google.generativeai as genai
 import requests
 
+from lazy_imports import lazy_import
+
+# SDKs carregados só quando um provedor é usado pela primeira vez
+openai = lazy_import("openai", "openai")
+genai = lazy_import("google.generativeai", "google-generativeai")
+
 logger = logging.getLogger(__name__)
 
+# Tempo máximo padrão (segundos) de cada provedor em uma comparação multi-LLM
+DEFAULT_PROVIDER_TIMEOUT = float(os.getenv("LLM_PROVIDER_TIMEOUT", "60"))
+
+class _AsyncRunner:
+    """
+    Loop de eventos em uma thread dedicada para que código síncrono (Flask,
+    Streamlit) execute corrotinas sem criar um loop novo a cada chamada,
+    mantendo os pools de conexão dos clientes assíncronos aquecidos.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="llm-async", daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    def run(self, coro):
+        """Executa a corrotina no loop dedicado e bloqueia até o resultado"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+_async_runner = _AsyncRunner()
+
 @dataclass
 class ProviderConfig:
     """Configuração para um provedor de IA"""
@@ -25,16 +63,50 @@ class ProviderConfig:
     temperature: float = 0.7
     max_tokens: int = 1000
 
+def _iter_openai_stream(stream) -> Iterator[str]:
+    """Extrai o texto incremental de um stream de chat completions compatível com OpenAI"""
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        content = chunk.choices[0].delta.content
+        if content:
+            yield content
+
 class BaseLLMProvider(ABC):
     """Classe base abstrata para provedores de IA"""
     
     def __init__(self, config: ProviderConfig):
         self.config = config
+        # Clientes assíncronos ficam presos ao loop em que foram criados
+        self._async_clients = weakref.WeakKeyDictionary()
     
     @abstractmethod
     def generate_response(self, messages: List[Dict[str, str]], **kwargs) -> str:
         """Gera uma resposta baseada nas mensagens fornecidas"""
         pass
+
+    def stream_response(self, messages: List[Dict[str, str]], **kwargs) -> Iterator[str]:
+        """
+        Gera a resposta em pedaços (tokens) à medida que o modelo os produz.
+        Provedores sem suporte a streaming entregam a resposta inteira de uma vez.
+        """
+        yield self.generate_response(messages, **kwargs)
+
+    async def agenerate_response(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """
+        Versão assíncrona de ``generate_response``. Provedores sem cliente
+        assíncrono nativo executam a chamada síncrona em uma thread.
+        """
+        return await asyncio.to_thread(self.generate_response, messages, **kwargs)
+
+    def _get_async_openai_client(self, base_url: Optional[str] = None) -> "openai.AsyncOpenAI":
+        """Cliente AsyncOpenAI reaproveitado dentro do loop de eventos corrente"""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = openai.AsyncOpenAI(api_key=self.config.api_key, base_url=base_url)
+            self._async_clients[loop] = client
+        return client
     
     @abstractmethod
     def list_models(self) -> List[str]:
@@ -44,11 +116,11 @@ class BaseLLMProvider(ABC):
 class OpenRouterProvider(BaseLLMProvider):
     """Provedor OpenRouter - Acesso unificado a múltiplos modelos"""
     
-    def __init__(self, config: ProviderConfig):
-        super().__init__(config)
-        self.client = OpenAI(
+    @cached_property
+    def client(self) -> "openai.OpenAI":
+        return openai.OpenAI(
             base_url="https://openrouter.ai/api/v1",
-            api_key=config.api_key
+            api_key=self.config.api_key
         )
     
     def generate_response(self, messages: List[Dict[str, str]], **kwargs) -> str:
@@ -68,6 +140,44 @@ class OpenRouterProvider(BaseLLMProvider):
         except Exception as e:
             logger.error(f"Erro ao gerar resposta via OpenRouter: {e}")
             raise
+
+    def stream_response(self, messages: List[Dict[str, str]], **kwargs) -> Iterator[str]:
+        """Gera resposta usando OpenRouter em streaming"""
+        try:
+            stream = self.client.chat.completions.create(
+                model=kwargs.get('model', self.config.model_name),
+                messages=messages,
+                temperature=kwargs.get('temperature', self.config.temperature),
+                max_tokens=kwargs.get('max_tokens', self.config.max_tokens),
+                extra_headers={
+                    "HTTP-Referer": kwargs.get('site_url', 'http://localhost:3000'),
+                    "X-Title": kwargs.get('site_name', 'RAG Python System'),
+                },
+                stream=True
+            )
+            yield from _iter_openai_stream(stream)
+        except Exception as e:
+            logger.error(f"Erro ao gerar resposta via OpenRouter: {e}")
+            raise
+
+    async def agenerate_response(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """Gera resposta usando OpenRouter (assíncrono)"""
+        try:
+            client = self._get_async_openai_client("https://openrouter.ai/api/v1")
+            response = await client.chat.completions.create(
+                model=kwargs.get('model', self.config.model_name),
+                messages=messages,
+                temperature=kwargs.get('temperature', self.config.temperature),
+                max_tokens=kwargs.get('max_tokens', self.config.max_tokens),
+                extra_headers={
+                    "HTTP-Referer": kwargs.get('site_url', 'http://localhost:3000'),
+                    "X-Title": kwargs.get('site_name', 'RAG Python System'),
+                }
+            )
+            return response.choices[0].message.content
+        except Exception as e:
+            logger.error(f"Erro ao gerar resposta via OpenRouter: {e}")
+            raise
     
     def list_models(self) -> List[str]:
         """Lista modelos disponíveis no OpenRouter"""
@@ -87,11 +197,11 @@ class OpenRouterProvider(BaseLLMProvider):
 class OpenAIProvider(BaseLLMProvider):
     """Provedor OpenAI - Acesso direto aos modelos OpenAI"""
     
-    def __init__(self, config: ProviderConfig):
-        super().__init__(config)
-        self.client = OpenAI(
-            api_key=config.api_key,
-            base_url=config.base_url
+    @cached_property
+    def client(self) -> "openai.OpenAI":
+        return openai.OpenAI(
+            api_key=self.config.api_key,
+            base_url=self.config.base_url
         )
     
     def generate_response(self, messages: List[Dict[str, str]], **kwargs) -> str:
@@ -112,6 +222,44 @@ class OpenAIProvider(BaseLLMProvider):
         except Exception as e:
             logger.error(f"Erro ao gerar resposta via OpenAI: {e}")
             raise
+
+    def stream_response(self, messages: List[Dict[str, str]], **kwargs) -> Iterator[str]:
+        """Gera resposta usando OpenAI em streaming"""
+        try:
+            model = kwargs.get('model', self.config.model_name)
+            if not model or not model.strip():
+                model = self.config.model_name
+
+            stream = self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=kwargs.get('temperature', self.config.temperature),
+                max_tokens=kwargs.get('max_tokens', self.config.max_tokens),
+                stream=True
+            )
+            yield from _iter_openai_stream(stream)
+        except Exception as e:
+            logger.error(f"Erro ao gerar resposta via OpenAI: {e}")
+            raise
+
+    async def agenerate_response(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """Gera resposta usando OpenAI (assíncrono)"""
+        try:
+            model = kwargs.get('model', self.config.model_name)
+            if not model or not model.strip():
+                model = self.config.model_name
+
+            client = self._get_async_openai_client(self.config.base_url)
+            response = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=kwargs.get('temperature', self.config.temperature),
+                max_tokens=kwargs.get('max_tokens', self.config.max_tokens)
+            )
+            return response.choices[0].message.content
+        except Exception as e:
+            logger.error(f"Erro ao gerar resposta via OpenAI: {e}")
+            raise
     
     def list_models(self) -> List[str]:
         """Lista modelos disponíveis na OpenAI"""
@@ -125,10 +273,10 @@ class OpenAIProvider(BaseLLMProvider):
 class GoogleGeminiProvider(BaseLLMProvider):
     """Provedor Google Gemini"""
     
-    def __init__(self, config: ProviderConfig):
-        super().__init__(config)
-        genai.configure(api_key=config.api_key)
-        self.model = genai.GenerativeModel(config.model_name)
+    @cached_property
+    def model(self):
+        genai.configure(api_key=self.config.api_key)
+        return genai.GenerativeModel(self.config.model_name)
     
     def generate_response(self, messages: List[Dict[str, str]], **kwargs) -> str:
         """Gera resposta usando Google Gemini"""
@@ -147,6 +295,43 @@ class GoogleGeminiProvider(BaseLLMProvider):
         except Exception as e:
             logger.error(f"Erro ao gerar resposta via Google Gemini: {e}")
             raise
+
+    def stream_response(self, messages: List[Dict[str, str]], **kwargs) -> Iterator[str]:
+        """Gera resposta usando Google Gemini em streaming"""
+        try:
+            prompt = self._convert_messages_to_prompt(messages)
+
+            response = self.model.generate_content(
+                prompt,
+                generation_config=genai.types.GenerationConfig(
+                    temperature=kwargs.get('temperature', self.config.temperature),
+                    max_output_tokens=kwargs.get('max_tokens', self.config.max_tokens)
+                ),
+                stream=True
+            )
+            for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            logger.error(f"Erro ao gerar resposta via Google Gemini: {e}")
+            raise
+
+    async def agenerate_response(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """Gera resposta usando Google Gemini (assíncrono)"""
+        try:
+            prompt = self._convert_messages_to_prompt(messages)
+
+            response = await self.model.generate_content_async(
+                prompt,
+                generation_config=genai.types.GenerationConfig(
+                    temperature=kwargs.get('temperature', self.config.temperature),
+                    max_output_tokens=kwargs.get('max_tokens', self.config.max_tokens)
+                )
+            )
+            return response.text
+        except Exception as e:
+            logger.error(f"Erro ao gerar resposta via Google Gemini: {e}")
+            raise
     
     def _convert_messages_to_prompt(self, messages: List[Dict[str, str]]) -> str:
         """Converte mensagens do formato OpenAI para prompt do Gemini"""
@@ -176,11 +361,11 @@ class GoogleGeminiProvider(BaseLLMProvider):
 class DeepSeekProvider(BaseLLMProvider):
     """Provedor DeepSeek - Modelos chineses avançados"""
     
-    def __init__(self, config: ProviderConfig):
-        super().__init__(config)
-        self.client = OpenAI(
+    @cached_property
+    def client(self) -> "openai.OpenAI":
+        return openai.OpenAI(
             base_url="https://api.deepseek.com/v1",
-            api_key=config.api_key
+            api_key=self.config.api_key
         )
     
     def generate_response(self, messages: List[Dict[str, str]], **kwargs) -> str:
@@ -201,6 +386,45 @@ class DeepSeekProvider(BaseLLMProvider):
         except Exception as e:
             logger.error(f"Erro ao gerar resposta via DeepSeek: {e}")
             raise
+
+    def stream_response(self, messages: List[Dict[str, str]], **kwargs) -> Iterator[str]:
+        """Gera resposta usando DeepSeek em streaming"""
+        try:
+            model = kwargs.get('model', self.config.model_name)
+            if not model or not model.strip():
+                model = self.config.model_name
+
+            stream = self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=kwargs.get('temperature', self.config.temperature),
+                max_tokens=kwargs.get('max_tokens', self.config.max_tokens),
+                stream=True
+            )
+            yield from _iter_openai_stream(stream)
+        except Exception as e:
+            logger.error(f"Erro ao gerar resposta via DeepSeek: {e}")
+            raise
+
+    async def agenerate_response(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """Gera resposta usando DeepSeek (assíncrono)"""
+        try:
+            model = kwargs.get('model', self.config.model_name)
+            if not model or not model.strip():
+                model = self.config.model_name
+
+            client = self._get_async_openai_client("https://api.deepseek.com/v1")
+            response = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=kwargs.get('temperature', self.config.temperature),
+                max_tokens=kwargs.get('max_tokens', self.config.max_tokens),
+                stream=False
+            )
+            return response.choices[0].message.content
+        except Exception as e:
+            logger.error(f"Erro ao gerar resposta via DeepSeek: {e}")
+            raise
     
     def list_models(self) -> List[str]:
         """Lista modelos disponíveis no DeepSeek"""
@@ -327,6 +551,20 @@ class LLMProviderManager:
                 'response_time': 0
             }
     
+    def stream_response(self, messages: List[Dict[str, str]], provider_name: str = None, **kwargs) -> Iterator[str]:
+        """Gera resposta em streaming usando o provedor especificado ou ativo"""
+        if provider_name and provider_name in self.providers:
+            provider = self.providers[provider_name]
+        else:
+            provider = self.get_active_provider()
+            if not provider:
+                raise ValueError("Nenhum provedor de IA configurado")
+
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+
+        yield from provider.stream_response(messages, **kwargs)
+    
     def generate_response_old(self, messages: List[Dict[str, str]], **kwargs) -> str:
         """Gera resposta usando o provedor ativo (método legado)"""
         provider = self.get_active_provider()
@@ -363,44 +601,77 @@ class LLMProviderManager:
         
         return info
     
-    def compare_multi_llm(self, messages: List[Dict[str, str]], providers: Optional[List[str]] = None, **kwargs) -> Dict[str, Any]:
-        """Compara respostas de múltiplos LLMs simultaneamente"""
+    async def _timed_response(self, provider_name: str, messages: List[Dict[str, str]],
+                              timeout: float, **kwargs) -> Dict[str, Any]:
+        """Executa um provedor com limite de tempo e devolve o resultado no formato da comparação"""
+        provider = self.providers[provider_name]
+        start_time = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(provider.agenerate_response(messages, **kwargs), timeout=timeout)
+            return {
+                "response": response,
+                "success": True,
+                "duration": round(time.perf_counter() - start_time, 2),
+                "model": provider.config.model_name,
+                "provider_info": {
+                    "temperature": float(provider.config.temperature),
+                    "max_tokens": int(provider.config.max_tokens)
+                }
+            }
+        except asyncio.TimeoutError:
+            logger.warning(f"Provedor {provider_name} excedeu o tempo limite de {timeout}s")
+            error = f"Tempo limite de {timeout}s excedido"
+        except Exception as e:
+            logger.error(f"Erro ao testar {provider_name}: {e}")
+            error = str(e)
+        return {
+            "response": None,
+            "success": False,
+            "error": error,
+            "duration": round(time.perf_counter() - start_time, 2),
+            "model": provider.config.model_name
+        }
+
+    async def astream_multi_llm(self, messages: List[Dict[str, str]], providers: Optional[List[str]] = None,
+                                timeout: Optional[float] = None, timeouts: Optional[Dict[str, float]] = None,
+                                **kwargs) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Dispara todos os provedores ao mesmo tempo e entrega ``(provedor, resultado)``
+        na ordem em que as respostas chegam. ``timeouts`` permite um limite por provedor.
+        """
         if providers is None:
             providers = self.list_available_providers()
-        
+        timeout = timeout or DEFAULT_PROVIDER_TIMEOUT
+        timeouts = timeouts or {}
+
+        async def run(name: str):
+            return name, await self._timed_response(name, messages, timeouts.get(name, timeout), **kwargs)
+
+        tasks = [asyncio.ensure_future(run(name)) for name in providers if name in self.providers]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def acompare_multi_llm(self, messages: List[Dict[str, str]], providers: Optional[List[str]] = None,
+                                 timeout: Optional[float] = None, timeouts: Optional[Dict[str, float]] = None,
+                                 **kwargs) -> Dict[str, Any]:
+        """Compara respostas de múltiplos LLMs em paralelo; o custo é o do provedor mais lento"""
+        start_time = time.perf_counter()
         results = {}
-        
-        for provider_name in providers:
-            if provider_name in self.providers:
-                try:
-                    logger.info(f"Testando provedor: {provider_name}")
-                    start_time = __import__('time').time()
-                    
-                    response = self.providers[provider_name].generate_response(messages, **kwargs)
-                    
-                    end_time = __import__('time').time()
-                    
-                    results[provider_name] = {
-                        "response": response,
-                        "success": True,
-                        "duration": round(end_time - start_time, 2),
-                        "model": self.providers[provider_name].config.model_name,
-                        "provider_info": {
-                            "temperature": float(self.providers[provider_name].config.temperature),
-                            "max_tokens": int(self.providers[provider_name].config.max_tokens)
-                        }
-                    }
-                except Exception as e:
-                    logger.error(f"Erro ao testar {provider_name}: {e}")
-                    results[provider_name] = {
-                        "response": None,
-                        "success": False,
-                        "error": str(e),
-                        "duration": 0,
-                        "model": self.providers[provider_name].config.model_name
-                    }
-        
+        async for provider_name, result in self.astream_multi_llm(messages, providers, timeout, timeouts, **kwargs):
+            logger.info(f"Resposta de {provider_name} recebida em {result['duration']}s")
+            results[provider_name] = result
+        logger.info(f"Comparação multi-LLM concluída em {time.perf_counter() - start_time:.2f}s ({len(results)} provedores)")
         return results
+
+    def compare_multi_llm(self, messages: List[Dict[str, str]], providers: Optional[List[str]] = None,
+                          timeout: Optional[float] = None, timeouts: Optional[Dict[str, float]] = None,
+                          **kwargs) -> Dict[str, Any]:
+        """Compara respostas de múltiplos LLMs simultaneamente"""
+        return _async_runner.run(self.acompare_multi_llm(messages, providers, timeout, timeouts, **kwargs))
     
     def get_best_provider_for_task(self, task_type: str = "general") -> str:
         """Recomenda o melhor provedor para um tipo de tarefa"""
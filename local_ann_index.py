@@ -0,0 +1,354 @@
+"""
+Índice vetorial local (em processo) por agente, na frente do pgvector
+
+- Cada agente tem sua própria matriz float32 normalizada, carregada sob
+  demanda de ``document_chunks``; o PostgreSQL continua sendo a fonte da verdade
+- Agentes pequenos usam busca exata (um produto de matrizes); acima de
+  ``ivf_threshold`` chunks é montado um índice IVF (k-means esférico + nprobe)
+- A sincronia usa o contador de versão por agente da tabela
+  ``agent_chunk_versions`` (mantida por triggers); sem ela, usa a assinatura
+  ``count(*) + max(created_at)`` dos chunks do agente
+- Orçamento de memória com despejo LRU dos índices de agentes frios
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _parse_embedding(value) -> "np.ndarray":
+    """Converte o valor da coluna ``vector`` (ndarray via pgvector ou texto '[...]')"""
+    if isinstance(value, str):
+        return np.array(value.strip("[]").split(","), dtype=np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+
+def _normalize_rows(matrix: "np.ndarray") -> "np.ndarray":
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class AgentVectorIndex:
+    """Índice de similaridade de cosseno dos chunks de um agente"""
+
+    def __init__(self, ids: List[str], texts: List[str], embeddings, version: Any = None,
+                 ivf_threshold: int = 20000, nprobe: int = 8, kmeans_iterations: int = 10):
+        self.ids = list(ids)
+        self.texts = list(texts)
+        self.version = version
+        self.nprobe = nprobe
+        self.loaded_at = time.time()
+
+        if len(self.ids):
+            matrix = np.vstack([_parse_embedding(e) for e in embeddings]).astype(np.float32, copy=False)
+            self.matrix = np.ascontiguousarray(_normalize_rows(matrix))
+        else:
+            self.matrix = np.zeros((0, 0), dtype=np.float32)
+
+        self.centroids: Optional["np.ndarray"] = None
+        self.lists: List["np.ndarray"] = []
+        if len(self.ids) >= ivf_threshold:
+            self._build_ivf(kmeans_iterations)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def kind(self) -> str:
+        return "ivf" if self.centroids is not None else "exact"
+
+    @property
+    def nbytes(self) -> int:
+        """Memória aproximada ocupada pelo índice (vetores, listas IVF e textos)"""
+        total = self.matrix.nbytes + sum(len(text) for text in self.texts) + 64 * len(self.ids)
+        if self.centroids is not None:
+            total += self.centroids.nbytes + sum(lst.nbytes for lst in self.lists)
+        return total
+
+    def _assign(self, centroids: "np.ndarray", block: int = 8192) -> "np.ndarray":
+        """Centróide mais próximo de cada vetor, em blocos para limitar a memória"""
+        labels = np.empty(len(self.matrix), dtype=np.int32)
+        for start in range(0, len(self.matrix), block):
+            labels[start:start + block] = np.argmax(self.matrix[start:start + block] @ centroids.T, axis=1)
+        return labels
+
+    def _build_ivf(self, iterations: int):
+        start = time.perf_counter()
+        n = len(self.matrix)
+        nlist = max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(0)
+        sample = self.matrix[rng.choice(n, size=min(n, nlist * 256), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[labels == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            centroids = _normalize_rows(centroids)
+
+        labels = self._assign(centroids)
+        self.centroids = centroids.astype(np.float32)
+        self.lists = [np.flatnonzero(labels == c) for c in range(nlist)]
+        logger.info(f"🧭 AgentVectorIndex: IVF com {nlist} listas para {n} chunks "
+                    f"em {time.perf_counter() - start:.2f}s")
+
+    def search(self, query_embedding, k: int = 5) -> List[Tuple[str, str, float]]:
+        """Retorna ``(chunk_id, chunk_text, similaridade)`` dos ``k`` chunks mais próximos"""
+        if not len(self.ids) or k <= 0:
+            return []
+        query = _parse_embedding(query_embedding)
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        if self.centroids is None:
+            candidates = None
+            scores = self.matrix @ query
+        else:
+            # Sonda as nprobe listas mais próximas e continua até reunir k candidatos
+            # (listas vazias ou pequenas); no limite, todas as listas = busca exata
+            order = np.argsort(self.centroids @ query)[::-1]
+            sizes = np.cumsum([len(self.lists[c]) for c in order])
+            nprobe = max(self.nprobe, int(np.searchsorted(sizes, min(k, sizes[-1]))) + 1)
+            candidates = np.concatenate([self.lists[c] for c in order[:nprobe]])
+            scores = self.matrix[candidates] @ query
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        positions = top if candidates is None else candidates[top]
+        return [(self.ids[p], self.texts[p], float(s)) for p, s in zip(positions, scores[top])]
+
+
+_version_table_available = True
+
+
+def _fetch_agent_version(agent_id: str) -> Any:
+    """Versão atual dos chunks do agente no PostgreSQL"""
+    global _version_table_available
+    from database import Database
+
+    conn = Database.get_connection()
+    try:
+        with conn.cursor() as cur:
+            if _version_table_available:
+                try:
+                    cur.execute("SELECT version FROM agent_chunk_versions WHERE agent_id = %s", (agent_id,))
+                    row = cur.fetchone()
+                    return ("v", row[0] if row else 0)
+                except Exception as e:
+                    # Banco sem os triggers de versão: passa a usar a assinatura dos chunks
+                    conn.rollback()
+                    _version_table_available = False
+                    logger.warning(f"⚠️ LocalANN: tabela agent_chunk_versions indisponível ({e}); "
+                                   f"usando count/max(created_at) como versão")
+                cur.execute("SELECT count(*), max(created_at) FROM document_chunks WHERE agent_id = %s",
+                            (agent_id,))
+                count, last_created = cur.fetchone()
+                return ("sig", count, str(last_created))
+    finally:
+        conn.rollback()
+        Database.release_connection(conn)
+
+
+def _load_agent_chunks(agent_id: str) -> Tuple[List[str], List[str], List[Any]]:
+    """Lê ids, textos e embeddings de todos os chunks do agente"""
+    from database import Database
+
+    conn = Database.get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id, chunk_text, embedding FROM document_chunks WHERE agent_id = %s", (agent_id,))
+            rows = cur.fetchall()
+        return [str(r[0]) for r in rows], [r[1] for r in rows], [r[2] for r in rows]
+    finally:
+        conn.rollback()
+        Database.release_connection(conn)
+
+
+class LocalANNIndexManager:
+    """Mantém os índices locais dos agentes em cache LRU com orçamento de memória"""
+
+    def __init__(self,
+                 memory_budget_mb: float = 512,
+                 version_check_interval: float = 2.0,
+                 ivf_threshold: int = 20000,
+                 nprobe: int = 8,
+                 loader: Optional[Callable[[str], Tuple[List[str], List[str], List[Any]]]] = None,
+                 version_fn: Optional[Callable[[str], Any]] = None):
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.version_check_interval = version_check_interval
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self._loader = loader or _load_agent_chunks
+        self._version_fn = version_fn or _fetch_agent_version
+
+        self._lock = threading.Lock()
+        self._indexes: "OrderedDict[str, AgentVectorIndex]" = OrderedDict()
+        self._checked_at: Dict[str, float] = {}
+        self._agent_locks: Dict[str, threading.Lock] = {}
+
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.total_search_time = 0.0
+        self.searches = 0
+
+    @property
+    def memory_used(self) -> int:
+        return sum(index.nbytes for index in self._indexes.values())
+
+    def _agent_lock(self, agent_id: str) -> threading.Lock:
+        with self._lock:
+            return self._agent_locks.setdefault(agent_id, threading.Lock())
+
+    def _drop_agent_lock_locked(self, agent_id: str):
+        """Remove o lock de carregamento de um agente sem índice (se nenhum carregamento o usa)"""
+        lock = self._agent_locks.get(agent_id)
+        if lock is not None and not lock.locked():
+            del self._agent_locks[agent_id]
+
+    def _fresh_index(self, agent_id: str) -> Optional[AgentVectorIndex]:
+        """Índice em cache se ainda válido (a versão é consultada no máximo a cada intervalo)"""
+        with self._lock:
+            index = self._indexes.get(agent_id)
+            if index is None:
+                return None
+            if time.monotonic() - self._checked_at.get(agent_id, 0) < self.version_check_interval:
+                self._indexes.move_to_end(agent_id)
+                return index
+
+        version = self._version_fn(agent_id)
+        with self._lock:
+            if self._indexes.get(agent_id) is not index:
+                return None
+            if version != index.version:
+                self._indexes.pop(agent_id, None)
+                return None
+            self._checked_at[agent_id] = time.monotonic()
+            self._indexes.move_to_end(agent_id)
+            return index
+
+    def get_index(self, agent_id: str) -> AgentVectorIndex:
+        """Retorna o índice do agente, carregando-o do PostgreSQL se preciso"""
+        index = self._fresh_index(agent_id)
+        if index is not None:
+            self.hits += 1
+            return index
+
+        # Um único carregamento por agente, mesmo com buscas simultâneas
+        with self._agent_lock(agent_id):
+            index = self._fresh_index(agent_id)
+            if index is not None:
+                self.hits += 1
+                return index
+
+            start = time.perf_counter()
+            version = self._version_fn(agent_id)
+            ids, texts, embeddings = self._loader(agent_id)
+            index = AgentVectorIndex(ids, texts, embeddings, version=version,
+                                     ivf_threshold=self.ivf_threshold, nprobe=self.nprobe)
+            self.loads += 1
+            logger.info(f"📥 LocalANN: índice {index.kind} do agente {agent_id} carregado "
+                        f"({len(index)} chunks, {index.nbytes / 1024 / 1024:.1f} MB) "
+                        f"em {time.perf_counter() - start:.2f}s")
+
+            with self._lock:
+                self._indexes[agent_id] = index
+                self._checked_at[agent_id] = time.monotonic()
+                self._evict_locked(keep=agent_id)
+            return index
+
+    def _evict_locked(self, keep: Optional[str] = None):
+        used = self.memory_used
+        while used > self.memory_budget and len(self._indexes) > 1:
+            agent_id, index = next(iter(self._indexes.items()))
+            if agent_id == keep:
+                break
+            self._indexes.pop(agent_id)
+            self._checked_at.pop(agent_id, None)
+            self._drop_agent_lock_locked(agent_id)
+            used -= index.nbytes
+            self.evictions += 1
+            logger.info(f"🧹 LocalANN: índice do agente {agent_id} despejado (LRU)")
+
+    def search(self, agent_id: str, query_embedding, k: int = 5) -> List[Tuple[str, str, float]]:
+        """Top-k local do agente: ``(chunk_id, chunk_text, similaridade)``"""
+        index = self.get_index(agent_id)
+        start = time.perf_counter()
+        results = index.search(query_embedding, k)
+        with self._lock:
+            self.searches += 1
+            self.total_search_time += time.perf_counter() - start
+        return results
+
+    def invalidate(self, agent_id: Optional[str] = None):
+        """Descarta o índice do agente (ou todos) após escritas locais"""
+        with self._lock:
+            if agent_id is None:
+                self._indexes.clear()
+                self._checked_at.clear()
+                for agent in list(self._agent_locks):
+                    self._drop_agent_lock_locked(agent)
+            else:
+                self._indexes.pop(agent_id, None)
+                self._checked_at.pop(agent_id, None)
+                self._drop_agent_lock_locked(agent_id)
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "agents_loaded": len(self._indexes),
+                "memory_used_mb": round(self.memory_used / 1024 / 1024, 2),
+                "memory_budget_mb": round(self.memory_budget / 1024 / 1024, 2),
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "avg_search_us": round(self.total_search_time / self.searches * 1e6, 1) if self.searches else 0.0,
+                "indexes": {agent_id: {"chunks": len(index), "kind": index.kind}
+                            for agent_id, index in self._indexes.items()}
+            }
+
+
+_manager: Optional[LocalANNIndexManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_local_ann_index() -> Optional[LocalANNIndexManager]:
+    """
+    Retorna o gerenciador compartilhado de índices locais, ou None se desativado
+    (LOCAL_ANN_ENABLED diferente de true) ou se o NumPy não estiver instalado.
+    """
+    global _manager
+    if os.getenv("LOCAL_ANN_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+    if not NUMPY_AVAILABLE:
+        logger.warning("⚠️ LocalANN: NumPy não instalado; usando apenas o pgvector")
+        return None
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = LocalANNIndexManager(
+                    memory_budget_mb=float(os.getenv("LOCAL_ANN_MEMORY_MB", "512")),
+                    version_check_interval=float(os.getenv("LOCAL_ANN_VERSION_CHECK_SECONDS", "2")),
+                    ivf_threshold=int(os.getenv("LOCAL_ANN_IVF_THRESHOLD", "20000")),
+                    nprobe=int(os.getenv("LOCAL_ANN_NPROBE", "8"))
+                )
+    return _manager
@@ -0,0 +1,254 @@
+"""
+Motor de busca em memória para os modos locais (apps Streamlit)
+
+- Documentos são divididos em chunks e os embeddings ficam em uma única matriz
+  NumPy float32 contígua, com um array de ids de documento por linha
+- Top-k com um único produto matriz-vetor + ``argpartition``
+- Inclusão e remoção incrementais: a matriz cresce por dobra de capacidade e
+  linhas removidas são marcadas como livres e reaproveitadas (sem reconstrução)
+- Embeddings locais por hashing de palavras (sem API) por padrão, ou os da
+  OpenAI com MEMORY_SEARCH_BACKEND=openai
+"""
+
+import os
+import re
+import zlib
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+    """Divide o texto em chunks com sobreposição, quebrando em fronteira de palavra"""
+    text = text.strip()
+    if len(text) <= chunk_size:
+        return [text] if text else []
+
+    chunks, start = [], 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            last_space = text.rfind(" ", start + chunk_size // 2, end)
+            if last_space > 0:
+                end = last_space
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+def hashing_embeddings(texts: List[str], dim: int = 1024) -> np.ndarray:
+    """
+    Embeddings locais por "hashing trick" de palavras e pares de palavras
+    (crc32, estável entre processos), com peso sublinear de frequência.
+    """
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = _TOKEN_RE.findall(text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        if not features:
+            continue
+        buckets = np.fromiter((zlib.crc32(f.encode("utf-8")) % dim for f in features),
+                              dtype=np.int64, count=len(features))
+        np.add.at(matrix[row], buckets, 1.0)
+        np.log1p(matrix[row], out=matrix[row])
+    return matrix
+
+
+def default_embed_fn() -> Callable[[List[str]], Any]:
+    """Função de embedding configurada por MEMORY_SEARCH_BACKEND (hashing|openai)"""
+    if os.getenv("MEMORY_SEARCH_BACKEND", "hashing").lower() == "openai":
+        from embedding_engine import get_embedding_engine, DEFAULT_EMBEDDING_MODEL
+        from embedding_cache import get_embedding_cache
+
+        engine, cache = get_embedding_engine(), get_embedding_cache()
+        return lambda texts: cache.get_or_compute(texts, DEFAULT_EMBEDDING_MODEL,
+                                                  lambda missing: engine.embed_texts(missing))
+    return hashing_embeddings
+
+
+class InMemorySearchEngine:
+    """Índice vetorial em memória de documentos carregados localmente"""
+
+    def __init__(self,
+                 embed_fn: Optional[Callable[[List[str]], Any]] = None,
+                 chunk_size: int = 1000,
+                 chunk_overlap: int = 200,
+                 initial_capacity: int = 1024):
+        self._embed_fn = embed_fn or default_embed_fn()
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self._initial_capacity = initial_capacity
+
+        self._lock = threading.RLock()
+        self._matrix: Optional[np.ndarray] = None
+        self._doc_ids = np.full(0, -1, dtype=np.int64)
+        self._alive = np.zeros(0, dtype=bool)
+        self._texts: List[Optional[str]] = []
+        self._size = 0
+        self._free: List[int] = []
+
+        self._next_doc_id = 0
+        self._documents: Dict[int, Dict[str, Any]] = {}
+        self._rows_by_doc: Dict[int, np.ndarray] = {}
+
+    # --- Armazenamento ------------------------------------------------------
+
+    def _ensure_capacity(self, needed: int, dim: int):
+        if self._matrix is None:
+            capacity = max(self._initial_capacity, needed)
+            self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+            self._doc_ids = np.full(capacity, -1, dtype=np.int64)
+            self._alive = np.zeros(capacity, dtype=bool)
+            return
+        if self._matrix.shape[1] != dim:
+            raise ValueError(f"Dimensão do embedding ({dim}) difere da do índice ({self._matrix.shape[1]})")
+        capacity = len(self._matrix)
+        if self._size + needed <= capacity:
+            return
+        # Crescimento amortizado: copia só quando a capacidade dobra
+        while capacity < self._size + needed:
+            capacity *= 2
+        matrix = np.zeros((capacity, dim), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        doc_ids = np.full(capacity, -1, dtype=np.int64)
+        doc_ids[:self._size] = self._doc_ids[:self._size]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        self._matrix, self._doc_ids, self._alive = matrix, doc_ids, alive
+
+    def _allocate_rows(self, count: int, dim: int) -> np.ndarray:
+        reused = [self._free.pop() for _ in range(min(count, len(self._free)))]
+        fresh = count - len(reused)
+        self._ensure_capacity(fresh, dim)
+        rows = reused + list(range(self._size, self._size + fresh))
+        self._size += fresh
+        self._texts.extend([None] * fresh)
+        return np.array(rows, dtype=np.int64)
+
+    # --- API ----------------------------------------------------------------
+
+    def add_document(self, content: str, source: str, **metadata) -> int:
+        """Divide, vetoriza e indexa o documento; retorna o id do documento"""
+        chunks = chunk_text(content, self.chunk_size, self.chunk_overlap)
+        if not chunks:
+            raise ValueError(f"Documento vazio: {source}")
+
+        vectors = np.asarray(self._embed_fn(chunks), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors = vectors / norms
+
+        with self._lock:
+            doc_id = self._next_doc_id
+            self._next_doc_id += 1
+            rows = self._allocate_rows(len(chunks), vectors.shape[1])
+            self._matrix[rows] = vectors
+            self._doc_ids[rows] = doc_id
+            self._alive[rows] = True
+            for row, chunk in zip(rows, chunks):
+                self._texts[row] = chunk
+            self._rows_by_doc[doc_id] = rows
+            self._documents[doc_id] = {
+                'id': doc_id,
+                'source': source,
+                'content': content,
+                'chunk_count': len(chunks),
+                'timestamp': datetime.now().isoformat(),
+                **metadata
+            }
+        logger.info(f"📥 InMemorySearch: '{source}' indexado em {len(chunks)} chunks")
+        return doc_id
+
+    def remove_document(self, doc_id: int) -> bool:
+        """Remove o documento; suas linhas ficam livres para os próximos inserts"""
+        with self._lock:
+            rows = self._rows_by_doc.pop(doc_id, None)
+            if rows is None:
+                return False
+            self._documents.pop(doc_id, None)
+            self._alive[rows] = False
+            self._doc_ids[rows] = -1
+            self._matrix[rows] = 0.0
+            for row in rows:
+                self._texts[row] = None
+            self._free.extend(int(row) for row in rows)
+        return True
+
+    def search(self, query: str, k: int = 4, where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Top-k chunks por similaridade de cosseno. ``where`` filtra por
+        metadados do documento (ex: ``{'agent_id': '...'}``).
+        """
+        if not self._rows_by_doc:
+            return []
+        query_vector = np.asarray(self._embed_fn([query]), dtype=np.float32)[0]
+        query_vector = query_vector / (np.linalg.norm(query_vector) or 1.0)
+
+        with self._lock:
+            if self._matrix is None or not self._rows_by_doc:
+                return []
+            scores = self._matrix[:self._size] @ query_vector
+            mask = self._alive[:self._size].copy()
+            if where:
+                allowed = [doc_id for doc_id, doc in self._documents.items()
+                           if all(doc.get(key) == value for key, value in where.items())]
+                mask &= np.isin(self._doc_ids[:self._size], allowed)
+            candidates = np.flatnonzero(mask)
+            if not len(candidates):
+                return []
+
+            candidate_scores = scores[candidates]
+            k = min(k, len(candidates))
+            top = np.argpartition(-candidate_scores, k - 1)[:k]
+            top = top[np.argsort(-candidate_scores[top])]
+
+            results = []
+            for position in top:
+                row = candidates[position]
+                doc = self._documents[int(self._doc_ids[row])]
+                results.append({
+                    'content': self._texts[row],
+                    'score': float(candidate_scores[position]),
+                    'metadata': {key: value for key, value in doc.items() if key != 'content'}
+                })
+            return results
+
+    def list_documents(self, **where) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [doc for doc in self._documents.values()
+                    if all(doc.get(key) == value for key, value in where.items())]
+
+    def clear(self):
+        with self._lock:
+            self._matrix = None
+            self._doc_ids = np.full(0, -1, dtype=np.int64)
+            self._alive = np.zeros(0, dtype=bool)
+            self._texts, self._free = [], []
+            self._size = 0
+            self._documents.clear()
+            self._rows_by_doc.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'documents': len(self._documents),
+                'chunks': int(self._alive[:self._size].sum()) if self._size else 0,
+                'capacity': len(self._matrix) if self._matrix is not None else 0,
+                'free_rows': len(self._free),
+                'memory_mb': round(self._matrix.nbytes / 1024 / 1024, 2) if self._matrix is not None else 0.0
+            }
+
+    def __len__(self) -> int:
+        return len(self._documents)
@@ -1,7 +1,8 @@
 import sqlite3
 import json
+import threading
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 class MetricsCollector:
     """Coleta e armazena métricas do sistema"""
@@ -48,6 +49,152 @@ class MetricsCollector:
         conn.commit()
         conn.close()
     
+    def record_llm_stream(self, provider: str, model: str, time_to_first_token: Optional[float],
+                          total_time: float, success: bool, token_count: int = None, metadata: Dict = None):
+        """Registra uma resposta em streaming com o tempo até o primeiro token"""
+        metadata = dict(metadata or {})
+        metadata['time_to_first_token'] = time_to_first_token
+        conn = sqlite3.connect(self.db_file)
+        conn.execute("""
+            INSERT INTO metrics (event_type, provider, model, response_time, token_count, success, metadata)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (
+            'llm_stream',
+            provider,
+            model,
+            total_time,
+            token_count,
+            success,
+            json.dumps(metadata)
+        ))
+        conn.commit()
+        conn.close()
+    
+    def get_stream_stats(self, hours: int = 24) -> Dict[str, Any]:
+        """Tempo médio até o primeiro token e tempo total das respostas em streaming"""
+        conn = sqlite3.connect(self.db_file)
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT provider, COUNT(*) as streams,
+                   AVG(json_extract(metadata, '$.time_to_first_token')) as avg_ttft,
+                   AVG(response_time) as avg_total
+            FROM metrics
+            WHERE event_type = 'llm_stream' AND timestamp > datetime('now', '-{} hours')
+            GROUP BY provider
+        """.format(hours))
+        
+        stats = {}
+        for provider, streams, avg_ttft, avg_total in cursor.fetchall():
+            stats[provider] = {
+                'streams': streams,
+                'avg_time_to_first_token': round(avg_ttft, 3) if avg_ttft is not None else None,
+                'avg_total_time': round(avg_total, 2) if avg_total else 0
+            }
+        
+        conn.close()
+        return stats
+    
+    def record_cache_event(self, cache: str, outcome: str, latency_saved: float = 0.0):
+        """Registra um acerto/erro de cache e a latência economizada no acerto"""
+        conn = sqlite3.connect(self.db_file)
+        conn.execute("""
+            INSERT INTO metrics (event_type, provider, model, response_time, success, metadata)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (
+            'cache',
+            cache,
+            outcome,
+            latency_saved,
+            outcome != 'miss',
+            None
+        ))
+        conn.commit()
+        conn.close()
+    
+    def get_cache_stats(self, hours: int = 24) -> Dict[str, Any]:
+        """Taxa de acerto por nível e latência economizada de cada cache"""
+        conn = sqlite3.connect(self.db_file)
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT provider, model, COUNT(*), COALESCE(SUM(response_time), 0)
+            FROM metrics
+            WHERE event_type = 'cache' AND timestamp > datetime('now', '-{} hours')
+            GROUP BY provider, model
+        """.format(hours))
+        
+        stats: Dict[str, Any] = {}
+        for cache, outcome, count, saved in cursor.fetchall():
+            entry = stats.setdefault(cache, {'lookups': 0, 'hits': 0, 'latency_saved_seconds': 0.0, 'by_outcome': {}})
+            entry['lookups'] += count
+            entry['by_outcome'][outcome] = count
+            if outcome != 'miss':
+                entry['hits'] += count
+            entry['latency_saved_seconds'] = round(entry['latency_saved_seconds'] + saved, 2)
+        for entry in stats.values():
+            entry['hit_rate'] = round(entry['hits'] / entry['lookups'] * 100, 2) if entry['lookups'] else 0.0
+        
+        conn.close()
+        return stats
+    
+    def record_rerank(self, stats: Dict[str, Any]):
+        """Registra uma execução do reranker (latência, candidatos pontuados e scores)"""
+        conn = sqlite3.connect(self.db_file)
+        conn.execute("""
+            INSERT INTO metrics (event_type, provider, model, response_time, success, metadata)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (
+            'rerank',
+            stats.get('scorer'),
+            None,
+            stats.get('latency_ms', 0) / 1000.0,
+            not stats.get('budget_exhausted', False),
+            json.dumps(stats)
+        ))
+        conn.commit()
+        conn.close()
+    
+    def get_rerank_stats(self, hours: int = 24) -> Dict[str, Any]:
+        """Latência, estouro de orçamento e mudanças no top-k por scorer de reranking"""
+        conn = sqlite3.connect(self.db_file)
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT provider, response_time * 1000, success, metadata
+            FROM metrics
+            WHERE event_type = 'rerank' AND timestamp > datetime('now', '-{} hours')
+        """.format(hours))
+        
+        grouped: Dict[str, list] = {}
+        for scorer, latency_ms, within_budget, metadata in cursor.fetchall():
+            grouped.setdefault(scorer, []).append((latency_ms, within_budget, json.loads(metadata or '{}')))
+        conn.close()
+        
+        stats = {}
+        for scorer, rows in grouped.items():
+            latencies = sorted(row[0] for row in rows)
+            changed = [row[2].get('top_k_changed', 0) for row in rows]
+            top_scores = [row[2]['score_max'] for row in rows if row[2].get('score_max') is not None]
+            avg_latency = sum(latencies) / len(latencies)
+            stats[scorer] = {
+                'calls': len(rows),
+                'avg_latency_ms': round(avg_latency, 2),
+                'p95_latency_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+                'budget_exhausted_rate': round(sum(1 for row in rows if not row[1]) / len(rows) * 100, 2),
+                'avg_scored_fraction': round(sum(row[2].get('scored', 0) / max(row[2].get('candidates', 1), 1)
+                                                 for row in rows) / len(rows), 3),
+                'avg_top_k_changed': round(sum(changed) / len(changed), 2),
+                # Chunks novos no top-k por milissegundo de reranking
+                'top_k_changed_per_ms': round(sum(changed) / len(changed) / avg_latency, 4) if avg_latency else None,
+                'top_score': {
+                    'min': round(min(top_scores), 4),
+                    'avg': round(sum(top_scores) / len(top_scores), 4),
+                    'max': round(max(top_scores), 4)
+                } if top_scores else None
+            }
+        return stats
+    
     def get_stats(self, hours: int = 24) -> Dict[str, Any]:
         """Obtém estatísticas das últimas horas"""
         conn = sqlite3.connect(self.db_file)
@@ -72,3 +219,15 @@ class MetricsCollector:
         
         conn.close()
         return stats
+
+_collector: Optional[MetricsCollector] = None
+_collector_lock = threading.Lock()
+
+def get_metrics_collector() -> MetricsCollector:
+    """Retorna o coletor de métricas compartilhado pelo processo"""
+    global _collector
+    if _collector is None:
+        with _collector_lock:
+            if _collector is None:
+                _collector = MetricsCollector()
+    return _collector
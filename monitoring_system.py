@@ -7,7 +7,6 @@ Coleta métricas, logs e monitora performance do sistema
 import os
 import sys
 import time
-import psutil
 import logging
 import json
 from datetime import datetime, timedelta
@@ -18,6 +17,10 @@ import threading
 from functools import wraps
 import sqlite3
 
+from lazy_imports import lazy_import
+
+psutil = lazy_import("psutil", "psutil")
+
 # Configuração de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -369,13 +372,32 @@ def monitor_performance(operation_name: str = None):
         return wrapper
     return decorator
 
-# Instância global do coletor de métricas
-metrics_collector = MetricsCollector()
+# Instância global do coletor de métricas, criada no primeiro uso
+# (o construtor cria o schema SQLite; importar o módulo não deve fazê-lo)
+_metrics_collector: Optional[MetricsCollector] = None
+_metrics_collector_lock = threading.Lock()
+
+
+def get_metrics_collector() -> MetricsCollector:
+    global _metrics_collector
+    if _metrics_collector is None:
+        with _metrics_collector_lock:
+            if _metrics_collector is None:
+                _metrics_collector = MetricsCollector()
+    return _metrics_collector
+
+
+def __getattr__(name: str):
+    # Compatibilidade com ``from monitoring_system import metrics_collector``
+    if name == "metrics_collector":
+        return get_metrics_collector()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def get_system_health() -> Dict[str, Any]:
     """Retorna status de saúde do sistema"""
     try:
         # Métricas atuais
+        metrics_collector = get_metrics_collector()
         current_metrics = metrics_collector.collect_system_metrics()
         
         # Determina status de saúde
@@ -419,6 +441,8 @@ if __name__ == "__main__":
     print("🔍 Sistema de Monitoramento - RAG Python v1.3.0")
     print("=" * 50)
     
+    metrics_collector = get_metrics_collector()
+
     # Inicia monitoramento
     metrics_collector.start_monitoring(interval=10)
     
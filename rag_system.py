@@ -5,7 +5,9 @@ Combina busca de documentos com geração de texto usando IA
 
 import logging
 import os
-from typing import List, Dict, Any, Optional
+import time
+from functools import cached_property
+from typing import List, Dict, Any, Optional, Iterator
 from pathlib import Path
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -14,6 +16,13 @@ from langchain.schema import Document
 from document_loader import DocumentLoader
 from vector_store import PGVectorStore  # Usaremos o PGVectorStore
 from llm_providers import llm_manager
+from ingestion_pipeline import IngestionPipeline
+from batch_ingestion import ParallelIngestor
+from metrics_collector import get_metrics_collector
+from response_cache import ResponseCache, get_response_cache, scope_hash
+from reranker import get_reranker
+from context_assembler import get_context_assembler, pack_chunks
+from request_coalescing import get_single_flight, normalize_query
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -23,6 +32,9 @@ class SecurityError(Exception):
     """Erro de segurança para violações de isolamento de agente"""
     pass
 
+# Passa a False na primeira falha por falta da coluna chunk_tsv (schema antigo)
+_hybrid_available = True
+
 class RAGSystem:
     """
     Sistema RAG que opera com um agente específico, usando PGVector para armazenamento.
@@ -33,13 +45,20 @@ class RAGSystem:
         
         self.agent_id = agent_id
         logger.info(f"Sistema RAG inicializado para o agente: {self.agent_id}")
-        
-        # Inicializar componentes
-        self.document_loader = DocumentLoader()
-        self.vector_store = PGVectorStore(agent_id=self.agent_id)
-        
-        # Configuração do text splitter
-        self.text_splitter = RecursiveCharacterTextSplitter(
+
+    # Componentes criados no primeiro uso: um chat não precisa do loader nem do splitter
+
+    @cached_property
+    def document_loader(self) -> DocumentLoader:
+        return DocumentLoader()
+
+    @cached_property
+    def vector_store(self) -> PGVectorStore:
+        return PGVectorStore(agent_id=self.agent_id)
+
+    @cached_property
+    def text_splitter(self) -> RecursiveCharacterTextSplitter:
+        return RecursiveCharacterTextSplitter(
             chunk_size=1000,
             chunk_overlap=200,
             length_function=len,
@@ -63,31 +82,72 @@ class RAGSystem:
         logger.info(f"🔒 Validação de segurança: {len(validated_docs)} documentos validados para agente {self.agent_id}")
         return validated_docs
 
-    def add_document(self, file_path: str):
-        """Carrega, processa e armazena um documento para o agente."""
+    def _create_ingestion_pipeline(self) -> IngestionPipeline:
+        """Cria o pipeline de ingestão em streaming reaproveitando os componentes do agente"""
+        return IngestionPipeline(
+            agent_id=self.agent_id,
+            document_loader=self.document_loader,
+            embed_fn=self.vector_store.embedding_function
+        )
+
+    def _create_parallel_ingestor(self, max_workers: Optional[int] = None) -> ParallelIngestor:
+        """Cria o ingestor paralelo de múltiplos arquivos para o agente"""
+        return ParallelIngestor(
+            agent_id=self.agent_id,
+            embed_fn=self.vector_store.embedding_function,
+            parse_workers=max_workers,
+            chunk_size=self.document_loader.chunk_size,
+            chunk_overlap=self.document_loader.chunk_overlap
+        )
+
+    def add_document(self, file_path: str) -> Dict[str, Any]:
+        """Carrega, processa e armazena um documento para o agente em streaming."""
         try:
             logger.info(f"🔄 RAGSystem: Iniciando processamento de {file_path} para agente {self.agent_id}")
             
-            # Carrega o conteúdo do arquivo
-            documents = self.document_loader.load_document(file_path)
-            if not documents:
+            # Páginas são lidas, divididas, vetorizadas e gravadas de forma sobreposta
+            report = self._create_ingestion_pipeline().ingest_file(file_path)
+            if not report['chunks_written']:
                 logger.warning(f"⚠️ RAGSystem: Nenhum conteúdo extraído de: {file_path}")
-                return
-
-            # Os documentos já vêm divididos em chunks do DocumentLoader
-            logger.info(f"📄 RAGSystem: Documento dividido em {len(documents)} chunks.")
+                return report
 
-            # Gera embeddings e armazena no PGVector
-            logger.info(f"🔗 RAGSystem: Iniciando armazenamento no vector store...")
-            self.vector_store.add_documents(documents)
-            logger.info(f"✅ RAGSystem: Documento '{file_path}' adicionado com sucesso ao agente {self.agent_id}.")
+            logger.info(f"✅ RAGSystem: Documento '{file_path}' adicionado com sucesso ao agente {self.agent_id} ({report['chunks_written']} chunks).")
+            return report
 
         except Exception as e:
             logger.error(f"❌ RAGSystem: Erro ao adicionar documento para o agente {self.agent_id}: {e}", exc_info=True)
             raise
 
-    def add_document_from_text(self, content: str, source: str):
-        """Processa e armazena um documento a partir de um texto e uma fonte."""
+    def add_directory(self, directory_path: str, parallel: bool = False,
+                      manifest_path: Optional[str] = None, max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Ingere todos os documentos suportados de um diretório.
+
+        Por padrão usa o pipeline em streaming (um arquivo por vez); com
+        ``parallel=True`` os arquivos são processados em paralelo e, com
+        ``manifest_path``, uma importação interrompida pode ser retomada.
+        """
+        if parallel or manifest_path:
+            report = self._create_parallel_ingestor(max_workers).ingest_directory(directory_path, manifest_path=manifest_path)
+            logger.info(f"📁 RAGSystem: {report['chunks_written']} chunks de '{directory_path}' adicionados ao agente {self.agent_id} "
+                        f"({report['files_failed']} arquivos com erro, {report['files_skipped']} já importados)")
+            return report
+
+        report = self._create_ingestion_pipeline().ingest_directory(directory_path)
+        logger.info(f"📁 RAGSystem: {report['chunks_written']} chunks de '{directory_path}' adicionados ao agente {self.agent_id} "
+                    f"({len(report['failed_files'])} arquivos com erro)")
+        return report
+
+    def add_files(self, file_paths: List[str], manifest_path: Optional[str] = None,
+                  max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """Ingere um lote de arquivos em paralelo, com resultado por arquivo."""
+        return self._create_parallel_ingestor(max_workers).ingest_files(file_paths, manifest_path=manifest_path)
+
+    def add_document_from_text(self, content: str, source: str) -> Dict[str, Any]:
+        """
+        Processa e armazena um documento a partir de um texto e uma fonte.
+        Recapturar a mesma fonte atualiza o documento incrementalmente.
+        """
         try:
             # Cria um objeto Document do LangChain
             document = Document(page_content=content, metadata={"source": source})
@@ -96,39 +156,145 @@ class RAGSystem:
             chunks = self.text_splitter.split_documents([document])
             logger.info(f"Conteúdo de '{source}' dividido em {len(chunks)} chunks.")
 
-            # Gera embeddings e armazena no PGVector
-            self.vector_store.add_documents(chunks)
-            logger.info(f"Conteúdo de '{source}' adicionado com sucesso ao agente {self.agent_id}.")
+            # Vetoriza apenas os chunks novos ou alterados e remove os que sumiram
+            result = self.vector_store.upsert_document(source, [chunk.page_content for chunk in chunks], source_type='url')
+            logger.info(f"Conteúdo de '{source}' sincronizado com sucesso no agente {self.agent_id} ({result['status']}).")
+            return result
 
         except Exception as e:
             logger.error(f"Erro ao adicionar conteúdo de texto para o agente {self.agent_id}: {e}", exc_info=True)
             raise
 
+    def sync_document(self, file_path: str) -> Dict[str, Any]:
+        """
+        Reingere um arquivo de forma incremental: chunks inalterados mantêm
+        seus embeddings, só os novos/alterados são vetorizados e os removidos
+        são apagados.
+        """
+        texts = [chunk.page_content for chunk in self.document_loader.iter_chunks(file_path)]
+        source_type = Path(file_path).suffix.lower().lstrip('.') or 'file'
+        return self.vector_store.upsert_document(str(file_path), texts, source_type=source_type)
+
+    def sync_directory(self, directory_path: str) -> Dict[str, Any]:
+        """Ressincroniza um diretório; o custo é proporcional ao que mudou."""
+        results = []
+        for path in self.document_loader.iter_supported_files(directory_path):
+            try:
+                result = self.sync_document(str(path))
+                results.append({'file': str(path), **result})
+            except Exception as e:
+                logger.warning(f"⚠️ RAGSystem: erro ao sincronizar {path}: {e}")
+                results.append({'file': str(path), 'status': 'failed', 'error': str(e)})
+
+        summary = {status: sum(1 for r in results if r['status'] == status)
+                   for status in ('created', 'updated', 'unchanged', 'failed')}
+        logger.info(f"🔁 RAGSystem: '{directory_path}' sincronizado para o agente {self.agent_id}: {summary}")
+        return {'success': not summary['failed'], 'agent_id': self.agent_id, 'summary': summary, 'files': results}
+
+    def _search(self, query: str, k: int) -> List[Document]:
+        """
+        Busca híbrida (vetorial + textual com RRF) por padrão; desative com
+        RAG_HYBRID_SEARCH=false. Bancos sem a coluna ``chunk_tsv`` caem na
+        busca apenas vetorial (migração: ``python vector_index_manager.py --lexical``).
+        Nos dois caminhos o lado vetorial usa o índice local quando LOCAL_ANN_ENABLED=true.
+        """
+        global _hybrid_available
+        if _hybrid_available and os.getenv("RAG_HYBRID_SEARCH", "true").lower() not in ("0", "false", "no"):
+            try:
+                return self.vector_store.hybrid_search(query, k=k)
+            except Exception as e:
+                if "chunk_tsv" not in str(e):
+                    raise
+                _hybrid_available = False
+                logger.warning("⚠️ RAGSystem: coluna chunk_tsv ausente; usando apenas a busca vetorial")
+        return self.vector_store.similarity_search(query, k=k)
+
+    def get_relevant_documents(self, query: str, k: int = 5) -> List[Document]:
+        """
+        Busca os chunks relevantes APENAS da base do agente atual (validados).
+        Buscas idênticas e simultâneas do mesmo agente compartilham uma única execução.
+        """
+        key = (self.agent_id, normalize_query(query), k)
+        return list(get_single_flight().do("retrieval", key, lambda: self._retrieve(query, k)))
+
+    def _retrieve(self, query: str, k: int) -> List[Document]:
+        logger.info(f"🔍 RAGSystem: Buscando contexto para agente {self.agent_id}")
+        
+        # Buscar documentos similares (já filtrados por agent_id no PGVectorStore);
+        # com o reranker ativo, busca um conjunto maior e reordena dentro do orçamento
+        reranker = get_reranker()
+        if reranker:
+            candidates = self._search(query, max(k, int(os.getenv("RERANK_CANDIDATES", "50"))))
+            similar_docs = reranker.rerank(query, candidates, top_k=k)
+        else:
+            similar_docs = self._search(query, k)
+        
+        # Validação adicional de segurança
+        validated_docs = self._validate_agent_access(similar_docs)
+        
+        if not validated_docs:
+            logger.warning(f"⚠️ RAGSystem: Nenhum contexto encontrado para agente {self.agent_id}")
+        else:
+            logger.info(f"✅ RAGSystem: Contexto recuperado com {len(validated_docs)} chunks para agente {self.agent_id}")
+        return validated_docs
+
     def get_relevant_context(self, query: str, k: int = 5) -> str:
         """Busca contexto relevante APENAS da base do agente atual."""
         try:
-            logger.info(f"🔍 RAGSystem: Buscando contexto para agente {self.agent_id}")
-            
-            # Buscar documentos similares (já filtrados por agent_id no PGVectorStore)
-            similar_docs = self.vector_store.similarity_search(query, k=k)
-            
-            # Validação adicional de segurança
-            validated_docs = self._validate_agent_access(similar_docs)
-            
-            if not validated_docs:
-                logger.warning(f"⚠️ RAGSystem: Nenhum contexto encontrado para agente {self.agent_id}")
-                return ""
-            
-            # Combinar o conteúdo dos documentos
-            context = "\n\n".join([doc.page_content for doc in validated_docs])
-            logger.info(f"✅ RAGSystem: Contexto recuperado com {len(validated_docs)} chunks para agente {self.agent_id}")
-            
-            return context
+            # Chunks vizinhos unidos e quase-duplicatas removidas
+            packed = pack_chunks([{'text': doc.page_content, 'source': doc.metadata.get('source')}
+                                  for doc in self.get_relevant_documents(query, k)])
+            return "\n\n".join(chunk['text'] for chunk in packed['chunks'])
             
         except Exception as e:
             logger.error(f"Erro ao buscar contexto para o agente {self.agent_id}: {e}")
             return ""
 
+    def _assemble_prompt(self, user_message: str, history: List[Dict[str, str]], system_prompt: str = "",
+                         model: Optional[str] = None, context: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Monta as mensagens dentro do orçamento de tokens do modelo: busca os
+        chunks (se ``context`` não for dado), une/deduplica e trunca primeiro o histórico.
+        """
+        if context is None:
+            try:
+                chunks = self.get_relevant_documents(user_message)
+            except Exception as e:
+                logger.error(f"Erro ao buscar contexto para o agente {self.agent_id}: {e}")
+                chunks = []
+        else:
+            chunks = [context] if context else []
+        return get_context_assembler(model).assemble(user_message, chunks, history, system_prompt)
+
+    def _build_messages(self, user_message: str, history: List[Dict[str, str]], system_prompt: str = "",
+                        context: Optional[str] = None, model: Optional[str] = None) -> List[Dict[str, str]]:
+        """Monta as mensagens do chat com o contexto RAG do agente"""
+        return self._assemble_prompt(user_message, history, system_prompt, model, context)['messages']
+
+    def _cached_response(self, user_message: str, scope: str, provider: str, model: str,
+                         messages: List[Dict[str, str]], temperature: float) -> Optional[Dict[str, Any]]:
+        """Consulta o cache de respostas; falhas no cache nunca interrompem o chat"""
+        cache = get_response_cache()
+        if not cache:
+            return None
+        try:
+            return cache.lookup(user_message, self.agent_id, scope, provider, model,
+                                messages=messages, temperature=temperature)
+        except Exception as e:
+            logger.warning(f"⚠️ RAGSystem: falha ao consultar o cache de respostas: {e}")
+            return None
+
+    def _cache_response(self, user_message: str, scope: str, provider: str, model: str,
+                        messages: List[Dict[str, str]], temperature: float, response_text: str, latency: float):
+        cache = get_response_cache()
+        if not cache or not response_text:
+            return
+        try:
+            cache.store(user_message, self.agent_id, scope, provider, model, response_text,
+                        latency=latency, messages=messages, temperature=temperature)
+        except Exception as e:
+            logger.warning(f"⚠️ RAGSystem: falha ao gravar no cache de respostas: {e}")
+
     def get_response(self, user_message: str, history: List[Dict[str, str]], system_prompt: str = "", temperature: float = 0.7, model: str = "gpt-4o-mini") -> str:
         """Gera uma resposta usando RAG ISOLADO para o agente."""
         try:
@@ -136,30 +302,29 @@ class RAGSystem:
                 logger.error("Nenhum provedor de LLM está configurado. Verifique as variáveis de ambiente (ex: OPENAI_API_KEY).")
                 return "Erro de configuração: Nenhum provedor de LLM foi configurado. Por favor, adicione uma chave de API nas configurações."
 
-            context = self.get_relevant_context(user_message)
-            
-            messages = []
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-
-            if context:
-                context_message = f"Use o seguinte contexto para responder à pergunta do usuário:\n\n---\n{context}\n---"
-                if messages and messages[0]['role'] == 'system':
-                    messages[0]['content'] += "\n\n" + context_message
-                else:
-                    messages.insert(0, {"role": "system", "content": context_message})
-
-            if history:
-                messages.extend(history)
-            
-            messages.append({"role": "user", "content": user_message})
+            prompt = self._assemble_prompt(user_message, history, system_prompt, model)
+            messages = prompt['messages']
 
-            response_text = llm_manager.generate_response(
+            # Respostas reaproveitáveis: mesmo agente, contexto, histórico e prompt
+            provider = llm_manager.active_provider
+            scope = scope_hash(prompt['context'], prompt['history'], system_prompt, temperature)
+            cached = self._cached_response(user_message, scope, provider, model, messages, temperature)
+            if cached:
+                return cached['response']
+
+            # Prompts idênticos em andamento (ex: extensão e interface web) geram uma única chamada
+            key = ResponseCache.get_cache_key(messages, provider, model, temperature, self.agent_id)
+            result = get_single_flight().do("generation", key, lambda: llm_manager.generate_response(
                 messages,
                 model=model,
                 temperature=temperature
-            )
-            
+            ))
+            if not result['success']:
+                raise RuntimeError(result.get('error', 'Falha ao gerar resposta'))
+
+            response_text = result['response']
+            self._cache_response(user_message, scope, provider, model, messages, temperature,
+                                 response_text, result['response_time'])
             return response_text
             
         except Exception as e:
@@ -169,32 +334,108 @@ class RAGSystem:
                 return "Erro de autenticação: A chave da API é inválida ou está faltando. Verifique suas credenciais."
             return "Desculpe, ocorreu um erro ao processar sua solicitação."
 
-    def get_multi_response(self, user_message: str, context: str, history: List[Dict[str, str]], system_prompt: str, temperature: float, providers: List[str]) -> Dict[str, Any]:
-        """Gera respostas de múltiplos LLMs usando o contexto RAG ISOLADO."""
-        responses = {}
-        
-        for provider in providers:
+    def stream_response(self, user_message: str, history: List[Dict[str, str]], system_prompt: str = "", temperature: float = 0.7,
+                        model: str = "gpt-4o-mini", stats: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Gera a resposta RAG em streaming, entregando os tokens conforme chegam.
+
+        O tempo até o primeiro token (contado desde o início da requisição,
+        incluindo a busca de contexto) e o tempo total são registrados nas
+        métricas e, se ``stats`` for fornecido, copiados para ele.
+        """
+        start = time.perf_counter()
+        time_to_first_token = None
+        chunks = 0
+        success = False
+        cached = None
+        prompt = None
+        provider = llm_manager.active_provider
+
+        try:
+            prompt = self._assemble_prompt(user_message, history, system_prompt, model)
+            messages = prompt['messages']
+
+            scope = scope_hash(prompt['context'], prompt['history'], system_prompt, temperature)
+            cached = self._cached_response(user_message, scope, provider, model, messages, temperature)
+            tokens = iter([cached['response']]) if cached else \
+                llm_manager.stream_response(messages, model=model, temperature=temperature)
+
+            parts = []
+            for token in tokens:
+                if time_to_first_token is None:
+                    time_to_first_token = time.perf_counter() - start
+                    logger.info(f"⚡ RAGSystem: primeiro token em {time_to_first_token:.3f}s (agente {self.agent_id})")
+                chunks += 1
+                parts.append(token)
+                yield token
+            success = True
+
+            if not cached:
+                self._cache_response(user_message, scope, provider, model, messages, temperature,
+                                     "".join(parts), time.perf_counter() - start)
+        finally:
+            total_time = time.perf_counter() - start
+            if stats is not None:
+                stats.update({
+                    'provider': provider,
+                    'model': model,
+                    'time_to_first_token': round(time_to_first_token, 3) if time_to_first_token is not None else None,
+                    'total_time': round(total_time, 3),
+                    'chunks': chunks,
+                    'success': success,
+                    'cache_hit': cached['tier'] if cached else None,
+                    'prompt_tokens': prompt['stats']['prompt_tokens'] if prompt else None
+                })
             try:
-                if context:
-                    enhanced_prompt = f"{system_prompt}\n\nContexto relevante:\n{context}\n\nPergunta do usuário: {user_message}"
-                else:
-                    enhanced_prompt = f"{system_prompt}\n\nPergunta do usuário: {user_message}"
-                
-                llm = llm_manager.get_llm_instance(provider=provider, temperature=temperature)
-                response = llm.invoke(enhanced_prompt)
-                
+                get_metrics_collector().record_llm_stream(
+                    provider, model, time_to_first_token, total_time, success,
+                    metadata={'agent_id': self.agent_id, 'chunks': chunks}
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ RAGSystem: falha ao registrar métricas de streaming: {e}")
+
+    def get_multi_response(self, user_message: str, context: str, history: List[Dict[str, str]], system_prompt: str, temperature: float, providers: List[str],
+                           timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Gera respostas de múltiplos LLMs usando o contexto RAG ISOLADO.
+        Os provedores são consultados em paralelo, cada um com seu tempo limite,
+        de modo que a latência total é a do provedor mais lento.
+        """
+        if context:
+            enhanced_prompt = f"{system_prompt}\n\nContexto relevante:\n{context}\n\nPergunta do usuário: {user_message}"
+        else:
+            enhanced_prompt = f"{system_prompt}\n\nPergunta do usuário: {user_message}"
+
+        messages = list(history or []) + [{"role": "user", "content": enhanced_prompt}]
+
+        unknown = [provider for provider in providers if provider not in llm_manager.providers]
+        key = (ResponseCache.get_cache_key(messages, ",".join(sorted(providers)), "", temperature, self.agent_id), timeout)
+        results = get_single_flight().do("multi_generation", key, lambda: llm_manager.compare_multi_llm(
+            messages, providers=providers, timeout=timeout, temperature=temperature))
+
+        responses = {}
+        for provider, result in results.items():
+            if result['success']:
                 responses[provider] = {
-                    'content': response.content if hasattr(response, 'content') else str(response),
-                    'model': llm_manager.get_model_name(provider),
+                    'content': result['response'],
+                    'model': result['model'],
+                    'duration': result['duration'],
                     'usage': {}
                 }
-                
-            except Exception as e:
-                logger.error(f"Erro ao gerar resposta com {provider} para agente {self.agent_id}: {e}")
+            else:
+                logger.error(f"Erro ao gerar resposta com {provider} para agente {self.agent_id}: {result['error']}")
                 responses[provider] = {
-                    'content': f"Erro ao processar com {provider}: {str(e)}",
+                    'content': f"Erro ao processar com {provider}: {result['error']}",
                     'model': 'N/A',
+                    'duration': result['duration'],
                     'usage': {}
                 }
-        
-        return responses 
\ No newline at end of file
+
+        for provider in unknown:
+            responses[provider] = {
+                'content': f"Erro ao processar com {provider}: provedor não configurado",
+                'model': 'N/A',
+                'usage': {}
+            }
+
+        return responses
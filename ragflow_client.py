@@ -9,6 +9,9 @@ import os
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from batch_ingestion import IngestionManifest
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -84,21 +87,45 @@ class RAGFlowClient:
             logger.error(f"Erro ao fazer upload: {e}")
             return {'error': str(e)}
     
-    def upload_documents_batch(self, file_paths: List[str], collection_name: str = "default") -> List[Dict[str, Any]]:
+    def upload_documents_batch(self, file_paths: List[str], collection_name: str = "default",
+                               max_workers: int = 4, manifest_path: Optional[str] = None) -> List[Dict[str, Any]]:
         """
-        Faz upload de múltiplos documentos
+        Faz upload de múltiplos documentos em paralelo
         
         Args:
             file_paths: Lista de caminhos de arquivos
             collection_name: Nome da coleção
+            max_workers: Número de uploads simultâneos
+            manifest_path: Manifesto para retomar um lote interrompido
             
         Returns:
-            Lista de resultados do upload
+            Lista de resultados do upload, na ordem de ``file_paths``
+            (arquivos já enviados segundo o manifesto retornam ``{'skipped': True}``)
         """
-        results = []
-        for file_path in file_paths:
-            result = self.upload_document(file_path, collection_name)
-            results.append(result)
+        manifest = IngestionManifest(manifest_path) if manifest_path else None
+        results: List[Optional[Dict[str, Any]]] = [None] * len(file_paths)
+        pending = []
+        for index, file_path in enumerate(file_paths):
+            if manifest and manifest.is_done(str(file_path)):
+                results[index] = {'file': str(file_path), 'skipped': True}
+            else:
+                pending.append(index)
+
+        def upload(index: int) -> Dict[str, Any]:
+            result = self.upload_document(file_paths[index], collection_name)
+            if manifest:
+                manifest.record({'file': str(file_paths[index]),
+                                 'status': 'failed' if 'error' in result else 'success',
+                                 'error': result.get('error')})
+            return result
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            for index, result in zip(pending, executor.map(upload, pending)):
+                results[index] = result
+
+        failed = sum(1 for result in results if 'error' in result)
+        logger.info(f"Upload em lote: {len(pending) - failed}/{len(pending)} documentos enviados, "
+                    f"{len(file_paths) - len(pending)} já enviados anteriormente")
         return results
     
     def ask_question(self, question: str, collection_name: str = "default", 
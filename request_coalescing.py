@@ -0,0 +1,179 @@
+"""
+Cache de embeddings de consulta e coalescência de requisições idênticas
+
+- ``QueryEmbeddingCache``: LRU só em memória para embeddings de consultas,
+  separado do cache de chunks (consultas não ocupam o nível em disco)
+- ``SingleFlight``: chamadas concorrentes com a mesma chave compartilham uma
+  única execução em andamento (embedding, busca ou geração); quem chega depois
+  espera o resultado da primeira em vez de repetir a chamada
+- Contadores por grupo: execuções, requisições coalescidas e em andamento
+"""
+
+import os
+import re
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(text: str) -> str:
+    """Normaliza a consulta (NFC, espaços colapsados) para compor chaves"""
+    text = unicodedata.normalize("NFC", text or "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class _Call:
+    __slots__ = ("event", "result", "error", "waiters")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Executa ``fn`` uma única vez por chave enquanto houver uma chamada em
+    andamento. O resultado (ou a exceção) é entregue a todos os que esperavam;
+    resultados compartilhados devem ser tratados como somente leitura.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._calls: Dict[Tuple[str, Any], _Call] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, group: str, field: str):
+        counters = self._counters.setdefault(group, {"executions": 0, "coalesced": 0})
+        counters[field] += 1
+
+    def do(self, group: str, key: Any, fn: Callable[[], Any]) -> Any:
+        if not self.enabled:
+            return fn()
+
+        with self._lock:
+            call = self._calls.get((group, key))
+            if call is None:
+                call = _Call()
+                self._calls[(group, key)] = call
+                self._count(group, "executions")
+                leader = True
+            else:
+                call.waiters += 1
+                self._count(group, "coalesced")
+                leader = False
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop((group, key), None)
+            call.event.set()
+            if call.waiters:
+                logger.info(f"🔗 SingleFlight[{group}]: {call.waiters} requisições idênticas atendidas por uma única execução")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            groups = {group: dict(counters) for group, counters in self._counters.items()}
+            for group, _ in self._calls:
+                groups.setdefault(group, {"executions": 0, "coalesced": 0})
+            for group, counters in groups.items():
+                counters["inflight"] = sum(1 for g, _ in self._calls if g == group)
+            return {"enabled": self.enabled, "groups": groups}
+
+
+class QueryEmbeddingCache:
+    """LRU de embeddings de consultas, com cálculo coalescido para chaves em falta"""
+
+    def __init__(self, max_entries: int = 2048, single_flight: Optional[SingleFlight] = None):
+        self.max_entries = max_entries
+        self._single_flight = single_flight or SingleFlight()
+        self._entries: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, query: str, model: str, compute: Callable[[str], List[float]]) -> List[float]:
+        key = (model, normalize_query(query))
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+            self.misses += 1
+
+        def embed() -> List[float]:
+            result = compute(query)
+            with self._lock:
+                self._entries[key] = result
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return result
+
+        return self._single_flight.do("query_embedding", key, embed)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
+
+
+_single_flight: Optional[SingleFlight] = None
+_query_cache: Optional[QueryEmbeddingCache] = None
+_singleton_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """Coalescedor compartilhado; REQUEST_COALESCING=false desativa"""
+    global _single_flight
+    if _single_flight is None:
+        with _singleton_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight(
+                    enabled=os.getenv("REQUEST_COALESCING", "true").lower() not in ("0", "false", "no")
+                )
+    return _single_flight
+
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    """Cache de embeddings de consulta configurado por QUERY_EMBEDDING_CACHE_SIZE"""
+    global _query_cache
+    single_flight = get_single_flight()
+    if _query_cache is None:
+        with _singleton_lock:
+            if _query_cache is None:
+                _query_cache = QueryEmbeddingCache(
+                    max_entries=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048")),
+                    single_flight=single_flight
+                )
+    return _query_cache
+
+
+def coalescing_stats() -> Dict[str, Any]:
+    """Contadores de coalescência e do cache de embeddings de consulta"""
+    return {"single_flight": get_single_flight().stats(), "query_embeddings": get_query_embedding_cache().stats()}
@@ -0,0 +1,202 @@
+"""
+Reranking dos chunks recuperados com orçamento de latência
+
+- A recuperação traz um conjunto amplo de candidatos (ex: 50) e o reranker
+  reordena por um score mais fino antes de escolher os k do prompt
+- Scorers: cross-encoder local em CPU (sentence-transformers, opcional) ou
+  sobreposição lexical ponderada por IDF (sem dependências)
+- Os candidatos são pontuados em lotes na ordem da recuperação; se o orçamento
+  em milissegundos acabar, os já pontuados são reordenados e o restante mantém
+  a ordem original (melhor ordem parcial)
+- Latência, fração pontuada e distribuição dos scores são registradas no
+  MetricsCollector para medir o ganho por milissegundo
+"""
+
+import os
+import re
+import math
+import time
+import logging
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _text_of(candidate: Any) -> str:
+    """Aceita Documents do LangChain, dicts com 'content' ou strings"""
+    if hasattr(candidate, "page_content"):
+        return candidate.page_content
+    if isinstance(candidate, dict):
+        return candidate.get("content", "")
+    return str(candidate)
+
+
+class LexicalOverlapScorer:
+    """
+    Score por sobreposição de termos da consulta com o chunk, ponderada pelo
+    IDF calculado sobre os próprios candidatos (termos raros pesam mais) e
+    saturada como no BM25. Números (artigos, CPF/CNPJ) contam em dobro.
+
+    O estado de cada consulta é devolvido por ``prepare`` e passado a
+    ``score``: a mesma instância atende requisições simultâneas.
+    """
+
+    name = "lexical"
+
+    def __init__(self, k1: float = 1.2):
+        self.k1 = k1
+
+    def prepare(self, query: str, texts: List[str]) -> Dict[str, Any]:
+        query_terms = set(_TOKEN_RE.findall(query.lower()))
+        tokens = [Counter(_TOKEN_RE.findall(text.lower())) for text in texts]
+        df = Counter(term for counts in tokens for term in query_terms & counts.keys())
+        n = len(texts)
+        idf = {term: math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5)) for term in query_terms}
+        return {"query_terms": query_terms, "tokens": tokens, "idf": idf}
+
+    def score(self, state: Dict[str, Any], query: str, indexes: List[int]) -> List[float]:
+        scores = []
+        for i in indexes:
+            tokens = state["tokens"][i]
+            total = 0.0
+            for term in state["query_terms"]:
+                tf = tokens.get(term, 0)
+                if tf:
+                    weight = 2.0 if term.isdigit() else 1.0
+                    total += weight * state["idf"][term] * tf * (self.k1 + 1) / (tf + self.k1)
+            scores.append(total)
+        return scores
+
+
+class CrossEncoderScorer:
+    """Cross-encoder local (CPU) do sentence-transformers, carregado uma única vez por processo"""
+
+    name = "cross_encoder"
+    _models: Dict[str, Any] = {}
+    _models_lock = threading.Lock()
+
+    def __init__(self, model_name: str = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"):
+        self.model_name = model_name
+        with self._models_lock:
+            if model_name not in self._models:
+                from sentence_transformers import CrossEncoder
+                self._models[model_name] = CrossEncoder(model_name, device="cpu")
+        self._model = self._models[model_name]
+
+    def prepare(self, query: str, texts: List[str]) -> List[str]:
+        return texts
+
+    def score(self, state: List[str], query: str, indexes: List[int]) -> List[float]:
+        return [float(s) for s in self._model.predict([(query, state[i]) for i in indexes])]
+
+
+class Reranker:
+    """
+    Reordena candidatos dentro de um orçamento de latência. Compartilhado
+    entre requisições: nenhuma informação de uma chamada fica na instância.
+    """
+
+    def __init__(self, scorer: Optional[Any] = None, budget_ms: float = 50.0, batch_size: int = 8,
+                 record_metrics: bool = True, clock: Callable[[], float] = time.perf_counter):
+        self.scorer = scorer or LexicalOverlapScorer()
+        self.budget_ms = budget_ms
+        self.batch_size = batch_size
+        self.record_metrics = record_metrics
+        self._clock = clock
+
+    def rerank(self, query: str, candidates: List[Any], top_k: int = 5) -> List[Any]:
+        """
+        Retorna os ``top_k`` melhores candidatos. Nos Documents, o score é
+        gravado em ``metadata['rerank_score']`` (None se não foi pontuado).
+        """
+        return self.rerank_with_stats(query, candidates, top_k)[0]
+
+    def rerank_with_stats(self, query: str, candidates: List[Any], top_k: int = 5) -> Tuple[List[Any], Dict[str, Any]]:
+        """Como ``rerank``, devolvendo também as estatísticas desta chamada"""
+        if len(candidates) <= 1:
+            return list(candidates[:top_k]), {}
+
+        start = self._clock()
+        deadline = start + self.budget_ms / 1000.0
+        texts = [_text_of(c) for c in candidates]
+        state = self.scorer.prepare(query, texts)
+
+        scores: List[Optional[float]] = [None] * len(candidates)
+        scored = 0
+        while scored < len(candidates) and self._clock() < deadline:
+            batch = list(range(scored, min(scored + self.batch_size, len(candidates))))
+            for i, value in zip(batch, self.scorer.score(state, query, batch)):
+                scores[i] = value
+            scored = batch[-1] + 1
+
+        # Pontuados reordenados por score; os demais mantêm a ordem da recuperação
+        order = sorted(range(scored), key=lambda i: -scores[i]) + list(range(scored, len(candidates)))
+        result = [candidates[i] for i in order[:top_k]]
+        for i in order[:top_k]:
+            if hasattr(candidates[i], "metadata"):
+                candidates[i].metadata["rerank_score"] = scores[i]
+
+        latency_ms = (self._clock() - start) * 1000
+        stats = self._record(latency_ms, len(candidates), scored, [s for s in scores if s is not None],
+                             changed=len(set(order[:top_k]) - set(range(top_k))))
+        return result, stats
+
+    def _record(self, latency_ms: float, candidates: int, scored: int, scores: List[float],
+                changed: int) -> Dict[str, Any]:
+        stats = {
+            "scorer": self.scorer.name,
+            "latency_ms": round(latency_ms, 3),
+            "candidates": candidates,
+            "scored": scored,
+            "budget_exhausted": scored < candidates,
+            # Quantos chunks do top-k final não estavam no top-k da recuperação
+            "top_k_changed": changed,
+            "score_max": max(scores) if scores else None,
+            "score_mean": sum(scores) / len(scores) if scores else None,
+            "score_min": min(scores) if scores else None
+        }
+        if stats["budget_exhausted"]:
+            logger.info(f"⏱️ Reranker: orçamento de {self.budget_ms}ms esgotado após {scored}/{candidates} candidatos")
+        if self.record_metrics:
+            try:
+                from metrics_collector import get_metrics_collector
+                get_metrics_collector().record_rerank(stats)
+            except Exception as e:
+                logger.debug(f"Reranker: falha ao registrar métrica: {e}")
+        return stats
+
+
+_reranker: Optional[Reranker] = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Optional[Reranker]:
+    """
+    Retorna o reranker compartilhado, ou None se desativado (RERANK_ENABLED).
+    RERANK_SCORER=cross_encoder usa o modelo de RERANK_MODEL, com fallback
+    para o scorer lexical se o sentence-transformers não estiver instalado.
+    """
+    global _reranker
+    if os.getenv("RERANK_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                scorer = None
+                if os.getenv("RERANK_SCORER", "lexical").lower() == "cross_encoder":
+                    try:
+                        model = os.getenv("RERANK_MODEL")
+                        scorer = CrossEncoderScorer(model) if model else CrossEncoderScorer()
+                    except Exception as e:
+                        logger.warning(f"⚠️ Reranker: cross-encoder indisponível ({e}); usando o scorer lexical")
+                _reranker = Reranker(
+                    scorer=scorer,
+                    budget_ms=float(os.getenv("RERANK_BUDGET_MS", "50")),
+                    batch_size=int(os.getenv("RERANK_BATCH_SIZE", "8"))
+                )
+    return _reranker
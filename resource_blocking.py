@@ -0,0 +1,209 @@
+"""
+Interceptação de requisições nas capturas headless
+Só o texto do DOM chega a extract_main_content_from_html, então imagens,
+fontes, mídia, anúncios e rastreadores são abortados antes de sair do
+navegador. A política (tipos bloqueados, domínios negados e permitidos) é
+configurável por variáveis de ambiente, e cada captura registra requisições,
+bytes baixados, bytes economizados (estimados) e tempo de carregamento.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOCKED_TYPES = ("image", "media", "font")
+
+# Anúncios, analytics e widgets de terceiros que não trazem texto da página
+DEFAULT_DENY_DOMAINS = (
+    "google-analytics.com", "googletagmanager.com", "googleadservices.com", "googlesyndication.com",
+    "doubleclick.net", "adservice.google.com", "analytics.google.com", "stats.g.doubleclick.net",
+    "facebook.net", "connect.facebook.net", "hotjar.com", "clarity.ms", "mc.yandex.ru",
+    "segment.io", "segment.com", "mixpanel.com", "amplitude.com", "scorecardresearch.com",
+    "taboola.com", "outbrain.com", "criteo.com", "criteo.net", "amazon-adsystem.com",
+    "adnxs.com", "rubiconproject.com", "pubmatic.com", "bat.bing.com", "nr-data.net",
+    "newrelic.com", "fullstory.com", "tiktok.com/i18n/pixel", "analytics.tiktok.com",
+    "onesignal.com", "pushnews.com.br", "rdstation.com.br"
+)
+
+# Tamanho típico transferido por tipo de recurso (medianas aproximadas do HTTP
+# Archive), usado para estimar o que deixou de ser baixado
+TYPICAL_BYTES = {
+    "image": 20_000,
+    "media": 300_000,
+    "font": 25_000,
+    "stylesheet": 15_000,
+    "script": 25_000,
+    "xhr": 3_000,
+    "fetch": 3_000,
+    "other": 5_000,
+}
+
+
+def _env_list(name: str) -> Optional[list]:
+    value = os.getenv(name)
+    if value is None:
+        return None
+    return [item.strip().lower() for item in value.split(",") if item.strip()]
+
+
+def _host_matches(host: str, path: str, patterns: Iterable[str]) -> bool:
+    for pattern in patterns:
+        domain, _, prefix = pattern.partition("/")
+        if (host == domain or host.endswith("." + domain)) and (not prefix or path.startswith("/" + prefix)):
+            return True
+    return False
+
+
+class ResourcePolicy:
+    """
+    Decide quais requisições de uma captura são abortadas.
+
+    Args:
+        blocked_types: tipos de recurso do Playwright a bloquear (image, font, ...)
+        deny_domains: domínios (e subdomínios) sempre bloqueados; aceita "dominio/prefixo"
+        allow_domains: domínios nunca bloqueados (vencem a lista negada e os tipos)
+    """
+
+    def __init__(self,
+                 blocked_types: Iterable[str] = DEFAULT_BLOCKED_TYPES,
+                 deny_domains: Iterable[str] = DEFAULT_DENY_DOMAINS,
+                 allow_domains: Iterable[str] = ()):
+        self.blocked_types = frozenset(t.lower() for t in blocked_types)
+        self.deny_domains = tuple(d.lower() for d in deny_domains)
+        self.allow_domains = tuple(d.lower() for d in allow_domains)
+
+    @classmethod
+    def from_env(cls) -> 'ResourcePolicy':
+        """
+        SCRAPER_BLOCK_TYPES substitui os tipos bloqueados, SCRAPER_DENY_DOMAINS
+        acrescenta domínios à lista padrão e SCRAPER_ALLOW_DOMAINS os libera
+        """
+        blocked_types = _env_list("SCRAPER_BLOCK_TYPES")
+        return cls(
+            blocked_types=DEFAULT_BLOCKED_TYPES if blocked_types is None else blocked_types,
+            deny_domains=DEFAULT_DENY_DOMAINS + tuple(_env_list("SCRAPER_DENY_DOMAINS") or ()),
+            allow_domains=_env_list("SCRAPER_ALLOW_DOMAINS") or ()
+        )
+
+    def block_reason(self, resource_type: str, url: str) -> Optional[str]:
+        """'type' ou 'tracker' se a requisição deve ser abortada, senão None"""
+        # Navegação principal e iframes nunca são abortados (nem por tipo, nem pela lista de rastreadores)
+        if resource_type == "document" or self._matches(url, self.allow_domains):
+            return None
+        if self._matches(url, self.deny_domains):
+            return "tracker"
+        if resource_type in self.blocked_types:
+            return "type"
+        return None
+
+    @staticmethod
+    def _matches(url: str, patterns: Iterable[str]) -> bool:
+        if not patterns:
+            return False
+        parts = urlsplit(url)
+        return _host_matches((parts.hostname or "").lower(), parts.path, patterns)
+
+
+class CaptureNetwork:
+    """Contabiliza a rede de uma captura: requisições, bloqueios, bytes e tempo"""
+
+    def __init__(self, policy: ResourcePolicy):
+        self.policy = policy
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.blocked_by_type: Dict[str, int] = {}
+        self.blocked_trackers = 0
+        self.bytes_loaded = 0
+        self.bytes_saved_estimate = 0
+        self.ready: Optional[str] = None
+        self.load_ms: Optional[float] = None
+
+    async def handle_route(self, route: Any):
+        request = route.request
+        self.requests += 1
+        reason = self.policy.block_reason(request.resource_type, request.url)
+        if reason is None:
+            await route.continue_()
+            return
+        if reason == "tracker":
+            self.blocked_trackers += 1
+        self.blocked_by_type[request.resource_type] = self.blocked_by_type.get(request.resource_type, 0) + 1
+        self.bytes_saved_estimate += TYPICAL_BYTES.get(request.resource_type, TYPICAL_BYTES["other"])
+        await route.abort()
+
+    def on_response(self, response: Any):
+        try:
+            self.bytes_loaded += int(response.headers.get("content-length") or 0)
+        except (TypeError, ValueError):
+            pass
+
+    async def install(self, page: Any):
+        """Registra a interceptação e a contagem de respostas na página"""
+        await page.route("**/*", self.handle_route)
+        page.on("response", self.on_response)
+
+    def mark_ready(self, how: str):
+        """Página pronta para extração ('networkidle', 'cap' etc.)"""
+        self.ready = how
+        self.load_ms = round((time.perf_counter() - self.started) * 1000, 1)
+
+    def summary(self) -> Dict[str, Any]:
+        blocked = sum(self.blocked_by_type.values())
+        return {
+            'requests': self.requests,
+            'blocked': blocked,
+            'blocked_by_type': dict(self.blocked_by_type),
+            'blocked_trackers': self.blocked_trackers,
+            'bytes_loaded': self.bytes_loaded,
+            'bytes_saved_estimate': self.bytes_saved_estimate,
+            'load_ms': self.load_ms,
+            'ready': self.ready
+        }
+
+
+class NetworkStats:
+    """Totais das capturas do processo (exibidos junto às estatísticas do pool)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = {'captures': 0, 'requests': 0, 'blocked': 0, 'blocked_trackers': 0,
+                       'bytes_loaded': 0, 'bytes_saved_estimate': 0, 'load_ms': 0.0, 'ready_cap': 0}
+
+    def record(self, summary: Dict[str, Any]):
+        with self._lock:
+            self.totals['captures'] += 1
+            for key in ('requests', 'blocked', 'blocked_trackers', 'bytes_loaded', 'bytes_saved_estimate'):
+                self.totals[key] += summary[key]
+            self.totals['load_ms'] += summary['load_ms'] or 0.0
+            self.totals['ready_cap'] += int(summary['ready'] == 'cap')
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            totals = dict(self.totals)
+        captures = totals['captures']
+        totals['avg_load_ms'] = round(totals.pop('load_ms') / captures, 1) if captures else 0.0
+        return totals
+
+
+_policy: Optional[ResourcePolicy] = None
+_network_stats = NetworkStats()
+_policy_lock = threading.Lock()
+
+
+def get_resource_policy() -> ResourcePolicy:
+    global _policy
+    if _policy is None:
+        with _policy_lock:
+            if _policy is None:
+                _policy = ResourcePolicy.from_env()
+    return _policy
+
+
+def get_network_stats() -> NetworkStats:
+    return _network_stats
@@ -1,55 +1,326 @@
+"""
+Cache de respostas LLM em dois níveis
+- Exato: mesma lista de mensagens, provedor e modelo
+- Semântico: pergunta com embedding próximo (similaridade de cosseno acima do
+  limiar) de uma já respondida para o mesmo agente e o mesmo contexto recuperado
+
+Armazenado em SQLite no modo WAL, podendo ser compartilhado por vários workers,
+com expiração por TTL e despejo LRU acima do limite de entradas.
+"""
+
+import os
 import json
+import math
+import array
+import sqlite3
 import hashlib
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+import logging
+import threading
+import time
+from typing import Optional, Dict, Any, List, Callable
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _pack(vector: List[float]) -> bytes:
+    return array.array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    values = array.array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+def _normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+def scope_hash(*parts: Any) -> str:
+    """Hash do escopo em que uma resposta é reaproveitável (contexto, histórico, prompt)"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
 
 class ResponseCache:
-    """Sistema de cache para respostas LLM"""
-    
-    def __init__(self, cache_file: str = "response_cache.json"):
-        self.cache_file = cache_file
-        self.cache = self._load_cache()
-        
-    def _load_cache(self) -> Dict:
-        """Carrega cache do arquivo"""
+    """Cache de respostas LLM (exato + semântico) sobre SQLite/WAL"""
+
+    def __init__(self,
+                 db_path: str = "response_cache.db",
+                 ttl_seconds: float = 24 * 3600,
+                 max_entries: int = 5000,
+                 semantic_threshold: float = 0.95,
+                 embed_fn: Optional[Callable[[List[str]], List[List[float]]]] = None,
+                 record_metrics: bool = True):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.semantic_threshold = semantic_threshold
+        self._embed_fn = embed_fn
+        self.record_metrics = record_metrics
+
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes = 0
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+
+        self._init_db()
+
+    def _init_db(self):
+        try:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA busy_timeout=10000")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    agent_id TEXT,
+                    provider TEXT,
+                    model TEXT,
+                    scope TEXT,
+                    query TEXT,
+                    embedding BLOB,
+                    response TEXT NOT NULL,
+                    latency REAL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_scope ON responses(agent_id, provider, model, scope)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access)")
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ ResponseCache: armazenamento indisponível ({e}); cache desativado")
+            self._conn = None
+
+    # --- Chaves e embeddings ------------------------------------------------
+
+    @staticmethod
+    def get_cache_key(messages: list, provider: str, model: str, temperature: Optional[float] = None,
+                      agent_id: Optional[str] = None) -> str:
+        """
+        Gera chave única para o nível exato. A temperatura e o agente entram
+        na chave, como no escopo do nível semântico: a mesma conversa com
+        outra temperatura ou de outro agente não reaproveita a resposta.
+        """
+        content = (f"{provider}\x00{model}\x00{temperature}\x00{agent_id or ''}\x00"
+                   f"{json.dumps(messages, sort_keys=True, ensure_ascii=False)}")
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def _embed(self, text: str) -> List[float]:
+        if self._embed_fn is None:
+            from embedding_engine import get_embedding_engine, DEFAULT_EMBEDDING_MODEL
+            from embedding_cache import get_embedding_cache
+
+            engine, cache = get_embedding_engine(), get_embedding_cache()
+            self._embed_fn = lambda texts: cache.get_or_compute(
+                texts, DEFAULT_EMBEDDING_MODEL, lambda missing: engine.embed_texts(missing)
+            )
+        return _normalize(self._embed_fn([text])[0])
+
+    # --- Métricas -----------------------------------------------------------
+
+    def _record(self, outcome: str, latency_saved: float = 0.0):
+        with self._lock:
+            if outcome == "exact_hit":
+                self.exact_hits += 1
+            elif outcome == "semantic_hit":
+                self.semantic_hits += 1
+            else:
+                self.misses += 1
+            self.latency_saved += latency_saved
+        if not self.record_metrics:
+            return
         try:
-            with open(self.cache_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return {}
-    
-    def _save_cache(self):
-        """Salva cache no arquivo"""
-        with open(self.cache_file, 'w', encoding='utf-8') as f:
-            json.dump(self.cache, f, indent=2, ensure_ascii=False, default=str)
-    
-    def get_cache_key(self, messages: list, provider: str, model: str) -> str:
-        """Gera chave única para cache"""
-        content = f"{provider}_{model}_{json.dumps(messages, sort_keys=True)}"
-        return hashlib.md5(content.encode()).hexdigest()
-    
-    def get(self, messages: list, provider: str, model: str, max_age_hours: int = 24) -> Optional[str]:
-        """Recupera resposta do cache se válida"""
-        key = self.get_cache_key(messages, provider, model)
-        
-        if key in self.cache:
-            entry = self.cache[key]
-            cached_time = datetime.fromisoformat(entry['timestamp'])
-            
-            if datetime.now() - cached_time < timedelta(hours=max_age_hours):
-                return entry['response']
-        
+            from metrics_collector import get_metrics_collector
+            get_metrics_collector().record_cache_event("response_cache", outcome, latency_saved)
+        except Exception as e:
+            logger.debug(f"ResponseCache: falha ao registrar métrica: {e}")
+
+    # --- Leitura ------------------------------------------------------------
+
+    def _touch(self, key: str):
+        self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+        self._conn.commit()
+
+    def _get_exact(self, key: str, max_age: float) -> Optional[tuple]:
+        row = self._conn.execute(
+            "SELECT response, latency FROM responses WHERE key = ? AND created_at > ?",
+            (key, time.time() - max_age)
+        ).fetchone()
+        if row:
+            self._touch(key)
+        return row
+
+    def get(self, messages: list, provider: str, model: str, max_age_hours: Optional[float] = None,
+            temperature: Optional[float] = None, agent_id: Optional[str] = None) -> Optional[str]:
+        """Recupera resposta do nível exato se válida"""
+        if not self._conn:
+            return None
+        max_age = max_age_hours * 3600 if max_age_hours is not None else self.ttl_seconds
+        with self._lock:
+            try:
+                row = self._get_exact(self.get_cache_key(messages, provider, model, temperature, agent_id), max_age)
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ ResponseCache: erro de leitura: {e}")
+                return None
+        if row:
+            self._record("exact_hit", row[1] or 0.0)
+            return row[0]
+        self._record("miss")
+        return None
+
+    def lookup(self, query: str, agent_id: str, scope: str, provider: str, model: str,
+               messages: Optional[list] = None, temperature: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Procura uma resposta reaproveitável: primeiro pelo nível exato (se
+        ``messages`` for dado), depois pelo nível semântico dentro do mesmo
+        agente/provedor/modelo/escopo.
+        """
+        if not self._conn:
+            return None
+
+        with self._lock:
+            try:
+                if messages is not None:
+                    key = self.get_cache_key(messages, provider, model, temperature, agent_id)
+                    row = self._get_exact(key, self.ttl_seconds)
+                    if row:
+                        result = {"response": row[0], "tier": "exact", "similarity": 1.0, "latency_saved": row[1] or 0.0}
+                        self._record("exact_hit", result["latency_saved"])
+                        return result
+
+                candidates = self._conn.execute(
+                    "SELECT key, embedding, response, latency FROM responses "
+                    "WHERE agent_id = ? AND provider = ? AND model = ? AND scope = ? "
+                    "AND embedding IS NOT NULL AND created_at > ?",
+                    (agent_id, provider, model, scope, time.time() - self.ttl_seconds)
+                ).fetchall()
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ ResponseCache: erro de leitura: {e}")
+                return None
+
+        if candidates:
+            query_vector = self._embed(query)
+            best, best_score = None, -1.0
+            for key, blob, response, latency in candidates:
+                score = sum(a * b for a, b in zip(query_vector, _unpack(blob)))
+                if score > best_score:
+                    best, best_score = (key, response, latency), score
+
+            if best_score >= self.semantic_threshold:
+                with self._lock:
+                    self._touch(best[0])
+                result = {"response": best[1], "tier": "semantic", "similarity": round(best_score, 4),
+                          "latency_saved": best[2] or 0.0}
+                logger.info(f"🎯 ResponseCache: acerto semântico (similaridade {best_score:.3f}) para o agente {agent_id}")
+                self._record("semantic_hit", result["latency_saved"])
+                return result
+
+        self._record("miss")
+        return None
+
+    # --- Escrita e despejo --------------------------------------------------
+
+    def set(self, messages: list, provider: str, model: str, response: str, latency: float = 0.0,
+            temperature: Optional[float] = None, agent_id: Optional[str] = None):
+        """Armazena resposta no nível exato"""
+        key = self.get_cache_key(messages, provider, model, temperature, agent_id)
+        self._store(key, agent_id, provider, model, None, None, None, response, latency)
+
+    def store(self, query: str, agent_id: str, scope: str, provider: str, model: str, response: str,
+              latency: float = 0.0, messages: Optional[list] = None, temperature: Optional[float] = None):
+        """Armazena resposta nos dois níveis (exato por mensagens e semântico por pergunta)"""
+        key = self.get_cache_key(messages, provider, model, temperature, agent_id) if messages is not None else \
+            scope_hash(agent_id, provider, model, scope, query)
+        embedding = _pack(self._embed(query))
+        self._store(key, agent_id, provider, model, scope, query, embedding, response, latency)
+
+    def _store(self, key, agent_id, provider, model, scope, query, embedding, response, latency):
+        if not self._conn or not response:
+            return
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses "
+                    "(key, agent_id, provider, model, scope, query, embedding, response, latency, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, agent_id, provider, model, scope, query, embedding, response, latency, now, now)
+                )
+                self._conn.commit()
+                self._writes += 1
+                # Despejo amortizado: não precisa rodar a cada escrita
+                if self._writes % 50 == 1:
+                    self.evict()
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ ResponseCache: erro de escrita: {e}")
+
+    def evict(self) -> int:
+        """Remove entradas expiradas e, acima do limite, as menos acessadas"""
+        if not self._conn:
+            return 0
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM responses WHERE created_at <= ?",
+                                         (time.time() - self.ttl_seconds,)).rowcount
+            count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_entries:
+                removed += self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                ).rowcount
+            self._conn.commit()
+        if removed:
+            logger.info(f"🧹 ResponseCache: {removed} respostas removidas")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de acerto por nível e latência economizada (deste processo)"""
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            total = hits + self.misses
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] if self._conn else 0
+            return {
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / total * 100, 2) if total else 0.0,
+                "latency_saved_seconds": round(self.latency_saved, 2),
+                "entries": entries,
+                "max_entries": self.max_entries
+            }
+
+    def clear(self):
+        with self._lock:
+            if self._conn:
+                self._conn.execute("DELETE FROM responses")
+                self._conn.commit()
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Retorna o cache de respostas compartilhado (None se desativado via RESPONSE_CACHE_ENABLED=false)"""
+    global _cache
+    if os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
         return None
-    
-    def set(self, messages: list, provider: str, model: str, response: str):
-        """Armazena resposta no cache"""
-        key = self.get_cache_key(messages, provider, model)
-        
-        self.cache[key] = {
-            'response': response,
-            'timestamp': datetime.now().isoformat(),
-            'provider': provider,
-            'model': model
-        }
-        
-        self._save_cache()
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(
+                    db_path=os.getenv("RESPONSE_CACHE_PATH", "response_cache.db"),
+                    ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_HOURS", "24")) * 3600,
+                    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000")),
+                    semantic_threshold=float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95"))
+                )
+    return _cache
@@ -42,7 +42,11 @@ CREATE TABLE documents (
 
 COMMENT ON TABLE documents IS 'Armazena metadados de cada documento fonte de um agente.';
 CREATE INDEX idx_docs_agent_id ON documents(agent_id);
-CREATE UNIQUE INDEX idx_docs_hash ON documents(content_hash);
+-- O mesmo conteúdo pode pertencer a agentes diferentes; a unicidade é por agente
+-- (bancos com o antigo idx_docs_hash global: python vector_index_manager.py --doc-hash)
+CREATE UNIQUE INDEX idx_docs_agent_hash ON documents(agent_id, content_hash);
+-- Localiza o documento de uma fonte para a reingestão incremental
+CREATE INDEX idx_docs_agent_file ON documents(agent_id, file_name);
 
 -- ---------------------------------------------------------------------
 -- Tabela 3: document_chunks
@@ -54,12 +58,61 @@ CREATE TABLE document_chunks (
     agent_id UUID NOT NULL REFERENCES agentes(id) ON DELETE CASCADE,
     chunk_text TEXT NOT NULL,
     embedding VECTOR(1536) NOT NULL, -- Dimensão para text-embedding-3-small
+    -- Busca textual da recuperação híbrida: palavras com stemming em português
+    -- e números sem pontuação (CPF/CNPJ, artigos) para casamento exato
+    chunk_tsv TSVECTOR GENERATED ALWAYS AS (
+        to_tsvector('portuguese', chunk_text) ||
+        to_tsvector('simple', regexp_replace(regexp_replace(chunk_text, '(\d)[.\-/](?=\d)', '\1', 'g'), '\D+', ' ', 'g'))
+    ) STORED,
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
 COMMENT ON TABLE document_chunks IS 'Coração do RAG, armazena chunks e seus embeddings.';
 CREATE INDEX idx_chunks_embedding ON document_chunks USING hnsw (embedding vector_cosine_ops);
 CREATE INDEX idx_chunks_agent_id ON document_chunks(agent_id);
+CREATE INDEX idx_chunks_tsv ON document_chunks USING gin (chunk_tsv);
+
+-- Versão dos chunks de cada agente: incrementada por statement (inclusive COPY)
+-- para que os índices vetoriais locais em memória saibam quando recarregar.
+-- Sem chave estrangeira: o despejo em cascata de um agente também dispara o trigger.
+CREATE TABLE agent_chunk_versions (
+    agent_id UUID PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION bump_agent_chunk_version() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO agent_chunk_versions (agent_id, version)
+    SELECT DISTINCT agent_id, 1 FROM changed_rows
+    ON CONFLICT (agent_id) DO UPDATE
+        SET version = agent_chunk_versions.version + 1, updated_at = NOW();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_chunks_version_insert AFTER INSERT ON document_chunks
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_agent_chunk_version();
+CREATE TRIGGER trg_chunks_version_update AFTER UPDATE ON document_chunks
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_agent_chunk_version();
+CREATE TRIGGER trg_chunks_version_delete AFTER DELETE ON document_chunks
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_agent_chunk_version();
+
+-- Histórico de construção dos índices vetoriais (global, parciais por agente)
+-- Os índices HNSW parciais de agentes grandes são geridos por vector_index_manager.py
+CREATE TABLE vector_index_builds (
+    id BIGSERIAL PRIMARY KEY,
+    index_name TEXT NOT NULL,
+    agent_id UUID,
+    chunks BIGINT,
+    build_seconds DOUBLE PRECISION,
+    size_bytes BIGINT,
+    built_at TIMESTAMPTZ DEFAULT NOW()
+);
+CREATE INDEX idx_vector_index_builds_name ON vector_index_builds(index_name, built_at DESC);
 
 -- ---------------------------------------------------------------------
 -- Tabela 4: conversations
@@ -73,7 +126,8 @@ CREATE TABLE conversations (
 );
 
 COMMENT ON TABLE conversations IS 'Registra a entrada do usuário em uma conversa com um agente.';
-CREATE INDEX idx_conversations_agent_id ON conversations(agent_id);
+-- Chave da paginação por keyset e da janela de histórico (mais recentes primeiro)
+CREATE INDEX idx_conversations_agent_created ON conversations(agent_id, created_at DESC, id DESC);
 
 -- ---------------------------------------------------------------------
 -- Tabela 5: llm_responses
@@ -92,4 +146,19 @@ CREATE TABLE llm_responses (
 
 COMMENT ON TABLE llm_responses IS 'Armazena cada resposta de um LLM, permitindo comparação e feedback individual.';
 COMMENT ON COLUMN llm_responses.feedback IS 'Feedback do usuário: -1 para ruim, 0 para neutro, 1 para bom.';
-CREATE INDEX idx_responses_conversation_id ON llm_responses(conversation_id); 
\ No newline at end of file
+CREATE INDEX idx_responses_conversation_id ON llm_responses(conversation_id);
+
+-- ---------------------------------------------------------------------
+-- Tabela 6: conversation_summaries
+-- Resumo incremental dos turnos que já saíram da janela de histórico do agente.
+-- ---------------------------------------------------------------------
+CREATE TABLE conversation_summaries (
+    agent_id UUID PRIMARY KEY REFERENCES agentes(id) ON DELETE CASCADE,
+    summary TEXT NOT NULL DEFAULT '',
+    covered_until TIMESTAMPTZ, -- (covered_until, covered_id): último turno incorporado ao resumo
+    covered_id UUID,
+    turns_covered INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+COMMENT ON TABLE conversation_summaries IS 'Resumo em cache do histórico antigo de cada agente, estendido em lotes pelo HistoryManager.';
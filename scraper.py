@@ -6,14 +6,21 @@ import time
 import json
 from datetime import datetime
 from typing import List, Dict, Any, Optional
-from playwright.async_api import async_playwright
-from bs4 import BeautifulSoup, Comment
+
+from html_extractor import extract_content
+from browser_pool import USER_AGENT, get_browser_pool
+from resource_blocking import CaptureNetwork, get_network_stats, get_resource_policy
+from http_fetcher import (TIER_BROWSER, TIER_HTTP, get_http_fetcher, get_tier_cache, html_title,
+                          http_first_enabled, needs_browser, url_domain)
+
+# Bases jurídicas com login/JS pesado: sempre capturadas no navegador
+PREMIUM_SITES = ['thomsonreuters', 'westlaw', 'lexisnexis', 'vlex', 'proview']
 
 # Importações para integração OpenAI
 import os
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
-from openai import OpenAI
+from embedding_engine import get_embedding_engine
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -71,105 +78,40 @@ def clean_text(text: str) -> str:
 def extract_main_content_from_html(html_content: str) -> dict:
     """
     Extrai múltiplas versões do conteúdo do HTML para posterior processamento.
-    Retorna um dicionário com diferentes extrações.
+    Retorna um dicionário com diferentes extrações (ver html_extractor).
     """
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    # Remover elementos que nunca contêm conteúdo útil
-    unwanted_elements = [
-        'script', 'style', 'noscript', 'iframe', 'embed', 'object', 'svg',
-        'meta', 'link', 'title', 'base', 'area', 'map'
-    ]
-    
-    for selector in unwanted_elements:
-        for element in soup.select(selector):
-            element.decompose()
-    
-    # Remover comentários HTML
-    for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
-        comment.extract()
-    
-    # Extrair diferentes tipos de conteúdo
-    content_extractions = {
-        'title': soup.title.get_text(strip=True) if soup.title else "",
-        'meta_description': "",
-        'headings': [],
-        'paragraphs': [],
-        'lists': [],
-        'semantic_content': "",
-        'full_body_text': "",
-        'jurisprudence_content': ""  # Específico para sites jurídicos
-    }
-    
-    # Meta description
-    meta_desc = soup.find('meta', attrs={'name': 'description'})
-    if meta_desc:
-        content_extractions['meta_description'] = meta_desc.get('content', '')
-    
-    # Extrair headings (h1-h6)
-    for heading in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
-        text = heading.get_text(strip=True)
-        if text and len(text) > 2:
-            content_extractions['headings'].append({
-                'level': heading.name,
-                'text': text
-            })
-    
-    # Extrair parágrafos
-    for p in soup.find_all('p'):
-        text = p.get_text(strip=True)
-        if text and len(text) > 10:
-            content_extractions['paragraphs'].append(text)
-    
-    # Extrair listas
-    for ul in soup.find_all(['ul', 'ol']):
-        items = []
-        for li in ul.find_all('li'):
-            text = li.get_text(strip=True)
-            if text and len(text) > 3:
-                items.append(text)
-        if items:
-            content_extractions['lists'].append(items)
-    
-    # Extrair conteúdo semântico (main, article, section)
-    semantic_selectors = [
-        'main', 'article', 'section',
-        '[role="main"]', '.content', '.main-content',
-        '.article-content', '.post-content', '.entry-content'
-    ]
-    
-    semantic_texts = []
-    for selector in semantic_selectors:
-        elements = soup.select(selector)
-        for element in elements:
-            text = element.get_text(separator='\n', strip=True)
-            if text and len(text) > 50:
-                semantic_texts.append(text)
-    
-    content_extractions['semantic_content'] = '\n\n'.join(semantic_texts)
-    
-    # Extrair conteúdo jurídico específico
-    jurisprudence_selectors = [
-        '.jurisprudencia-content', '.decisao-content', '.ementa',
-        '.acordao', '.sentenca', '.voto', '.relatorio', '.fundamentacao',
-        '.tribunal', '.processo', '.julgamento', '.decisao'
-    ]
+    return extract_content(html_content)
+
+def _pick_main_content(extractions: dict, verbose: bool = True) -> Optional[str]:
+    """
+    Escolhe o conteúdo principal de um site comum (não premium), na ordem:
+    jurídico, semântico, parágrafos e texto completo. None se a página é rala.
+    """
+    # Priorizar conteúdo jurídico se disponível
+    if extractions['jurisprudence_content'] and len(extractions['jurisprudence_content'].strip()) > 100:
+        if verbose:
+            logger.info("🏛️ Usando conteúdo jurídico específico")
+        return extractions['jurisprudence_content']
     
-    jurisprudence_texts = []
-    for selector in jurisprudence_selectors:
-        elements = soup.select(selector)
-        for element in elements:
-            text = element.get_text(separator='\n', strip=True)
-            if text and len(text) > 20:
-                jurisprudence_texts.append(text)
+    # Senão, usar conteúdo semântico
+    if extractions['semantic_content'] and len(extractions['semantic_content'].strip()) > 200:
+        if verbose:
+            logger.info("📄 Usando conteúdo semântico")
+        return extractions['semantic_content']
     
-    content_extractions['jurisprudence_content'] = '\n\n'.join(jurisprudence_texts)
+    # Combinar parágrafos se necessário
+    if extractions['paragraphs'] and len(extractions['paragraphs']) > 2:
+        if verbose:
+            logger.info("📝 Usando parágrafos combinados")
+        return '\n\n'.join(extractions['paragraphs'])
     
-    # Extrair texto completo do body como fallback
-    if soup.body:
-        content_extractions['full_body_text'] = soup.body.get_text(separator='\n', strip=True)
+    # Usar texto completo do body como último recurso
+    if extractions['full_body_text'] and len(extractions['full_body_text'].strip()) > 100:
+        if verbose:
+            logger.info("🌐 Usando texto completo do body")
+        return extractions['full_body_text']
     
-    return content_extractions
+    return None
 
 def process_content_extractions(extractions: dict, url: str, protected: bool = False) -> str:
     """
@@ -177,9 +119,7 @@ def process_content_extractions(extractions: dict, url: str, protected: bool = F
     Versão melhorada para sites premium.
     """
     # Detectar se é site premium
-    is_premium = any(domain in url.lower() for domain in [
-        'thomsonreuters', 'westlaw', 'lexisnexis', 'vlex', 'proview'
-    ])
+    is_premium = any(domain in url.lower() for domain in PREMIUM_SITES)
     
     # Para sites premium, tentar estratégias mais agressivas primeiro
     if is_premium:
@@ -215,29 +155,7 @@ def process_content_extractions(extractions: dict, url: str, protected: bool = F
             else:
                 main_content = None
     else:
-        # Lógica normal para sites não-premium
-        # Priorizar conteúdo jurídico se disponível
-        if extractions['jurisprudence_content'] and len(extractions['jurisprudence_content'].strip()) > 100:
-            main_content = extractions['jurisprudence_content']
-            logger.info("🏛️ Usando conteúdo jurídico específico")
-        
-        # Senão, usar conteúdo semântico
-        elif extractions['semantic_content'] and len(extractions['semantic_content'].strip()) > 200:
-            main_content = extractions['semantic_content']
-            logger.info("📄 Usando conteúdo semântico")
-        
-        # Combinar parágrafos se necessário
-        elif extractions['paragraphs'] and len(extractions['paragraphs']) > 2:
-            main_content = '\n\n'.join(extractions['paragraphs'])
-            logger.info("📝 Usando parágrafos combinados")
-        
-        # Usar texto completo do body como último recurso
-        elif extractions['full_body_text'] and len(extractions['full_body_text'].strip()) > 100:
-            main_content = extractions['full_body_text']
-            logger.info("🌐 Usando texto completo do body")
-        
-        else:
-            main_content = None
+        main_content = _pick_main_content(extractions)
     
     # Se não há conteúdo suficiente
     if not main_content:
@@ -365,223 +283,225 @@ async def detect_cloudflare_protection(page):
     except Exception:
         return False
 
+# Seletores que indicam que o conteúdo principal já está no DOM
+CONTENT_SELECTORS = [
+    'main', 'article', '[role="main"]', '.content', '.main-content',
+    '.document-content', '.legal-content', '.case-content', '.text-content'
+]
+
+def _capture_mode() -> str:
+    """fast (padrão): espera pela rede ociosa; stealth: pausas aleatórias e comportamento humano em toda página"""
+    return os.getenv("SCRAPER_CAPTURE_MODE", "fast").lower()
+
+async def _wait_until_ready(page, cap_ms: int) -> str:
+    """Aguarda a rede ficar ociosa por no máximo cap_ms; retorna 'networkidle' ou 'cap'"""
+    try:
+        await page.wait_for_load_state('networkidle', timeout=cap_ms)
+        return 'networkidle'
+    except Exception:
+        return 'cap'
+
+async def _wait_cloudflare_clearance(page, url: str, cap_ms: int) -> bool:
+    """Aguarda a verificação automática do Cloudflare; retorna se a proteção continua"""
+    logger.warning(f"🛡️ Proteção Cloudflare detectada em {url}")
+    logger.info("⏳ Aguardando verificação automática...")
+    deadline = time.monotonic() + cap_ms / 1000
+    await human_like_behavior(page)
+    while time.monotonic() < deadline:
+        await _wait_until_ready(page, 2000)
+        if not await detect_cloudflare_protection(page):
+            return False
+        await page.wait_for_timeout(1000)
+    logger.warning(f"🚫 Não foi possível contornar a proteção de {url}")
+    return True
+
+async def _capture_page(page, url: str) -> dict:
+    """
+    Navega e espera o conteúdo em uma página do pool de navegadores.
+    Roda no loop do pool; a extração do HTML fica com quem chamou.
+    Imagens, fontes, mídia e rastreadores são abortados (ResourcePolicy) e a
+    espera é pela rede ociosa, limitada por SCRAPER_NETWORK_IDLE_CAP_MS.
+    """
+    is_premium_site = any(domain in url.lower() for domain in PREMIUM_SITES)
+    stealth = _capture_mode() == "stealth"
+    idle_cap = int(os.getenv("SCRAPER_NETWORK_IDLE_CAP_MS", "8000"))
+    if is_premium_site:
+        # Sites premium carregam o conteúdo em várias levas de XHR
+        idle_cap *= 2
+        logger.info("🏢 Site premium detectado - aguardando mais o carregamento")
+    
+    network = CaptureNetwork(get_resource_policy())
+    await network.install(page)
+    
+    if stealth:
+        # Delay inicial aleatório
+        await page.wait_for_timeout(random.randint(2000, 4000))
+    
+    # Navegar para a página e aguardar a rede ficar ociosa (com teto)
+    logger.info(f"🌐 Navegando para: {url}")
+    await page.goto(url, timeout=45000, wait_until='domcontentloaded')
+    await _wait_until_ready(page, idle_cap)
+    
+    # Verificar se há proteção Cloudflare
+    has_cloudflare = await detect_cloudflare_protection(page)
+    if has_cloudflare:
+        has_cloudflare = await _wait_cloudflare_clearance(
+            page, url, int(os.getenv("SCRAPER_CLOUDFLARE_CAP_MS", "25000")))
+    
+    # Para sites premium, tentar executar JavaScript adicional
+    if is_premium_site:
+        logger.info("🔧 Executando JavaScript adicional para site premium...")
+        
+        # Tentar forçar carregamento de conteúdo
+        try:
+            await page.evaluate("""
+                // Scroll para ativar lazy loading
+                window.scrollTo(0, document.body.scrollHeight / 2);
+                
+                // Tentar clicar em elementos que podem carregar conteúdo
+                const buttons = document.querySelectorAll('button, [role="button"], .load-more, .show-more');
+                for (let btn of buttons) {
+                    if (btn.textContent && btn.textContent.toLowerCase().includes('load')) {
+                        btn.click();
+                        break;
+                    }
+                }
+            """)
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao executar JavaScript adicional: {e}")
+    
+    if stealth:
+        # Simular comportamento humano
+        await human_like_behavior(page)
+    
+    # Conteúdo carregado por scroll/cliques: nova espera pela rede ociosa
+    ready = await _wait_until_ready(page, idle_cap)
+    
+    # Um único seletor combinado (em vez de esperar cada seletor em sequência)
+    try:
+        await page.wait_for_selector(', '.join(CONTENT_SELECTORS), timeout=3000)
+    except Exception:
+        logger.info("ℹ️ Nenhum contêiner de conteúdo conhecido encontrado")
+    
+    network.mark_ready(ready)
+    summary = network.summary()
+    get_network_stats().record(summary)
+    logger.info(f"📉 Captura pronta em {summary['load_ms']:.0f} ms ({ready}) - "
+                f"{summary['blocked']}/{summary['requests']} requisições bloqueadas, "
+                f"~{summary['bytes_saved_estimate'] // 1024} KB economizados")
+    
+    # Extrair todos os dados
+    return {
+        'title': await page.title(),
+        'html': await page.content(),
+        'final_url': page.url,
+        'protected': has_cloudflare,
+        'is_premium_site': is_premium_site,
+        'network': summary
+    }
+
+def _build_page_data(url: str, captured: dict, extractions: dict, tier: str) -> dict:
+    """Monta o JSON da captura (mesmo formato para as camadas HTTP e navegador)"""
+    return {
+        'capture_info': {
+            'original_url': url,
+            'final_url': captured['final_url'],
+            'timestamp': datetime.now().isoformat(),
+            'protected': captured['protected'],
+            'is_premium_site': captured['is_premium_site'],
+            'user_agent': USER_AGENT,
+            'tier': tier,
+            'network': captured.get('network')
+        },
+        'page_metadata': {
+            'title': captured['title'],
+            'html_length': len(captured['html'])
+        },
+        'raw_html': captured['html'],
+        'content_extractions': extractions
+    }
+
+async def _try_http_capture(url: str) -> tuple:
+    """
+    Camada HTTP: GET no cliente persistente e, se o HTML bastar, a captura
+    pronta. Retorna (captura, extrações, motivo_da_escalada, texto_http).
+    """
+    started = time.perf_counter()
+    try:
+        response = await get_http_fetcher().fetch(url)
+    except Exception as e:
+        return None, None, f"erro HTTP: {e}", ""
+
+    extractions = extract_main_content_from_html(response['html']) if 'html' in response['content_type'] else None
+    text = extractions['full_body_text'] if extractions else ""
+    has_main_content = bool(extractions) and _pick_main_content(extractions, verbose=False) is not None
+    reason = needs_browser(response, text, has_main_content)
+    if reason:
+        return None, None, reason, text
+
+    captured = {
+        'title': html_title(response['html']),
+        'html': response['html'],
+        'final_url': response['final_url'],
+        'protected': False,
+        'is_premium_site': False,
+        'network': {
+            'requests': 1,
+            'blocked': 0,
+            'bytes_loaded': response['bytes'],
+            'load_ms': round((time.perf_counter() - started) * 1000, 1),
+            'ready': 'http'
+        }
+    }
+    return captured, extractions, None, text
+
 async def scrape_url_to_json(url: str) -> dict:
     """
     Captura uma página e retorna todos os dados em formato JSON para posterior processamento.
-    Versão melhorada para sites com muito JavaScript.
+    Tenta primeiro um GET HTTP simples e só usa o navegador persistente do pool
+    quando a página precisa de JavaScript; a camada que funcionou fica lembrada
+    por domínio.
     """
     logger.info(f"🔍 Iniciando captura JSON da URL: {url}")
     
     try:
-        async with async_playwright() as p:
-            # Configurar browser com flags anti-detecção
-            browser = await p.chromium.launch(
-                headless=True,
-                args=[
-                    '--no-sandbox',
-                    '--disable-dev-shm-usage',
-                    '--disable-blink-features=AutomationControlled',
-                    '--disable-web-security',
-                    '--disable-features=VizDisplayCompositor',
-                    '--disable-automation',
-                    '--disable-extensions',
-                    '--no-first-run',
-                    '--disable-default-apps',
-                    '--disable-background-timer-throttling',
-                    '--disable-backgrounding-occluded-windows',
-                    '--disable-renderer-backgrounding',
-                    '--disable-field-trial-config',
-                    '--disable-back-forward-cache',
-                    '--disable-ipc-flooding-protection',
-                    '--enable-javascript',  # Garantir que JS está habilitado
-                    '--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36'
-                ]
-            )
-            
-            # Criar contexto com configurações realistas
-            context = await browser.new_context(
-                viewport={'width': 1920, 'height': 1080},
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
-                locale='pt-BR',
-                timezone_id='America/Sao_Paulo',
-                permissions=['geolocation'],
-                java_script_enabled=True,  # Explicitamente habilitar JavaScript
-                extra_http_headers={
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-                    'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
-                    'Accept-Encoding': 'gzip, deflate, br',
-                    'DNT': '1',
-                    'Connection': 'keep-alive',
-                    'Upgrade-Insecure-Requests': '1',
-                    'Sec-Fetch-Dest': 'document',
-                    'Sec-Fetch-Mode': 'navigate',
-                    'Sec-Fetch-Site': 'none',
-                    'Sec-Fetch-User': '?1',
-                    'Cache-Control': 'max-age=0'
-                }
-            )
-            
-            page = await context.new_page()
-            
-            # Mascarar propriedades que indicam automação
-            await page.add_init_script("""
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined,
-                });
-                
-                Object.defineProperty(navigator, 'plugins', {
-                    get: () => [1, 2, 3, 4, 5],
-                });
-                
-                Object.defineProperty(navigator, 'languages', {
-                    get: () => ['pt-BR', 'pt', 'en'],
-                });
-                
-                window.chrome = {
-                    runtime: {},
-                };
-                
-                Object.defineProperty(navigator, 'permissions', {
-                    get: () => ({
-                        query: () => Promise.resolve({ state: 'granted' }),
-                    }),
-                });
-            """)
-            
-            # Para sites premium, permitir mais recursos
-            is_premium_site = any(domain in url.lower() for domain in [
-                'thomsonreuters', 'westlaw', 'lexisnexis', 'vlex', 'proview'
-            ])
-            
-            if is_premium_site:
-                # Para sites premium, permitir CSS e outros recursos
-                await page.route("**/*", lambda route: (
-                    route.abort() if route.request.resource_type in [
-                        "image", "font", "media"
-                    ] else route.continue_()
-                ))
-                logger.info("🏢 Site premium detectado - permitindo mais recursos")
-            else:
-                # Para sites normais, bloquear mais recursos
-                await page.route("**/*", lambda route: (
-                    route.abort() if route.request.resource_type in [
-                        "image", "font", "media"
-                    ] else route.continue_()
-                ))
-            
-            # Delay inicial aleatório
-            await page.wait_for_timeout(random.randint(2000, 4000))
-            
-            # Navegar para a página
-            logger.info(f"🌐 Navegando para: {url}")
-            await page.goto(url, timeout=45000, wait_until='networkidle')  # Aguardar rede idle
-            
-            # Aguardar carregamento inicial mais longo para sites JS-heavy
-            await page.wait_for_timeout(random.randint(5000, 8000))
-            
-            # Verificar se há proteção Cloudflare
-            has_cloudflare = await detect_cloudflare_protection(page)
-            
-            if has_cloudflare:
-                logger.warning(f"🛡️ Proteção Cloudflare detectada em {url}")
-                
-                # Tentar aguardar mais tempo para verificação automática
-                logger.info("⏳ Aguardando verificação automática...")
-                await page.wait_for_timeout(random.randint(10000, 15000))
-                
-                # Simular comportamento humano
-                await human_like_behavior(page)
-                
-                # Aguardar mais um pouco
-                await page.wait_for_timeout(random.randint(5000, 10000))
-                
-                # Verificar novamente se ainda há proteção
-                has_cloudflare = await detect_cloudflare_protection(page)
-                
-                if has_cloudflare:
-                    logger.warning(f"🚫 Não foi possível contornar a proteção de {url}")
-            
-            # Para sites premium, tentar executar JavaScript adicional
-            if is_premium_site:
-                logger.info("🔧 Executando JavaScript adicional para site premium...")
-                
-                # Tentar forçar carregamento de conteúdo
-                try:
-                    await page.evaluate("""
-                        // Scroll para ativar lazy loading
-                        window.scrollTo(0, document.body.scrollHeight / 2);
-                        
-                        // Aguardar um pouco
-                        await new Promise(resolve => setTimeout(resolve, 2000));
-                        
-                        // Tentar clicar em elementos que podem carregar conteúdo
-                        const buttons = document.querySelectorAll('button, [role="button"], .load-more, .show-more');
-                        for (let btn of buttons) {
-                            if (btn.textContent && btn.textContent.toLowerCase().includes('load')) {
-                                btn.click();
-                                break;
-                            }
-                        }
-                        
-                        // Aguardar mais um pouco
-                        await new Promise(resolve => setTimeout(resolve, 3000));
-                    """)
-                    await page.wait_for_timeout(3000)
-                except Exception as e:
-                    logger.warning(f"⚠️ Erro ao executar JavaScript adicional: {e}")
-            
-            # Simular mais comportamento humano
-            await human_like_behavior(page)
-            
-            # Aguardar conteúdo dinâmico - mais tempo para sites premium
-            wait_time = random.randint(8000, 12000) if is_premium_site else random.randint(3000, 6000)
-            await page.wait_for_timeout(wait_time)
-            
-            # Tentar aguardar por seletores específicos de conteúdo
-            content_selectors = [
-                'main', 'article', '[role="main"]', '.content', '.main-content',
-                '.document-content', '.legal-content', '.case-content', '.text-content'
-            ]
-            
-            for selector in content_selectors:
-                try:
-                    await page.wait_for_selector(selector, timeout=5000)
-                    logger.info(f"✅ Conteúdo encontrado: {selector}")
-                    break
-                except:
-                    continue
-            
-            # Extrair todos os dados
-            title = await page.title()
-            html_content = await page.content()
-            current_url = page.url
-            
-            await browser.close()
-            
-            # Criar objeto JSON com todos os dados
-            page_data = {
-                'capture_info': {
-                    'original_url': url,
-                    'final_url': current_url,
-                    'timestamp': datetime.now().isoformat(),
-                    'protected': has_cloudflare,
-                    'is_premium_site': is_premium_site,
-                    'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36'
-                },
-                'page_metadata': {
-                    'title': title,
-                    'html_length': len(html_content)
-                },
-                'raw_html': html_content,
-                'content_extractions': extract_main_content_from_html(html_content)
-            }
-            
-            logger.info(f"📦 Dados JSON capturados - Título: '{title}' | HTML: {len(html_content)} chars")
-            
-            return {
-                "success": True,
-                "data": page_data
-            }
+        tiers = get_tier_cache()
+        domain = url_domain(url)
+        is_premium_site = any(site in url.lower() for site in PREMIUM_SITES)
+        escalation, http_text = None, ""
+
+        if http_first_enabled() and not is_premium_site and tiers.get(domain) != TIER_BROWSER:
+            captured, extractions, escalation, http_text = await _try_http_capture(url)
+            if captured:
+                tiers.remember(domain, TIER_HTTP)
+                tiers.count('http')
+                page_data = _build_page_data(url, captured, extractions, TIER_HTTP)
+                logger.info(f"⚡ Captura HTTP - Título: '{captured['title']}' | HTML: {len(captured['html'])} chars")
+                return {"success": True, "data": page_data}
+            logger.info(f"⬆️ Escalando {url} para o navegador: {escalation}")
+            tiers.count('escalated')
+        else:
+            tiers.count('browser_direct')
+
+        captured = await get_browser_pool().run(lambda page: _capture_page(page, url))
+        extractions = extract_main_content_from_html(captured['html'])
+        
+        if escalation and not is_premium_site:
+            # O navegador só fica lembrado se trouxe bem mais texto ou se o HTTP foi barrado
+            browser_text = extractions['full_body_text']
+            blocked = escalation.startswith(("HTTP ", "erro HTTP", "desafio", "proteção"))
+            tier = TIER_BROWSER if blocked or len(browser_text) > 1.5 * len(http_text) + 200 else TIER_HTTP
+            tiers.remember(domain, tier)
+        
+        page_data = _build_page_data(url, captured, extractions, TIER_BROWSER)
+        title, html_content = captured['title'], captured['html']
+        
+        logger.info(f"📦 Dados JSON capturados - Título: '{title}' | HTML: {len(html_content)} chars")
+        
+        return {
+            "success": True,
+            "data": page_data
+        }
             
     except Exception as e:
         error_msg = f"Erro ao capturar JSON da URL {url}: {str(e)}"
@@ -795,9 +715,6 @@ def generate_embeddings_with_openai(texts: List[str], model: str = "text-embeddi
             logger.error("❌ OPENAI_API_KEY não configurada")
             return []
         
-        # Inicializar cliente OpenAI
-        client = OpenAI(api_key=api_key)
-        
         # Filtrar textos vazios
         valid_texts = [text.strip() for text in texts if text.strip()]
         if not valid_texts:
@@ -806,14 +723,8 @@ def generate_embeddings_with_openai(texts: List[str], model: str = "text-embeddi
         
         logger.info(f"🔮 Gerando embeddings para {len(valid_texts)} textos usando modelo {model}")
         
-        # Gerar embeddings
-        response = client.embeddings.create(
-            input=valid_texts,
-            model=model
-        )
-        
-        # Extrair os vetores
-        embeddings = [embedding.embedding for embedding in response.data]
+        # Gerar embeddings em lotes concorrentes pelo motor compartilhado
+        embeddings = get_embedding_engine().embed_texts(valid_texts, model=model)
         
         logger.info(f"✅ {len(embeddings)} embeddings gerados com sucesso")
         return embeddings
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Testes da construção preguiçosa de agentes e do cache de agentes do processo
+"""
+
+import pytest
+
+import agent_system
+from agent_system import Agent
+
+
+def agent_row(i):
+    return {'id': f"agente-{i}", 'name': f"Agente {i}", 'description': None, 'system_prompt': "",
+            'model': "gpt-4o-mini", 'temperature': 0.7, 'created_at': None}
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """Substitui o banco e o RAGSystem por contadores"""
+    rows = {f"agente-{i}": agent_row(i) for i in range(1000)}
+    calls = {'queries': [], 'rag_systems': 0}
+
+    def execute(query, params=(), fetch=None):
+        calls['queries'].append(query)
+        if query.startswith("SELECT * FROM agentes WHERE"):
+            return rows.get(params[0])
+        if query.startswith("SELECT * FROM agentes"):
+            return list(rows.values())
+        if query.startswith("UPDATE agentes"):
+            rows[params[-1]] = dict(rows[params[-1]], name=params[0])
+            return rows[params[-1]]
+        if query.startswith("DELETE FROM agentes"):
+            rows.pop(params[0], None)
+        return None
+
+    class FakeRAGSystem:
+        def __init__(self, agent_id):
+            calls['rag_systems'] += 1
+            self.agent_id = agent_id
+
+    monkeypatch.setattr(Agent, "_execute_query", staticmethod(execute))
+    monkeypatch.setattr(agent_system, "RAGSystem", FakeRAGSystem)
+    Agent.invalidate_cache()
+    yield calls
+    Agent.invalidate_cache()
+
+
+class TestAgentCache:
+    """Testes do cache de agentes"""
+
+    def test_listing_is_one_query_without_rag_setup(self, fake_db):
+        agents = Agent.get_all()
+        assert len(agents) == 1000
+        assert len(fake_db['queries']) == 1 and fake_db['rag_systems'] == 0
+
+        # Após a listagem, get_by_id vem do cache; o RAGSystem só nasce no primeiro uso
+        agent = Agent.get_by_id("agente-7")
+        assert len(fake_db['queries']) == 1
+        assert agent.rag_system is agent.rag_system and fake_db['rag_systems'] == 1
+
+    def test_update_and_delete_invalidate(self, fake_db):
+        agent = Agent.get_by_id("agente-1")
+        rag = agent.rag_system
+
+        updated = Agent.update("agente-1", {'name': "Renomeado"})
+        assert Agent.get_by_id("agente-1") is updated and updated.name == "Renomeado"
+        assert updated.rag_system is rag and fake_db['rag_systems'] == 1
+
+        Agent.delete("agente-1")
+        assert Agent.get_by_id("agente-1") is None
+
+    def test_ttl_expiry_and_disabled_cache(self, fake_db, monkeypatch):
+        monkeypatch.setenv("AGENT_CACHE_TTL", "0")
+        Agent.get_by_id("agente-2")
+        Agent.get_by_id("agente-2")
+        assert len(fake_db['queries']) == 2
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Testes da ingestão paralela de múltiplos arquivos (sem banco e sem rede)
+"""
+
+import threading
+
+from batch_ingestion import ParallelIngestor, IngestionManifest
+
+
+def fake_parse(file_path, chunk_size, chunk_overlap):
+    """Parser executado no pool de processos (precisa ser de nível de módulo)"""
+    with open(file_path, encoding="utf-8") as f:
+        content = f.read()
+    if "corrompido" in content:
+        raise ValueError("arquivo corrompido")
+    return {'file': file_path, 'file_type': '.txt', 'texts': [t for t in content.split("|") if t]}
+
+
+class FakeWriter:
+    """Gravador compartilhado entre as instâncias criadas pela fábrica"""
+
+    rows = []
+    lock = threading.Lock()
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.pending = []
+        self.aborted = False
+
+    def write(self, batch):
+        if self.fail_on and batch.source.endswith(self.fail_on):
+            raise RuntimeError("falha no banco")
+        self.pending = [(batch.source, text) for text in batch.texts]
+        return len(batch.texts)
+
+    def finish_document(self):
+        with self.lock:
+            self.rows.extend(self.pending)
+
+    def abort(self):
+        self.aborted = True
+
+
+def make_files(tmp_path, count=6, bad=None):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"doc{i}.txt"
+        path.write_text("corrompido" if i == bad else f"doc{i}-a|doc{i}-b|doc{i}-c", encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+
+def make_ingestor(fail_on=None):
+    FakeWriter.rows = []
+    return ParallelIngestor(
+        agent_id="agente-teste",
+        embed_fn=lambda texts: [[float(len(t))] for t in texts],
+        writer_factory=lambda: FakeWriter(fail_on),
+        parse_fn=fake_parse,
+        parse_workers=2,
+        embed_workers=2
+    )
+
+
+class TestParallelIngestor:
+    """Testes do ParallelIngestor"""
+
+    def test_ingests_all_files_with_per_file_report(self, tmp_path):
+        paths = make_files(tmp_path)
+        report = make_ingestor().ingest_files(paths)
+
+        assert report['success'] is True
+        assert report['files_succeeded'] == 6
+        assert report['chunks_written'] == 18
+        assert sorted(r['file'] for r in report['files']) == sorted(paths)
+        assert len(FakeWriter.rows) == 18
+
+    def test_failures_are_isolated_per_file(self, tmp_path):
+        paths = make_files(tmp_path, bad=1)
+        report = make_ingestor(fail_on="doc3.txt").ingest_files(paths)
+
+        failed = {r['file']: r['error'] for r in report['files'] if r['status'] == 'failed'}
+        assert report['success'] is False
+        assert set(failed) == {paths[1], paths[3]}
+        assert "corrompido" in failed[paths[1]]
+        assert report['chunks_written'] == 12
+        assert all(source not in (paths[1], paths[3]) for source, _ in FakeWriter.rows)
+
+    def test_manifest_resumes_interrupted_import(self, tmp_path):
+        paths = make_files(tmp_path, bad=2)
+        manifest_path = str(tmp_path / "manifest.jsonl")
+
+        first = make_ingestor().ingest_files(paths, manifest_path=manifest_path)
+        assert first['files_failed'] == 1
+
+        # Corrige o arquivo com erro; apenas ele deve ser reprocessado
+        (tmp_path / "doc2.txt").write_text("doc2-a|doc2-b", encoding="utf-8")
+        second = make_ingestor().ingest_files(paths, manifest_path=manifest_path)
+
+        assert second['files_skipped'] == 5
+        assert [r['file'] for r in second['files']] == [paths[2]]
+        assert second['chunks_written'] == 2
+
+        manifest = IngestionManifest(manifest_path)
+        assert all(manifest.is_done(path) for path in paths)
+
+    def test_manifest_treats_empty_files_as_done(self, tmp_path):
+        paths = make_files(tmp_path, count=2)
+        (tmp_path / "doc1.txt").write_text("", encoding="utf-8")
+        manifest_path = str(tmp_path / "manifest.jsonl")
+
+        first = make_ingestor().ingest_files(paths, manifest_path=manifest_path)
+        assert sorted(r['status'] for r in first['files']) == ['empty', 'success']
+
+        second = make_ingestor().ingest_files(paths, manifest_path=manifest_path)
+        assert second['files_skipped'] == 2 and second['files'] == []
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Testes do pool persistente de navegadores (com navegador falso, sem Playwright)
+"""
+
+import asyncio
+import threading
+
+from browser_pool import BrowserPool
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.url = "about:blank"
+
+    def on(self, event, callback):
+        pass
+
+    async def close(self):
+        self.context.open_pages -= 1
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.open_pages = 0
+        self.closed = False
+
+    async def add_init_script(self, script):
+        pass
+
+    async def new_page(self):
+        if not self.browser.connected:
+            raise RuntimeError("Target page, context or browser has been closed")
+        self.open_pages += 1
+        self.browser.tracker.enter()
+        return FakePage(self)
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.connected = True
+        self.contexts = []
+        self._handlers = []
+
+    def on(self, event, callback):
+        self._handlers.append(callback)
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, **options):
+        context = FakeContext(self)
+        self.contexts.append(context)
+        return context
+
+    def crash(self):
+        self.connected = False
+        for callback in self._handlers:
+            callback(self)
+
+    async def close(self):
+        self.connected = False
+
+
+class Tracker:
+    """Conta navegadores lançados e o pico de páginas simultâneas"""
+
+    def __init__(self):
+        self.browsers = []
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def enter(self):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+
+    def leave(self):
+        with self.lock:
+            self.active -= 1
+
+    async def launch(self):
+        browser = FakeBrowser(self)
+        self.browsers.append(browser)
+        return browser
+
+
+def make_pool(tracker, **kwargs):
+    return BrowserPool(launcher=tracker.launch, **kwargs)
+
+
+async def fake_capture(page, tracker, delay=0.0):
+    await asyncio.sleep(delay)
+    tracker.leave()
+    return page.context
+
+
+class TestBrowserPool:
+    """Testes do BrowserPool"""
+
+    def test_reuses_browser_and_recycles_contexts(self):
+        tracker = Tracker()
+        pool = make_pool(tracker, max_pages_per_context=2)
+
+        contexts = [pool.run_sync(lambda page: fake_capture(page, tracker)) for _ in range(5)]
+
+        assert len(tracker.browsers) == 1
+        assert contexts[0] is contexts[1] and contexts[1] is not contexts[2]
+        assert contexts[0].closed and contexts[2].closed and not contexts[4].closed
+        stats = pool.stats()
+        assert stats['launches'] == 1 and stats['contexts_created'] == 3 and stats['pages'] == 5
+        reaper = pool._reaper_task
+        assert reaper is not None and not reaper.done()
+        pool.close()
+        assert pool._reaper_task is None
+
+    def test_crash_relaunches_and_retries(self):
+        tracker = Tracker()
+        pool = make_pool(tracker)
+        pool.run_sync(lambda page: fake_capture(page, tracker))
+
+        async def crashing(page):
+            tracker.leave()
+            if len(tracker.browsers) == 1:
+                tracker.browsers[0].crash()
+                raise RuntimeError("Target closed")
+            return "ok"
+
+        assert pool.run_sync(crashing) == "ok"
+        stats = pool.stats()
+        assert len(tracker.browsers) == 2 and stats['crashes'] == 1 and stats['retries'] == 1
+        pool.close()
+
+    def test_concurrent_pages_are_bounded_and_restart_after_limit(self):
+        tracker = Tracker()
+        pool = make_pool(tracker, max_concurrent_pages=2, max_pages_per_browser=4)
+
+        async def burst():
+            return await asyncio.gather(*[pool.run(lambda page: fake_capture(page, tracker, 0.05))
+                                          for _ in range(6)])
+
+        assert len(asyncio.run(burst())) == 6
+        assert tracker.peak == 2
+        # 6 páginas com limite de 4 por navegador: um reinício preventivo
+        assert len(tracker.browsers) == 2 and pool.stats()['restarts'] == 1
+        assert not tracker.browsers[0].connected
+        pool.close()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Testes da montagem do prompt com orçamento de tokens
+"""
+
+from context_assembler import ContextAssembler, count_tokens, pack_chunks
+
+
+def split_with_overlap(text, size, overlap):
+    return [text[i:i + size] for i in range(0, len(text) - overlap, size - overlap)]
+
+
+class TestPackChunks:
+    """Testes da união de vizinhos e remoção de duplicatas"""
+
+    def test_splitter_overlaps_are_merged(self):
+        text = " ".join(f"palavra{i}" for i in range(300))
+        pieces = split_with_overlap(text, 600, 200)
+        # Ordem de relevância diferente da ordem no documento
+        chunks = [{'text': pieces[2]}, {'text': pieces[0]}, {'text': pieces[1]}]
+
+        packed = pack_chunks(chunks)
+
+        assert len(packed['chunks']) == 1
+        assert packed['chunks'][0]['text'] == text[:len(packed['chunks'][0]['text'])]
+        assert packed['merged'] == 2
+
+    def test_near_duplicates_dropped_and_sources_kept_apart(self):
+        base = "O prazo para recurso é de quinze dias úteis contados da intimação da decisão."
+        chunks = [
+            {'text': base, 'source': 'a.pdf'},
+            {'text': base.replace("úteis", "úteis,"), 'source': 'b.pdf'},
+            {'text': "Assunto totalmente diferente sobre honorários.", 'source': 'a.pdf'},
+        ]
+        packed = pack_chunks(chunks)
+        assert [c['source'] for c in packed['chunks']] == ['a.pdf', 'a.pdf']
+        assert packed['duplicates'] == 1
+
+
+class TestContextAssembler:
+    """Testes do ContextAssembler"""
+
+    def test_history_truncated_before_context(self):
+        chunks = [f"trecho relevante número {i} " * 20 for i in range(3)]
+        history = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"mensagem antiga {i} " * 30}
+                   for i in range(10)]
+        chunk_tokens = sum(count_tokens(c) for c in chunks)
+        assembler = ContextAssembler(context_length=chunk_tokens + 600, response_tokens=100)
+
+        result = assembler.assemble("qual o trecho?", chunks, history, system_prompt="Seja breve.")
+
+        stats = result['stats']
+        assert stats['chunks_used'] == 3
+        assert 0 < len(result['history']) < len(history)
+        assert result['history'] == history[-len(result['history']):]
+        assert stats['prompt_tokens'] <= assembler.prompt_budget
+        assert result['messages'][0]['content'].startswith("Seja breve.")
+        assert result['messages'][-1] == {"role": "user", "content": "qual o trecho?"}
+
+    def test_low_relevance_chunks_dropped_and_first_truncated(self):
+        chunks = ["primeiro " * 400, "segundo " * 400]
+        assembler = ContextAssembler(context_length=300, response_tokens=50)
+
+        result = assembler.assemble("pergunta", chunks)
+
+        assert result['stats']['chunks_over_budget'] == 1
+        assert "segundo" not in result['context'] and result['context'].startswith("primeiro")
+        assert result['stats']['prompt_tokens'] <= assembler.prompt_budget
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Testes do crawler em lote (captura falsa, sem navegador nem banco)
+"""
+
+import asyncio
+import time
+
+from crawler import Crawler, normalize_url, extract_links, parse_sitemap
+
+SITE = {
+    "https://juris.example/": ['/acordaos?page=1', '/acordaos?page=1#topo', 'https://outro.example/x'],
+    "https://juris.example/acordaos?page=1": ['/acordao/1?utm_source=news', '/acordao/2', '/arquivo.pdf'],
+    "https://juris.example/acordao/1": ['/'],
+    "https://juris.example/acordao/2": [],
+}
+
+
+class FakeSite:
+    """Serve SITE e registra o horário e a concorrência de cada captura"""
+
+    def __init__(self, site=SITE, delay=0.01, fail=()):
+        self.site = site
+        self.delay = delay
+        self.fail = set(fail)
+        self.calls = []
+        self.active = {}
+        self.peak = {}
+
+    async def fetch(self, url):
+        domain = url.split("/")[2]
+        self.calls.append((url, time.monotonic()))
+        self.active[domain] = self.active.get(domain, 0) + 1
+        self.peak[domain] = max(self.peak.get(domain, 0), self.active[domain])
+        await asyncio.sleep(self.delay)
+        self.active[domain] -= 1
+        if url in self.fail:
+            return {"success": False, "error": "timeout"}
+        links = [normalize_url(href, url) for href in self.site.get(url, [])]
+        return {"success": True, "title": url, "content": f"conteúdo de {url}", "url": url,
+                "content_length": 20, "links": links}
+
+
+def make_crawler(site, ingested, state_path=":memory:", **kwargs):
+    kwargs.setdefault("min_delay", 0.0)
+    return Crawler(ingest=lambda page: ingested.append(page["url"]), fetch=site.fetch,
+                   state_path=state_path, respect_robots=False, **kwargs)
+
+
+class TestCrawler:
+    """Testes do Crawler"""
+
+    def test_normalization_links_and_sitemap(self):
+        assert normalize_url("HTTPS://Juris.Example:443/a//b?z=1&utm_medium=x&a=2#sec") == \
+            "https://juris.example/a/b?a=2&z=1"
+        assert normalize_url("ftp://juris.example/") is None
+
+        html = ('<base href="/sub/"><a href="p1">1</a><a href="p1#x">dup</a>'
+                '<a href="mailto:a@b.c">m</a><a rel="nofollow" href="/x">n</a>')
+        assert extract_links(html, "https://juris.example/") == ["https://juris.example/sub/p1"]
+
+        index = b'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">' \
+                b'<sitemap><loc>https://juris.example/s1.xml</loc></sitemap></sitemapindex>'
+        assert parse_sitemap(index) == ([], ["https://juris.example/s1.xml"])
+
+    def test_crawl_dedups_stays_in_scope_and_ingests(self):
+        site, ingested = FakeSite(), []
+        summary = make_crawler(site, ingested).crawl_sync(["https://juris.example/"])
+
+        assert sorted(ingested) == sorted(SITE)
+        assert len(site.calls) == 4 and summary['complete']
+        assert summary['status'] == {'done': 4}
+
+    def test_per_domain_politeness_with_concurrency_across_domains(self):
+        site = {f"https://site{d}.example/p{i}": [] for d in range(3) for i in range(3)}
+        fake, ingested = FakeSite(site, delay=0.02), []
+        crawler = make_crawler(fake, ingested, min_delay=0.05, per_domain_concurrency=1, max_depth=0)
+        crawler.crawl_sync(list(site))
+
+        assert len(ingested) == 9
+        assert all(peak == 1 for peak in fake.peak.values())
+        # Domínios diferentes começam juntos; dentro de um domínio as capturas respeitam o intervalo
+        starts = {}
+        for url, at in fake.calls:
+            starts.setdefault(url.split("/")[2], []).append(at)
+        firsts = [times[0] for times in starts.values()]
+        assert max(firsts) - min(firsts) < 0.05
+        for times in starts.values():
+            assert all(b - a >= 0.045 for a, b in zip(times, times[1:]))
+
+    def test_resume_after_limit_and_failure(self, tmp_path):
+        state = str(tmp_path / "crawl.db")
+        site, ingested = FakeSite(fail={"https://juris.example/acordao/2"}), []
+        first = make_crawler(site, ingested, state_path=state, max_concurrency=1, max_pages=3)
+        summary = first.crawl_sync(["https://juris.example/"])
+        first.close()
+        assert not summary['complete'] and summary['fetched'] == 3
+
+        site.fail.clear()
+        second = make_crawler(site, ingested, state_path=state)
+        summary = second.crawl_sync(["https://juris.example/"])
+        second.close()
+
+        assert summary['complete'] and summary['status'] == {'done': 4}
+        assert sorted(ingested) == sorted(SITE)
+
+    def test_max_pages_is_not_exceeded_by_concurrent_workers(self):
+        site = {f"https://site{d}.example/": [] for d in range(6)}
+        fake, ingested = FakeSite(site, delay=0.02), []
+        summary = make_crawler(fake, ingested, max_concurrency=6, max_pages=2, max_depth=0).crawl_sync(list(site))
+
+        assert len(fake.calls) == 2 and summary['fetched'] == 2 and not summary['complete']
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Testes do pool de conexões thread-safe (conexões falsas, sem PostgreSQL)
+"""
+
+import threading
+import time
+
+import pytest
+from psycopg2 import pool, extensions
+
+from database import ConnectionPool
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, query, params=None):
+        if self.conn.broken:
+            raise RuntimeError("server closed the connection unexpectedly")
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.configured = 0
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+def make_pool(**kwargs):
+    created = []
+
+    def connect():
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+
+    def configure(conn):
+        conn.configured += 1
+
+    params = dict(minconn=1, maxconn=2, timeout=0.2, configure=configure, connect=connect)
+    params.update(kwargs)
+    return ConnectionPool(**params), created
+
+
+class TestConnectionPool:
+    """Testes do ConnectionPool"""
+
+    def test_configure_runs_once_per_physical_connection(self):
+        db_pool, created = make_pool()
+        for _ in range(5):
+            conn = db_pool.getconn()
+            db_pool.putconn(conn)
+
+        assert len(created) == 1
+        assert created[0].configured == 1
+        assert db_pool.stats()['checkouts'] == 5
+
+    def test_checkout_waits_then_times_out(self):
+        db_pool, _ = make_pool()
+        first, second = db_pool.getconn(), db_pool.getconn()
+
+        threading.Timer(0.05, db_pool.putconn, args=(first,)).start()
+        third = db_pool.getconn()
+        assert third is first
+
+        with pytest.raises(pool.PoolError):
+            db_pool.getconn(timeout=0.05)
+
+        stats = db_pool.stats()
+        assert stats['waited_checkouts'] == 1
+        assert stats['timeouts'] == 1
+        assert stats['saturation'] == 1.0
+        assert stats['max_wait_ms'] >= 40
+
+    def test_stale_and_dirty_connections_are_handled(self):
+        db_pool, created = make_pool(validate_after=0.0)
+        conn = db_pool.getconn()
+        rollbacks = conn.rollbacks
+        conn.status = extensions.TRANSACTION_STATUS_INTRANS
+        db_pool.putconn(conn)
+        assert conn.rollbacks == rollbacks + 1
+        assert conn.status == extensions.TRANSACTION_STATUS_IDLE
+
+        conn.broken = True
+        time.sleep(0.01)
+        replacement = db_pool.getconn()
+
+        assert replacement is not conn
+        assert conn.closed
+        assert db_pool.stats()['replaced_connections'] == 1
+        assert len(created) == 2
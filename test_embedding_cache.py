@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Testes do cache de embeddings endereçado por conteúdo
+"""
+
+import pytest
+
+from embedding_cache import EmbeddingCache, content_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    # Dois vetores de uma dimensão em float32
+    return EmbeddingCache(db_path=str(tmp_path / "cache.db"), max_memory_bytes=8)
+
+
+class TestEmbeddingCache:
+    """Testes do EmbeddingCache"""
+
+    def test_key_uses_normalized_text_and_model(self):
+        assert content_key("m", "Olá   mundo\n") == content_key("m", " Olá mundo")
+        assert content_key("m", "texto") != content_key("outro", "texto")
+
+    def test_get_or_compute_only_embeds_misses(self, cache):
+        calls = []
+
+        def compute(texts):
+            calls.append(list(texts))
+            return [[float(len(t))] for t in texts]
+
+        first = cache.get_or_compute(["a", "bb", "a"], "m", compute)
+        second = cache.get_or_compute(["bb", "ccc"], "m", compute)
+
+        assert first == [[1.0], [2.0], [1.0]]
+        assert second == [[2.0], [3.0]]
+        assert calls == [["a", "bb"], ["ccc"]]
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 4
+
+    def test_disk_tier_survives_memory_eviction(self, cache, tmp_path):
+        cache.put_many(["a", "b", "c"], [[1.0], [2.0], [3.0]], "m")
+        assert cache.get_many(["a"], "m") == [[1.0]]
+        assert cache.disk_hits == 1
+
+        reopened = EmbeddingCache(db_path=str(tmp_path / "cache.db"))
+        assert reopened.get_many(["c"], "m") == [[3.0]]
+
+    def test_disk_size_eviction(self, tmp_path):
+        small = EmbeddingCache(db_path=str(tmp_path / "small.db"), max_disk_bytes=400)
+        for i in range(10):
+            small.put_many([f"t{i}"], [[0.0] * 10], "m")
+        assert small.stats()["disk_bytes"] <= 400
+
+    def test_memory_tier_bounded_in_bytes_and_disk_size_incremental(self, tmp_path):
+        cache = EmbeddingCache(db_path=str(tmp_path / "c.db"), max_memory_bytes=1536 * 4 * 3)
+        vectors = [[0.5] * 1536 for _ in range(5)]
+        cache.put_many([f"t{i}" for i in range(5)], vectors, "m")
+        cache.put_many(["t0", "t1"], vectors[:2], "m")
+
+        stats = cache.stats()
+        assert stats["memory_entries"] == 3 and stats["memory_bytes"] == 1536 * 4 * 3
+        assert stats["disk_bytes"] == 5 * 1536 * 4
+        assert cache.get_many(["t4"], "m") == [vectors[4]]
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Testes do motor de embeddings em lote (backend stub, sem rede)
+"""
+
+import pytest
+
+from embedding_engine import EmbeddingEngine, EmbeddingBackend, LocalStubEmbeddingBackend
+
+
+class RateLimitError(RuntimeError):
+    """Imita o erro de limite de taxa do SDK"""
+    status_code = 429
+
+
+class FlakyBackend(EmbeddingBackend):
+    """Backend que falha nas primeiras chamadas"""
+
+    def __init__(self, failures: int, error: Exception = None):
+        self.failures = failures
+        self.error = error or RateLimitError("rate limit")
+        self.calls = 0
+        self.stub = LocalStubEmbeddingBackend(dimensions=8)
+
+    def embed_batch(self, texts, model):
+        self.calls += 1
+        if self.failures > 0:
+            self.failures -= 1
+            raise self.error
+        return self.stub.embed_batch(texts, model)
+
+
+class TestEmbeddingEngine:
+    """Testes do EmbeddingEngine"""
+
+    def test_batches_respect_size_and_tokens(self):
+        engine = EmbeddingEngine(backend=LocalStubEmbeddingBackend(dimensions=8),
+                                 max_batch_size=3, max_batch_tokens=50)
+        texts = ["a" * 40] * 7  # ~10 tokens cada
+        batches = engine.make_batches(texts)
+
+        assert [i for batch in batches for i in batch] == list(range(7))
+        assert all(len(batch) <= 3 for batch in batches)
+
+        big = engine.make_batches(["b" * 160, "c" * 160])  # ~40 tokens cada
+        assert big == [[0], [1]]
+
+    def test_embed_texts_preserves_order(self):
+        stub = LocalStubEmbeddingBackend(dimensions=8)
+        engine = EmbeddingEngine(backend=stub, max_batch_size=4, max_concurrency=3)
+        texts = [f"texto {i}" for i in range(10)]
+
+        vectors = engine.embed_texts(texts)
+
+        assert len(vectors) == 10
+        assert stub.calls == 3
+        for text, vector in zip(texts, vectors):
+            assert vector == stub.embed_batch([text], engine.model)[0]
+
+    def test_retries_failed_batches(self):
+        engine = EmbeddingEngine(backend=FlakyBackend(failures=2), backoff_base=0.001)
+        assert len(engine.embed_texts(["x", "y"])) == 2
+
+    def test_gives_up_after_max_retries(self):
+        engine = EmbeddingEngine(backend=FlakyBackend(failures=5), max_retries=2, backoff_base=0.001)
+        with pytest.raises(RuntimeError):
+            engine.embed_texts(["x"])
+
+    def test_does_not_retry_client_errors(self):
+        class BadRequestError(RuntimeError):
+            status_code = 400
+
+        backend = FlakyBackend(failures=1, error=BadRequestError("entrada inválida"))
+        engine = EmbeddingEngine(backend=backend, backoff_base=0.001)
+        with pytest.raises(BadRequestError):
+            engine.embed_texts(["x"])
+        assert backend.calls == 1
+
+    def test_truncates_oversized_inputs_before_batching(self):
+        stub = LocalStubEmbeddingBackend(dimensions=8)
+        engine = EmbeddingEngine(backend=stub, max_batch_tokens=1000, max_input_tokens=100)
+        seen = []
+        stub.embed_batch = lambda texts, model: seen.extend(texts) or [[0.0] * 8 for _ in texts]
+
+        assert len(engine.embed_texts(["a" * 4000, "b" * 40])) == 2
+        assert seen == ["a" * 400, "b" * 40]
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Testes da janela de histórico, do resumo incremental e da paginação (sem PostgreSQL)
+"""
+
+from datetime import datetime, timedelta
+
+from history_manager import HistoryManager, SUMMARY_HEADER, decode_cursor, encode_cursor
+
+
+class FakeHistoryDB:
+    """Responde às consultas do HistoryManager a partir de uma lista de turnos"""
+
+    def __init__(self, turns):
+        start = datetime(2024, 1, 1)
+        self.turns = [{'id': f"00000000-0000-0000-0000-{i:012d}", 'user_message': f"pergunta {i}",
+                       'response_text': f"resposta {i}", 'created_at': start + timedelta(minutes=i)}
+                      for i in range(turns)]
+        self.summary = None
+        self.queries = []
+
+    def __call__(self, query, params=(), fetch=None):
+        self.queries.append(query)
+        if "FROM conversation_summaries" in query:
+            return self.summary
+        if "INSERT INTO conversation_summaries" in query:
+            _, text, until, last_id, count, _ = params
+            self.summary = {'summary': text, 'covered_until': until, 'covered_id': last_id,
+                            'turns_covered': (self.summary or {}).get('turns_covered', 0) + count}
+            return None
+
+        params = list(params[1:])
+        limit = params.pop()
+        rows = sorted(self.turns, key=lambda t: (t['created_at'], t['id']), reverse=True)
+        if "> (%s, %s)" in query:
+            after = (params.pop(0), params.pop(0))
+            rows = [t for t in rows if (t['created_at'], t['id']) > after]
+        if "< (%s" in query:
+            before = (params.pop(0), params.pop(0))
+            if isinstance(before[0], str):
+                before = (datetime.fromisoformat(before[0]), before[1])
+            rows = [t for t in rows if (t['created_at'], t['id']) < before]
+        if "json_agg" in query:
+            rows = [dict(t, responses=[{'id': t['id'], 'provider': 'openai', 'response_text': t['response_text'],
+                                        'feedback': 0}]) for t in rows]
+        return rows[:limit]
+
+
+def summarize(previous, turns, max_tokens):
+    return (previous + " " if previous else "") + "+".join(t['user_message'].split()[-1] for t in turns)
+
+
+class TestHistoryManager:
+    """Testes do gerenciador de histórico"""
+
+    def make(self, db, **kwargs):
+        return HistoryManager(window_turns=3, summary_batch=2, summarizer=summarize, execute=db,
+                              background=False, **kwargs)
+
+    def test_window_and_incremental_summary(self):
+        db = FakeHistoryDB(turns=7)
+        manager = self.make(db)
+
+        messages = manager.build_history("agente")
+        # Janela com os 3 últimos turnos; o resumo dos 4 anteriores é gerado para o próximo turno
+        assert [m['content'] for m in messages if m['role'] == 'user'] == ["pergunta 4", "pergunta 5", "pergunta 6"]
+        assert db.summary['summary'] == "0+1+2+3" and db.summary['turns_covered'] == 4
+
+        # Dois turnos novos: só eles são incorporados, a partir do cursor do resumo
+        db.turns += FakeHistoryDB(turns=9).turns[7:]
+        messages = manager.build_history("agente")
+        assert messages[0]['role'] == 'system' and messages[0]['content'].startswith(SUMMARY_HEADER)
+        assert db.summary['summary'] == "0+1+2+3 4+5" and db.summary['turns_covered'] == 6
+
+    def test_history_token_cap_keeps_most_recent(self):
+        db = FakeHistoryDB(turns=3)
+        db.turns[0]['user_message'] = "texto longo " * 400
+        manager = self.make(db, max_history_tokens=60)
+
+        messages = manager.build_history("agente")
+        assert [m['content'] for m in messages] == ["pergunta 1", "resposta 1", "pergunta 2", "resposta 2"]
+
+        client = [{"role": "user", "content": f"m{i}"} for i in range(20)] + [{"role": "tool", "content": "x"}]
+        assert [m['content'] for m in manager.window_client_history(client)] == [f"m{i}" for i in range(14, 20)]
+
+    def test_keyset_pagination(self):
+        db = FakeHistoryDB(turns=5)
+        manager = self.make(db)
+
+        first = manager.get_page("agente", limit=2)
+        assert [m['content'] for m in first['items'] if m['role'] == 'user'] == ["pergunta 3", "pergunta 4"]
+        second = manager.get_page("agente", limit=2, before=first['next_cursor'])
+        assert [m['content'] for m in second['items'] if m['role'] == 'user'] == ["pergunta 1", "pergunta 2"]
+        last = manager.get_page("agente", limit=2, before=second['next_cursor'])
+        assert len(last['items']) == 2 and last['next_cursor'] is None
+
+        assert decode_cursor(encode_cursor(datetime(2024, 1, 1), "abc")) == ("2024-01-01T00:00:00", "abc")
+
+    def test_summary_table_disabled_only_when_missing(self):
+        class DBError(Exception):
+            def __init__(self, pgcode):
+                super().__init__(pgcode)
+                self.pgcode = pgcode
+
+        errors = [DBError(None), DBError('42P01')]
+
+        def failing_db(query, params=(), fetch=None):
+            raise errors.pop(0)
+
+        manager = self.make(failing_db)
+        assert manager._load_summary("agente") is None and manager._summary_table_available
+        assert manager._load_summary("agente") is None and not manager._summary_table_available
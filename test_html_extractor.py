@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Testes do extrator de conteúdo HTML de passada única (lxml) contra o original (BeautifulSoup)
+"""
+
+import pytest
+
+pytest.importorskip("bs4")
+pytest.importorskip("lxml")
+
+import html_extractor
+from html_extractor import extract_content, extract_content_bs4, extract_content_lxml
+
+PAGE = """<html><head><title>Acórdão</title><meta name="description" content="Ementa"></head><body>
+<h1>Acórdão nº 123</h1><h2>Ok</h2><p>Primeiro parágrafo com texto suficiente.</p>
+<p>Com <b>negrito</b>, <a href='#'>link</a> &amp; entidades&nbsp;aqui.</p><!-- comentário -->
+<ul><li>Item um</li><li>ab</li><li>Item <i>três</i><ul><li>Subitem</li></ul></li></ul>
+<main><h3>Relatório</h3><p>Texto do main com mais de cinquenta caracteres para passar o limite.</p></main>
+<div class="ementa destaque">EMENTA: direito civil. Responsabilidade. Recurso provido.</div>
+<div role="main">Conteúdo com role main e bastante texto para passar o limiar de cinquenta.</div>
+<script>var x = 1;</script><style>p{}</style>texto solto<noscript>Habilite o JS</noscript>depois
+<template><p>Conteúdo de template que não aparece</p></template>
+</body></html>"""
+
+
+class TestHTMLExtractor:
+    """Testes do extrator de passada única"""
+
+    def test_same_output_as_original_without_nesting(self):
+        expected = extract_content_bs4(PAGE)
+        assert extract_content_lxml(PAGE) == expected
+        assert expected['lists'] == [['Item um', 'ItemtrêsSubitem', 'Subitem'], ['Subitem']]
+        assert extract_content_lxml("<div><p>Fragmento sem body, com texto.</p></div>") == \
+            extract_content_bs4("<div><p>Fragmento sem body, com texto.</p></div>")
+
+    def test_nested_containers_are_counted_once(self):
+        page = ("<html><body><main><article><section>" + "<p>Fundamentação da decisão colegiada.</p>" * 3
+                + "</section></article></main><div class='acordao'><div class='ementa'>Ementa: recurso "
+                "conhecido.</div><div class='voto'>Voto pelo provimento do recurso.</div></div></body></html>")
+        original, single_pass = extract_content_bs4(page), extract_content_lxml(page)
+
+        assert original['semantic_content'].count("Fundamentação") == 9
+        assert single_pass['semantic_content'].count("Fundamentação") == 3
+        assert single_pass['jurisprudence_content'] == "Ementa: recurso conhecido.\nVoto pelo provimento do recurso."
+        for key in ('headings', 'paragraphs', 'lists', 'full_body_text'):
+            assert single_pass[key] == original[key]
+
+    def test_malformed_html_follows_lxml_tree(self):
+        # Divergências documentadas em extract_content_lxml: o lxml fecha os elementos como o navegador
+        page = ("<html><body><p>antes do div <div>conteúdo dentro</div> depois do div</p>"
+                "<p>Primeiro parágrafo aberto<p>Segundo parágrafo aberto"
+                "<ul><li>Item um aberto<li>Item dois aberto</ul>"
+                "<main class='content'>" + "Texto do main com conteúdo suficiente. " * 2 + "</main></body></html>")
+        original, single_pass = extract_content_bs4(page), extract_content_lxml(page)
+
+        assert original['paragraphs'][0] == "antes do divconteúdo dentrodepois do div"
+        assert single_pass['paragraphs'] == ["antes do div", "Primeiro parágrafo aberto", "Segundo parágrafo aberto"]
+        assert original['lists'] == [["Item um abertoItem dois aberto", "Item dois aberto"]]
+        assert single_pass['lists'] == [["Item um aberto", "Item dois aberto"]]
+        assert original['semantic_content'].count("Texto do main") == 4
+        assert single_pass['semantic_content'].count("Texto do main") == 2
+        assert single_pass['full_body_text'].startswith("antes do div\nconteúdo dentro\ndepois do div")
+
+    def test_dispatch_falls_back_to_beautifulsoup(self, monkeypatch):
+        assert extract_content("") == extract_content_lxml("")
+        monkeypatch.setattr(html_extractor, "lxml_available", lambda: False)
+        assert extract_content(PAGE) == extract_content_bs4(PAGE)
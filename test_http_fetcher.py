@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Testes da camada HTTP do scraper (heurística de escalada e camada por domínio)
+"""
+
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from http_fetcher import DomainTierCache, HTTPFetcher, needs_browser, html_title, TIER_BROWSER, TIER_HTTP
+
+
+def response(html, status=200, content_type="text/html; charset=utf-8"):
+    return {'status': status, 'content_type': content_type, 'html': html, 'final_url': "https://x.example/"}
+
+
+class TestHTTPFetcher:
+    """Testes da camada HTTP"""
+
+    def test_needs_browser_heuristics(self):
+        article = "<html><body><main>" + "Ementa do acórdão. " * 60 + "</main></body></html>"
+        text = "Ementa do acórdão. " * 60
+        assert needs_browser(response(article), text, True) is None
+        # Sites que só usam o CDN da Cloudflare não são escalados
+        assert needs_browser(response(article + '<script src="https://cdnjs.cloudflare.com/x.js">'), text, True) is None
+
+        assert needs_browser(response(article, status=403), text, True) == "HTTP 403"
+        assert needs_browser(response("<div class='cf-browser-verification'></div>"), "", False) == "desafio anti-bot"
+        assert needs_browser(response('<body><div id="root"></div></body>'), "Carregando", True) == "casca de SPA"
+        assert needs_browser(response("<p>x</p>"), "Please enable JavaScript", False) == "página exige JavaScript"
+        assert needs_browser(response("<p>Olá</p>"), "Olá", False) == "conteúdo ralo"
+        assert needs_browser(response("%PDF", content_type="application/pdf"), "", False).startswith("conteúdo")
+
+    def test_tier_cache_remembers_and_expires_browser(self, monkeypatch):
+        cache = DomainTierCache(ttl=60)
+        cache.remember("juris.example", TIER_HTTP)
+        cache.remember("spa.example", TIER_BROWSER)
+        assert cache.get("juris.example") == TIER_HTTP and cache.get("spa.example") == TIER_BROWSER
+
+        cache.ttl = 0
+        assert cache.get("spa.example") is None and cache.get("juris.example") == TIER_HTTP
+        assert html_title("<title> Acórdão &amp; Voto </title>") == "Acórdão & Voto"
+
+    def test_fetch_reuses_connection_and_decodes_charset(self):
+        pytest.importorskip("aiohttp")
+        body = "<html><head><meta charset='iso-8859-1'></head><body>Decisão</body></html>".encode("latin-1")
+        connections = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                connections.append(self.client_address)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        fetcher = HTTPFetcher()
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/"
+            first = asyncio.run(fetcher.fetch(url))
+            second = asyncio.run(fetcher.fetch(url))
+            assert "Decisão" in first['html'] and second['status'] == 200
+            # Keep-alive: a sessão persiste entre loops e reaproveita a conexão
+            assert connections[0] == connections[1]
+            assert fetcher.stats()['requests'] == 2
+        finally:
+            fetcher.close()
+            server.shutdown()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Testes da montagem da consulta textual da busca híbrida
+"""
+
+import vector_store
+from vector_store import PGVectorStore, build_lexical_query
+
+AGENT = "3f2504e0-4f89-11d3-9a0c-0305e82c3301"
+
+
+class FakeConnection:
+    """Registra a consulta da busca híbrida e devolve uma linha fixa"""
+
+    def __init__(self):
+        self.executed = []
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return [("texto", 0.1, AGENT, 0.03, 1, None)]
+
+
+class FakeLocalIndex:
+    def search(self, agent_id, query_embedding, k):
+        return [("chunk-b", "b", 0.9), ("chunk-a", "a", 0.8)][:k]
+
+
+def run_hybrid(monkeypatch, local_index):
+    conn = FakeConnection()
+    monkeypatch.setattr(vector_store, "get_local_ann_index", lambda: local_index)
+    monkeypatch.setattr(vector_store.Database, "get_connection", lambda: conn)
+    monkeypatch.setattr(vector_store.Database, "release_connection", lambda c: None)
+    store = object.__new__(PGVectorStore)
+    store.agent_id = AGENT
+    store._embed_query = lambda query: [0.1, 0.2]
+    docs = store.hybrid_search("art. 5", k=1, candidates=2)
+    return conn.executed[-1], docs
+
+
+class TestBuildLexicalQuery:
+    """Testes do build_lexical_query"""
+
+    def test_identifiers_are_normalized_to_digits(self):
+        query = build_lexical_query("Qual a situação do CPF 123.456.789-00 e do CNPJ 12.345.678/0001-90?")
+        assert query['numbers'] == "12345678900 | 12345678000190"
+        assert "cpf" in query['words'].split(" | ")
+
+    def test_terms_are_or_combined_without_duplicates(self):
+        query = build_lexical_query("O art. 5º da Lei 8.666 e o art. 5º da CF")
+        assert query['words'] == "art | da | lei | cf"
+        assert query['numbers'] == "5 | 8666"
+
+    def test_empty_query(self):
+        assert build_lexical_query("?!") == {'words': "", 'numbers': ""}
+
+
+class TestHybridVectorLeg:
+    """Testes da origem do lado vetorial da busca híbrida"""
+
+    def test_local_index_feeds_vector_leg(self, monkeypatch):
+        (sql, params), docs = run_hybrid(monkeypatch, FakeLocalIndex())
+        assert params['vector_ids'] == ["chunk-b", "chunk-a"]
+        assert "WITH ORDINALITY" in sql and "ORDER BY embedding" not in sql
+        assert docs[0].metadata['vector_rank'] == 1
+
+    def test_pgvector_leg_ranks_are_ordered(self, monkeypatch):
+        monkeypatch.setattr(vector_store, "get_vector_index_manager",
+                            lambda: type("M", (), {"prepare_search": lambda *a: "global"})())
+        (sql, params), _ = run_hybrid(monkeypatch, None)
+        assert params['vector_ids'] is None
+        assert "row_number() OVER ()" not in sql
+        assert "row_number() OVER (ORDER BY distance)" in sql and "OVER (ORDER BY rank DESC)" in sql
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark de importação a frio dos módulos de entrada
+
+Cada módulo é importado em um processo novo: falha se a importação passar de
+IMPORT_TIME_BUDGET segundos ou se carregar algum SDK pesado de HEAVY_MODULES
+(que devem ser importados só no primeiro uso). Módulos cujas dependências
+obrigatórias não estão instaladas são pulados; se o módulo ausente for um dos
+SDKs pesados, o teste falha, porque a importação nem deveria tê-lo pedido.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from lazy_imports import HEAVY_MODULES, lazy_import
+
+REPO_ROOT = Path(__file__).resolve().parent
+ENTRY_MODULES = [
+    "llm_providers",
+    "document_loader",
+    "vector_store",
+    "rag_system",
+    "agent_system",
+    "scraper",
+    "monitoring_system",
+    "api_server",
+]
+
+HEAVY_TOP_LEVEL = {name.split(".")[0] for name in HEAVY_MODULES}
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+try:
+    __import__(sys.argv[1])
+except ModuleNotFoundError as e:
+    print(json.dumps({"missing": e.name}))
+    raise SystemExit(0)
+elapsed = time.perf_counter() - start
+heavy = json.loads(sys.argv[2])
+print(json.dumps({"seconds": elapsed, "heavy": [m for m in heavy if m in sys.modules]}))
+"""
+
+
+def cold_import(module: str, workdir: Path) -> dict:
+    env = dict(os.environ, PYTHONPATH=str(REPO_ROOT), PYTHONDONTWRITEBYTECODE="1")
+    # Chaves fictícias: os provedores são instanciados, mas não devem carregar seus SDKs
+    for key in ("OPENAI_API_KEY", "GOOGLE_GEMINI_API_KEY", "DEEPSEEK_API_KEY", "OPENROUTER_API_KEY"):
+        env.setdefault(key, "sk-test")
+    result = subprocess.run([sys.executable, "-c", _PROBE, module, json.dumps(HEAVY_MODULES)],
+                            cwd=workdir, env=env, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr[-2000:]
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+class TestImportTime:
+    """Testes de tempo de importação a frio"""
+
+    @pytest.mark.parametrize("module", ENTRY_MODULES)
+    def test_cold_import_is_fast_and_skips_heavy_sdks(self, module, tmp_path):
+        probe = cold_import(module, tmp_path)
+        if "missing" in probe:
+            assert probe["missing"].split(".")[0] not in HEAVY_TOP_LEVEL, \
+                f"{module} importa o SDK pesado {probe['missing']} na importação"
+            pytest.skip(f"dependência não instalada: {probe['missing']}")
+
+        assert probe["heavy"] == [], f"{module} carregou SDKs pesados na importação: {probe['heavy']}"
+        budget = float(os.getenv("IMPORT_TIME_BUDGET", "2.0"))
+        assert probe["seconds"] < budget, f"{module} levou {probe['seconds']:.2f}s para importar (limite {budget}s)"
+
+    def test_lazy_module_loads_on_first_use(self):
+        json_module = lazy_import("json")
+        assert json_module.dumps([1]) == "[1]" and json_module.loaded
+
+        missing = lazy_import("modulo_que_nao_existe", "pacote-exemplo")
+        assert not missing.loaded
+        with pytest.raises(ImportError, match="pip install pacote-exemplo"):
+            missing.algum_atributo
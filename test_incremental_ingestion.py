@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Testes da reingestão incremental por hash de chunk
+"""
+
+import pytest
+
+import vector_store
+from vector_store import PGVectorStore, chunk_hash, plan_chunk_diff, sync_document_chunks
+
+AGENT = "3f2504e0-4f89-11d3-9a0c-0305e82c3301"
+
+
+class FakeConnection:
+    """Documento já gravado com os chunks "a" e "b"; registra SQL, commit e rollback"""
+
+    def __init__(self):
+        self.executed, self.committed, self.rolled_back = [], False, False
+        self._result = []
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.executed.append(sql)
+        if "FROM documents WHERE agent_id = %s AND file_name" in sql:
+            self._result = [("doc-1", "hash-antigo")]
+        elif "md5(chunk_text)" in sql:
+            self._result = [(1, chunk_hash("a")), (2, chunk_hash("b"))]
+        else:
+            self._result = []
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def fetchall(self):
+        return self._result
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+class TestPlanChunkDiff:
+    """Testes do plano de diferenças entre chunks gravados e novos"""
+
+    def test_unchanged_document_needs_no_embeddings(self):
+        texts = ["a", "b", "c"]
+        existing = [(i, chunk_hash(t)) for i, t in enumerate(texts)]
+
+        plan = plan_chunk_diff(existing, texts)
+
+        assert sorted(plan['keep_ids']) == [0, 1, 2]
+        assert plan['delete_ids'] == []
+        assert plan['new_texts'] == []
+
+    def test_only_changed_chunks_are_embedded(self):
+        existing = [(1, chunk_hash("a")), (2, chunk_hash("b")), (3, chunk_hash("c"))]
+
+        plan = plan_chunk_diff(existing, ["a", "b alterado", "c", "d"])
+
+        assert sorted(plan['keep_ids']) == [1, 3]
+        assert plan['delete_ids'] == [2]
+        assert plan['new_texts'] == ["b alterado", "d"]
+
+    def test_repeated_chunks_are_counted(self):
+        existing = [(1, chunk_hash("x")), (2, chunk_hash("x")), (3, chunk_hash("x"))]
+
+        plan = plan_chunk_diff(existing, ["x", "x"])
+
+        assert len(plan['keep_ids']) == 2
+        assert len(plan['delete_ids']) == 1
+        assert plan['new_texts'] == []
+
+
+class TestFailedEmbeddings:
+    """Falha do provedor durante a reingestão não pode perder chunks"""
+
+    def test_missing_embeddings_abort_before_insert(self):
+        conn = FakeConnection()
+        with pytest.raises(ValueError, match="Embeddings ausentes"):
+            sync_document_chunks(conn, "doc-1", AGENT, ["a", "c"], lambda texts: [None] * len(texts))
+        assert not any("COPY" in sql or "INSERT" in sql for sql in conn.executed)
+
+    def test_update_rolls_back_and_keeps_content_hash(self, monkeypatch):
+        conn = FakeConnection()
+        monkeypatch.setattr(vector_store.Database, "get_connection", lambda: conn)
+        monkeypatch.setattr(vector_store.Database, "release_connection", lambda c: None)
+        store = object.__new__(PGVectorStore)
+        store.agent_id = AGENT
+
+        def failing_embed(texts):
+            raise RuntimeError("provedor indisponível")
+        store.embedding_function = failing_embed
+
+        with pytest.raises(RuntimeError):
+            store.upsert_document("arquivo.txt", ["a", "c"])
+
+        assert conn.rolled_back and not conn.committed
+        assert not any(sql.startswith("UPDATE documents SET content_hash") for sql in conn.executed)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Testes do pipeline de ingestão em streaming (sem banco e sem rede)
+"""
+
+import threading
+import time
+
+import pytest
+
+from ingestion_pipeline import ChunkBatch, IngestionPipeline, PGChunkWriter
+
+
+class FakeDoc:
+    def __init__(self, page_content, metadata=None):
+        self.page_content = page_content
+        self.metadata = metadata or {}
+
+
+class FakeSplitter:
+    def split_documents(self, documents):
+        return [FakeDoc(part, dict(doc.metadata)) for doc in documents for part in doc.page_content.split("|")]
+
+
+class FakeLoader:
+    """Loader que registra quantas páginas foram lidas"""
+
+    def __init__(self, pages_per_file=20):
+        self.pages_per_file = pages_per_file
+        self.text_splitter = FakeSplitter()
+        self.pages_read = 0
+
+    def iter_pages(self, path):
+        if path.endswith("ruim.pdf"):
+            raise ValueError("arquivo corrompido")
+        for n in range(self.pages_per_file):
+            self.pages_read += 1
+            yield FakeDoc(f"{path}-p{n}-a|{path}-p{n}-b", {"source": path, "file_type": ".pdf"})
+
+    def iter_supported_files(self, directory):
+        return [f"{directory}/a.pdf", f"{directory}/ruim.pdf", f"{directory}/b.pdf"]
+
+
+class FakeWriter:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.rows = []
+        self.documents = {}
+        self.finished = 0
+
+    def write(self, batch):
+        time.sleep(self.delay)
+        self.documents.setdefault(batch.source, str(len(self.documents)))
+        self.rows.extend(zip([batch.source] * len(batch.texts), batch.texts, batch.embeddings))
+        return len(batch.texts)
+
+    def finish_document(self):
+        self.finished += 1
+
+    def abort(self):
+        pass
+
+
+def fake_embed(texts):
+    return [[float(len(t))] for t in texts]
+
+
+class TestIngestionPipeline:
+    """Testes do IngestionPipeline"""
+
+    def test_ingest_file_streams_all_chunks_in_order(self):
+        writer = FakeWriter()
+        pipeline = IngestionPipeline("agent-1", FakeLoader(), fake_embed, writer, embed_batch_size=7)
+
+        report = pipeline.ingest_file("doc.pdf")
+
+        assert report["chunks_written"] == 40
+        assert [text for _, text, _ in writer.rows][:3] == ["doc.pdf-p0-a", "doc.pdf-p0-b", "doc.pdf-p1-a"]
+        assert all(vector == [float(len(text))] for _, text, vector in writer.rows)
+        assert set(report["stages"]) == {"load", "split", "embed", "write"}
+        assert report["stages"]["embed"]["items"] == 40
+
+    def test_bounded_queues_apply_backpressure(self):
+        loader = FakeLoader(pages_per_file=200)
+        writer = FakeWriter(delay=0.01)
+        pipeline = IngestionPipeline("agent-1", loader, fake_embed, writer, queue_size=2, embed_batch_size=2)
+
+        thread = threading.Thread(target=pipeline.ingest_file, args=("grande.pdf",))
+        thread.start()
+        time.sleep(0.1)
+        # Com o gravador lento, o leitor não pode ter avançado muito à frente
+        assert loader.pages_read < 60
+        thread.join()
+        assert len(writer.rows) == 400
+
+    def test_directory_reports_failed_files_and_continues(self):
+        writer = FakeWriter()
+        pipeline = IngestionPipeline("agent-1", FakeLoader(pages_per_file=2), fake_embed, writer)
+
+        report = pipeline.ingest_directory("pasta")
+
+        assert report["chunks_written"] == 8
+        assert [f["file"] for f in report["failed_files"]] == ["pasta/ruim.pdf"]
+        assert set(writer.documents) == {"pasta/a.pdf", "pasta/b.pdf"}
+
+    def test_single_file_error_propagates(self):
+        pipeline = IngestionPipeline("agent-1", FakeLoader(), fake_embed, FakeWriter())
+        with pytest.raises(ValueError):
+            pipeline.ingest_file("ruim.pdf")
+
+
+class FakeDocumentsDB:
+    """Tabelas documents/document_chunks em memória para o PGChunkWriter"""
+
+    def __init__(self):
+        self.documents = {}
+        self.chunks = {}
+        self._result = []
+        self._next_id = 0
+
+    def _new_id(self):
+        self._next_id += 1
+        return f"00000000-0000-0000-0000-{self._next_id:012d}"
+
+    def cursor(self):
+        return self
+
+    def close(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        raise AssertionError("rollback inesperado")
+
+    def execute(self, sql, params=None):
+        import hashlib
+        self._result = []
+        if sql.startswith("SELECT id FROM documents WHERE agent_id = %s AND file_name"):
+            self._result = [(d,) for d, doc in self.documents.items() if doc['file_name'] == params[1]][:1]
+        elif sql.startswith("SELECT id, md5(chunk_text)"):
+            self._result = [(c, hashlib.md5(chunk['text'].encode()).hexdigest())
+                            for c, chunk in self.chunks.items() if chunk['document_id'] == params[0]]
+        elif sql.startswith("INSERT INTO documents"):
+            doc_id = self._new_id()
+            self.documents[doc_id] = {'file_name': params[1], 'content_hash': None}
+            self._result = [(doc_id,)]
+        elif sql.startswith("SELECT id FROM documents WHERE agent_id = %s AND content_hash"):
+            self._result = [(d,) for d, doc in self.documents.items()
+                            if doc['content_hash'] == params[1] and d != params[2]][:1]
+        elif sql.startswith("DELETE FROM document_chunks"):
+            for chunk_id in params[0]:
+                del self.chunks[chunk_id]
+        elif sql.startswith("UPDATE documents SET content_hash"):
+            self.documents[params[1]]['content_hash'] = params[0]
+        elif sql.startswith("DELETE FROM documents"):
+            del self.documents[params[0]]
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def fetchall(self):
+        return self._result
+
+
+class TestPGChunkWriter:
+    """Reingestão pelo pipeline segue a semântica de upsert por (agente, fonte)"""
+
+    def test_readding_a_file_does_not_duplicate_chunks(self, monkeypatch):
+        import database
+        import vector_store
+        import ingestion_pipeline
+
+        db = FakeDocumentsDB()
+
+        def fake_bulk_insert(cur, document_id, agent_id, texts, embeddings, batch_size=None):
+            for text in texts:
+                db.chunks[db._new_id()] = {'document_id': str(document_id), 'text': text}
+            return len(texts)
+
+        monkeypatch.setattr(database.Database, "get_connection", lambda: db)
+        monkeypatch.setattr(database.Database, "release_connection", lambda conn: None)
+        monkeypatch.setattr(vector_store, "bulk_insert_chunks", fake_bulk_insert)
+        monkeypatch.setattr(PGChunkWriter, "_invalidate_agent_indexes", lambda self: None)
+
+        def ingest(texts):
+            writer = PGChunkWriter("agent-1")
+            writer.write(ChunkBatch("a.pdf", ".pdf", texts, fake_embed(texts)))
+            writer.finish_document()
+            return writer.results["a.pdf"]
+
+        assert ingest(["a", "b", "c"])['status'] == 'created'
+        assert ingest(["a", "b", "c"]) == {'document_id': ingest(["a", "b", "c"])['document_id'],
+                                            'status': 'unchanged', 'kept': 3, 'added': 0, 'removed': 0}
+        changed = ingest(["a", "b alterado", "c"])
+        assert (changed['status'], changed['kept'], changed['added'], changed['removed']) == ('updated', 2, 1, 1)
+        assert len(db.documents) == 1
+        assert sorted(chunk['text'] for chunk in db.chunks.values()) == ["a", "b alterado", "c"]
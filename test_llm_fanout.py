@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Testes da comparação multi-LLM concorrente (provedores falsos, sem rede)
+"""
+
+import asyncio
+import time
+
+from llm_providers import BaseLLMProvider, LLMProviderManager, ProviderConfig
+
+
+class SlowProvider(BaseLLMProvider):
+    """Provedor que responde após ``delay`` segundos"""
+
+    def __init__(self, name, delay, fail=False):
+        super().__init__(ProviderConfig(name=name, api_key="x", model_name=f"{name}-model"))
+        self.delay = delay
+        self.fail = fail
+
+    def generate_response(self, messages, **kwargs):
+        time.sleep(self.delay)
+        return f"{self.config.name}: {messages[-1]['content']}"
+
+    async def agenerate_response(self, messages, **kwargs):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("falha no provedor")
+        return f"{self.config.name}: {messages[-1]['content']}"
+
+    def list_models(self):
+        return [self.config.model_name]
+
+
+def make_manager(**providers):
+    manager = LLMProviderManager.__new__(LLMProviderManager)
+    manager.providers = providers
+    manager.active_provider = next(iter(providers))
+    return manager
+
+
+class TestMultiLLMFanout:
+    """Testes do fan-out concorrente entre provedores"""
+
+    def test_latency_is_max_not_sum(self):
+        manager = make_manager(a=SlowProvider("a", 0.3), b=SlowProvider("b", 0.3),
+                               c=SlowProvider("c", 0.3), d=SlowProvider("d", 0.3))
+
+        start = time.perf_counter()
+        results = manager.compare_multi_llm([{"role": "user", "content": "oi"}])
+        elapsed = time.perf_counter() - start
+
+        assert set(results) == {"a", "b", "c", "d"}
+        assert all(r["success"] for r in results.values())
+        assert elapsed < 0.9
+
+    def test_per_provider_timeout_and_errors(self):
+        manager = make_manager(rapido=SlowProvider("rapido", 0.05), lento=SlowProvider("lento", 2.0),
+                               quebrado=SlowProvider("quebrado", 0.01, fail=True))
+
+        results = manager.compare_multi_llm([{"role": "user", "content": "oi"}],
+                                            timeout=5, timeouts={"lento": 0.2})
+
+        assert results["rapido"]["success"] is True
+        assert results["lento"]["success"] is False
+        assert "Tempo limite" in results["lento"]["error"]
+        assert results["quebrado"]["error"] == "falha no provedor"
+
+    def test_stream_yields_in_arrival_order(self):
+        manager = make_manager(lento=SlowProvider("lento", 0.3), rapido=SlowProvider("rapido", 0.05))
+
+        async def collect():
+            return [name async for name, _ in manager.astream_multi_llm([{"role": "user", "content": "oi"}])]
+
+        assert asyncio.run(collect()) == ["rapido", "lento"]
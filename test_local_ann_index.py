@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Testes do índice vetorial local por agente (dados sintéticos, sem PostgreSQL)
+"""
+
+import numpy as np
+
+from local_ann_index import AgentVectorIndex, LocalANNIndexManager
+
+
+def make_corpus(n, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    return [f"id-{i}" for i in range(n)], [f"texto {i}" for i in range(n)], vectors
+
+
+class TestAgentVectorIndex:
+    """Testes do AgentVectorIndex"""
+
+    def test_exact_search_matches_brute_force(self):
+        ids, texts, vectors = make_corpus(200)
+        index = AgentVectorIndex(ids, texts, vectors)
+        query = vectors[17] + 0.01
+
+        results = index.search(query, k=5)
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        expected = np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:5]
+
+        assert index.kind == "exact"
+        assert [r[0] for r in results] == [ids[i] for i in expected]
+        assert results[0][0] == "id-17" and results[0][2] > 0.99
+
+    def test_ivf_recall_and_text_embeddings(self):
+        ids, texts, vectors = make_corpus(2000)
+        index = AgentVectorIndex(ids, texts, vectors, ivf_threshold=1000, nprobe=12)
+        assert index.kind == "ivf"
+        hits = sum(index.search(vectors[i], k=1)[0][0] == ids[i] for i in range(0, 2000, 50))
+        assert hits >= 36
+
+        as_text = ["[" + ",".join(str(x) for x in v) + "]" for v in vectors[:3]]
+        small = AgentVectorIndex(ids[:3], texts[:3], as_text)
+        assert small.search(vectors[2], k=1)[0][0] == "id-2"
+
+    def test_ivf_probes_until_k_candidates(self):
+        ids, texts, vectors = make_corpus(400)
+        index = AgentVectorIndex(ids, texts, vectors, ivf_threshold=100, nprobe=1)
+        index.lists[int(np.argmax(index.centroids @ (vectors[0] / np.linalg.norm(vectors[0]))))] = \
+            np.array([], dtype=np.int64)
+
+        assert len(index.search(vectors[0], k=50)) == 50
+        assert len(index.search(vectors[0], k=1000)) == sum(len(lst) for lst in index.lists)
+
+
+class TestLocalANNIndexManager:
+    """Testes do LocalANNIndexManager"""
+
+    def test_reload_on_version_change_and_lru_eviction(self):
+        corpora = {agent: make_corpus(100, seed=i) for i, agent in enumerate(["a", "b", "c"])}
+        versions = {"a": 1, "b": 1, "c": 1}
+        loads = []
+
+        def loader(agent_id):
+            loads.append(agent_id)
+            return corpora[agent_id]
+
+        one_index_mb = AgentVectorIndex(*corpora["a"]).nbytes / 1024 / 1024
+        manager = LocalANNIndexManager(memory_budget_mb=one_index_mb * 2.5, version_check_interval=0,
+                                       loader=loader, version_fn=versions.get)
+
+        manager.search("a", corpora["a"][2][0], k=3)
+        manager.search("a", corpora["a"][2][0], k=3)
+        assert loads == ["a"]
+
+        versions["a"] = 2
+        manager.search("a", corpora["a"][2][0], k=3)
+        assert loads == ["a", "a"]
+
+        manager.search("b", corpora["b"][2][0], k=3)
+        manager.search("a", corpora["a"][2][0], k=3)
+        manager.search("c", corpora["c"][2][0], k=3)
+        stats = manager.stats()
+        assert set(stats["indexes"]) == {"a", "c"}
+        assert stats["evictions"] == 1
+
+        manager.invalidate("a")
+        manager.search("a", corpora["a"][2][0], k=3)
+        assert loads[-1] == "a" and manager.stats()["loads"] == 5
+        assert set(manager._agent_locks) == {"a", "c"}
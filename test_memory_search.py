@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Testes do motor de busca em memória dos modos locais
+"""
+
+from memory_search import InMemorySearchEngine, chunk_text
+
+
+def make_engine(**kwargs):
+    return InMemorySearchEngine(chunk_size=200, chunk_overlap=40, initial_capacity=4, **kwargs)
+
+
+class TestInMemorySearchEngine:
+    """Testes do InMemorySearchEngine"""
+
+    def test_top_k_finds_relevant_chunk_beyond_first_chars(self):
+        engine = make_engine()
+        filler = "texto genérico sobre assuntos diversos. " * 20
+        engine.add_document(filler + "O prazo de garantia do produto é de 12 meses.", "manual.txt")
+        engine.add_document("Receita de bolo de cenoura com cobertura de chocolate.", "receita.txt")
+
+        results = engine.search("qual o prazo de garantia do produto", k=1)
+
+        assert results[0]['metadata']['source'] == "manual.txt"
+        assert "garantia" in results[0]['content']
+
+    def test_incremental_add_remove_reuses_rows(self):
+        engine = make_engine()
+        ids = [engine.add_document(f"documento número {i} sobre tema {i}", f"doc{i}.txt") for i in range(10)]
+        capacity = engine.stats()['capacity']
+        assert capacity >= 10
+
+        assert engine.remove_document(ids[3])
+        assert all(r['metadata']['source'] != "doc3.txt" for r in engine.search("tema 3", k=10))
+
+        engine.add_document("documento novo sobre tema novo", "novo.txt")
+        stats = engine.stats()
+        assert stats['capacity'] == capacity and stats['free_rows'] == 0
+        assert stats['documents'] == 10 and stats['chunks'] == 10
+
+    def test_metadata_filter(self):
+        engine = make_engine()
+        engine.add_document("política de reembolso da loja A", "a.txt", agent_id="agente-a")
+        engine.add_document("política de reembolso da loja B", "b.txt", agent_id="agente-b")
+
+        results = engine.search("política de reembolso", k=5, where={'agent_id': "agente-b"})
+        assert [r['metadata']['source'] for r in results] == ["b.txt"]
+        assert [d['source'] for d in engine.list_documents(agent_id="agente-a")] == ["a.txt"]
+
+
+def test_chunk_text_overlaps_on_word_boundaries():
+    chunks = chunk_text("palavra " * 100, chunk_size=100, overlap=20)
+    assert len(chunks) > 1
+    assert all(len(c) <= 100 and not c.startswith("alavra") for c in chunks)
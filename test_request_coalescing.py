@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Testes da coalescência de requisições e do cache de embeddings de consulta
+"""
+
+import threading
+import time
+
+import pytest
+
+from request_coalescing import QueryEmbeddingCache, SingleFlight
+
+
+def run_concurrently(count, target):
+    results, errors = [None] * count, []
+
+    def worker(i):
+        try:
+            results[i] = target()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    return results, errors
+
+
+class TestSingleFlight:
+    """Testes do SingleFlight"""
+
+    def test_concurrent_identical_calls_share_one_execution(self):
+        flight = SingleFlight()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.2)
+            return ["resultado"]
+
+        results, errors = run_concurrently(8, lambda: flight.do("generation", ("agente", "pergunta"), slow))
+        assert not errors and len(calls) == 1
+        assert all(result == ["resultado"] for result in results)
+        stats = flight.stats()["groups"]["generation"]
+        assert stats == {"executions": 1, "coalesced": 7, "inflight": 0}
+
+        # Encerrada a chamada, a mesma chave volta a executar
+        flight.do("generation", ("agente", "pergunta"), slow)
+        assert len(calls) == 2
+
+    def test_error_is_shared_and_disabled_mode_runs_everything(self):
+        flight = SingleFlight()
+
+        def failing():
+            time.sleep(0.2)
+            raise RuntimeError("provedor indisponível")
+
+        _, errors = run_concurrently(4, lambda: flight.do("retrieval", "k", failing))
+        assert len(errors) == 4 and all("indisponível" in str(e) for e in errors)
+
+        disabled = SingleFlight(enabled=False)
+        calls = []
+        run_concurrently(3, lambda: disabled.do("retrieval", "k", lambda: calls.append(1) or time.sleep(0.1)))
+        assert len(calls) == 3
+
+
+class TestQueryEmbeddingCache:
+    """Testes do LRU de embeddings de consulta"""
+
+    def test_lru_hits_and_eviction(self):
+        cache = QueryEmbeddingCache(max_entries=2)
+        computed = []
+
+        def embed(text):
+            computed.append(text)
+            return [float(len(text))]
+
+        assert cache.get_or_compute("qual o prazo?", "m", embed) == [13.0]
+        assert cache.get_or_compute("  qual  o prazo? ", "m", embed) == [13.0]
+        cache.get_or_compute("b", "m", embed)
+        cache.get_or_compute("c", "m", embed)
+        cache.get_or_compute("qual o prazo?", "m", embed)
+
+        assert computed == ["qual o prazo?", "b", "c", "qual o prazo?"]
+        stats = cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 4 and stats["entries"] == 2
+
+        with pytest.raises(ValueError):
+            cache.get_or_compute("erro", "m", lambda text: (_ for _ in ()).throw(ValueError("falha")))
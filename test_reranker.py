@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Testes do reranker com orçamento de latência
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from reranker import Reranker, LexicalOverlapScorer
+
+
+class FakeClock:
+    """Relógio que avança um passo fixo a cada leitura"""
+
+    def __init__(self, step_ms):
+        self.now, self.step = 0.0, step_ms / 1000.0
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+
+class TestReranker:
+    """Testes do Reranker"""
+
+    def test_lexical_rerank_promotes_exact_identifier(self):
+        candidates = [
+            "Disposições gerais sobre contratos administrativos.",
+            "Prazos de pagamento em contratos públicos.",
+            "O artigo 37 trata dos princípios da administração pública.",
+        ]
+        reranker = Reranker(LexicalOverlapScorer(), budget_ms=1000, record_metrics=False)
+
+        result, stats = reranker.rerank_with_stats("o que diz o artigo 37", candidates, top_k=2)
+
+        assert result[0].startswith("O artigo 37")
+        assert stats["scored"] == 3 and not stats["budget_exhausted"]
+        assert stats["top_k_changed"] == 1
+
+    def test_budget_returns_best_partial_order(self):
+        candidates = [f"texto {i}" for i in range(10)] + ["alvo procurado"] * 2
+        reranker = Reranker(LexicalOverlapScorer(), budget_ms=25, batch_size=4, record_metrics=False,
+                            clock=FakeClock(step_ms=10))
+
+        result, stats = reranker.rerank_with_stats("alvo procurado", candidates, top_k=12)
+
+        # Só os primeiros lotes cabem no orçamento: o restante mantém a ordem original
+        assert stats["budget_exhausted"]
+        assert stats["scored"] == 8
+        assert result[8:] == candidates[8:]
+        assert "alvo procurado" not in result[:8]
+
+    def test_concurrent_queries_do_not_share_state(self):
+        reranker = Reranker(LexicalOverlapScorer(), budget_ms=10_000, batch_size=1, record_metrics=False)
+        short = ["artigo 5 da constituição", "outro texto"]
+        long = [f"texto {i}" for i in range(30)] + ["lei 8666 licitações"]
+        barrier = threading.Barrier(8)
+
+        def run(query, candidates, expected):
+            barrier.wait()
+            for _ in range(50):
+                assert reranker.rerank(query, candidates, top_k=1) == [expected]
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(run, "artigo 5", short, short[0]) if i % 2 else
+                       pool.submit(run, "lei 8666", long, long[-1]) for i in range(8)]
+            for future in futures:
+                future.result()
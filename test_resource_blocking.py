@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Testes da interceptação de requisições nas capturas headless
+"""
+
+import asyncio
+
+from resource_blocking import ResourcePolicy, CaptureNetwork, NetworkStats, TYPICAL_BYTES
+
+
+class FakeRequest:
+    def __init__(self, resource_type, url):
+        self.resource_type = resource_type
+        self.url = url
+
+
+class FakeRoute:
+    def __init__(self, resource_type, url):
+        self.request = FakeRequest(resource_type, url)
+        self.outcome = None
+
+    async def continue_(self):
+        self.outcome = "continued"
+
+    async def abort(self):
+        self.outcome = "aborted"
+
+
+class FakeResponse:
+    def __init__(self, length):
+        self.headers = {"content-length": str(length)} if length is not None else {}
+
+
+class TestResourceBlocking:
+    """Testes da ResourcePolicy e da contabilidade por captura"""
+
+    def test_policy_types_trackers_and_allow_list(self):
+        policy = ResourcePolicy(deny_domains=("google-analytics.com", "tiktok.com/i18n/pixel"),
+                                allow_domains=("cdn.tribunal.jus.br",))
+
+        assert policy.block_reason("image", "https://stf.jus.br/logo.png") == "type"
+        assert policy.block_reason("script", "https://www.google-analytics.com/analytics.js") == "tracker"
+        assert policy.block_reason("script", "https://tiktok.com/i18n/pixel/events.js") == "tracker"
+        assert policy.block_reason("script", "https://tiktok.com/app.js") is None
+        assert policy.block_reason("script", "https://stf.jus.br/app.js") is None
+        # A lista de permitidos vence tipos e rastreadores; documentos nunca são bloqueados
+        assert policy.block_reason("font", "https://cdn.tribunal.jus.br/fonte.woff2") is None
+        assert policy.block_reason("document", "https://stf.jus.br/") is None
+        assert policy.block_reason("document", "https://tiktok.com/i18n/pixel/") is None
+        assert policy.block_reason("script", "https://tiktok.com/i18n/pixel/") == "tracker"
+
+    def test_policy_from_env(self, monkeypatch):
+        monkeypatch.setenv("SCRAPER_BLOCK_TYPES", "image,stylesheet")
+        monkeypatch.setenv("SCRAPER_DENY_DOMAINS", "widgets.example")
+        monkeypatch.setenv("SCRAPER_ALLOW_DOMAINS", "googletagmanager.com")
+        policy = ResourcePolicy.from_env()
+
+        assert policy.block_reason("stylesheet", "https://site.example/a.css") == "type"
+        assert policy.block_reason("font", "https://site.example/a.woff") is None
+        assert policy.block_reason("script", "https://api.widgets.example/w.js") == "tracker"
+        assert policy.block_reason("script", "https://www.googletagmanager.com/gtm.js") is None
+
+    def test_capture_network_summary(self):
+        network = CaptureNetwork(ResourcePolicy(deny_domains=("doubleclick.net",)))
+        routes = [FakeRoute("document", "https://stj.jus.br/"),
+                  FakeRoute("image", "https://stj.jus.br/a.png"),
+                  FakeRoute("font", "https://stj.jus.br/f.woff"),
+                  FakeRoute("script", "https://ad.doubleclick.net/x.js")]
+
+        async def run():
+            for route in routes:
+                await network.handle_route(route)
+        asyncio.run(run())
+        network.on_response(FakeResponse(5000))
+        network.on_response(FakeResponse(None))
+        network.mark_ready("networkidle")
+
+        assert [r.outcome for r in routes] == ["continued", "aborted", "aborted", "aborted"]
+        summary = network.summary()
+        assert summary['requests'] == 4 and summary['blocked'] == 3 and summary['blocked_trackers'] == 1
+        assert summary['bytes_loaded'] == 5000
+        assert summary['bytes_saved_estimate'] == TYPICAL_BYTES['image'] + TYPICAL_BYTES['font'] + TYPICAL_BYTES['script']
+        assert summary['ready'] == "networkidle" and summary['load_ms'] >= 0
+
+        stats = NetworkStats()
+        stats.record(summary)
+        assert stats.stats()['captures'] == 1 and stats.stats()['blocked'] == 3
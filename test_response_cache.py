@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Testes do cache de respostas exato + semântico
+"""
+
+import time
+
+from response_cache import ResponseCache, scope_hash
+
+
+def fake_embed(texts):
+    """Embeddings por palavras-chave: perguntas parecidas ficam próximas"""
+    vocab = ["prazo", "entrega", "preço", "garantia", "qual", "é", "o"]
+    return [[float(text.lower().count(word)) for word in vocab] + [0.01] for text in texts]
+
+
+def make_cache(tmp_path, **kwargs):
+    return ResponseCache(db_path=str(tmp_path / "responses.db"), embed_fn=fake_embed,
+                         record_metrics=False, **kwargs)
+
+
+class TestResponseCache:
+    """Testes do ResponseCache"""
+
+    def test_exact_tier_is_compatible_with_get_set(self, tmp_path):
+        cache = make_cache(tmp_path)
+        messages = [{"role": "user", "content": "oi"}]
+
+        assert cache.get(messages, "openai", "gpt-4o-mini") is None
+        cache.set(messages, "openai", "gpt-4o-mini", "olá!", latency=1.5)
+
+        assert cache.get(messages, "openai", "gpt-4o-mini") == "olá!"
+        assert cache.get(messages, "openai", "outro-modelo") is None
+        assert cache.stats()["latency_saved_seconds"] == 1.5
+
+    def test_exact_tier_keys_on_temperature_and_agent(self, tmp_path):
+        cache = make_cache(tmp_path)
+        messages = [{"role": "user", "content": "qual é o prazo?"}]
+        scope = scope_hash("contexto", [], "prompt", 0.2)
+        cache.store("qual é o prazo?", "agente-1", scope, "openai", "gpt", "5 dias",
+                    messages=messages, temperature=0.2)
+
+        hit = cache.lookup("qual é o prazo?", "agente-1", scope, "openai", "gpt",
+                           messages=messages, temperature=0.2)
+        assert hit["tier"] == "exact"
+
+        other_scope = scope_hash("contexto", [], "prompt", 0.9)
+        assert cache.lookup("qual é o prazo?", "agente-1", other_scope, "openai", "gpt",
+                            messages=messages, temperature=0.9) is None
+        assert cache.lookup("qual é o prazo?", "agente-2", scope, "openai", "gpt",
+                            messages=messages, temperature=0.2) is None
+        assert cache.get(messages, "openai", "gpt", temperature=0.2, agent_id="agente-1") == "5 dias"
+        assert cache.get(messages, "openai", "gpt", temperature=0.9, agent_id="agente-1") is None
+
+    def test_semantic_tier_requires_same_agent_and_scope(self, tmp_path):
+        cache = make_cache(tmp_path, semantic_threshold=0.9)
+        scope = scope_hash("contexto A", [], "prompt", 0.7)
+        cache.store("Qual é o prazo de entrega?", "agente-1", scope, "openai", "gpt", "5 dias", latency=2.0)
+
+        hit = cache.lookup("qual é o prazo de entrega", "agente-1", scope, "openai", "gpt")
+        assert hit["tier"] == "semantic" and hit["response"] == "5 dias"
+
+        assert cache.lookup("qual é o prazo de entrega", "agente-2", scope, "openai", "gpt") is None
+        other_scope = scope_hash("contexto B", [], "prompt", 0.7)
+        assert cache.lookup("qual é o prazo de entrega", "agente-1", other_scope, "openai", "gpt") is None
+        assert cache.lookup("qual é o preço da garantia", "agente-1", scope, "openai", "gpt") is None
+
+    def test_ttl_and_lru_eviction(self, tmp_path):
+        cache = make_cache(tmp_path, ttl_seconds=0.2, max_entries=3)
+        for i in range(5):
+            cache.set([{"role": "user", "content": str(i)}], "openai", "gpt", f"r{i}")
+            time.sleep(0.01)
+        cache.get([{"role": "user", "content": "0"}], "openai", "gpt")
+
+        cache.evict()
+        assert cache.stats()["entries"] == 3
+        assert cache.get([{"role": "user", "content": "1"}], "openai", "gpt") is None
+
+        time.sleep(0.25)
+        cache.evict()
+        assert cache.stats()["entries"] == 0
+
+    def test_shared_between_instances(self, tmp_path):
+        writer = make_cache(tmp_path)
+        reader = make_cache(tmp_path)
+        messages = [{"role": "user", "content": "compartilhado"}]
+
+        writer.set(messages, "openai", "gpt", "sim")
+        assert reader.get(messages, "openai", "gpt") == "sim"
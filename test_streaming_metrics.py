@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Testes das métricas de streaming (tempo até o primeiro token)
+"""
+
+from metrics_collector import MetricsCollector
+
+
+class TestStreamingMetrics:
+    """Testes do registro de respostas em streaming"""
+
+    def test_records_time_to_first_token(self, tmp_path):
+        collector = MetricsCollector(db_file=str(tmp_path / "metrics.db"))
+
+        collector.record_llm_stream("openai", "gpt-4o-mini", 0.2, 2.0, True, metadata={'chunks': 40})
+        collector.record_llm_stream("openai", "gpt-4o-mini", 0.4, 3.0, True)
+        collector.record_llm_stream("gemini", "gemini-1.5-flash", None, 1.0, False)
+
+        stats = collector.get_stream_stats()
+
+        assert stats["openai"]["streams"] == 2
+        assert stats["openai"]["avg_time_to_first_token"] == 0.3
+        assert stats["openai"]["avg_total_time"] == 2.5
+        assert stats["gemini"]["avg_time_to_first_token"] is None
+
+    def test_stream_events_do_not_skew_request_stats(self, tmp_path):
+        collector = MetricsCollector(db_file=str(tmp_path / "metrics.db"))
+
+        collector.record_llm_request("openai", "gpt-4o-mini", 1.0, True)
+        collector.record_llm_stream("deepseek", "deepseek-chat", 0.1, 1.0, True)
+
+        assert "openai" not in collector.get_stream_stats()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Testes das decisões do gerenciador de índices vetoriais (sem PostgreSQL)
+"""
+
+from vector_index_manager import (
+    VectorIndexManager, choose_strategy, ef_search_for_recall, partial_index_name, plan_partial_indexes
+)
+
+
+class FakeCursor:
+    """Responde às consultas de catálogo e registra os SET LOCAL"""
+
+    def __init__(self, partial_indexes=(), chunk_count=0, iterative_scan=True):
+        self.partial_indexes = list(partial_indexes)
+        self.chunk_count = chunk_count
+        self.iterative_scan = iterative_scan
+        self.executed = []
+        self._result = []
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+        if "pg_indexes" in sql:
+            self._result = [(name,) for name in self.partial_indexes]
+        elif "count(*)" in sql:
+            self._result = [(self.chunk_count,)]
+        elif "set_config('hnsw.iterative_scan" in sql and not self.iterative_scan:
+            raise RuntimeError("unrecognized configuration parameter")
+
+    def fetchone(self):
+        return self._result[0]
+
+    def fetchall(self):
+        return self._result
+
+    def settings(self):
+        return [params or sql for sql, params in self.executed if "set_config" in sql]
+
+
+class TestIndexDecisions:
+    """Testes das funções de decisão"""
+
+    def test_ef_search_grows_with_recall_and_k(self):
+        assert ef_search_for_recall(0.9, 5) == 40
+        assert ef_search_for_recall(0.97, 5) == 160
+        assert ef_search_for_recall(0.95, 100) == 200
+        assert ef_search_for_recall(1.0, 5) == 1000
+
+    def test_plan_partial_indexes_with_hysteresis(self):
+        counts = {"a": 50000, "b": 8000, "c": 3000}
+        plan = plan_partial_indexes(counts, existing=["b", "c", "gone"], min_chunks=10000)
+        assert plan == {"create": ["a"], "drop": ["c", "gone"]}
+
+    def test_strategy_and_index_name(self):
+        assert choose_strategy(100, False, 2000) == "exact"
+        assert choose_strategy(100, True, 2000) == "partial"
+        assert choose_strategy(5000, False, 2000) == "global"
+        name = partial_index_name("3F2504E0-4F89-11D3-9A0C-0305E82C3301")
+        assert name == "idx_chunks_hnsw_agent_3f2504e04f8911d39a0c0305e82c3301" and len(name) <= 63
+
+
+class TestPrepareSearch:
+    """Testes do ajuste por consulta"""
+
+    def test_settings_per_strategy(self):
+        agent = "3f2504e0-4f89-11d3-9a0c-0305e82c3301"
+
+        cur = FakeCursor(chunk_count=10)
+        assert VectorIndexManager().prepare_search(cur, agent, k=5) == "exact"
+        assert cur.settings() == ["SELECT set_config('enable_indexscan', 'off', true)"]
+
+        cur = FakeCursor(partial_indexes=[partial_index_name(agent)])
+        assert VectorIndexManager().prepare_search(cur, agent, k=5, recall=0.99) == "partial"
+        assert cur.settings() == [("320",)]
+
+        manager = VectorIndexManager()
+        cur = FakeCursor(chunk_count=50000, iterative_scan=False)
+        assert manager.prepare_search(cur, agent, k=5) == "global"
+        assert ("ROLLBACK TO SAVEPOINT iterative_scan", None) in cur.executed
+
+        cur = FakeCursor(chunk_count=50000)
+        manager.prepare_search(cur, agent, k=5)
+        assert not any("iterative_scan" in sql for sql, _ in cur.executed)
+
+    def test_iterative_scan_probed_once_then_single_round_trip(self):
+        agent = "3f2504e0-4f89-11d3-9a0c-0305e82c3301"
+        manager = VectorIndexManager()
+
+        cur = FakeCursor(chunk_count=50000)
+        manager.prepare_search(cur, agent, k=5)
+        assert ("RELEASE SAVEPOINT iterative_scan", None) in cur.executed
+
+        cur = FakeCursor(chunk_count=50000)
+        assert manager.prepare_search(cur, agent, k=5) == "global"
+        assert not any("SAVEPOINT" in sql for sql, _ in cur.executed)
+        assert len(cur.settings()) == 1 and "hnsw.iterative_scan" in cur.executed[-1][0]
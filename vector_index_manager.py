@@ -0,0 +1,462 @@
+"""
+Gerenciamento dos índices vetoriais de ``document_chunks``
+
+- Índices HNSW parciais (``WHERE agent_id = ...``) para agentes grandes, que
+  evitam o pós-filtro do índice global quando há milhares de agentes
+- Busca exata (varredura pelo btree de ``agent_id``) para agentes pequenos
+- ``hnsw.ef_search`` ajustado por consulta conforme o recall pedido
+- Particionamento opcional de ``document_chunks`` por hash de ``agent_id``
+- Coluna ``chunk_tsv`` + índice GIN da busca híbrida (bancos anteriores ao schema atual)
+- Unicidade de ``documents.content_hash`` por agente (bancos com o índice global antigo)
+- Relatório de tamanho e tempo de construção dos índices
+
+Uso:
+    python vector_index_manager.py --report
+    python vector_index_manager.py --sync
+    python vector_index_manager.py --build <agent_id>
+    python vector_index_manager.py --drop <agent_id>
+    python vector_index_manager.py --partition [partições]
+    python vector_index_manager.py --lexical
+    python vector_index_manager.py --doc-hash
+"""
+
+import os
+import sys
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from database import Database
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PARTIAL_INDEX_PREFIX = "idx_chunks_hnsw_agent_"
+
+# Mesma expressão da coluna gerada chunk_tsv em schema.sql
+LEXICAL_TSVECTOR_SQL = (
+    "to_tsvector('portuguese', chunk_text) || "
+    "to_tsvector('simple', regexp_replace(regexp_replace(chunk_text, '(\\d)[.\\-/](?=\\d)', '\\1', 'g'), "
+    "'\\D+', ' ', 'g'))"
+)
+
+# Recall alvo -> ef_search (referência: HNSW com m=16, ef_construction=64)
+EF_SEARCH_BY_RECALL = [
+    (0.90, 40),
+    (0.95, 80),
+    (0.98, 160),
+    (0.99, 320),
+    (1.00, 1000)
+]
+
+
+def ef_search_for_recall(recall: float, k: int) -> int:
+    """Menor ``ef_search`` que atinge o recall pedido, nunca abaixo de 2*k"""
+    ef_search = EF_SEARCH_BY_RECALL[-1][1]
+    for target, value in EF_SEARCH_BY_RECALL:
+        if recall <= target:
+            ef_search = value
+            break
+    return min(max(ef_search, 2 * k), 1000)
+
+
+def partial_index_name(agent_id: str) -> str:
+    """Nome determinístico do índice parcial do agente (cabe nos 63 caracteres do PostgreSQL)"""
+    return PARTIAL_INDEX_PREFIX + str(agent_id).replace("-", "").lower()
+
+
+def choose_strategy(chunk_count: int, has_partial_index: bool, exact_threshold: int) -> str:
+    """
+    Estratégia de busca do agente:
+    - ``partial``: índice HNSW exclusivo do agente
+    - ``exact``: poucos chunks, varredura exata é mais rápida e tem recall 1.0
+    - ``global``: índice HNSW global com varredura iterativa para compensar o filtro
+    """
+    if has_partial_index:
+        return "partial"
+    if chunk_count <= exact_threshold:
+        return "exact"
+    return "global"
+
+
+def plan_partial_indexes(agent_counts: Dict[str, int], existing: List[str], min_chunks: int,
+                         hysteresis: float = 0.5) -> Dict[str, List[str]]:
+    """
+    Decide quais índices parciais criar e quais remover. Um índice só é
+    removido quando o agente cai abaixo de ``min_chunks * hysteresis``,
+    evitando recriações quando o volume oscila perto do limite.
+    """
+    existing = set(existing)
+    create = [agent_id for agent_id, count in agent_counts.items()
+              if count >= min_chunks and agent_id not in existing]
+    drop = [agent_id for agent_id in existing
+            if agent_counts.get(agent_id, 0) < min_chunks * hysteresis]
+    return {"create": sorted(create), "drop": sorted(drop)}
+
+
+class VectorIndexManager:
+    """Cria, remove e reporta os índices vetoriais e prepara cada busca"""
+
+    def __init__(self,
+                 min_chunks_for_partial: int = 10000,
+                 exact_threshold: int = 2000,
+                 default_recall: float = 0.95,
+                 m: int = 16,
+                 ef_construction: int = 64,
+                 cache_ttl: float = 60.0):
+        self.min_chunks_for_partial = min_chunks_for_partial
+        self.exact_threshold = exact_threshold
+        self.default_recall = default_recall
+        self.m = m
+        self.ef_construction = ef_construction
+        self.cache_ttl = cache_ttl
+
+        self._lock = threading.Lock()
+        self._partial_agents: Optional[set] = None
+        self._partial_loaded_at = 0.0
+        self._counts: Dict[str, Tuple[int, float]] = {}
+        self._iterative_scan: Optional[bool] = None
+
+    # --- Preparação da busca ------------------------------------------------
+
+    def _agents_with_partial_index(self, cur) -> set:
+        with self._lock:
+            if self._partial_agents is not None and time.monotonic() - self._partial_loaded_at < self.cache_ttl:
+                return self._partial_agents
+        cur.execute("SELECT indexname FROM pg_indexes WHERE tablename = 'document_chunks' AND indexname LIKE %s",
+                    (PARTIAL_INDEX_PREFIX + "%",))
+        agents = {row[0][len(PARTIAL_INDEX_PREFIX):] for row in cur.fetchall()}
+        with self._lock:
+            self._partial_agents, self._partial_loaded_at = agents, time.monotonic()
+        return agents
+
+    def _chunk_count(self, cur, agent_id: str) -> int:
+        with self._lock:
+            cached = self._counts.get(agent_id)
+            if cached and time.monotonic() - cached[1] < self.cache_ttl:
+                return cached[0]
+        cur.execute("SELECT count(*) FROM document_chunks WHERE agent_id = %s", (agent_id,))
+        count = cur.fetchone()[0]
+        with self._lock:
+            self._counts[agent_id] = (count, time.monotonic())
+        return count
+
+    def strategy_for(self, cur, agent_id: str) -> str:
+        key = str(agent_id).replace("-", "").lower()
+        if key in self._agents_with_partial_index(cur):
+            return "partial"
+        return choose_strategy(self._chunk_count(cur, agent_id), False, self.exact_threshold)
+
+    def prepare_search(self, cur, agent_id: str, k: int, recall: Optional[float] = None) -> str:
+        """
+        Ajusta a transação corrente para a busca do agente (``SET LOCAL``) e
+        retorna a estratégia escolhida. Deve rodar na mesma transação da busca.
+        """
+        strategy = self.strategy_for(cur, agent_id)
+        if strategy == "exact":
+            # Desliga só o index scan: o bitmap scan pelo btree de agent_id continua disponível
+            cur.execute("SELECT set_config('enable_indexscan', 'off', true)")
+            return strategy
+
+        ef_search = ef_search_for_recall(recall if recall is not None else self.default_recall, k)
+        if strategy == "global" and self._iterative_scan:
+            # Suporte já conhecido: os dois parâmetros em uma única ida ao banco
+            cur.execute("SELECT set_config('hnsw.ef_search', %s, true), "
+                        "set_config('hnsw.iterative_scan', 'strict_order', true)", (str(ef_search),))
+            return strategy
+
+        cur.execute("SELECT set_config('hnsw.ef_search', %s, true)", (str(ef_search),))
+        if strategy == "global" and self._iterative_scan is None:
+            # pgvector >= 0.8: continua percorrendo o grafo até achar k linhas do agente.
+            # Sondado uma vez por processo, dentro de um savepoint
+            try:
+                cur.execute("SAVEPOINT iterative_scan")
+                cur.execute("SELECT set_config('hnsw.iterative_scan', 'strict_order', true)")
+                cur.execute("RELEASE SAVEPOINT iterative_scan")
+                self._iterative_scan = True
+            except Exception:
+                cur.execute("ROLLBACK TO SAVEPOINT iterative_scan")
+                self._iterative_scan = False
+        return strategy
+
+    def invalidate(self, agent_id: Optional[str] = None):
+        with self._lock:
+            if agent_id is None:
+                self._counts.clear()
+                self._partial_agents = None
+            else:
+                self._counts.pop(agent_id, None)
+
+    # --- Construção e remoção -----------------------------------------------
+
+    def _run_autocommit(self, statements: List[Tuple[str, tuple]]) -> float:
+        """Executa DDL fora de transação (necessário para CREATE INDEX CONCURRENTLY)"""
+        conn = Database.get_connection()
+        conn.rollback()
+        conn.autocommit = True
+        start = time.perf_counter()
+        try:
+            with conn.cursor() as cur:
+                for sql, params in statements:
+                    cur.execute(sql, params or None)
+            return time.perf_counter() - start
+        finally:
+            conn.autocommit = False
+            Database.release_connection(conn)
+
+    def build_partial_index(self, agent_id: str) -> Dict[str, Any]:
+        """Cria (sem bloquear escritas) o índice HNSW parcial do agente e registra o tempo de construção"""
+        name = partial_index_name(agent_id)
+        logger.info(f"🏗️ VectorIndexManager: construindo {name}...")
+        build_seconds = self._run_autocommit([
+            (f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON document_chunks "
+             f"USING hnsw (embedding vector_cosine_ops) WITH (m = %s, ef_construction = %s) "
+             f"WHERE agent_id = %s", (self.m, self.ef_construction, str(agent_id)))
+        ])
+
+        conn = Database.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT count(*) FROM document_chunks WHERE agent_id = %s", (agent_id,))
+                chunks = cur.fetchone()[0]
+                cur.execute("SELECT pg_relation_size(%s::regclass)", (name,))
+                size_bytes = cur.fetchone()[0]
+                cur.execute(
+                    "INSERT INTO vector_index_builds (index_name, agent_id, chunks, build_seconds, size_bytes) "
+                    "VALUES (%s, %s, %s, %s, %s)",
+                    (name, agent_id, chunks, build_seconds, size_bytes)
+                )
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.warning(f"⚠️ VectorIndexManager: tempo de construção não registrado: {e}")
+            chunks = size_bytes = None
+        finally:
+            Database.release_connection(conn)
+
+        self.invalidate()
+        logger.info(f"✅ VectorIndexManager: {name} criado em {build_seconds:.1f}s")
+        return {"index_name": name, "agent_id": agent_id, "chunks": chunks,
+                "build_seconds": round(build_seconds, 2), "size_bytes": size_bytes}
+
+    def drop_partial_index(self, agent_id: str):
+        name = partial_index_name(agent_id)
+        self._run_autocommit([(f"DROP INDEX CONCURRENTLY IF EXISTS {name}", ())])
+        self.invalidate()
+        logger.info(f"🗑️ VectorIndexManager: {name} removido")
+
+    def ensure_lexical_index(self) -> float:
+        """Adiciona a coluna ``chunk_tsv`` e seu índice GIN em bancos criados antes da busca híbrida"""
+        build_seconds = self._run_autocommit([
+            (f"ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS chunk_tsv tsvector "
+             f"GENERATED ALWAYS AS ({LEXICAL_TSVECTOR_SQL}) STORED", ()),
+            ("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chunks_tsv ON document_chunks USING gin (chunk_tsv)", ())
+        ])
+        logger.info(f"✅ VectorIndexManager: índice textual idx_chunks_tsv pronto em {build_seconds:.1f}s")
+        return build_seconds
+
+    def ensure_document_hash_index(self) -> float:
+        """
+        Troca o antigo ``idx_docs_hash`` (único em ``content_hash`` para todos os
+        agentes) pela unicidade por agente e cria o índice de busca por fonte
+        usado na reingestão incremental
+        """
+        build_seconds = self._run_autocommit([
+            ("CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_docs_agent_hash "
+             "ON documents (agent_id, content_hash)", ()),
+            ("DROP INDEX CONCURRENTLY IF EXISTS idx_docs_hash", ()),
+            ("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_docs_agent_file ON documents (agent_id, file_name)", ())
+        ])
+        logger.info(f"✅ VectorIndexManager: unicidade de documentos por agente pronta em {build_seconds:.1f}s")
+        return build_seconds
+
+    @staticmethod
+    def _is_partitioned(cur) -> bool:
+        cur.execute("SELECT relkind FROM pg_class WHERE relname = 'document_chunks'")
+        row = cur.fetchone()
+        return bool(row) and row[0] == 'p'
+
+    def sync_partial_indexes(self) -> Dict[str, List[str]]:
+        """Cria índices parciais para agentes que passaram do limite e remove os que encolheram"""
+        conn = Database.get_connection()
+        try:
+            with conn.cursor() as cur:
+                if self._is_partitioned(cur):
+                    # Com partições por agente o HNSW de cada partição já é pequeno
+                    logger.info("ℹ️ VectorIndexManager: document_chunks particionada; índices parciais não são usados")
+                    return {"create": [], "drop": []}
+                cur.execute("SELECT agent_id::text, count(*) FROM document_chunks GROUP BY agent_id")
+                counts = {agent_id.replace("-", ""): count for agent_id, count in cur.fetchall()}
+                self.invalidate()
+                existing = list(self._agents_with_partial_index(cur))
+        finally:
+            conn.rollback()
+            Database.release_connection(conn)
+
+        plan = plan_partial_indexes(counts, existing, self.min_chunks_for_partial)
+        for agent_key in plan["create"]:
+            self.build_partial_index(_uuid_from_key(agent_key))
+        for agent_key in plan["drop"]:
+            self.drop_partial_index(_uuid_from_key(agent_key))
+        return plan
+
+    def partition_by_agent(self, partitions: int = 64):
+        """
+        Migra ``document_chunks`` para uma tabela particionada por hash de
+        ``agent_id`` (cada partição tem seu próprio HNSW, bem menor que o global).
+        Bloqueia escritas durante a cópia: rodar em janela de manutenção.
+        """
+        conn = Database.get_connection()
+        try:
+            with conn.cursor() as cur:
+                if self._is_partitioned(cur):
+                    logger.info("ℹ️ VectorIndexManager: document_chunks já está particionada")
+                    return
+                partial_agents = self._agents_with_partial_index(cur)
+        finally:
+            conn.rollback()
+            Database.release_connection(conn)
+
+        # Os índices parciais ficariam na tabela antiga com os mesmos nomes
+        statements = [f"DROP INDEX IF EXISTS {PARTIAL_INDEX_PREFIX}{key}" for key in sorted(partial_agents)]
+        statements += [
+            "LOCK TABLE document_chunks IN EXCLUSIVE MODE",
+            "CREATE TABLE document_chunks_partitioned (LIKE document_chunks INCLUDING DEFAULTS INCLUDING GENERATED, "
+            "PRIMARY KEY (id, agent_id)) PARTITION BY HASH (agent_id)",
+        ]
+        statements += [
+            f"CREATE TABLE document_chunks_p{i} PARTITION OF document_chunks_partitioned "
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {i})"
+            for i in range(partitions)
+        ]
+        statements += [
+            "INSERT INTO document_chunks_partitioned (id, document_id, agent_id, chunk_text, embedding, created_at) "
+            "SELECT id, document_id, agent_id, chunk_text, embedding, created_at FROM document_chunks",
+            "ALTER TABLE document_chunks RENAME TO document_chunks_unpartitioned",
+            "ALTER TABLE document_chunks_partitioned RENAME TO document_chunks",
+            "ALTER TABLE document_chunks ADD FOREIGN KEY (document_id) REFERENCES documents(id) ON DELETE CASCADE",
+            "ALTER TABLE document_chunks ADD FOREIGN KEY (agent_id) REFERENCES agentes(id) ON DELETE CASCADE",
+            "CREATE INDEX idx_chunks_agent_id_part ON document_chunks(agent_id)",
+            "CREATE INDEX idx_chunks_tsv_part ON document_chunks USING gin (chunk_tsv)",
+            f"CREATE INDEX idx_chunks_embedding_part ON document_chunks USING hnsw (embedding vector_cosine_ops) "
+            f"WITH (m = {self.m}, ef_construction = {self.ef_construction})",
+        ]
+        statements += [
+            f"CREATE TRIGGER trg_chunks_version_{op.lower()} AFTER {op} ON document_chunks "
+            f"REFERENCING {'OLD' if op == 'DELETE' else 'NEW'} TABLE AS changed_rows "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION bump_agent_chunk_version()"
+            for op in ("INSERT", "UPDATE", "DELETE")
+        ]
+
+        conn = Database.get_connection()
+        start = time.perf_counter()
+        try:
+            with conn.cursor() as cur:
+                for sql in statements:
+                    cur.execute(sql)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"❌ VectorIndexManager: falha no particionamento (nada foi alterado): {e}")
+            raise
+        finally:
+            Database.release_connection(conn)
+
+        self.invalidate()
+        logger.info(f"✅ VectorIndexManager: document_chunks particionada em {partitions} partições "
+                    f"em {time.perf_counter() - start:.1f}s (tabela antiga: document_chunks_unpartitioned)")
+
+    # --- Relatório ----------------------------------------------------------
+
+    def report(self) -> Dict[str, Any]:
+        """Tamanho, uso e último tempo de construção de cada índice de ``document_chunks``"""
+        conn = Database.get_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT i.indexrelname, pg_relation_size(i.indexrelid), i.idx_scan,
+                           b.build_seconds, b.chunks, b.built_at
+                    FROM pg_stat_user_indexes i
+                    LEFT JOIN LATERAL (
+                        SELECT build_seconds, chunks, built_at FROM vector_index_builds
+                        WHERE index_name = i.indexrelname ORDER BY built_at DESC LIMIT 1
+                    ) b ON true
+                    WHERE i.relname LIKE 'document_chunks%'
+                    ORDER BY pg_relation_size(i.indexrelid) DESC
+                """)
+                indexes = [{
+                    "index_name": row[0],
+                    "size_mb": round(row[1] / 1024 / 1024, 2),
+                    "scans": row[2],
+                    "build_seconds": row[3],
+                    "chunks": row[4],
+                    "built_at": row[5].isoformat() if row[5] else None
+                } for row in cur.fetchall()]
+                cur.execute("SELECT count(DISTINCT agent_id), count(*) FROM document_chunks")
+                agents, chunks = cur.fetchone()
+        finally:
+            conn.rollback()
+            Database.release_connection(conn)
+
+        return {
+            "agents": agents,
+            "chunks": chunks,
+            "partial_indexes": sum(1 for idx in indexes if idx["index_name"].startswith(PARTIAL_INDEX_PREFIX)),
+            "total_index_size_mb": round(sum(idx["size_mb"] for idx in indexes), 2),
+            "indexes": indexes
+        }
+
+
+def _uuid_from_key(key: str) -> str:
+    return f"{key[:8]}-{key[8:12]}-{key[12:16]}-{key[16:20]}-{key[20:]}"
+
+
+_manager: Optional[VectorIndexManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_vector_index_manager() -> VectorIndexManager:
+    """Retorna o gerenciador de índices compartilhado (configurado por variáveis VECTOR_INDEX_*)"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = VectorIndexManager(
+                    min_chunks_for_partial=int(os.getenv("VECTOR_INDEX_PARTIAL_MIN_CHUNKS", "10000")),
+                    exact_threshold=int(os.getenv("VECTOR_INDEX_EXACT_THRESHOLD", "2000")),
+                    default_recall=float(os.getenv("VECTOR_INDEX_DEFAULT_RECALL", "0.95"))
+                )
+    return _manager
+
+
+def main():
+    manager = get_vector_index_manager()
+    comando = sys.argv[1] if len(sys.argv) > 1 else "--report"
+
+    if comando == "--report":
+        report = manager.report()
+        print(f"📊 {report['agents']} agentes, {report['chunks']} chunks, "
+              f"{report['partial_indexes']} índices parciais, {report['total_index_size_mb']} MB em índices")
+        for idx in report["indexes"]:
+            build = f"{idx['build_seconds']:.1f}s" if idx["build_seconds"] is not None else "-"
+            print(f"  {idx['index_name']:<52} {idx['size_mb']:>10.2f} MB  scans={idx['scans']:<8} build={build}")
+    elif comando == "--sync":
+        plan = manager.sync_partial_indexes()
+        print(f"✅ {len(plan['create'])} índices parciais criados, {len(plan['drop'])} removidos")
+    elif comando == "--build" and len(sys.argv) > 2:
+        print(manager.build_partial_index(sys.argv[2]))
+    elif comando == "--drop" and len(sys.argv) > 2:
+        manager.drop_partial_index(sys.argv[2])
+    elif comando == "--lexical":
+        manager.ensure_lexical_index()
+    elif comando == "--doc-hash":
+        manager.ensure_document_hash_index()
+    elif comando == "--partition":
+        manager.partition_by_agent(int(sys.argv[2]) if len(sys.argv) > 2 else 64)
+    else:
+        print(__doc__)
+
+
+if __name__ == "__main__":
+    main()
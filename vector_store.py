@@ -2,20 +2,31 @@
 Módulo para gerenciamento do banco de vetores usando ChromaDB
 """
 
+import io
 import os
+import re
+import hashlib
 import logging
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 
-import chromadb
-from chromadb.config import Settings
-from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings
 import psycopg2
+import psycopg2.extras
 from langchain.schema import Document
-from pgvector.psycopg2 import register_vector
 from llm_providers import llm_manager
 from database import Database
+from embedding_engine import get_embedding_engine
+from embedding_cache import get_embedding_cache
+from local_ann_index import get_local_ann_index
+from vector_index_manager import get_vector_index_manager
+from request_coalescing import get_query_embedding_cache
+from lazy_imports import lazy_import
+
+# Dependências do VectorStore legado (ChromaDB), carregadas só se ele for instanciado
+chromadb = lazy_import("chromadb", "chromadb")
+chromadb_config = lazy_import("chromadb.config", "chromadb")
+langchain_vectorstores = lazy_import("langchain_community.vectorstores", "langchain-community")
+langchain_openai = lazy_import("langchain_openai", "langchain-openai")
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -51,7 +62,7 @@ class VectorStore:
         self.persist_directory.mkdir(parents=True, exist_ok=True)
         
         # Inicializar embeddings
-        self.embeddings = OpenAIEmbeddings(
+        self.embeddings = langchain_openai.OpenAIEmbeddings(
             model=embedding_model,
             openai_api_key=os.getenv("OPENAI_API_KEY")
         )
@@ -59,7 +70,7 @@ class VectorStore:
         # Inicializar ChromaDB
         self.client = chromadb.PersistentClient(
             path=str(self.persist_directory),
-            settings=Settings(
+            settings=chromadb_config.Settings(
                 anonymized_telemetry=False,
                 allow_reset=True
             )
@@ -80,7 +91,7 @@ class VectorStore:
             
             if collection_exists:
                 # Carregar coleção existente
-                self.vector_store = Chroma(
+                self.vector_store = langchain_vectorstores.Chroma(
                     client=self.client,
                     collection_name=self.collection_name,
                     embedding_function=self.embeddings,
@@ -89,7 +100,7 @@ class VectorStore:
                 logger.info(f"Coleção existente carregada: {self.collection_name}")
             else:
                 # Criar nova coleção
-                self.vector_store = Chroma(
+                self.vector_store = langchain_vectorstores.Chroma(
                     client=self.client,
                     collection_name=self.collection_name,
                     embedding_function=self.embeddings,
@@ -268,6 +279,141 @@ class VectorStore:
             logger.error(f"Erro ao obter fontes de documentos: {str(e)}")
             return []
 
+# Número de chunks enviados por instrução COPY/execute_values
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+
+def _copy_escape(value: str) -> str:
+    """Escapa um campo para o formato texto do COPY."""
+    return (value.replace('\\', '\\\\')
+                 .replace('\t', '\\t')
+                 .replace('\n', '\\n')
+                 .replace('\r', '\\r'))
+
+def _vector_literal(embedding) -> str:
+    """Representação textual de um vetor pgvector: [x1,x2,...]."""
+    return '[' + ','.join(repr(float(x)) for x in embedding) + ']'
+
+def bulk_insert_chunks(cur, document_id, agent_id: str, texts: List[str], embeddings: List[List[float]],
+                       batch_size: Optional[int] = None) -> int:
+    """
+    Insere chunks em massa na tabela document_chunks usando o cursor (e a
+    transação) do chamador.
+
+    Usa ``COPY ... FROM STDIN`` em lotes de ``batch_size`` linhas; se o COPY
+    não for suportado (ex: pooler em modo transação), recua para
+    ``execute_values``. Retorna o número de chunks inseridos.
+
+    Levanta ValueError se faltar o embedding de algum chunk: o chamador
+    desfaz a transação em vez de gravar o documento incompleto.
+    """
+    batch_size = batch_size or INGEST_BATCH_SIZE
+    missing = len(texts) - sum(1 for embedding in embeddings if embedding is not None)
+    if len(embeddings) != len(texts) or missing:
+        raise ValueError(f"Embeddings ausentes para {max(missing, len(texts) - len(embeddings))} "
+                         f"de {len(texts)} chunks do documento {document_id}")
+    rows = list(zip(texts, embeddings))
+    if not rows:
+        return 0
+
+    document_id = str(document_id)
+    agent_id = str(agent_id)
+
+    cur.execute("SAVEPOINT bulk_insert_chunks")
+    try:
+        for start in range(0, len(rows), batch_size):
+            buffer = io.StringIO()
+            for text, embedding in rows[start:start + batch_size]:
+                buffer.write(f"{document_id}\t{agent_id}\t{_copy_escape(text)}\t{_vector_literal(embedding)}\n")
+            buffer.seek(0)
+            cur.copy_expert(
+                "COPY document_chunks (document_id, agent_id, chunk_text, embedding) FROM STDIN",
+                buffer
+            )
+        method = "COPY"
+    except psycopg2.Error as e:
+        logger.warning(f"⚠️ COPY indisponível ({e}); usando execute_values")
+        cur.execute("ROLLBACK TO SAVEPOINT bulk_insert_chunks")
+        psycopg2.extras.execute_values(
+            cur,
+            "INSERT INTO document_chunks (document_id, agent_id, chunk_text, embedding) VALUES %s",
+            [(document_id, agent_id, text, _vector_literal(embedding)) for text, embedding in rows],
+            template="(%s, %s, %s, %s::vector)",
+            page_size=batch_size
+        )
+        method = "execute_values"
+    cur.execute("RELEASE SAVEPOINT bulk_insert_chunks")
+
+    logger.info(f"📦 {len(rows)} chunks inseridos via {method} em lotes de {batch_size}")
+    return len(rows)
+
+def chunk_hash(text: str) -> str:
+    """Hash do texto de um chunk; equivale a ``md5(chunk_text)`` no PostgreSQL."""
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+def plan_chunk_diff(existing: List[tuple], texts: List[str]) -> Dict[str, Any]:
+    """
+    Compara os chunks já gravados (pares ``(id, hash)``) com os novos textos.
+
+    Chunks cujo hash continua presente são mantidos (com seus embeddings);
+    os demais são removidos e apenas os textos novos ou alterados precisam
+    ser vetorizados. Textos repetidos são tratados como multiconjunto.
+    """
+    available: Dict[str, List[Any]] = {}
+    for chunk_id, digest in existing:
+        available.setdefault(digest, []).append(chunk_id)
+
+    keep_ids, new_texts = [], []
+    for text in texts:
+        ids = available.get(chunk_hash(text))
+        if ids:
+            keep_ids.append(ids.pop())
+        else:
+            new_texts.append(text)
+
+    delete_ids = [chunk_id for ids in available.values() for chunk_id in ids]
+    return {'keep_ids': keep_ids, 'delete_ids': delete_ids, 'new_texts': new_texts}
+
+def sync_document_chunks(cur, document_id, agent_id: str, texts: List[str], embed_fn,
+                         batch_size: Optional[int] = None) -> Dict[str, int]:
+    """
+    Atualiza incrementalmente os chunks de um documento existente usando o
+    cursor (e a transação) do chamador: remove os chunks que sumiram e
+    vetoriza/insere só os novos ou alterados. O custo é proporcional à diferença.
+    """
+    cur.execute("SELECT id, md5(chunk_text) FROM document_chunks WHERE document_id = %s", (str(document_id),))
+    plan = plan_chunk_diff(cur.fetchall(), texts)
+
+    if plan['delete_ids']:
+        cur.execute("DELETE FROM document_chunks WHERE id = ANY(%s::uuid[])",
+                    ([str(chunk_id) for chunk_id in plan['delete_ids']],))
+
+    added = 0
+    if plan['new_texts']:
+        embeddings = embed_fn(plan['new_texts'])
+        added = bulk_insert_chunks(cur, document_id, agent_id, plan['new_texts'], embeddings, batch_size=batch_size)
+
+    logger.info(f"🔁 Sincronização do documento {document_id}: {len(plan['keep_ids'])} chunks mantidos, "
+                f"{added} adicionados, {len(plan['delete_ids'])} removidos")
+    return {'kept': len(plan['keep_ids']), 'added': added, 'removed': len(plan['delete_ids'])}
+
+# Separadores dentro de identificadores numéricos (CPF 123.456.789-00, CNPJ 12.345.678/0001-90)
+_NUMERIC_SEPARATORS = re.compile(r"(\d)[.\-/](?=\d)")
+
+def build_lexical_query(text: str) -> Dict[str, str]:
+    """
+    Monta os termos da busca textual em OR (semântica próxima do BM25: basta um
+    termo em comum), espelhando a coluna gerada ``chunk_tsv``:
+    - ``words``: palavras para ``to_tsquery('portuguese', ...)`` (com stemming)
+    - ``numbers``: números sem pontuação para ``to_tsquery('simple', ...)``,
+      de modo que "123.456.789-00" e "12345678900" se encontrem
+    """
+    words = [w for w in re.findall(r"[^\W\d_]+", text.lower()) if len(w) > 1]
+    numbers = re.findall(r"\d+", _NUMERIC_SEPARATORS.sub(r"\1", text))
+    return {
+        'words': " | ".join(dict.fromkeys(words)),
+        'numbers': " | ".join(dict.fromkeys(numbers))
+    }
+
 class PGVectorStore:
     """
     Gerencia o armazenamento e a busca de vetores no PostgreSQL/Supabase
@@ -280,33 +426,41 @@ class PGVectorStore:
         self.embedding_function = self._get_embedding_function()
 
     def _get_embedding_function(self):
-        """Retorna a função de embedding usando OpenAI diretamente."""
+        """
+        Retorna a função de embedding baseada no motor em lotes compartilhado.
+        Vetores já calculados são servidos pelo cache endereçado por conteúdo.
+        """
+        engine = get_embedding_engine()
+        cache = get_embedding_cache()
+
         def embed_texts(texts: List[str]) -> List[List[float]]:
             try:
-                from openai import OpenAI
-                client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-                
-                embeddings = []
-                for text in texts:
-                    response = client.embeddings.create(
-                        model=EMBEDDING_MODEL,
-                        input=text
-                    )
-                    embeddings.append(response.data[0].embedding)
-                
-                return embeddings
+                return cache.get_or_compute(
+                    texts,
+                    EMBEDDING_MODEL,
+                    lambda missing: engine.embed_texts(missing, model=EMBEDDING_MODEL)
+                )
             except Exception as e:
                 logger.error(f"Erro ao gerar embeddings: {e}")
                 raise
 
         return embed_texts
 
+    def _embed_query(self, query: str) -> List[float]:
+        """
+        Embedding da consulta pelo LRU de consultas; consultas idênticas e
+        simultâneas compartilham uma única chamada ao provedor.
+        """
+        engine = get_embedding_engine()
+        return get_query_embedding_cache().get_or_compute(
+            query, EMBEDDING_MODEL, lambda text: engine.embed_query(text, model=EMBEDDING_MODEL)
+        )
+
     def _execute_query(self, query: str, params: tuple = (), fetch: str = None):
         """Executa uma query no banco de dados."""
         conn = None
         try:
             conn = Database.get_connection()
-            register_vector(conn)
             with conn.cursor() as cur:
                 cur.execute(query, params)
                 if fetch == 'one':
@@ -323,8 +477,11 @@ class PGVectorStore:
             if conn:
                 Database.release_connection(conn)
 
-    def add_documents(self, documents: List[Document]):
-        """Gera embeddings para os documentos e os salva no banco de dados."""
+    def add_documents(self, documents: List[Document], batch_size: Optional[int] = None):
+        """
+        Gera embeddings para os documentos e os salva no banco de dados
+        em uma única transação, com inserção em massa dos chunks.
+        """
         logger.info(f"🔗 PGVectorStore: Iniciando adição de {len(documents)} documentos para agente {self.agent_id}")
         
         # Verificar se há documentos para processar
@@ -354,7 +511,6 @@ class PGVectorStore:
         conn = None
         try:
             conn = Database.get_connection()
-            register_vector(conn)
             
             with conn.cursor() as cur:
                 # Insere um novo documento na tabela 'documents' para obter um ID
@@ -364,15 +520,13 @@ class PGVectorStore:
                 document_id = cur.fetchone()[0]
                 logger.info(f"✅ PGVectorStore: Documento mestre criado com ID: {document_id}")
 
-                # Agora, insere cada chunk associado a esse novo document_id
+                # Agora, insere os chunks em massa associados a esse novo document_id
                 logger.info(f"📄 PGVectorStore: Inserindo {len(valid_texts)} chunks na tabela 'document_chunks'...")
-                chunk_query = "INSERT INTO document_chunks (document_id, agent_id, chunk_text, embedding) VALUES (%s, %s, %s, %s)"
-                for i, text_chunk in enumerate(valid_texts):
-                    logger.info(f"  - Inserindo chunk {i+1}/{len(valid_texts)} (tamanho: {len(text_chunk)} chars)")
-                    cur.execute(chunk_query, (document_id, self.agent_id, text_chunk, embeddings[i]))
+                bulk_insert_chunks(cur, document_id, self.agent_id, valid_texts, embeddings, batch_size=batch_size)
                 
                 # Commit da transação
                 conn.commit()
+                self._invalidate_local_index()
                 logger.info(f"🎉 PGVectorStore: {len(valid_texts)} chunks salvos no banco de dados para o agente {self.agent_id}")
                 
         except Exception as e:
@@ -384,24 +538,148 @@ class PGVectorStore:
             if conn:
                 Database.release_connection(conn)
 
-    def similarity_search(self, query: str, k: int = 5) -> List[Document]:
-        """Busca por documentos similares a uma query APENAS do agente atual."""
+    def upsert_document(self, source: str, texts: List[str], source_type: str = 'file',
+                        batch_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Grava ou atualiza incrementalmente o documento ``source`` do agente.
+
+        Se o conteúdo não mudou (mesmo ``content_hash``), nada é feito; se o
+        documento já existe, apenas os chunks novos ou alterados são
+        vetorizados e os removidos são apagados; caso contrário ele é criado.
+        Conteúdo idêntico ao de outra fonte do agente não é duplicado: o
+        resultado vem como ``unchanged`` com ``duplicate_of`` e a versão
+        anterior desta fonte, se houver, é removida.
+        """
+        texts = [text for text in texts if text and text.strip()]
+        content_hash = hashlib.sha256("\x00".join(texts).encode('utf-8')).hexdigest()
+
+        conn = None
+        try:
+            conn = Database.get_connection()
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT id, content_hash FROM documents WHERE agent_id = %s AND file_name = %s "
+                    "ORDER BY created_at LIMIT 1 FOR UPDATE",
+                    (self.agent_id, source)
+                )
+                row = cur.fetchone()
+
+                if row and row[1] == content_hash:
+                    conn.rollback()
+                    logger.info(f"⏭️ PGVectorStore: '{source}' sem alterações para o agente {self.agent_id}")
+                    return {'document_id': str(row[0]), 'status': 'unchanged', 'kept': len(texts), 'added': 0, 'removed': 0}
+
+                # Mesmo conteúdo já gravado sob outra fonte do agente: a unicidade é
+                # por (agent_id, content_hash), então a fonte passa a apontar para ele
+                cur.execute(
+                    "SELECT id, file_name FROM documents WHERE agent_id = %s AND content_hash = %s "
+                    "LIMIT 1 FOR UPDATE",
+                    (self.agent_id, content_hash)
+                )
+                duplicate = cur.fetchone()
+                if duplicate:
+                    removed = 0
+                    if row:
+                        cur.execute("SELECT count(*) FROM document_chunks WHERE document_id = %s", (row[0],))
+                        removed = cur.fetchone()[0]
+                        cur.execute("DELETE FROM documents WHERE id = %s", (row[0],))
+                    conn.commit()
+                    if row:
+                        self._invalidate_local_index()
+                    logger.info(f"⏭️ PGVectorStore: '{source}' tem o mesmo conteúdo de '{duplicate[1]}' "
+                                f"para o agente {self.agent_id}")
+                    return {'document_id': str(duplicate[0]), 'status': 'unchanged', 'duplicate_of': duplicate[1],
+                            'kept': len(texts), 'added': 0, 'removed': removed}
+
+                if row:
+                    document_id = row[0]
+                    diff = sync_document_chunks(cur, document_id, self.agent_id, texts,
+                                                self.embedding_function, batch_size=batch_size)
+                    cur.execute("UPDATE documents SET content_hash = %s WHERE id = %s", (content_hash, document_id))
+                    status = 'updated'
+                else:
+                    cur.execute(
+                        "INSERT INTO documents (agent_id, file_name, source_type, content_hash) "
+                        "VALUES (%s, %s, %s, %s) RETURNING id",
+                        (self.agent_id, source, source_type, content_hash)
+                    )
+                    document_id = cur.fetchone()[0]
+                    added = bulk_insert_chunks(cur, document_id, self.agent_id, texts,
+                                               self.embedding_function(texts) if texts else [], batch_size=batch_size)
+                    diff = {'kept': 0, 'added': added, 'removed': 0}
+                    status = 'created'
+            conn.commit()
+            self._invalidate_local_index()
+        except Exception as e:
+            logger.error(f"❌ PGVectorStore: Erro ao sincronizar '{source}': {e}", exc_info=True)
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if conn:
+                Database.release_connection(conn)
+
+        logger.info(f"🔁 PGVectorStore: '{source}' {status} para o agente {self.agent_id} "
+                    f"(+{diff['added']} / -{diff['removed']} / ={diff['kept']})")
+        return {'document_id': str(document_id), 'status': status, **diff}
+
+    def _invalidate_local_index(self):
+        """Descarta o índice local e a contagem de chunks do agente após escritas deste processo"""
+        get_vector_index_manager().invalidate(self.agent_id)
+        local_index = get_local_ann_index()
+        if local_index:
+            local_index.invalidate(self.agent_id)
+
+    def _local_similarity_search(self, query_embedding, k: int) -> Optional[List[Document]]:
+        """Top-k servido pelo índice local do agente (None se desativado ou indisponível)"""
+        local_index = get_local_ann_index()
+        if local_index is None:
+            return None
+        try:
+            results = local_index.search(self.agent_id, query_embedding, k)
+        except Exception as e:
+            logger.warning(f"⚠️ PGVectorStore: índice local indisponível, usando o pgvector: {e}")
+            return None
+
+        logger.info(f"⚡ PGVectorStore: {len(results)} chunks do índice local do agente {self.agent_id}")
+        return [Document(
+            page_content=text,
+            metadata={
+                'distance': 1.0 - similarity,
+                'agent_id': self.agent_id,
+                'source_agent_verified': True,
+                'chunk_id': chunk_id
+            }
+        ) for chunk_id, text, similarity in results]
+
+    def similarity_search(self, query: str, k: int = 5, recall: Optional[float] = None) -> List[Document]:
+        """
+        Busca por documentos similares a uma query APENAS do agente atual.
+        ``recall`` (ex: 0.99) aumenta o ``hnsw.ef_search`` da consulta ao custo de latência.
+        """
         # Validação de segurança: garantir que agent_id não seja nulo/vazio
         if not self.agent_id or not isinstance(self.agent_id, str):
             raise ValueError(f"Agent ID inválido para busca: {self.agent_id}")
             
         logger.info(f"🔍 PGVectorStore: Iniciando busca por similaridade para agente {self.agent_id}")
         
-        query_embedding = self.embedding_function([query])[0]
+        query_embedding = self._embed_query(query)
         logger.info(f"🧠 PGVectorStore: Embedding da query gerado ({len(query_embedding)} dimensões)")
 
+        # O índice local só contém chunks carregados com WHERE agent_id = %s
+        local_results = self._local_similarity_search(query_embedding, k)
+        if local_results is not None:
+            return local_results
+
         # Usar uma conexão dedicada para a busca
         conn = None
         try:
             conn = Database.get_connection()
-            register_vector(conn)
             
             with conn.cursor() as cur:
+                # Índice parcial do agente, busca exata ou HNSW global com ef_search ajustado
+                strategy = get_vector_index_manager().prepare_search(cur, self.agent_id, k, recall)
+
                 # ISOLAMENTO GARANTIDO: Busca APENAS chunks do agente específico
                 # Usamos tanto WHERE agent_id = %s quanto validação dupla
                 db_query = """
@@ -412,7 +690,7 @@ class PGVectorStore:
                     LIMIT %s
                 """
                 
-                logger.info(f"📊 PGVectorStore: Executando busca ISOLADA por {k} chunks do agente {self.agent_id}...")
+                logger.info(f"📊 PGVectorStore: Executando busca ISOLADA ({strategy}) por {k} chunks do agente {self.agent_id}...")
                 cur.execute(db_query, (query_embedding, self.agent_id, k))
                 results = cur.fetchall()
                 
@@ -436,6 +714,109 @@ class PGVectorStore:
         except Exception as e:
             logger.error(f"❌ PGVectorStore: Erro na busca por similaridade: {e}", exc_info=True)
             raise
+        finally:
+            if conn:
+                Database.release_connection(conn)
+
+    def hybrid_search(self, query: str, k: int = 5, candidates: Optional[int] = None, rrf_k: int = 60,
+                      recall: Optional[float] = None) -> List[Document]:
+        """
+        Busca híbrida do agente: vetorial (pgvector) + textual (tsvector/GIN),
+        fundidas por Reciprocal Rank Fusion em uma única consulta.
+
+        Cada lado traz até ``candidates`` chunks pelos seus índices (HNSW e GIN,
+        ambos filtrados por ``agent_id``) e o score final é
+        ``1/(rrf_k + rank_vetorial) + 1/(rrf_k + rank_textual)``.
+        Termos exatos (números de artigos, CPF/CNPJ) entram pelo lado textual.
+        Com o índice local ativo (LOCAL_ANN_ENABLED), o lado vetorial vem dele e
+        o banco só executa o lado textual e a fusão.
+        """
+        if not self.agent_id or not isinstance(self.agent_id, str):
+            raise ValueError(f"Agent ID inválido para busca: {self.agent_id}")
+
+        candidates = candidates or max(4 * k, 20)
+        query_embedding = self._embed_query(query)
+        lexical = build_lexical_query(query)
+
+        # Lado vetorial pelo índice local (ids já na ordem de similaridade) ou pelo pgvector
+        local_results = self._local_similarity_search(query_embedding, candidates)
+        if local_results is not None:
+            vector_ids = [doc.metadata['chunk_id'] for doc in local_results]
+            vector_leg = """
+                    vec AS (
+                        SELECT v.id, v.rnk FROM unnest(%(vector_ids)s::uuid[]) WITH ORDINALITY AS v(id, rnk)
+                    ),"""
+        else:
+            vector_ids = None
+            vector_leg = """
+                    vec AS (
+                        SELECT id, row_number() OVER (ORDER BY distance) AS rnk FROM (
+                            SELECT id, embedding <=> %(embedding)s::vector AS distance FROM document_chunks
+                            WHERE agent_id = %(agent_id)s
+                            ORDER BY distance
+                            LIMIT %(candidates)s
+                        ) v
+                    ),"""
+
+        conn = None
+        try:
+            conn = Database.get_connection()
+            with conn.cursor() as cur:
+                if vector_ids is None:
+                    strategy = get_vector_index_manager().prepare_search(cur, self.agent_id, candidates, recall)
+                else:
+                    strategy = "local"
+                cur.execute("""
+                    WITH q AS (
+                        SELECT to_tsquery('portuguese', %(words)s) || to_tsquery('simple', %(numbers)s) AS query
+                    ),""" + vector_leg + """
+                    lex AS (
+                        SELECT id, row_number() OVER (ORDER BY rank DESC) AS rnk FROM (
+                            SELECT c.id, ts_rank_cd(c.chunk_tsv, q.query) AS rank FROM document_chunks c, q
+                            WHERE c.agent_id = %(agent_id)s AND c.chunk_tsv @@ q.query
+                            ORDER BY rank DESC
+                            LIMIT %(candidates)s
+                        ) l
+                    ),
+                    fused AS (
+                        SELECT COALESCE(vec.id, lex.id) AS id,
+                               COALESCE(1.0 / (%(rrf_k)s + vec.rnk), 0) + COALESCE(1.0 / (%(rrf_k)s + lex.rnk), 0) AS score,
+                               vec.rnk AS vector_rank, lex.rnk AS lexical_rank
+                        FROM vec FULL OUTER JOIN lex ON vec.id = lex.id
+                    )
+                    SELECT c.chunk_text, (c.embedding <=> %(embedding)s::vector) AS distance, c.agent_id,
+                           f.score, f.vector_rank, f.lexical_rank
+                    FROM fused f JOIN document_chunks c ON c.id = f.id
+                    ORDER BY f.score DESC
+                    LIMIT %(k)s
+                """, {
+                    'words': lexical['words'], 'numbers': lexical['numbers'], 'agent_id': self.agent_id,
+                    'embedding': query_embedding, 'candidates': candidates, 'rrf_k': rrf_k, 'k': k,
+                    'vector_ids': vector_ids
+                })
+                results = cur.fetchall()
+
+            for row in results:
+                if row[2] != self.agent_id:
+                    logger.error(f"🚨 VIOLAÇÃO DE SEGURANÇA: Chunk de agente diferente detectado! Esperado: {self.agent_id}, Encontrado: {row[2]}")
+                    raise SecurityError(f"Violação de isolamento de agente detectada")
+
+            logger.info(f"✅ PGVectorStore: busca híbrida ({strategy}) retornou {len(results)} chunks "
+                        f"({sum(1 for r in results if r[5] is not None)} com match textual) para o agente {self.agent_id}")
+            return [Document(
+                page_content=row[0],
+                metadata={
+                    'distance': float(row[1]),
+                    'agent_id': row[2],
+                    'source_agent_verified': row[2] == self.agent_id,
+                    'rrf_score': float(row[3]),
+                    'vector_rank': row[4],
+                    'lexical_rank': row[5]
+                }
+            ) for row in results]
+        except Exception as e:
+            logger.error(f"❌ PGVectorStore: Erro na busca híbrida: {e}", exc_info=True)
+            raise
         finally:
             if conn:
                 Database.release_connection(conn) 
\ No newline at end of file
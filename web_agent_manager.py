@@ -1,6 +1,8 @@
 import os
+import re
 import logging
-from flask import Flask, request, jsonify, render_template, redirect, url_for, g
+import json
+from flask import Flask, request, jsonify, render_template, redirect, url_for, g, Response, stream_with_context
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 from pathlib import Path
@@ -24,6 +26,16 @@ from database import Database
 from extension_api import extension_api_bp
 from agent_system import Agent
 from scraper import scrape_url # Importa a nova função
+from browser_pool import get_browser_pool
+from http_fetcher import fetch_tier_stats
+from resource_blocking import get_network_stats
+from crawler import start_crawl, get_crawl_status
+from embedding_cache import get_embedding_cache
+from metrics_collector import get_metrics_collector
+from response_cache import get_response_cache
+from local_ann_index import get_local_ann_index
+from vector_index_manager import get_vector_index_manager
+from request_coalescing import coalescing_stats
 from chrome_extension_manager import register_extension_api, test_extension_integration
 
 # Função para testar conectividade com o banco
@@ -166,12 +178,13 @@ def handle_chat(agent_id):
         
     data = request.json
     user_message = data.get('message', '')
-    history = data.get('history', [])
     compare_llms = data.get('compare_llms', False)
     providers = data.get('providers', ['openai'])
 
     if not user_message: return jsonify({"error": "Mensagem não pode ser vazia"}), 400
 
+    # Antes de salvar o turno atual, para que ele não apareça no próprio histórico
+    history = agent.get_chat_history(data.get('history', []))
     conversation_id = agent.save_conversation(user_message)
     if not conversation_id: return jsonify({"error": "Falha ao salvar conversa"}), 500
 
@@ -189,12 +202,42 @@ def handle_chat(agent_id):
         response_id = agent.save_llm_response(conversation_id, agent.llm_provider_name, model_to_use, response_text, 0)
         return jsonify({"id": response_id, "role": "assistant", "content": response_text})
 
+@app.route('/api/v1/agents/<agent_id>/chat/stream', methods=['POST'])
+def handle_chat_stream(agent_id):
+    """Chat em streaming (Server-Sent Events): um evento por token e um evento final 'done'."""
+    agent = Agent.get_by_id(agent_id)
+    if not agent: return jsonify({"error": "Agente não encontrado"}), 404
+
+    data = request.json
+    user_message = data.get('message', '')
+
+    if not user_message: return jsonify({"error": "Mensagem não pode ser vazia"}), 400
+
+    history = agent.get_chat_history(data.get('history', []))
+    conversation_id = agent.save_conversation(user_message)
+    if not conversation_id: return jsonify({"error": "Falha ao salvar conversa"}), 500
+
+    def events():
+        for event in agent.stream_chat(user_message, history, conversation_id):
+            yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/v1/agents/<agent_id>/history', methods=['GET'])
 def get_history(agent_id):
     agent = Agent.get_by_id(agent_id)
     if not agent: return jsonify({"error": "Agente não encontrado"}), 404
-    history = agent.get_full_history()
-    return jsonify(history)
+    try:
+        page = agent.get_history_page(limit=request.args.get('limit', 50, type=int),
+                                      before=request.args.get('before'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    # Corpo continua sendo a lista de mensagens; a próxima página vem no cabeçalho
+    response = jsonify(page['items'])
+    if page['next_cursor']:
+        response.headers['X-Next-Cursor'] = page['next_cursor']
+    return response
 
 @app.route('/api/v1/responses/<response_id>/feedback', methods=['POST'])
 def handle_feedback(response_id):
@@ -248,6 +291,43 @@ def handle_capture_page():
         logging.error(f"Erro ao adicionar documento de URL para o agente {agent_id}: {e}", exc_info=True)
         return jsonify({"error": "Falha ao salvar o conteúdo capturado na base de conhecimento."}), 500
 
+@app.route('/api/v1/agents/<agent_id>/crawl', methods=['POST'])
+def handle_start_crawl(agent_id):
+    """
+    Inicia em segundo plano a captura em lote de sementes e/ou sitemaps para o
+    agente. Reenviar com o mesmo crawl_id retoma uma captura interrompida.
+    """
+    data = request.json or {}
+    seeds, sitemaps = data.get('seeds', []), data.get('sitemaps', [])
+    if not seeds and not sitemaps and not data.get('crawl_id'):
+        return jsonify({"error": "Informe seeds e/ou sitemaps (ou o crawl_id a retomar)."}), 400
+
+    options = {key: data[key] for key in ('max_pages', 'max_depth', 'same_domain', 'include', 'exclude')
+               if key in data}
+    # Regex inválidas são erro do cliente, não do servidor
+    for key in ('include', 'exclude'):
+        patterns = options.get(key) or []
+        if not isinstance(patterns, list) or not all(isinstance(p, str) for p in patterns):
+            return jsonify({"error": f"'{key}' deve ser uma lista de expressões regulares."}), 400
+        for pattern in patterns:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                return jsonify({"error": f"Expressão regular inválida em '{key}': {pattern!r} ({e})"}), 400
+    try:
+        status = start_crawl(agent_id, seeds, sitemaps, crawl_id=data.get('crawl_id'), **options)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(status), 202
+
+@app.route('/api/v1/agents/<agent_id>/crawl/<crawl_id>', methods=['GET'])
+def handle_crawl_status(agent_id, crawl_id):
+    """Progresso de uma captura em lote"""
+    status = get_crawl_status(crawl_id)
+    if not status or status['agent_id'] != agent_id:
+        return jsonify({"error": "Captura não encontrada"}), 404
+    return jsonify(status)
+
 @app.route('/add_document', methods=['POST'])
 def add_document_from_extension():
     """Endpoint para a extensão do Chrome salvar conteúdo de uma página."""
@@ -347,5 +427,68 @@ def get_available_models():
         "available_providers": llm_manager.list_available_providers()
     })
 
+@app.route('/api/v1/embedding_cache/stats', methods=['GET'])
+def get_embedding_cache_stats():
+    """Retorna contadores de acerto/erro do cache de embeddings"""
+    return jsonify(get_embedding_cache().stats())
+
+@app.route('/api/v1/response_cache/stats', methods=['GET'])
+def get_response_cache_stats():
+    """Acertos do cache de respostas (exato/semântico) e latência economizada"""
+    cache = get_response_cache()
+    hours = request.args.get('hours', 24, type=int)
+    return jsonify({
+        'enabled': cache is not None,
+        'process': cache.stats() if cache else {},
+        'history': get_metrics_collector().get_cache_stats(hours).get('response_cache', {})
+    })
+
+@app.route('/api/v1/db/pool_stats', methods=['GET'])
+def get_db_pool_stats():
+    """Tempo de espera e saturação do pool de conexões com o PostgreSQL"""
+    return jsonify(Database.get_pool_stats())
+
+@app.route('/api/v1/db/vector_indexes', methods=['GET'])
+def get_vector_indexes_report():
+    """Tamanho, uso e tempo de construção dos índices vetoriais de document_chunks"""
+    try:
+        return jsonify(get_vector_index_manager().report())
+    except Exception as e:
+        logging.error(f"Erro ao gerar relatório de índices vetoriais: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/v1/local_ann/stats', methods=['GET'])
+def get_local_ann_stats():
+    """Agentes com índice vetorial local carregado, memória usada e latência média da busca"""
+    local_index = get_local_ann_index()
+    return jsonify({'enabled': local_index is not None, **(local_index.stats() if local_index else {})})
+
+@app.route('/api/v1/metrics/rerank', methods=['GET'])
+def get_rerank_metrics():
+    """Latência, estouro de orçamento e mudanças no top-k do reranker, por scorer"""
+    hours = request.args.get('hours', 24, type=int)
+    return jsonify(get_metrics_collector().get_rerank_stats(hours))
+
+@app.route('/api/v1/scraper/browser_pool', methods=['GET'])
+def get_browser_pool_stats():
+    """Lançamentos, quedas e reciclagem de contextos do navegador, mais requisições bloqueadas e tempo de carga"""
+    return jsonify({**get_browser_pool().stats(), 'network': get_network_stats().stats()})
+
+@app.route('/api/v1/scraper/fetch_tiers', methods=['GET'])
+def get_fetch_tier_stats():
+    """Capturas resolvidas via HTTP, escaladas para o navegador e camada lembrada por domínio"""
+    return jsonify(fetch_tier_stats())
+
+@app.route('/api/v1/metrics/coalescing', methods=['GET'])
+def get_coalescing_metrics():
+    """Requisições coalescidas por grupo (embedding, busca, geração) e acertos do cache de consultas"""
+    return jsonify(coalescing_stats())
+
+@app.route('/api/v1/metrics/streaming', methods=['GET'])
+def get_streaming_metrics():
+    """Tempo médio até o primeiro token e tempo total das respostas em streaming, por provedor"""
+    hours = request.args.get('hours', 24, type=int)
+    return jsonify(get_metrics_collector().get_stream_stats(hours))
+
 if __name__ == "__main__":
     app.run(debug=True, port=5000, host='0.0.0.0') 
\ No newline at end of file